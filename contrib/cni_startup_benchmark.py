@@ -0,0 +1,73 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compares the startup time of kuryr-cni and kuryr-cni-client.
+
+Both are run with CNI_COMMAND=VERSION, which doesn't talk to kuryr-daemon,
+so the results are the per-pod overhead of starting the CNI driver that
+kubelet pays on every ADD and DEL, e.g.:
+
+    $ python contrib/cni_startup_benchmark.py -n 50
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+COMMANDS = {
+    'kuryr-cni': [sys.executable, '-m', 'kuryr_kubernetes.cmd.cni'],
+    'kuryr-cni-client': [sys.executable, '-m', 'kuryr_kubernetes.cni.client'],
+}
+
+
+def _measure(command, runs, kuryr_conf):
+    env = dict(os.environ, CNI_COMMAND='VERSION')
+    stdin = json.dumps({'kuryr_conf': kuryr_conf}).encode()
+    times = []
+    for _ in range(runs):
+        start = time.monotonic()
+        subprocess.run(command, input=stdin, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.monotonic() - start) * 1000)
+    return sorted(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--runs', type=int, default=20,
+                        help='Number of times to start each command.')
+    parser.add_argument('--config-file',
+                        help='kuryr.conf to start kuryr-cni with, an empty '
+                             'one by default.')
+    args = parser.parse_args()
+
+    kuryr_conf = args.config_file
+    if not kuryr_conf:
+        tmp = tempfile.NamedTemporaryFile(suffix='.conf')
+        kuryr_conf = tmp.name
+
+    print('%-18s %8s %8s %8s %8s' % ('command (ms)', 'min', 'median', 'p90',
+                                     'max'))
+    for name, command in COMMANDS.items():
+        times = _measure(command, args.runs, kuryr_conf)
+        p90 = times[min(len(times) - 1, int(len(times) * 0.9))]
+        print('%-18s %8.1f %8.1f %8.1f %8.1f' % (
+            name, times[0], statistics.median(times), p90, times[-1]))
+
+
+if __name__ == '__main__':
+    main()
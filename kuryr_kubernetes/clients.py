@@ -17,7 +17,6 @@ from functools import partial
 import ipaddress
 import os
 
-from keystoneauth1 import session as k_session
 from kuryr.lib import utils
 from openstack import connection
 from openstack import exceptions as os_exc
@@ -30,6 +29,7 @@ from openstack import utils as os_utils
 from kuryr_kubernetes import config
 from kuryr_kubernetes import k8s_client
 from kuryr_kubernetes.pod_resources import client as pr_client
+from kuryr_kubernetes import rate_limit
 
 _clients = {}
 _NEUTRON_CLIENT = 'neutron-client'
@@ -159,8 +159,9 @@ def setup_openstacksdk():
     # NOTE(mdulko): To get rid of warnings about connection pool being full
     #               we need to "tweak" the keystoneauth's adapters increasing
     #               the maximum pool size.
+    # The adapters also enforce client-side rate limits of OpenStack APIs.
     for scheme in list(session.session.adapters):
-        session.session.mount(scheme, k_session.TCPKeepAliveAdapter(
+        session.session.mount(scheme, rate_limit.get_openstack_adapter(
             pool_maxsize=1000))
 
     # TODO(mdulko): To use Neutron's ability to do compare-and-swap updates we
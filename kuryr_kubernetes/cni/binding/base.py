@@ -14,7 +14,10 @@
 #    under the License.
 
 import abc
+import contextlib
 import errno
+import os
+import threading
 
 import os_vif
 from os_vif.objects import vif as osv_objects
@@ -23,33 +26,38 @@ import pyroute2
 from pyroute2 import netns as pyroute_netns
 from stevedore import driver as stv_driver
 
-from kuryr_kubernetes.cni import utils as cni_utils
 from kuryr_kubernetes import config
 from kuryr_kubernetes import constants
+from kuryr_kubernetes import exceptions
 from kuryr_kubernetes import utils
 
 _BINDING_NAMESPACE = 'kuryr_kubernetes.cni.binding'
 LOG = logging.getLogger(__name__)
 
+_host_iproute = None
+_host_iproute_pid = None
+_host_iproute_lock = threading.Lock()
+_netns_iproutes = threading.local()
+
 
 class BaseBindingDriver(object, metaclass=abc.ABCMeta):
     """Interface to attach ports to pods."""
 
-    def _remove_ifaces(self, ipdb, ifnames, netns='host'):
+    def _remove_ifaces(self, ipr, ifnames, netns='host'):
         """Check if any of `ifnames` exists and remove it.
 
-        :param ipdb: ipdb of the network namespace to check
+        :param ipr: IPRoute of the network namespace to check
         :param ifnames: iterable of interface names to remove
         :param netns: network namespace name (used for logging)
         """
         for ifname in ifnames:
-            if ifname in ipdb.interfaces:
+            index = ipr.link_lookup(ifname=ifname)
+            if index:
                 LOG.warning('Found hanging interface %(ifname)s inside '
                             '%(netns)s netns. Most likely it is a leftover '
                             'from a kuryr-daemon restart. Trying to delete '
                             'it.', {'ifname': ifname, 'netns': netns})
-                with ipdb.interfaces[ifname] as iface:
-                    iface.remove()
+                ipr.link('del', index=index[0])
 
     @abc.abstractmethod
     def connect(self, vif, ifname, netns, container_id):
@@ -67,51 +75,94 @@ def _get_binding_driver(vif):
     return mgr.driver
 
 
-def get_ipdb(netns=None):
-    if netns:
-        netns = utils.convert_netns(netns)
-        ipdb = pyroute2.IPDB(nl=pyroute2.NetNS(netns))
-    else:
-        ipdb = pyroute2.IPDB()
-    return ipdb
+def _get_host_iproute():
+    global _host_iproute, _host_iproute_pid
+    with _host_iproute_lock:
+        # NOTE(dulek): Netlink socket cannot be shared with forked processes,
+        #              they would get each other's responses.
+        if _host_iproute is None or _host_iproute_pid != os.getpid():
+            _host_iproute = pyroute2.IPRoute()
+            _host_iproute_pid = os.getpid()
+        return _host_iproute
+
+
+@contextlib.contextmanager
+def _switch_netns(netns):
+    """Moves the calling thread to the netns for the duration of the block.
+
+    setns() only affects the calling thread, so other threads of the daemon
+    stay in the host netns.
+    """
+    with open(utils.convert_netns('/proc/self/ns/net')) as self_ns_fd:
+        pyroute_netns.setns(netns, flags=0)
+        try:
+            yield
+        finally:
+            pyroute_netns.setns(self_ns_fd)
+
+
+@contextlib.contextmanager
+def get_iproute(netns=None):
+    """Yields IPRoute handle of the netns, the host netns by default.
+
+    The handle of the host netns is shared by the whole process. The one of
+    a pod netns is opened on the first use and reused by nested calls in
+    the same thread, e.g. through the whole `connect()`, then it's closed.
+    It's a netlink socket created in the netns, which is much cheaper than
+    pyroute2.NetNS forking a process to run in the netns.
+    """
+    if not netns:
+        yield _get_host_iproute()
+        return
+
+    netns = utils.convert_netns(netns)
+    handles = _netns_iproutes.__dict__.setdefault('handles', {})
+    if netns in handles:
+        yield handles[netns]
+        return
+
+    with _switch_netns(netns):
+        ipr = pyroute2.IPRoute()
+    handles[netns] = ipr
+    try:
+        yield ipr
+    finally:
+        del handles[netns]
+        ipr.close()
 
 
 def _enable_ipv6(netns):
     # Docker disables IPv6 for --net=none containers
     # TODO(apuimedo) remove when it is no longer the case
-    try:
-        netns = utils.convert_netns(netns)
-        path = utils.convert_netns('/proc/self/ns/net')
-        self_ns_fd = open(path)
-        pyroute_netns.setns(netns)
+    with _switch_netns(utils.convert_netns(netns)):
         path = utils.convert_netns('/proc/sys/net/ipv6/conf/all/disable_ipv6')
         with open(path, 'w') as disable_ipv6:
             disable_ipv6.write('0')
-    except Exception:
-        raise
-    finally:
-        pyroute_netns.setns(self_ns_fd)
 
 
 def _configure_l3(vif, ifname, netns, is_default_gateway):
-    with get_ipdb(netns) as ipdb:
-        with ipdb.interfaces[ifname] as iface:
-            for subnet in vif.network.subnets.objects:
-                if subnet.cidr.version == 6:
-                    _enable_ipv6(netns)
-                for fip in subnet.ips.objects:
-                    iface.add_ip('%s/%s' % (fip.address,
-                                            subnet.cidr.prefixlen))
-
-        routes = ipdb.routes
+    with get_iproute(netns) as ipr:
+        index = ipr.link_lookup(ifname=ifname)
+        if not index:
+            raise exceptions.CNIBindingFailure(
+                f'Cannot find interface {ifname} in netns {netns} to '
+                'configure its addresses and routes.')
+        index = index[0]
+        for subnet in vif.network.subnets.objects:
+            if subnet.cidr.version == 6:
+                _enable_ipv6(netns)
+            for fip in subnet.ips.objects:
+                ipr.addr('add', index=index, address=str(fip.address),
+                         mask=subnet.cidr.prefixlen)
+
         for subnet in vif.network.subnets.objects:
             for route in subnet.routes.objects:
-                routes.add(gateway=str(route.gateway),
-                           dst=str(route.cidr)).commit()
+                ipr.route('add', gateway=str(route.gateway),
+                          dst=str(route.cidr))
             if is_default_gateway and hasattr(subnet, 'gateway'):
                 try:
-                    routes.add(gateway=str(subnet.gateway),
-                               dst='default').commit()
+                    ipr.route('add', gateway=str(subnet.gateway),
+                              dst='default')
                 except pyroute2.NetlinkError as ex:
                     if ex.code != errno.EEXIST:
                         raise
@@ -152,19 +203,20 @@ def _need_configure_l3(vif):
     return True
 
 
-@cni_utils.log_ipdb
 def connect(vif, instance_info, ifname, netns=None, report_health=None,
             is_default_gateway=True, container_id=None):
     driver = _get_binding_driver(vif)
     if report_health:
         report_health(driver.is_alive())
     os_vif.plug(vif, instance_info)
-    driver.connect(vif, ifname, netns, container_id)
-    if _need_configure_l3(vif):
-        _configure_l3(vif, ifname, netns, is_default_gateway)
+    # NOTE(dulek): Keep the pod netns handle open, so that the driver and L3
+    #              configuration share it instead of opening their own.
+    with get_iproute(netns):
+        driver.connect(vif, ifname, netns, container_id)
+        if _need_configure_l3(vif):
+            _configure_l3(vif, ifname, netns, is_default_gateway)
 
 
-@cni_utils.log_ipdb
 def disconnect(vif, instance_info, ifname, netns=None, report_health=None,
                container_id=None, **kwargs):
     driver = _get_binding_driver(vif)
@@ -174,9 +226,8 @@ def disconnect(vif, instance_info, ifname, netns=None, report_health=None,
     os_vif.unplug(vif, instance_info)
 
 
-@cni_utils.log_ipdb
 def cleanup(ifname, netns):
-    with get_ipdb(netns) as c_ipdb:
-        if ifname in c_ipdb.interfaces:
-            with c_ipdb.interfaces[ifname] as iface:
-                iface.remove()
+    with get_iproute(netns) as c_ipr:
+        index = c_ipr.link_lookup(ifname=ifname)
+        if index:
+            c_ipr.link('del', index=index[0])
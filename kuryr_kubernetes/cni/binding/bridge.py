@@ -36,29 +36,28 @@ class BaseBridgeDriver(health.HealthHandler, b_base.BaseBindingDriver):
         #              there's a leftover host-side vif. If so we need to
         #              remove it, its peer should get deleted automatically by
         #              the kernel.
-        with b_base.get_ipdb() as h_ipdb:
-            self._remove_ifaces(h_ipdb, (host_ifname,))
+        with b_base.get_iproute() as h_ipr:
+            self._remove_ifaces(h_ipr, (host_ifname,))
 
         interface_mtu = vif.network.mtu
         mtu_cfg = CONF.neutron_defaults.network_device_mtu
         if mtu_cfg and mtu_cfg < interface_mtu:
             interface_mtu = CONF.neutron_defaults.network_device_mtu
 
-        with b_base.get_ipdb(netns) as c_ipdb:
-            with c_ipdb.create(ifname=ifname, peer=host_ifname,
-                               kind='veth') as c_iface:
-                c_iface.mtu = interface_mtu
-                c_iface.address = str(vif.address)
-                c_iface.up()
+        with b_base.get_iproute(netns) as c_ipr:
+            c_ipr.link('add', ifname=ifname, peer=host_ifname, kind='veth')
+            c_index = c_ipr.link_lookup(ifname=ifname)[0]
+            c_ipr.link('set', index=c_index, mtu=interface_mtu,
+                       address=str(vif.address))
+            c_ipr.link('set', index=c_index, state='up')
 
             if netns:
-                with c_ipdb.interfaces[host_ifname] as h_iface:
-                    h_iface.net_ns_pid = os.getpid()
+                h_index = c_ipr.link_lookup(ifname=host_ifname)[0]
+                c_ipr.link('set', index=h_index, net_ns_pid=os.getpid())
 
-        with b_base.get_ipdb() as h_ipdb:
-            with h_ipdb.interfaces[host_ifname] as h_iface:
-                h_iface.mtu = interface_mtu
-                h_iface.up()
+        with b_base.get_iproute() as h_ipr:
+            h_index = h_ipr.link_lookup(ifname=host_ifname)[0]
+            h_ipr.link('set', index=h_index, mtu=interface_mtu, state='up')
 
     def disconnect(self, vif, ifname, netns, container_id):
         pass
@@ -73,9 +72,10 @@ class BridgeDriver(BaseBridgeDriver):
         host_ifname = vif.vif_name
         bridge_name = vif.bridge_name
 
-        with b_base.get_ipdb() as h_ipdb:
-            with h_ipdb.interfaces[bridge_name] as h_br:
-                h_br.add_port(host_ifname)
+        with b_base.get_iproute() as h_ipr:
+            h_index = h_ipr.link_lookup(ifname=host_ifname)[0]
+            br_index = h_ipr.link_lookup(ifname=bridge_name)[0]
+            h_ipr.link('set', index=h_index, master=br_index)
 
     def disconnect(self, vif, ifname, netns, container_id):
         # NOTE(ivc): veth pair is destroyed automatically along with the
@@ -105,8 +105,8 @@ class VIFOpenVSwitchDriver(BaseBridgeDriver):
     def is_alive(self):
         bridge_name = CONF.neutron_defaults.ovs_bridge
         try:
-            with b_base.get_ipdb() as h_ipdb:
-                h_ipdb.interfaces[bridge_name]
+            with b_base.get_iproute() as h_ipr:
+                h_ipr.link_lookup(ifname=bridge_name)[0]
             return True
         except Exception:
             LOG.error("The configured ovs_bridge=%s integration interface "
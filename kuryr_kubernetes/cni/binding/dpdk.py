@@ -73,10 +73,10 @@ class DpdkDriver(health.HealthHandler, b_base.BaseBindingDriver):
         self._remove_pci_file(container_id, ifname)
 
     def _get_iface_name_by_mac(self, mac_address):
-        with b_base.get_ipdb() as h_ipdb:
-            for name, data in h_ipdb.interfaces.items():
-                if data['address'] == mac_address:
-                    return data['ifname']
+        with b_base.get_iproute() as h_ipr:
+            for link in h_ipr.get_links():
+                if link.get_attr('IFLA_ADDRESS') == mac_address:
+                    return link.get_attr('IFLA_IFNAME')
 
     def _get_device_info(self, ifname):
         """Get driver and PCI addr by using sysfs"""
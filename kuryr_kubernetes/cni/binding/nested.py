@@ -35,6 +35,13 @@ KUBELET_PORT = 10250
 LOG = logging.getLogger(__name__)
 
 
+def _get_vlan_id(link):
+    link_info = link.get_attr('IFLA_LINKINFO')
+    if not link_info or link_info.get_attr('IFLA_INFO_KIND') != VLAN_KIND:
+        return None
+    return link_info.get_attr('IFLA_INFO_DATA').get_attr('IFLA_VLAN_ID')
+
+
 class NestedDriver(health.HealthHandler, b_base.BaseBindingDriver,
                    metaclass=abc.ABCMeta):
 
@@ -45,12 +52,15 @@ class NestedDriver(health.HealthHandler, b_base.BaseBindingDriver,
     def _get_iface_create_args(self, vif):
         raise NotImplementedError()
 
-    def _detect_iface_name(self, h_ipdb):
+    def _detect_iface_name(self, h_ipr):
         # Let's try config first
-        if config.CONF.binding.link_iface in h_ipdb.interfaces:
-            LOG.debug(f'Using configured interface '
-                      f'{config.CONF.binding.link_iface} as bridge interface.')
-            return config.CONF.binding.link_iface
+        link_iface = config.CONF.binding.link_iface
+        if link_iface and h_ipr.link_lookup(ifname=link_iface):
+            LOG.debug(f'Using configured interface {link_iface} as bridge '
+                      f'interface.')
+            return link_iface
+
+        links = h_ipr.get_links()
 
         # Then let's try choosing the one where kubelet listens to
         conns = [x for x in psutil.net_connections()
@@ -58,24 +68,22 @@ class NestedDriver(health.HealthHandler, b_base.BaseBindingDriver,
                  and x.laddr.port == KUBELET_PORT]
         if len(conns) == 1:
             lookup_addr = conns[0].laddr.ip
-            for name, iface in h_ipdb.interfaces.items():
-                if type(name) is int:  # Skip ones duplicated by id
+            for addr in h_ipr.get_addr():
+                if addr.get_attr('IFA_ADDRESS') != lookup_addr:
                     continue
-
-                for addr in iface['ipaddr']:
-                    if addr[0] == lookup_addr:
+                for link in links:
+                    if link['index'] == addr['index']:
+                        name = link.get_attr('IFLA_IFNAME')
                         LOG.debug(f'Using kubelet bind interface {name} as '
                                   f'bridge interface.')
                         return name
 
         # Alright, just try the first non-loopback interface
-        for name, iface in h_ipdb.interfaces.items():
-            if type(name) is int:  # Skip ones duplicated by id
-                continue
-
-            if iface['flags'] & pyroute_netlink.rtnl.ifinfmsg.IFF_LOOPBACK:
+        for link in links:
+            if link['flags'] & pyroute_netlink.rtnl.ifinfmsg.IFF_LOOPBACK:
                 continue  # Skip loopback
 
+            name = link.get_attr('IFLA_IFNAME')
             LOG.debug(f'Using interface {name} as bridge interface.')
             return name
 
@@ -92,24 +100,20 @@ class NestedDriver(health.HealthHandler, b_base.BaseBindingDriver,
         # exists' error.
         temp_name = vif.vif_name
 
-        # First let's take a peek into the pod namespace and try to remove any
-        # leftover interface in case we got restarted before CNI returned to
-        # kubelet.
-        with b_base.get_ipdb(netns) as c_ipdb:
-            self._remove_ifaces(c_ipdb, (temp_name, ifname), netns)
+        with b_base.get_iproute(netns) as c_ipr, \
+                b_base.get_iproute() as h_ipr:
+            # First let's take a peek into the pod namespace and try to remove
+            # any leftover interface in case we got restarted before CNI
+            # returned to kubelet. We might also have leftover interface in
+            # the host netns, let's try to remove it too.
+            self._remove_ifaces(c_ipr, (temp_name, ifname), netns)
+            self._remove_ifaces(h_ipr, (temp_name,))
 
-        # We might also have leftover interface in the host netns, let's try to
-        # remove it too. This is outside of the main host's IPDB context
-        # manager to make sure removal is commited before starting next
-        # transaction.
-        with b_base.get_ipdb() as h_ipdb:
-            self._remove_ifaces(h_ipdb, (temp_name,))
-
-        with b_base.get_ipdb() as h_ipdb:
             # TODO(vikasc): evaluate whether we should have stevedore
             #               driver for getting the link device.
-            vm_iface_name = self._detect_iface_name(h_ipdb)
-            mtu = h_ipdb.interfaces[vm_iface_name].mtu
+            vm_iface_name = self._detect_iface_name(h_ipr)
+            vm_iface = h_ipr.link('get', ifname=vm_iface_name)[0]
+            mtu = vm_iface.get_attr('IFLA_MTU')
             if mtu < vif.network.mtu:
                 # NOTE(dulek): This might happen if Neutron and DHCP agent
                 # have different MTU settings. See
@@ -121,17 +125,16 @@ class NestedDriver(health.HealthHandler, b_base.BaseBindingDriver,
                     f'has the same or smaller MTU as node (VM) network.')
 
             args = self._get_iface_create_args(vif)
-            with h_ipdb.create(ifname=temp_name,
-                               link=h_ipdb.interfaces[vm_iface_name],
-                               **args) as iface:
-                iface.net_ns_fd = utils.convert_netns(netns)
-
-        with b_base.get_ipdb(netns) as c_ipdb:
-            with c_ipdb.interfaces[temp_name] as iface:
-                iface.ifname = ifname
-                iface.mtu = vif.network.mtu
-                iface.address = str(vif.address)
-                iface.up()
+            h_ipr.link('add', ifname=temp_name, link=vm_iface['index'],
+                       **args)
+            index = h_ipr.link_lookup(ifname=temp_name)[0]
+            h_ipr.link('set', index=index,
+                       net_ns_fd=utils.convert_netns(netns))
+
+            index = c_ipr.link_lookup(ifname=temp_name)[0]
+            c_ipr.link('set', index=index, ifname=ifname,
+                       mtu=vif.network.mtu, address=str(vif.address))
+            c_ipr.link('set', index=index, state='up')
 
     def disconnect(self, vif, ifname, netns, container_id):
         # NOTE(dulek): Interfaces should get deleted with the netns, but it may
@@ -139,8 +142,8 @@ class NestedDriver(health.HealthHandler, b_base.BaseBindingDriver,
         #              the old netns is deleted. This might result in VLAN ID
         #              conflict. In oder to protect from that let's remove the
         #              netns ifaces here anyway.
-        with b_base.get_ipdb(netns) as c_ipdb:
-            self._remove_ifaces(c_ipdb, (vif.vif_name, ifname), netns)
+        with b_base.get_iproute(netns) as c_ipr:
+            self._remove_ifaces(c_ipr, (vif.vif_name, ifname), netns)
 
 
 class VlanDriver(NestedDriver):
@@ -175,9 +178,9 @@ class VlanDriver(NestedDriver):
 
         netns_paths = []
         handled_netns = set()
-        with b_base.get_ipdb() as h_ipdb:
-            vm_iface_name = self._detect_iface_name(h_ipdb)
-            vm_iface_index = h_ipdb.interfaces[vm_iface_name].index
+        with b_base.get_iproute() as h_ipr:
+            vm_iface_name = self._detect_iface_name(h_ipr)
+            vm_iface_index = h_ipr.link_lookup(ifname=vm_iface_name)[0]
 
         if netns.startswith('/proc'):
             # Paths have /proc/<pid>/ns/net pattern, we need to iterate
@@ -215,16 +218,17 @@ class VlanDriver(NestedDriver):
             handled_netns.add(netns_id)
 
             try:
-                with b_base.get_ipdb(netns_path) as c_ipdb:
-                    for ifname, iface in c_ipdb.interfaces.items():
-                        if (iface.vlan_id == vlan_id
-                                and iface.link == vm_iface_index):
+                with b_base.get_iproute(netns_path) as c_ipr:
+                    for link in c_ipr.get_links():
+                        if (_get_vlan_id(link) == vlan_id
+                                and link.get_attr('IFLA_LINK') ==
+                                vm_iface_index):
+                            ifname = link.get_attr('IFLA_IFNAME')
                             LOG.warning(
                                 f'Found offending interface {ifname} with '
                                 f'VLAN ID {vlan_id} in netns {netns_path}. '
                                 f'Trying to remove it.')
-                            with c_ipdb.interfaces[ifname] as found_iface:
-                                found_iface.remove()
+                            c_ipr.link('del', index=link['index'])
                             break
             except OSError:
                 continue
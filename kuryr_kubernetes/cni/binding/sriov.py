@@ -152,14 +152,16 @@ class VIFSriovDriver(health.HealthHandler, b_base.BaseBindingDriver):
 
         self._set_vf_mac(pf, vf_index, vif.address)
 
-        with b_base.get_ipdb() as h_ipdb, b_base.get_ipdb(netns) as c_ipdb:
-            with h_ipdb.interfaces[vf_name] as host_iface:
-                host_iface.net_ns_fd = utils.convert_netns(netns)
+        with b_base.get_iproute() as h_ipr, \
+                b_base.get_iproute(netns) as c_ipr:
+            index = h_ipr.link_lookup(ifname=vf_name)[0]
+            h_ipr.link('set', index=index,
+                       net_ns_fd=utils.convert_netns(netns))
 
-            with c_ipdb.interfaces[vf_name] as iface:
-                iface.ifname = ifname
-                iface.mtu = vif.network.mtu
-                iface.up()
+            index = c_ipr.link_lookup(ifname=vf_name)[0]
+            c_ipr.link('set', index=index, ifname=ifname,
+                       mtu=vif.network.mtu)
+            c_ipr.link('set', index=index, state='up')
 
     def _get_vf_info(self, pci, driver):
         vf_sys_path = '/sys/bus/pci/devices/{}/net/'.format(pci)
@@ -363,24 +365,25 @@ class VIFSriovDriver(health.HealthHandler, b_base.BaseBindingDriver):
         LOG.debug("Setting VF MAC: pf = %s, vf_index = %s, mac = %s",
                   pf, vf_index, mac)
 
-        ip = pyroute2.IPRoute()
-        pf_index = ip.link_lookup(ifname=pf)[0]
-        try:
-            ip.link("set", index=pf_index, vf={"vf": vf_index, "mac": mac})
-        except pyroute2.NetlinkError:
-            LOG.exception("Unable to set mac for VF %s on pf %s",
-                          vf_index, pf)
-            raise
+        with b_base.get_iproute() as ip:
+            pf_index = ip.link_lookup(ifname=pf)[0]
+            try:
+                ip.link("set", index=pf_index,
+                        vf={"vf": vf_index, "mac": mac})
+            except pyroute2.NetlinkError:
+                LOG.exception("Unable to set mac for VF %s on pf %s",
+                              vf_index, pf)
+                raise
 
     def _set_vf_vlan(self, pf, vf_index, vlan_id):
         LOG.debug("Setting VF VLAN: pf = %s, vf_index = %s, vlan_id = %s",
                   pf, vf_index, vlan_id)
-        ip = pyroute2.IPRoute()
-        pf_index = ip.link_lookup(ifname=pf)[0]
-        try:
-            ip.link("set", index=pf_index, vf={"vf": vf_index,
-                                               "vlan": vlan_id})
-        except pyroute2.NetlinkError:
-            LOG.exception("Unable to set vlan for VF %s on pf %s",
-                          vf_index, pf)
-            raise
+        with b_base.get_iproute() as ip:
+            pf_index = ip.link_lookup(ifname=pf)[0]
+            try:
+                ip.link("set", index=pf_index, vf={"vf": vf_index,
+                                                   "vlan": vlan_id})
+            except pyroute2.NetlinkError:
+                LOG.exception("Unable to set vlan for VF %s on pf %s",
+                              vf_index, pf)
+                raise
@@ -0,0 +1,182 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Minimal CNI driver forwarding kubelet's requests to kuryr-daemon.
+
+It's the equivalent of kuryr-cni, but kubelet starts it for every pod, so
+it only imports the standard library instead of oslo.config, oslo.log and
+os-vif. kuryr-daemon is called on the Unix socket set as `daemon_socket`
+in the CNI config (see `[cni_daemon]bind_socket`), or on `daemon_address`
+(127.0.0.1:5036 by default) if there's none.
+"""
+
+from http import client as httplib
+import ipaddress
+import json
+import os
+import socket
+import sys
+import traceback
+
+from kuryr_kubernetes import constants as k_const
+
+CNI_VERSION = '0.3.1'
+SUPPORTED_VERSIONS = [CNI_VERSION]
+DEFAULT_ADDRESS = '127.0.0.1:5036'
+TIMEOUT = 180
+_OVO_DATA = 'versioned_object.data'
+
+
+class DaemonError(Exception):
+    def __init__(self, error):
+        super(DaemonError, self).__init__(error.get('msg'))
+        self.error = error
+
+
+class UnixDomainHttpConnection(httplib.HTTPConnection):
+
+    def __init__(self, path, timeout):
+        super(UnixDomainHttpConnection, self).__init__('localhost',
+                                                       timeout=timeout)
+        self._unix_socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self._unix_socket_path)
+        self.sock = sock
+
+
+def _get_connection(conf):
+    path = conf.get('daemon_socket')
+    if path:
+        return UnixDomainHttpConnection(path, TIMEOUT)
+    host, port = conf.get('daemon_address', DEFAULT_ADDRESS).rsplit(':', 1)
+    return httplib.HTTPConnection(host, int(port), timeout=TIMEOUT)
+
+
+def _make_request(conf, path, params, expected_status):
+    conn = _get_connection(conf)
+    try:
+        conn.request('POST', '/' + path, body=json.dumps(params),
+                     headers={'Content-Type': 'application/json',
+                              'Connection': 'close'})
+        resp = conn.getresponse()
+        data = resp.read()
+    finally:
+        conn.close()
+
+    if resp.status != expected_status:
+        try:
+            error = json.loads(data)
+        except ValueError:
+            error = None
+        if not isinstance(error, dict) or 'code' not in error:
+            error = {'code': k_const.CNI_EXCEPTION_CODE,
+                     'msg': 'Got invalid status code from CNI daemon.',
+                     'details': f'{resp.status} {resp.reason}'}
+        raise DaemonError(error)
+    return data
+
+
+def _ovo_data(primitive):
+    return primitive[_OVO_DATA]
+
+
+def _ovo_objects(primitive):
+    return [_ovo_data(o) for o in _ovo_data(primitive)['objects']]
+
+
+def _vif_data(vif, params):
+    """Translates the VIF primitive returned by kuryr-daemon to CNI result.
+
+    Same as `CNIRunner._vif_data`, without deserializing os-vif objects.
+    """
+    vif = _ovo_data(vif)
+    result = {}
+    nameservers = []
+
+    cni_ip_list = result.setdefault("ips", [])
+    cni_routes_list = result.setdefault("routes", [])
+    result["interfaces"] = [
+        {
+            "name": params["CNI_IFNAME"],
+            "mac": vif['address'],
+            "sandbox": params["CNI_CONTAINERID"]}]
+    for subnet in _ovo_objects(_ovo_data(vif['network'])['subnets']):
+        cni_ip = {}
+        nameservers.extend(subnet.get('dns', []))
+
+        ip = ipaddress.ip_address(_ovo_objects(subnet['ips'])[0]['address'])
+        prefixlen = ipaddress.ip_network(subnet['cidr']).prefixlen
+
+        cni_ip['version'] = str(ip.version)
+        cni_ip['address'] = "%s/%s" % (ip, prefixlen)
+        cni_ip['interface'] = len(result["interfaces"]) - 1
+
+        if 'gateway' in subnet:
+            cni_ip['gateway'] = str(subnet['gateway'])
+
+        routes = _ovo_objects(subnet['routes']) if 'routes' in subnet else []
+        cni_routes_list.extend(
+            {'dst': route['cidr'], 'gw': route['gateway']}
+            for route in routes)
+        cni_ip_list.append(cni_ip)
+
+    if nameservers:
+        result['dns'] = {'nameservers': nameservers}
+    return result
+
+
+def _write_dict(fout, dct):
+    output = {'cniVersion': CNI_VERSION}
+    output.update(dct)
+    json.dump(output, fout, sort_keys=True)
+
+
+def _run(env, conf, fout):
+    params = {k: v for k, v in env.items() if k.startswith('CNI_')}
+    params['config_kuryr'] = conf
+    command = env.get('CNI_COMMAND')
+    try:
+        if command == 'ADD':
+            vif = json.loads(_make_request(conf, 'addNetwork', params,
+                                           httplib.ACCEPTED))
+            _write_dict(fout, _vif_data(vif, params))
+        elif command == 'DEL':
+            _make_request(conf, 'delNetwork', params, httplib.NO_CONTENT)
+        elif command == 'VERSION':
+            _write_dict(fout, {'supportedVersions': SUPPORTED_VERSIONS})
+        elif command != 'CHECK':
+            raise ValueError(f'unknown CNI_COMMAND: {command}')
+        return 0
+    except DaemonError as ex:
+        _write_dict(fout, ex.error)
+    except socket.timeout:
+        _write_dict(fout, {'msg': 'timeout',
+                           'code': k_const.CNI_TIMEOUT_CODE})
+    except Exception as ex:
+        _write_dict(fout, {'msg': str(ex),
+                           'code': k_const.CNI_EXCEPTION_CODE,
+                           'details': traceback.format_exc()})
+    return 1
+
+
+def run():
+    conf = json.load(sys.stdin.buffer)
+    status = _run(os.environ, conf, sys.stdout)
+    if status:
+        sys.exit(status)
+
+
+if __name__ == '__main__':
+    run()
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import contextlib
 from ctypes import c_bool
 import errno
 from http import client as httplib
@@ -27,7 +29,6 @@ import urllib3
 import cotyledon
 import flask
 import pyroute2
-from pyroute2.ipdb import transactional
 from werkzeug import serving
 
 import os_vif
@@ -39,6 +40,7 @@ from oslo_serialization import jsonutils
 from kuryr_kubernetes import clients
 from kuryr_kubernetes.cni import handlers as h_cni
 from kuryr_kubernetes.cni import health
+from kuryr_kubernetes.cni import metrics
 from kuryr_kubernetes.cni.plugins import k8s_cni_registry
 from kuryr_kubernetes.cni import utils as cni_utils
 from kuryr_kubernetes import config
@@ -56,6 +58,55 @@ ErrTryAgainLater = 11
 ErrInternal = 999
 
 
+class AdmissionQueue(object):
+    """Admits requests to be processed in the order they came in.
+
+    At most `workers` requests are processed at once, the other ones wait
+    for their turn in a FIFO queue. Only `size` of the requests admitted with
+    `bounded=True` can be waiting at once.
+    """
+
+    def __init__(self, workers, size):
+        self._workers = workers
+        self._size = size
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = collections.deque()
+        self._bounded_waiting = 0
+
+    def _is_next(self, ticket):
+        return self._waiting[0] is ticket and self._running < self._workers
+
+    @contextlib.contextmanager
+    def admit(self, bounded=False):
+        """Waits for the turn of the request to be processed.
+
+        :param bounded: whether the request counts towards the queue size
+        :raises CNIRequestQueueFull: if the request cannot be queued
+        """
+        with self._cond:
+            if self._running < self._workers and not self._waiting:
+                self._running += 1
+            else:
+                if bounded and self._bounded_waiting >= self._size:
+                    raise exceptions.CNIRequestQueueFull()
+                ticket = object()
+                self._waiting.append(ticket)
+                self._bounded_waiting += bounded
+                self._cond.wait_for(lambda: self._is_next(ticket))
+                self._waiting.popleft()
+                self._bounded_waiting -= bounded
+                self._running += 1
+                # Free workers might be left for the next requests.
+                self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+
 class DaemonServer(object):
     def __init__(self, plugin, healthy):
         self.ctx = None
@@ -69,7 +120,10 @@ class DaemonServer(object):
             '/delNetwork', methods=['POST'], view_func=self.delete)
         self.headers = {'ContentType': 'application/json',
                         'Connection': 'close'}
+        self._queue = AdmissionQueue(CONF.cni_daemon.worker_num,
+                                     CONF.cni_daemon.add_queue_size)
         self._server = None
+        self._socket_server = None
 
     def _prepare_request(self):
         params = cni_utils.CNIParameters(flask.request.get_json())
@@ -86,7 +140,32 @@ class DaemonServer(object):
         data = jsonutils.dumps(template)
         return data
 
+    @contextlib.contextmanager
+    def _admit(self, command, bounded=False):
+        start = time.monotonic()
+        with self._queue.admit(bounded):
+            queued = time.monotonic() - start
+            LOG.debug('%s request waited %.3f seconds for a worker.', command,
+                      queued)
+            metrics.CNI_QUEUE_TIME.labels(command).observe(queued)
+            yield
+
     def add(self):
+        start = time.monotonic()
+        try:
+            with self._admit('ADD', bounded=True):
+                return self._add()
+        except exceptions.CNIRequestQueueFull:
+            LOG.warning('Too many addNetwork requests queued, rejecting the '
+                        'request.')
+            error = self._error(ErrTryAgainLater,
+                                "Too many requests queued. Try Again Later.")
+            return error, httplib.SERVICE_UNAVAILABLE, self.headers
+        finally:
+            metrics.CNI_REQUEST_TIME.labels('ADD').observe(
+                time.monotonic() - start)
+
+    def _add(self):
         try:
             params = self._prepare_request()
         except Exception:
@@ -139,6 +218,15 @@ class DaemonServer(object):
         return data, httplib.ACCEPTED, self.headers
 
     def delete(self):
+        start = time.monotonic()
+        try:
+            with self._admit('DEL'):
+                return self._delete()
+        finally:
+            metrics.CNI_REQUEST_TIME.labels('DEL').observe(
+                time.monotonic() - start)
+
+    def _delete(self):
         try:
             params = self._prepare_request()
         except Exception:
@@ -187,18 +275,34 @@ class DaemonServer(object):
 
         try:
             self._server = serving.make_server(
-                address, port, self.application, threaded=False,
-                processes=CONF.cni_daemon.worker_num)
+                address, port, self.application, threaded=True)
+            if CONF.cni_daemon.bind_socket:
+                self._start_socket_server(CONF.cni_daemon.bind_socket)
             self._server.serve_forever()
         except Exception:
             LOG.exception('Failed to start kuryr-daemon.')
             raise
 
+    def _start_socket_server(self, path):
+        LOG.info('Starting server on Unix socket %s.', path)
+        try:
+            os.unlink(path)
+        except OSError:
+            if os.path.exists(path):
+                raise
+        self._socket_server = serving.make_server(
+            f'unix://{path}', 0, self.application, threaded=True)
+        thread = threading.Thread(target=self._socket_server.serve_forever,
+                                  daemon=True)
+        thread.start()
+
     def stop(self):
-        LOG.info("Waiting for DaemonServer worker processes to exit...")
-        self._server._block_on_close = True
-        self._server.shutdown()
-        self._server.server_close()
+        LOG.info("Waiting for DaemonServer worker threads to exit...")
+        for server in (self._socket_server, self._server):
+            if server:
+                server._block_on_close = True
+                server.shutdown()
+                server.server_close()
         LOG.info("All DaemonServer workers finished gracefully.")
 
     def _check_failure(self):
@@ -215,35 +319,40 @@ class DaemonServer(object):
 class CNIDaemonServerService(cotyledon.Service):
     name = "server"
 
-    def __init__(self, worker_id, registry, healthy):
+    def __init__(self, worker_id, healthy):
         super(CNIDaemonServerService, self).__init__(worker_id)
-        self.registry = registry
+        # NOTE(dulek): Watcher runs in a thread of the server process, so the
+        #              registry is a plain dict shared by both of them and
+        #              accessing it is not an IPC round trip.
+        self.registry = k8s_cni_registry.Registry()
         self.healthy = healthy
-        self.plugin = k8s_cni_registry.K8sCNIRegistryPlugin(registry,
+        self.plugin = k8s_cni_registry.K8sCNIRegistryPlugin(self.registry,
                                                             self.healthy)
         self.server = DaemonServer(self.plugin, self.healthy)
+        self.watcher = CNIDaemonWatcher(self.registry, self.healthy)
+        self.watcher_thread = None
 
     def run(self):
-        # NOTE(dulek): We might do a *lot* of pyroute2 operations, let's
-        #              make the pyroute2 timeout configurable to make sure
-        #              kernel will have chance to catch up.
-        transactional.SYNC_TIMEOUT = CONF.cni_daemon.pyroute2_timeout
+        self.watcher_thread = threading.Thread(target=self.watcher.run,
+                                               daemon=True)
+        self.watcher_thread.start()
 
         # Run HTTP server
         self.server.run()
 
     def terminate(self):
         self.server.stop()
+        self.watcher.terminate()
 
 
-class CNIDaemonWatcherService(cotyledon.Service):
-    name = "watcher"
+class CNIDaemonWatcher(object):
+    """Fills the registry with the KuryrPorts of the node's pods."""
 
-    def __init__(self, worker_id, registry, healthy):
-        super(CNIDaemonWatcherService, self).__init__(worker_id)
+    def __init__(self, registry, healthy):
         self.pipeline = None
         self.watcher = None
         self.health_thread = None
+        self.is_running = False
         self.registry = registry
         self.healthy = healthy
 
@@ -272,7 +381,15 @@ class CNIDaemonWatcherService(cotyledon.Service):
         self.health_thread = threading.Thread(
             target=self._start_watcher_health_checker)
         self.health_thread.start()
-        self.watcher.start()
+        try:
+            self.watcher.start()
+        finally:
+            # NOTE(dulek): Watcher gives up by exiting, which only ends this
+            #              thread, so let K8s restart the daemon instead.
+            if self.is_running:
+                LOG.error("Watcher stopped, reporting not healthy.")
+                with self.healthy.get_lock():
+                    self.healthy.value = False
 
     def _start_watcher_health_checker(self):
         while self.is_running:
@@ -284,7 +401,7 @@ class CNIDaemonWatcherService(cotyledon.Service):
 
     def on_done(self, kuryrport, vifs):
         kp_name = utils.get_res_unique_name(kuryrport)
-        with lockutils.lock(kp_name, external=True):
+        with lockutils.lock(kp_name):
             if (kp_name not in self.registry or
                     self.registry[kp_name]['kp']['metadata']['uid']
                     != kuryrport['metadata']['uid']):
@@ -297,9 +414,9 @@ class CNIDaemonWatcherService(cotyledon.Service):
                 old_vifs = self.registry[kp_name]['vifs']
                 for iface in vifs:
                     if old_vifs[iface].active != vifs[iface].active:
-                        kp_dict = self.registry[kp_name]
-                        kp_dict['vifs'] = vifs
-                        self.registry[kp_name] = kp_dict
+                        self.registry[kp_name]['vifs'] = vifs
+                        break
+        self.registry.notify(kp_name)
 
     def on_deleted(self, kp):
         kp_name = utils.get_res_unique_name(kp)
@@ -308,13 +425,12 @@ class CNIDaemonWatcherService(cotyledon.Service):
                 # NOTE(ndesh): We need to lock here to avoid race condition
                 #              with the deletion code for CNI DEL so that
                 #              we delete the registry entry exactly once
-                with lockutils.lock(kp_name, external=True):
+                with lockutils.lock(kp_name):
                     if self.registry[kp_name]['vif_unplugged']:
                         del self.registry[kp_name]
+                        self.registry.notify(kp_name)
                     else:
-                        kp_dict = self.registry[kp_name]
-                        kp_dict['del_received'] = True
-                        self.registry[kp_name] = kp_dict
+                        self.registry[kp_name]['del_received'] = True
         except KeyError:
             # This means someone else removed it. It's odd but safe to ignore.
             LOG.debug('KuryrPort %s entry already removed from registry while '
@@ -356,21 +472,13 @@ class CNIDaemonServiceManager(cotyledon.ServiceManager):
         if CONF.sriov.enable_pod_resource_service:
             clients.setup_pod_resources_client()
 
-        self.manager = multiprocessing.Manager()
-        registry = self.manager.dict()  # For Watcher->Server communication.
         healthy = multiprocessing.Value(c_bool, True)
-        self.add(CNIDaemonWatcherService, workers=1, args=(registry, healthy,))
         self._server_service = self.add(
-            CNIDaemonServerService, workers=1, args=(registry, healthy))
+            CNIDaemonServerService, workers=1, args=(healthy,))
         self.add(CNIDaemonHealthServerService, workers=1, args=(healthy,))
         self.register_hooks(on_terminate=self.terminate)
 
     def run(self):
-        # FIXME(darshna): Remove pyroute2 IPDB deprecation warning, remove
-        #                 once we stop using pyroute2.IPDB.
-        logging.getLogger('pyroute2').setLevel(logging.ERROR)
-        logging.getLogger('pr2modules.ipdb.main').setLevel(logging.ERROR)
-
         reaper_thread = threading.Thread(target=self._zombie_reaper,
                                          daemon=True)
         self._terminate_called = threading.Event()
@@ -402,8 +510,6 @@ class CNIDaemonServiceManager(cotyledon.ServiceManager):
             worker.terminate()
         for worker in self._running_services[self._server_service]:
             worker.join()
-        LOG.info("Stopping registry manager...")
-        self.manager.shutdown()
         LOG.info("Continuing with shutdown")
 
 
@@ -15,9 +15,10 @@ import os
 
 from oslo_config import cfg
 from oslo_log import log as logging
-from pyroute2 import IPDB
+from pyroute2 import IPRoute
 
 from kuryr.lib._i18n import _
+from kuryr_kubernetes.cni import metrics
 from kuryr_kubernetes.cni import utils
 from kuryr_kubernetes import health as base_server
 
@@ -89,14 +90,16 @@ def _get_memsw_usage(cgroup_mem_path):
 class CNIHealthServer(base_server.BaseHealthServer):
     """Server used by readiness and liveness probe to manage CNI health checks.
 
-    Verifies presence of NET_ADMIN capabilities, IPDB in working order,
+    Verifies presence of NET_ADMIN capabilities, netlink in working order,
     connectivity to Kubernetes API, quantity of CNI add failure, health of
-    CNI components and existence of memory leaks.
+    CNI components and existence of memory leaks. Prometheus metrics of the
+    CNI daemon are served on /metrics.
     """
 
     def __init__(self, components_healthy):
 
-        super().__init__('daemon-health', CONF.cni_health_server.port)
+        super().__init__('daemon-health', CONF.cni_health_server.port,
+                         metrics.REGISTRY)
         self._components_healthy = components_healthy
 
     def readiness_status(self):
@@ -116,10 +119,10 @@ class CNIHealthServer(base_server.BaseHealthServer):
     def liveness_status(self):
         no_limit = -1
         try:
-            with IPDB():
-                pass
+            with IPRoute() as ipr:
+                ipr.get_links()
         except Exception:
-            error_message = 'IPDB not in working order.'
+            error_message = 'Netlink not in working order.'
             LOG.error(error_message)
             return error_message, httplib.INTERNAL_SERVER_ERROR, {}
 
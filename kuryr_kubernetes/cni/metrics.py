@@ -0,0 +1,39 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import prometheus_client
+
+from kuryr_kubernetes import metrics
+
+# CNI requests are handled by the server process of the CNI daemon, while
+# the metrics are exposed by its health server process, so the histograms are
+# shared and need to be created before the daemon forks.
+REGISTRY = prometheus_client.CollectorRegistry()
+
+QUEUE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+                 float('inf'))
+
+POD_NETWORK_READINESS = metrics.SharedHistogram(
+    'kuryr_pod_network_readiness_seconds',
+    'Time from the pod creation until each stage of its network setup.',
+    'stage', (metrics.STAGE_CNI_ADD_RECEIVED, metrics.STAGE_CNI_ADD_RETURNED),
+    registry=REGISTRY)
+
+CNI_REQUEST_TIME = metrics.SharedHistogram(
+    'kuryr_cni_request_duration_seconds',
+    'Time spent handling CNI requests, per command.',
+    'command', ('ADD', 'DEL'), registry=REGISTRY)
+
+CNI_QUEUE_TIME = metrics.SharedHistogram(
+    'kuryr_cni_request_queue_seconds',
+    'Time CNI requests waited for a worker to process them, per command.',
+    'command', ('ADD', 'DEL'), buckets=QUEUE_BUCKETS, registry=REGISTRY)
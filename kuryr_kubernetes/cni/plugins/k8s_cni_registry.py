@@ -12,7 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import retrying
+import threading
+import time
 
 from os_vif import objects as obj_vif
 from oslo_concurrency import lockutils
@@ -21,15 +22,16 @@ from oslo_log import log as logging
 
 from kuryr_kubernetes import clients
 from kuryr_kubernetes.cni.binding import base as b_base
+from kuryr_kubernetes.cni import metrics as cni_metrics
 from kuryr_kubernetes.cni.plugins import base as base_cni
 from kuryr_kubernetes.cni import utils
 from kuryr_kubernetes import constants as k_const
 from kuryr_kubernetes import exceptions
+from kuryr_kubernetes import metrics
 from kuryr_kubernetes import utils as k_utils
 
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
-RETRY_DELAY = 1000  # 1 second in milliseconds
 
 # TODO(dulek, gryf): Another corner case is (and was) when pod is deleted
 # before it's corresponding CRD was created and populated by vifs by
@@ -41,6 +43,52 @@ RETRY_DELAY = 1000  # 1 second in milliseconds
 # created.
 
 
+class Registry(dict):
+    """KuryrPorts of the pods of the node, keyed by namespace/name.
+
+    Besides being a dict, it lets CNI requests wait for the entry of their
+    pod to change instead of polling it. The watcher calls `notify` after
+    updating an entry, waking up the requests waiting for that pod only.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Registry, self).__init__(*args, **kwargs)
+        self._waiters_lock = threading.Lock()
+        self._waiters = {}
+
+    def wait_for(self, key, predicate, timeout):
+        """Waits until the predicate is true for the entry of the key.
+
+        :param key: namespace/name of the pod
+        :param predicate: callable getting the entry, or None if there's no
+                          entry for the key
+        :param timeout: maximum time to wait, in seconds
+        :return: the entry, or None if there's none, when the predicate got
+                 true or on timeout
+        """
+        with self._waiters_lock:
+            waiter = self._waiters.setdefault(key, [threading.Condition(), 0])
+            waiter[1] += 1
+        condition = waiter[0]
+        try:
+            with condition:
+                condition.wait_for(lambda: predicate(self.get(key)), timeout)
+        finally:
+            with self._waiters_lock:
+                waiter[1] -= 1
+                if not waiter[1]:
+                    del self._waiters[key]
+        return self.get(key)
+
+    def notify(self, key):
+        """Wakes up the requests waiting for the entry of the key."""
+        with self._waiters_lock:
+            waiter = self._waiters.get(key)
+        if waiter:
+            with waiter[0]:
+                waiter[0].notify_all()
+
+
 class K8sCNIRegistryPlugin(base_cni.CNIPlugin):
     def __init__(self, registry, healthy):
         self.healthy = healthy
@@ -53,12 +101,13 @@ class K8sCNIRegistryPlugin(base_cni.CNIPlugin):
             'name': params.args.K8S_POD_NAME}
 
     def add(self, params):
+        received = time.time()
         kp_name = self._get_obj_name(params)
         timeout = CONF.cni_daemon.vif_annotation_timeout
 
         # Try to confirm if CRD in the registry is not stale cache. If it is,
         # remove it.
-        with lockutils.lock(kp_name, external=True):
+        with lockutils.lock(kp_name):
             if kp_name in self.registry:
                 cached_kp = self.registry[kp_name]['kp']
                 try:
@@ -78,30 +127,43 @@ class K8sCNIRegistryPlugin(base_cni.CNIPlugin):
 
         # NOTE(dulek): Saving containerid to be able to distinguish old DEL
         #              requests that we should ignore. We need a lock to
-        #              prevent race conditions and replace whole object in the
-        #              dict for multiprocessing.Manager to notice that.
-        with lockutils.lock(kp_name, external=True):
+        #              prevent race conditions with the watcher.
+        with lockutils.lock(kp_name):
             d = self.registry[kp_name]
             d['containerid'] = params.CNI_CONTAINERID
-            self.registry[kp_name] = d
             LOG.debug('Saved containerid = %s for CRD %s',
                       params.CNI_CONTAINERID, kp_name)
 
-        # Wait for timeout sec, 1 sec between tries, retry when even one
-        # vif is not active.
-        @retrying.retry(stop_max_delay=timeout * 1000, wait_fixed=RETRY_DELAY,
-                        retry_on_result=utils.any_vif_inactive)
-        def wait_for_active(kp_name):
-            return self.registry[kp_name]['vifs']
-
-        vifs = wait_for_active(kp_name)
-        for vif in vifs.values():
-            if not vif.active:
-                LOG.error("Timed out waiting for vifs to become active")
-                raise exceptions.ResourceNotReady(kp_name)
+        # Wait for timeout sec for all the vifs to become active, the
+        # watcher wakes us up as soon as they do.
+        d = self.registry.wait_for(
+            kp_name,
+            lambda e: e is None or not utils.any_vif_inactive(e['vifs']),
+            timeout)
+        if d is None:
+            LOG.error("KuryrPort %s removed while waiting for vifs to become "
+                      "active", kp_name)
+            raise exceptions.ResourceNotReady(kp_name)
+        vifs = d['vifs']
+        if utils.any_vif_inactive(vifs):
+            LOG.error("Timed out waiting for vifs to become active")
+            raise exceptions.ResourceNotReady(kp_name)
 
+        self._observe_readiness(d['kp'], received)
         return vifs[k_const.DEFAULT_IFNAME]
 
+    def _observe_readiness(self, kp, received):
+        annotations = kp['metadata'].get('annotations', {})
+        created = annotations.get(
+            k_const.K8S_ANNOTATION_POD_CREATION_TIMESTAMP)
+        if not created:
+            return
+        for stage, now in ((metrics.STAGE_CNI_ADD_RECEIVED, received),
+                           (metrics.STAGE_CNI_ADD_RETURNED, time.time())):
+            metrics.observe_pod_readiness(
+                stage, created, now,
+                histogram=cni_metrics.POD_NETWORK_READINESS)
+
     def delete(self, params):
         kp_name = self._get_obj_name(params)
         try:
@@ -138,13 +200,11 @@ class K8sCNIRegistryPlugin(base_cni.CNIPlugin):
         #              with the deletion code in the watcher to ensure that
         #              we delete the registry entry exactly once
         try:
-            with lockutils.lock(kp_name, external=True):
+            with lockutils.lock(kp_name):
                 if self.registry[kp_name]['del_received']:
                     del self.registry[kp_name]
                 else:
-                    kp_dict = self.registry[kp_name]
-                    kp_dict['vif_unplugged'] = True
-                    self.registry[kp_name] = kp_dict
+                    self.registry[kp_name]['vif_unplugged'] = True
         except KeyError:
             # This means the kuryrport was removed before vif was unplugged.
             # This shouldn't happen, but we can't do anything about it now
@@ -161,20 +221,14 @@ class K8sCNIRegistryPlugin(base_cni.CNIPlugin):
     def _do_work(self, params, fn, timeout):
         kp_name = self._get_obj_name(params)
 
-        # In case of KeyError retry for `timeout` s, wait 1 s between tries.
-        @retrying.retry(stop_max_delay=timeout * 1000, wait_fixed=RETRY_DELAY,
-                        retry_on_exception=lambda e: isinstance(e, KeyError))
-        def find():
-            return self.registry[kp_name]
-
-        try:
-            d = find()
-            kp = d['kp']
-            vifs = d['vifs']
-        except KeyError:
+        # Wait for `timeout` s for the KuryrPort to appear in the registry.
+        d = self.registry.wait_for(kp_name, lambda e: e is not None, timeout)
+        if d is None:
             LOG.error("Timed out waiting for requested KuryrPort to appear in "
                       "registry")
             raise exceptions.ResourceNotReady(kp_name)
+        kp = d['kp']
+        vifs = d['vifs']
 
         for ifname, vif in vifs.items():
             is_default_gateway = (ifname == k_const.DEFAULT_IFNAME)
@@ -15,6 +15,7 @@ import sys
 from kuryr.lib._i18n import _
 from kuryr.lib import config as lib_config
 from oslo_config import cfg
+from oslo_config import types
 from oslo_log import log as logging
 
 from kuryr_kubernetes import constants
@@ -36,10 +37,24 @@ daemon_opts = [
                help=_('Bind address for CNI daemon HTTP server. It is '
                       'recommened to allow only local connections.'),
                default='127.0.0.1:5036'),
+    cfg.StrOpt('bind_socket',
+               help=_('Path of a Unix socket the CNI daemon HTTP server '
+                      'listens on in addition to bind_address. It is used by '
+                      'the kuryr-cni-client CNI driver when set as '
+                      'daemon_socket in its CNI config. Empty value disables '
+                      'it.'),
+               default=''),
     cfg.IntOpt('worker_num',
-               help=_('Maximum number of processes that will be spawned to '
-                      'process requests from CNI driver.'),
+               help=_('Maximum number of requests from CNI driver that will '
+                      'be processed concurrently.'),
                default=30),
+    cfg.IntOpt('add_queue_size',
+               help=_('Maximum number of CNI ADD requests waiting for a '
+                      'worker to process them. Requests are processed in the '
+                      'order they came in, requests exceeding the limit are '
+                      'rejected right away and need to be retried.'),
+               default=200,
+               min=0),
     cfg.IntOpt('vif_annotation_timeout',
                help=_('Time (in seconds) the CNI daemon will wait for VIF '
                       'annotation to appear in pod metadata before failing '
@@ -51,7 +66,11 @@ daemon_opts = [
                       'requests in parallel, it may take kernel more time to '
                       'process all networking stack changes. This option '
                       'allows to tune internal pyroute2 timeout.'),
-               default=10),
+               default=10,
+               deprecated_for_removal=True,
+               deprecated_reason=_('It was the timeout of pyroute2 IPDB '
+                                   'transactions. IPDB is not used anymore '
+                                   'and netlink requests are synchronous.')),
     cfg.BoolOpt('docker_mode',
                 help=_('Set to True when you are running kuryr-daemon inside '
                        'a Docker container on Kubernetes host. E.g. as '
@@ -179,6 +198,44 @@ k8s_opts = [
                       'prevent Kuryr from missing events due to K8s API or '
                       'etcd issues.'),
                default=120),
+    cfg.IntOpt('event_workers',
+               help=_('Number of green threads kuryr-controller uses to '
+                      'handle K8s events. Events of a single K8s object are '
+                      'always handled by one thread at a time, while events '
+                      'waiting to be retried do not occupy any thread.'),
+               default=200,
+               min=1),
+    cfg.Opt('event_workers_limits',
+            type=types.Dict(value_type=types.Integer(min=1)),
+            help=_('Maximum number of threads out of event_workers that can '
+                   'handle events of a given class at the same time. Events '
+                   'of "pods" class (pods, KuryrPorts, namespaces and '
+                   'KuryrNetworks) are handled before the ones of "services" '
+                   'class (services, endpoints, KuryrLoadBalancers and all '
+                   'the other resources) and those before "policies" class '
+                   '(network policies and KuryrNetworkPolicies). Classes '
+                   'missing here are not limited, unknown ones are ignored.'),
+            default={'services': 100, 'policies': 50}),
+    cfg.IntOpt('list_page_size',
+               help=_('Maximum number of objects fetched in a single request '
+                      'when Kuryr needs to list a whole collection of K8s API '
+                      'resources (e.g. all the pods). Bigger collections are '
+                      'fetched in multiple requests to limit the memory usage '
+                      'of both Kuryr and K8s API. Setting 0 disables '
+                      'paging.'),
+               default=500,
+               min=0),
+    cfg.BoolOpt('informer_cache',
+                help=_('Keep an in-memory copy of every watched K8s API '
+                       'resource collection, fed by the watcher, and use it '
+                       'to answer list queries done by the handlers and '
+                       'drivers (e.g. pods matching a selector) instead of '
+                       'querying K8s API each time. When disabled, pending '
+                       'pods whose KuryrPort got deleted only get a new one '
+                       'on the next reconciliation (see '
+                       'watch_reconcile_period) or once their phase, node, '
+                       'finalizers or hostNetwork change.'),
+                default=True),
     cfg.ListOpt('enabled_handlers',
                 help=_("The comma-separated handlers that should be "
                        "registered for watching in the pipeline."),
@@ -293,6 +350,13 @@ nested_vif_driver_opts = [
                help=_("How many time to try to re-update the neutron resource "
                       "when revision has been changed by other thread"),
                default=3),
+    cfg.IntOpt('vlan_ids_reconcile_period',
+               help=_("Time (in seconds) after which the VLAN IDs known to "
+                      "be in use on a trunk are refreshed from Neutron "
+                      "before allocating a new one. 0 means they are only "
+                      "refreshed after a VLAN ID conflict."),
+               default=300,
+               min=0),
 ]
 
 DEFAULT_PHYSNET_SUBNET_MAPPINGS = {}
@@ -47,6 +47,7 @@ OPENSHIFT_OBJ_MACHINE = 'Machine'
 OPENSHIFT_API_CRD_MACHINES = '/apis/machine.openshift.io/v1beta1/machines'
 
 K8S_POD_STATUS_PENDING = 'Pending'
+K8S_POD_STATUS_RUNNING = 'Running'
 K8S_POD_STATUS_SUCCEEDED = 'Succeeded'
 K8S_POD_STATUS_FAILED = 'Failed'
 
@@ -62,6 +63,8 @@ K8S_ANNOTATION_LBAAS_STATE = K8S_ANNOTATION_PREFIX + '-lbaas-state'
 K8S_ANNOTATION_NET_CRD = K8S_ANNOTATION_PREFIX + '-net-crd'
 K8S_ANNOTATION_NETPOLICY_CRD = K8S_ANNOTATION_PREFIX + '-netpolicy-crd'
 K8S_ANNOTATION_POLICY = K8S_ANNOTATION_PREFIX + '-counter'
+K8S_ANNOTATION_POD_CREATION_TIMESTAMP = (K8S_ANNOTATION_PREFIX +
+                                         '-pod-creation-timestamp')
 
 K8S_ANNOTATION_CLIENT_TIMEOUT = K8S_ANNOTATION_PREFIX + '-timeout-client-data'
 K8S_ANNOTATION_MEMBER_TIMEOUT = K8S_ANNOTATION_PREFIX + '-timeout-member-data'
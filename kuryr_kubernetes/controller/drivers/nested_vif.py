@@ -61,15 +61,17 @@ class NestedPodVIFDriver(neutron_vif.NeutronPodVIFDriver,
                   fixed_ips)
         raise kl_exc.NoResourceException()
 
-    def _get_parent_port(self, pod):
+    def _get_host_ip(self, pod):
         try:
             # REVISIT(vikasc): Assumption is being made that hostIP is the IP
             #              of trunk interface on the node(vm).
-            node_fixed_ip = pod['status']['hostIP']
+            return pod['status']['hostIP']
         except KeyError:
             if pod['status']['conditions'][0]['type'] != "Initialized":
                 LOG.debug("Pod condition type is not 'Initialized'")
 
             LOG.error("Failed to get parent vm port ip")
             raise
-        return self._get_parent_port_by_host_ip(node_fixed_ip)
+
+    def _get_parent_port(self, pod):
+        return self._get_parent_port_by_host_ip(self._get_host_ip(pod))
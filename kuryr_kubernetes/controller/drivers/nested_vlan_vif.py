@@ -11,11 +11,12 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
-from time import sleep
+import itertools
+import threading
+import time
 
 from kuryr.lib import constants as kl_const
 from kuryr.lib import exceptions as kl_exc
-from kuryr.lib import segmentation_type_drivers as seg_driver
 from openstack import exceptions as os_exc
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -32,19 +33,191 @@ from kuryr_kubernetes import os_vif_util as ovu
 LOG = logging.getLogger(__name__)
 
 DEFAULT_MAX_RETRY_COUNT = 3
-DEFAULT_RETRY_INTERVAL = 1
 ACTIVE_TIMEOUT = 90
 
 CONF = cfg.CONF
 
+# Bits of all the valid VLAN IDs.
+_VLAN_IDS_MASK = ((1 << (kl_const.MAX_VLAN_TAG + 1)) -
+                  (1 << kl_const.MIN_VLAN_TAG))
+
+
+class _TrunkVlanIds(object):
+    """Bitmap of the VLAN IDs in use on a single trunk.
+
+    Bit N is set when VLAN ID N is in use. IDs handed out, but not yet
+    confirmed to be attached to the trunk, are remembered apart, so that
+    syncing the bitmap with Neutron does not free them.
+    """
+
+    def __init__(self):
+        self._bitmap = 0
+        self._pending = set()
+        self._next = kl_const.MIN_VLAN_TAG
+        self.synced_at = None
+
+    def sync(self, vlan_ids):
+        bitmap = 0
+        for vlan_id in itertools.chain(vlan_ids, self._pending):
+            bitmap |= 1 << int(vlan_id)
+        self._bitmap = bitmap & _VLAN_IDS_MASK
+        self.synced_at = time.monotonic()
+
+    def reserve(self, vlan_id):
+        self._bitmap |= 1 << vlan_id
+        self._pending.add(vlan_id)
+
+    def allocate(self):
+        free = ~self._bitmap & _VLAN_IDS_MASK
+        if not free:
+            raise kl_exc.SegmentationIdAllocationFailure(
+                'There are no vlan ids available.')
+        # NOTE: Next fit, so that just released IDs, which Neutron may still
+        # consider in use, are not handed out again right away.
+        candidates = (free >> self._next << self._next) or free
+        vlan_id = (candidates & -candidates).bit_length() - 1
+        self._next = vlan_id + 1
+        self.reserve(vlan_id)
+        return vlan_id
+
+    def confirm(self, vlan_ids):
+        self._pending.difference_update(vlan_ids)
+
+    def release(self, vlan_ids):
+        for vlan_id in vlan_ids:
+            self._bitmap &= ~(1 << vlan_id)
+            self._pending.discard(vlan_id)
+
+
+class VlanIdAllocator(object):
+    """Allocates VLAN IDs for subports, separately for each trunk.
+
+    The VLAN IDs in use are kept in memory, so allocating one requires no
+    Neutron calls. The IDs in use on a trunk are synced with Neutron when
+    the trunk is first used, after `vlan_ids_reconcile_period` and after an
+    allocated ID turned out to be in conflict.
+    """
+
+    def __init__(self):
+        self._trunks = {}
+        self._lock = threading.Lock()
+
+    def _get(self, trunk_id):
+        try:
+            return self._trunks[trunk_id]
+        except KeyError:
+            trunk = self._trunks[trunk_id] = _TrunkVlanIds()
+            return trunk
+
+    def is_stale(self, trunk_id):
+        period = CONF.pod_vif_nested.vlan_ids_reconcile_period
+        with self._lock:
+            trunk = self._trunks.get(trunk_id)
+            if trunk is None or trunk.synced_at is None:
+                return True
+            return bool(period) and time.monotonic() - trunk.synced_at > period
+
+    def sync(self, trunk_id, vlan_ids):
+        """Sets the VLAN IDs in use on the trunk, as seen in Neutron."""
+        with self._lock:
+            self._get(trunk_id).sync(vlan_ids)
+
+    def seed(self, trunk_id, vlan_ids):
+        """Syncs the trunk unless its VLAN IDs are already known."""
+        with self._lock:
+            if trunk_id in self._trunks:
+                return False
+            self._get(trunk_id).sync(vlan_ids)
+            return True
+
+    def invalidate(self, trunk_id):
+        """Makes the trunk get synced with Neutron before next allocation."""
+        with self._lock:
+            trunk = self._trunks.get(trunk_id)
+            if trunk is not None:
+                trunk.synced_at = None
+
+    def allocate(self, trunk_id):
+        with self._lock:
+            return self._get(trunk_id).allocate()
+
+    def reserve(self, trunk_id, vlan_id):
+        with self._lock:
+            self._get(trunk_id).reserve(vlan_id)
+
+    def confirm(self, trunk_id, vlan_ids):
+        """Marks the VLAN IDs as attached to the trunk in Neutron."""
+        with self._lock:
+            self._get(trunk_id).confirm(vlan_ids)
+
+    def release(self, trunk_id, vlan_ids):
+        with self._lock:
+            self._get(trunk_id).release(vlan_ids)
+
+
+class TrunksIndex(object):
+    """Indexes trunks by the IPs of their nodes and by their subports.
+
+    Lets the driver find the trunk of a node or of a subport without calling
+    Neutron. Entries are added as trunks get looked up in Neutron and as
+    subports get attached, and trunks that turn out to be missing in Neutron
+    are forgotten.
+    """
+
+    def __init__(self):
+        self._trunk_ids = {}
+        self._host_ips = {}
+        self._subports = {}
+        self._trunk_subports = {}
+
+    def add_trunk(self, trunk_id, host_ip):
+        old_trunk_id = self._trunk_ids.get(host_ip)
+        if old_trunk_id is not None and old_trunk_id != trunk_id:
+            # The node got replaced by a new one with the same IP.
+            self.remove_trunk(old_trunk_id)
+        self._trunk_ids[host_ip] = trunk_id
+        self._host_ips[trunk_id] = host_ip
+
+    def remove_trunk(self, trunk_id):
+        host_ip = self._host_ips.pop(trunk_id, None)
+        if self._trunk_ids.get(host_ip) == trunk_id:
+            del self._trunk_ids[host_ip]
+        for port_id in self._trunk_subports.pop(trunk_id, ()):
+            self._subports.pop(port_id, None)
+
+    def add_subports(self, trunk_id, port_ids):
+        self.remove_subports(port_ids)
+        self._trunk_subports.setdefault(trunk_id, set()).update(port_ids)
+        for port_id in port_ids:
+            self._subports[port_id] = trunk_id
+
+    def remove_subports(self, port_ids):
+        for port_id in port_ids:
+            trunk_id = self._subports.pop(port_id, None)
+            if trunk_id is not None:
+                self._trunk_subports[trunk_id].discard(port_id)
+
+    def get_trunk_id(self, host_ip):
+        return self._trunk_ids.get(host_ip)
+
+    def get_host_ip(self, trunk_id):
+        return self._host_ips.get(trunk_id)
+
+    def get_subport_trunk_id(self, port_id):
+        return self._subports.get(port_id)
+
 
 class NestedVlanPodVIFDriver(nested_vif.NestedPodVIFDriver):
     """Manages ports for nested-containers using VLANs to provide VIFs."""
 
+    def __init__(self):
+        super().__init__()
+        self._vlan_ids = VlanIdAllocator()
+        self._trunks = TrunksIndex()
+
     def request_vif(self, pod, project_id, subnets, security_groups):
         os_net = clients.get_network_client()
-        parent_port = self._get_parent_port(pod)
-        trunk_id = self._get_trunk_id(parent_port)
+        trunk_id = self._get_pod_trunk_id(pod)
 
         rq = self._get_port_request(pod, project_id, subnets, security_groups)
         port = os_net.create_port(**rq)
@@ -72,10 +245,9 @@ class NestedVlanPodVIFDriver(nested_vif.NestedPodVIFDriver):
         """
         os_net = clients.get_network_client()
         if trunk_ip:
-            parent_port = self._get_parent_port_by_host_ip(trunk_ip)
+            trunk_id = self._get_trunk_id_by_host_ip(trunk_ip)
         else:
-            parent_port = self._get_parent_port(pod)
-        trunk_id = self._get_trunk_id(parent_port)
+            trunk_id = self._get_pod_trunk_id(pod)
 
         port_rq, subports_info = self._create_subports_info(
             pod, project_id, subnets, security_groups,
@@ -98,19 +270,27 @@ class NestedVlanPodVIFDriver(nested_vif.NestedPodVIFDriver):
         for index, port in enumerate(ports):
             subports_info[index]['port_id'] = port['id']
 
+        vlan_ids = [info['segmentation_id'] for info in subports_info]
         try:
             try:
                 os_net.add_trunk_subports(trunk_id, subports_info)
             except os_exc.ConflictException:
                 LOG.error("vlan ids already in use on trunk")
+                self._vlan_ids.release(trunk_id, vlan_ids)
+                self._vlan_ids.invalidate(trunk_id)
                 for port in ports:
                     os_net.delete_port(port.id)
                 return []
-        except os_exc.SDKException:
+        except os_exc.SDKException as ex:
             LOG.exception("Error happened during subport addition to trunk")
+            self._vlan_ids.release(trunk_id, vlan_ids)
+            if isinstance(ex, os_exc.NotFoundException):
+                self._forget_trunk(trunk_id)
             for port in ports:
                 os_net.delete_port(port.id)
             return []
+        self._vlan_ids.confirm(trunk_id, vlan_ids)
+        self._trunks.add_subports(trunk_id, [port.id for port in ports])
 
         vifs = []
         for index, port in enumerate(ports):
@@ -124,10 +304,9 @@ class NestedVlanPodVIFDriver(nested_vif.NestedPodVIFDriver):
             super().activate_vif(vif)
         except k_exc.PortNotReady:
             if retry_info and retry_info.get('elapsed', 0) > ACTIVE_TIMEOUT:
-                parent_port = self._get_parent_port(pod)
-                trunk_id = self._get_trunk_id(parent_port)
+                trunk_id = self._get_pod_trunk_id(pod)
                 # NOTE(dulek): We don't need a lock to prevent VLAN ID from
-                #              being taken over because the SegmentationDriver
+                #              being taken over because the VlanIdAllocator
                 #              will keep it reserved in memory unless we
                 #              release it. And we won't.
                 LOG.warning('Subport %s is in DOWN status for more than %d '
@@ -152,10 +331,9 @@ class NestedVlanPodVIFDriver(nested_vif.NestedPodVIFDriver):
 
     def release_vif(self, pod, vif, project_id=None, security_groups=None):
         os_net = clients.get_network_client()
-        parent_port = self._get_parent_port(pod)
-        trunk_id = self._get_trunk_id(parent_port)
+        trunk_id = self._get_pod_trunk_id(pod)
         self._remove_subport(trunk_id, vif.id)
-        self._release_vlan_id(vif.vlan_id)
+        self._release_vlan_id(trunk_id, vif.vlan_id)
         os_net.delete_port(vif.id)
 
     def _get_port_request(self, pod, project_id, subnets, security_groups,
@@ -188,17 +366,15 @@ class NestedVlanPodVIFDriver(nested_vif.NestedPodVIFDriver):
                               unbound=False):
         subports_info = []
 
-        in_use_vlan_ids = self._get_in_use_vlan_ids_set(trunk_id)
         port_rq = self._get_port_request(pod, project_id, subnets,
                                          security_groups, unbound)
         for _ in range(num_ports):
             try:
-                vlan_id = seg_driver.allocate_segmentation_id(in_use_vlan_ids)
+                vlan_id = self._get_vlan_id(trunk_id)
             except kl_exc.SegmentationIdAllocationFailure:
                 LOG.warning("There is not enough vlan ids available to "
                             "create a batch of %d subports.", num_ports)
                 break
-            in_use_vlan_ids.add(vlan_id)
 
             subports_info.append({'segmentation_id': vlan_id,
                                   'port_id': '',
@@ -217,19 +393,19 @@ class NestedVlanPodVIFDriver(nested_vif.NestedPodVIFDriver):
     def _add_subport(self, trunk_id, subport, requested_vlan_id=None):
         """Adds subport port to Neutron trunk
 
-        This method gets vlanid allocated from kuryr segmentation driver.
-        In active/active HA type deployment, possibility of vlanid conflict
-        is there. In such a case, vlanid will be requested again and subport
-        addition is re-tried. This is tried DEFAULT_MAX_RETRY_COUNT times in
-        case of vlanid conflict.
+        This method gets vlanid allocated from the VlanIdAllocator of the
+        trunk. If the trunk got modified outside of this controller, the
+        vlanid may be in conflict. In such a case, the VLAN IDs in use are
+        synced with Neutron, vlanid is requested again and subport addition
+        is re-tried. This is tried DEFAULT_MAX_RETRY_COUNT times in case of
+        vlanid conflict.
         """
-        # TODO(vikasc): Better approach for retrying in case of
-        # vlan-id conflict.
         os_net = clients.get_network_client()
         retry_count = 1
         while True:
             if requested_vlan_id:
                 vlan_id = requested_vlan_id
+                self._vlan_ids.reserve(trunk_id, vlan_id)
             else:
                 try:
                     vlan_id = self._get_vlan_id(trunk_id)
@@ -244,24 +420,38 @@ class NestedVlanPodVIFDriver(nested_vif.NestedPodVIFDriver):
             try:
                 os_net.add_trunk_subports(trunk_id, subport)
             except os_exc.ConflictException:
+                self._cancel_vlan_id(trunk_id, vlan_id, requested_vlan_id)
+                self._vlan_ids.invalidate(trunk_id)
                 if (retry_count < DEFAULT_MAX_RETRY_COUNT and
                         not requested_vlan_id):
                     LOG.error("VLAN ID already in use on trunk %s. "
                               "Retrying.", trunk_id)
                     retry_count += 1
-                    sleep(DEFAULT_RETRY_INTERVAL)
                     continue
                 else:
                     LOG.error("Failed to add subport %s to trunk %s due to "
                               "VLAN ID %d conflict.", subport, trunk_id,
                               vlan_id)
                     raise
-            except os_exc.SDKException:
+            except os_exc.SDKException as ex:
                 LOG.exception("Error happened during subport "
                               "addition to trunk %s", trunk_id)
+                self._cancel_vlan_id(trunk_id, vlan_id, requested_vlan_id)
+                if isinstance(ex, os_exc.NotFoundException):
+                    self._forget_trunk(trunk_id)
                 raise
+            self._vlan_ids.confirm(trunk_id, [vlan_id])
+            self._trunks.add_subports(trunk_id, [subport[0]['port_id']])
             return vlan_id
 
+    def _cancel_vlan_id(self, trunk_id, vlan_id, requested=False):
+        if requested:
+            # NOTE: Requested VLAN IDs already belonged to the subport, so
+            # keep them reserved.
+            self._vlan_ids.confirm(trunk_id, [vlan_id])
+        else:
+            self._vlan_ids.release(trunk_id, [vlan_id])
+
     def _remove_subports(self, trunk_id, subports_id):
         os_net = clients.get_network_client()
         subports_body = []
@@ -273,16 +463,53 @@ class NestedVlanPodVIFDriver(nested_vif.NestedPodVIFDriver):
             LOG.exception("Error happened during subport removal from "
                           "trunk %s", trunk_id)
             raise
+        self._trunks.remove_subports(subports_id)
 
     def _remove_subport(self, trunk_id, subport_id):
         self._remove_subports(trunk_id, [subport_id])
 
     def _get_vlan_id(self, trunk_id):
-        vlan_ids = self._get_in_use_vlan_ids_set(trunk_id)
-        return seg_driver.allocate_segmentation_id(vlan_ids)
-
-    def _release_vlan_id(self, id):
-        return seg_driver.release_segmentation_id(id)
+        if self._vlan_ids.is_stale(trunk_id):
+            self._vlan_ids.sync(trunk_id,
+                                self._get_in_use_vlan_ids_set(trunk_id))
+        return self._vlan_ids.allocate(trunk_id)
+
+    def _release_vlan_id(self, trunk_id, vlan_id):
+        self._vlan_ids.release(trunk_id, [vlan_id])
+
+    def _get_trunk_id_by_host_ip(self, host_ip):
+        trunk_id = self._trunks.get_trunk_id(host_ip)
+        if trunk_id is None:
+            parent_port = self._get_parent_port_by_host_ip(host_ip)
+            trunk_id = self._get_trunk_id(parent_port)
+            self._trunks.add_trunk(trunk_id, host_ip)
+        return trunk_id
+
+    def _get_pod_trunk_id(self, pod):
+        return self._get_trunk_id_by_host_ip(self._get_host_ip(pod))
+
+    def _get_subport_host_ip(self, port_id):
+        """Returns the IP of the node of a known subport or None."""
+        trunk_id = self._trunks.get_subport_trunk_id(port_id)
+        if trunk_id is None:
+            return None
+        return self._trunks.get_host_ip(trunk_id)
+
+    def _seed_trunk(self, trunk_id, host_ip, subports):
+        """Learns about a trunk and its subports listed in Neutron.
+
+        Used when recovering the pools, to avoid getting the trunk from
+        Neutron on the first allocation or lookup.
+        """
+        self._trunks.add_trunk(trunk_id, host_ip)
+        self._trunks.add_subports(trunk_id,
+                                  [sp['port_id'] for sp in subports])
+        self._vlan_ids.seed(trunk_id,
+                            [sp['segmentation_id'] for sp in subports])
+
+    def _forget_trunk(self, trunk_id):
+        self._trunks.remove_trunk(trunk_id)
+        self._vlan_ids.invalidate(trunk_id)
 
     def _get_in_use_vlan_ids_set(self, trunk_id):
         vlan_ids = set()
@@ -115,8 +115,8 @@ class OpenShiftNodesSubnets(base.NodesSubnetsDriver):
                         machine['metadata']['name'])
             return False
 
-        machines = k8s.get(constants.OPENSHIFT_API_CRD_MACHINES)
-        for existing_machine in machines.get('items', []):
+        machines = k8s.list_items(constants.OPENSHIFT_API_CRD_MACHINES)
+        for existing_machine in machines:
             if affected_subnet_id == self._get_subnet_from_machine(
                     existing_machine):
                 return False
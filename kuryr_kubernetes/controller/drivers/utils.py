@@ -26,12 +26,16 @@ from oslo_serialization import jsonutils
 from kuryr_kubernetes import clients
 from kuryr_kubernetes import constants
 from kuryr_kubernetes import exceptions as k_exc
+from kuryr_kubernetes import informer
 from kuryr_kubernetes import utils
 
 
 OPERATORS_WITH_VALUES = [constants.K8S_OPERATOR_IN,
                          constants.K8S_OPERATOR_NOT_IN]
 
+POD_PATH = f'{constants.K8S_API_BASE}/pods'
+SERVICE_PATH = f'{constants.K8S_API_BASE}/services'
+
 LOG = log.getLogger(__name__)
 
 CONF = cfg.CONF
@@ -72,7 +76,10 @@ def get_kuryrport(pod):
 
 
 def get_vifs(pod):
-    kp = get_kuryrport(pod)
+    return get_kuryrport_vifs(get_kuryrport(pod))
+
+
+def get_kuryrport_vifs(kp):
     try:
         return {k: objects.base.VersionedObject.obj_from_primitive(v['vif'])
                 for k, v in kp['status']['vifs'].items()}
@@ -104,6 +111,10 @@ def get_pods(selector, namespace=None):
     return: k8s list object containing all matching pods
 
     """
+    pods = _get_cached_pods(selector, namespace)
+    if pods is not None:
+        return pods
+
     kubernetes = clients.get_kubernetes_client()
 
     svc_selector = selector.get('selector')
@@ -137,6 +148,27 @@ def get_pods(selector, namespace=None):
     return pods
 
 
+def _get_cached_pods(selector, namespace=None):
+    svc_selector = selector.get('selector')
+    if svc_selector:
+        selector = {'matchLabels': svc_selector}
+    elif selector.get('matchLabels'):
+        # Removing pod-template-hash as pods will not have it and
+        # otherwise there will be no match
+        selector = dict(selector)
+        selector['matchLabels'] = {
+            k: v for k, v in selector['matchLabels'].items()
+            if k != 'pod-template-hash'}
+
+    pods = informer.list_objects(
+        POD_PATH, namespace=namespace,
+        predicate=lambda pod: match_selector(
+            selector, pod['metadata'].get('labels')))
+    if pods is None:
+        return None
+    return {'kind': 'PodList', 'apiVersion': 'v1', 'items': pods}
+
+
 def get_namespaces(selector):
     """Return a k8s object list with the namespaces matching the selector.
 
@@ -144,6 +176,14 @@ def get_namespaces(selector):
     return: k8s list object containing all matching namespaces
 
     """
+    namespaces = informer.list_objects(
+        constants.K8S_API_NAMESPACES,
+        predicate=lambda ns: match_selector(selector,
+                                            ns['metadata'].get('labels')))
+    if namespaces is not None:
+        return {'kind': 'NamespaceList', 'apiVersion': 'v1',
+                'items': namespaces}
+
     kubernetes = clients.get_kubernetes_client()
     labels = selector.get('matchLabels', None)
     if labels:
@@ -323,6 +363,10 @@ def get_annotated_labels(resource, annotation_labels):
 
 
 def get_kuryrnetworkpolicy_crds(namespace=None):
+    knps = informer.list_objects(constants.K8S_API_CRD_KURYRNETWORKPOLICIES,
+                                 namespace=namespace)
+    if knps is not None:
+        return knps
 
     try:
         if namespace:
@@ -498,6 +542,11 @@ def tag_neutron_resources(resources):
 
 
 def get_services(namespace=None):
+    services = informer.list_objects(SERVICE_PATH, namespace=namespace)
+    if services is not None:
+        return {'kind': 'ServiceList', 'apiVersion': 'v1',
+                'items': services}
+
     kubernetes = clients.get_kubernetes_client()
     try:
         if namespace:
@@ -16,17 +16,20 @@
 import abc
 import collections
 import eventlet
+import math
 import os
 import time
 
 from kuryr.lib._i18n import _
 from kuryr.lib import constants as kl_const
 from openstack import exceptions as os_exc
+from os_vif import objects
 from oslo_cache import core as cache
 from oslo_concurrency import lockutils
 from oslo_config import cfg as oslo_cfg
 from oslo_log import log as logging
 from oslo_log import versionutils
+from oslo_serialization import jsonutils
 
 from kuryr_kubernetes import clients
 from kuryr_kubernetes import config
@@ -35,6 +38,7 @@ from kuryr_kubernetes.controller.drivers import base
 from kuryr_kubernetes.controller.drivers import utils as c_utils
 from kuryr_kubernetes.controller.managers import pool
 from kuryr_kubernetes import exceptions
+from kuryr_kubernetes import metrics
 from kuryr_kubernetes import os_vif_util as ovu
 from kuryr_kubernetes import utils
 
@@ -50,12 +54,57 @@ vif_pool_driver_opts = [
                     help=_("Set a target minimum size of the pool of ports"),
                     default=5),
     oslo_cfg.IntOpt('ports_pool_batch',
-                    help=_("Number of ports to be created in a bulk request"),
+                    help=_("Number of ports to be created in a bulk request. "
+                           "With 'adaptive' pools sizing it is not used when "
+                           "refilling the pools, as only the ports missing "
+                           "to reach the target size are created."),
                     default=10),
     oslo_cfg.IntOpt('ports_pool_update_frequency',
                     help=_("Minimum interval (in seconds) "
                            "between pool updates"),
                     default=20),
+    oslo_cfg.StrOpt('ports_pool_sizing',
+                    help=_("How the pools are sized. 'static' keeps at "
+                           "least ports_pool_min ports in each pool, "
+                           "creating ports_pool_batch ports at once. "
+                           "'adaptive' sizes each pool according to the "
+                           "observed rate of ports taken from it and the "
+                           "time it takes to populate it, keeping between "
+                           "ports_pool_min and ports_pool_max ports. Pools "
+                           "are refilled up to their target size at once, "
+                           "regardless of ports_pool_batch, and ports "
+                           "exceeding it are periodically deleted, so idle "
+                           "pools shrink back to ports_pool_min."),
+                    choices=['static', 'adaptive'],
+                    default='static'),
+    oslo_cfg.IntOpt('ports_pool_demand_window',
+                    help=_("Time (in seconds) over which the rate of ports "
+                           "taken from a pool is averaged with 'adaptive' "
+                           "pools sizing."),
+                    default=120,
+                    min=1),
+    oslo_cfg.FloatOpt('ports_pool_refill_weight',
+                      help=_("Weight of the last pool population time in its "
+                             "moving average used with 'adaptive' pools "
+                             "sizing."),
+                      default=0.3,
+                      min=0.01,
+                      max=1),
+    oslo_cfg.StrOpt('ports_pool_checkpoint_file',
+                    help=_("Path of the file the pools content is saved to "
+                           "on every pool update. On start the pools are "
+                           "loaded from it, only verifying the saved ports "
+                           "still exist in Neutron, instead of recovering "
+                           "them from the full ports listing, which then "
+                           "runs in the background. The file is local, so "
+                           "it only helps restarts on the same node. Empty "
+                           "value disables the checkpoint."),
+                    default=''),
+    oslo_cfg.IntOpt('ports_pool_populate_concurrency',
+                    help=_("Number of nodes the pools of a new namespace "
+                           "are populated at concurrently."),
+                    default=10,
+                    min=1),
     oslo_cfg.DictOpt('pools_vif_drivers',
                      help=_("Dict with the pool driver and pod driver to be "
                             "used. If not set, it will take them from the "
@@ -105,6 +154,263 @@ VIF_TYPE_TO_DRIVER_MAPPING = {
 }
 
 NODE_PORTS_CLEAN_FREQUENCY = 600  # seconds
+# Number of port IDs in a single Neutron ports query filtering by IDs.
+PORTS_QUERY_SIZE = 100
+# Number of subnets looked up at once when recovering the pools.
+SUBNET_LOOKUP_CONCURRENCY = 10
+# Number of ports deleted at once when draining the pools.
+PORTS_DELETE_CONCURRENCY = 10
+SUBPORT_DEVICE_OWNER = 'trunk:subport'
+POOL_SIZING_ADAPTIVE = 'adaptive'
+
+
+class PortsPool(object):
+    """Available ports of a single pool, grouped by their security groups.
+
+    Groups are kept ordered from the least to the most recently populated
+    one. Groups that got ports without being populated, e.g. recovered or
+    recycled ones, are considered the least recently populated. Empty groups
+    are dropped. Iterating over the pool yields the port IDs.
+    """
+
+    def __init__(self):
+        self._groups = collections.OrderedDict()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for ports in list(self._groups.values()):
+            yield from list(ports)
+
+    def groups(self):
+        """Returns a copy of the port IDs by security groups."""
+        return {sgs: list(ports) for sgs, ports in self._groups.items()}
+
+    def get_group_size(self, security_groups):
+        return len(self._groups.get(security_groups, ()))
+
+    def _put(self, security_groups, port_id):
+        try:
+            ports = self._groups[security_groups]
+        except KeyError:
+            ports = self._groups[security_groups] = {}
+            self._groups.move_to_end(security_groups, last=False)
+        ports[port_id] = None
+        self._size += 1
+
+    def _take(self, security_groups):
+        ports = self._groups.get(security_groups)
+        if not ports:
+            return None
+        # NOTE: Ports are taken in LIFO order.
+        port_id, _ = ports.popitem()
+        self._size -= 1
+        if not ports:
+            del self._groups[security_groups]
+        return port_id
+
+    def _take_lru(self):
+        for security_groups in self._groups:
+            return self._take(security_groups)
+        return None
+
+    def _remove(self, security_groups, port_id):
+        ports = self._groups[security_groups]
+        del ports[port_id]
+        self._size -= 1
+        if not ports:
+            del self._groups[security_groups]
+
+    def _touch(self, security_groups):
+        if security_groups in self._groups:
+            self._groups.move_to_end(security_groups)
+
+
+class PoolIndex(object):
+    """Available ports of all the pools.
+
+    Keeps a `PortsPool` per pool_key and the location of each port, so that
+    ports can be added, taken and removed and the pool sizes obtained in
+    constant time regardless of the number of pooled ports.
+    """
+
+    def __init__(self, pools=None):
+        self._pools = {}
+        self._locations = {}
+        for pool_key, groups in (pools or {}).items():
+            self._pools.setdefault(pool_key, PortsPool())
+            for security_groups, port_ids in groups.items():
+                for port_id in port_ids:
+                    self.put(pool_key, security_groups, port_id)
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, pool_key):
+        return pool_key in self._pools
+
+    def __iter__(self):
+        return iter(list(self._pools))
+
+    def items(self):
+        return list(self._pools.items())
+
+    def get(self, pool_key):
+        return self._pools.get(pool_key)
+
+    def get_size(self, pool_key):
+        pool = self._pools.get(pool_key)
+        return len(pool) if pool is not None else 0
+
+    def get_pool_key(self, port_id):
+        location = self._locations.get(port_id)
+        return location[0] if location else None
+
+    def put(self, pool_key, security_groups, port_id):
+        """Adds the port to the group of the security groups of the pool."""
+        self.remove(port_id)
+        try:
+            pool = self._pools[pool_key]
+        except KeyError:
+            pool = self._pools[pool_key] = PortsPool()
+        pool._put(security_groups, port_id)
+        self._locations[port_id] = (pool_key, security_groups)
+
+    def take(self, pool_key, security_groups):
+        """Takes a port with the security groups from the pool or None."""
+        pool = self._pools.get(pool_key)
+        if pool is None:
+            return None
+        port_id = pool._take(security_groups)
+        if port_id is not None:
+            del self._locations[port_id]
+        return port_id
+
+    def take_lru(self, pool_key):
+        """Takes a port of the least recently populated group or None."""
+        pool = self._pools.get(pool_key)
+        if pool is None:
+            return None
+        port_id = pool._take_lru()
+        if port_id is not None:
+            del self._locations[port_id]
+        return port_id
+
+    def touch(self, pool_key, security_groups):
+        """Marks the group as the most recently populated one."""
+        pool = self._pools.get(pool_key)
+        if pool is not None:
+            pool._touch(security_groups)
+
+    def remove(self, port_id):
+        """Removes the port from its pool.
+
+        :return: True if the port was found in any of the pools
+        """
+        location = self._locations.pop(port_id, None)
+        if location is None:
+            return False
+        pool_key, security_groups = location
+        self._pools[pool_key]._remove(security_groups, port_id)
+        return True
+
+    def remove_group(self, pool_key, security_groups):
+        """Removes the group from the pool, returning its port IDs."""
+        port_ids = []
+        port_id = self.take(pool_key, security_groups)
+        while port_id is not None:
+            port_ids.append(port_id)
+            port_id = self.take(pool_key, security_groups)
+        return port_ids
+
+    def clear(self, pool_key):
+        """Empties the pool, returning its port IDs."""
+        pool = self._pools.get(pool_key)
+        if pool is None:
+            return []
+        port_ids = list(pool)
+        for port_id in port_ids:
+            del self._locations[port_id]
+        self._pools[pool_key] = PortsPool()
+        return port_ids
+
+
+class PortsScan(object):
+    """Ports found in Neutron when recovering the pools.
+
+    Built by `BaseVIFPool._scan_ports` out of a single listing of the ports
+    owned by Kuryr, so that the cleanup and the recovery of the pools don't
+    need to list the ports on their own.
+    """
+
+    def __init__(self):
+        # IDs of the ports used by the pods
+        self.in_use_ports = set()
+        # Kuryr ports that are DOWN, candidates for cleanup
+        self.leftover_ports = []
+        # Kuryr ports not used by pods, by ID
+        self.available_ports = {}
+        # ACTIVE subports not used by pods, by ID
+        self.subports = {}
+        # Trunks, by ID, with the IP of their parent port and their subports
+        self.parent_ports = {}
+        # Networks of the available ports and subports, by subnet ID
+        self.subnets = {}
+
+    def discard(self, port_id):
+        """Forgets the port, e.g. after deleting it."""
+        self.available_ports.pop(port_id, None)
+        self.subports.pop(port_id, None)
+
+
+class PoolDemand(object):
+    """Demand for the ports of a single pool.
+
+    Tracks exponentially weighted moving averages of the rate of ports taken
+    from the pool and of the time it takes to populate the pool. The rate
+    decays continuously with the `window` time constant, so it drops to zero
+    on idle pools.
+    """
+
+    def __init__(self, window, weight):
+        self._window = window
+        self._weight = weight
+        self._rate = 0.0
+        self._last_request = None
+        self.refill_time = None
+
+    def record_request(self, now=None):
+        if now is None:
+            now = time.time()
+        self._rate = self.get_rate(now) + 1.0 / self._window
+        self._last_request = now
+
+    def record_refill(self, duration):
+        if self.refill_time is None:
+            self.refill_time = duration
+        else:
+            self.refill_time += self._weight * (duration - self.refill_time)
+
+    def get_rate(self, now=None):
+        """Returns the rate of ports taken from the pool per second."""
+        if self._last_request is None:
+            return 0.0
+        if now is None:
+            now = time.time()
+        elapsed = max(now - self._last_request, 0)
+        return self._rate * math.exp(-elapsed / self._window)
+
+    def get_target(self, now=None):
+        """Returns number of ports needed until the pool gets refilled.
+
+        The pool can be populated at most every ports_pool_update_frequency
+        and the new ports are available only after the population finishes.
+        """
+        horizon = (oslo_cfg.CONF.vif_pool.ports_pool_update_frequency +
+                   (self.refill_time or 0))
+        return int(math.ceil(self.get_rate(now) * horizon))
 
 
 class NoopVIFPool(base.VIFPoolDriver):
@@ -137,15 +443,15 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
     """Skeletal pool driver.
 
     In order to handle the pools of ports, a few dicts are used:
-    _available_ports_pool is a dictionary with the ready to use Neutron ports
-    information. The keys are the 'pool_key' and the values the 'port_id's.
+    _available_ports_pools is a `PoolIndex` with the ready to use Neutron
+    ports' IDs by 'pool_key' and their security groups.
     _existing_vifs is a dictionary containing the port vif objects. The keys
     are the 'port_id' and the values are the vif objects.
     _recyclable_ports is a dictionary with the Neutron ports to be
     recycled. The keys are the 'port_id' and their values are the 'pool_key'.
     _last_update is a dictionary with the timestamp of the last population
-    action for each pool. The keys are the pool_keys and the values are the
-    timestamps.
+    action for each pool, used to limit the population frequency. The keys
+    are the pool_keys and the values are the timestamps.
 
     The following driver configuration options exist:
     - ports_pool_max: it specifies how many ports can be kept at each pool.
@@ -158,14 +464,26 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
     when populating pools.
     - ports_pool_update_frequency: interval in seconds between ports pool
     updates, both for populating pools as well as for recycling ports.
+    - ports_pool_sizing: with 'adaptive' the target size of each pool is
+    based on its `PoolDemand` instead of ports_pool_min, bounded by
+    ports_pool_min and ports_pool_max. Pools are refilled up to their target
+    regardless of ports_pool_batch. Ports returned to a pool above its
+    target are deleted and so are the ports exceeding it when the ports are
+    recycled.
+    - ports_pool_checkpoint_file: file the pools are saved to after each
+    ports recycling and loaded from on start.
     """
+    # device_owner values of the ports that can be kept in the pools
+    _pool_port_owners = (kl_const.DEVICE_OWNER,)
 
     def __init__(self):
         # Note(ltomasbo) Execute the port recycling periodic actions in a
         # background thread
         self._recovered_pools = False
+        self._pool_demand = {}
         eventlet.spawn(self._return_ports_to_pool)
         eventlet.spawn(self._cleanup_removed_nodes)
+        metrics.register_vif_pool(self)
 
     def set_vif_driver(self, driver):
         self._drv_vif = driver
@@ -177,11 +495,82 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
         self._drv_vif.update_vif_sgs(pod, sgs)
 
     def _get_pool_size(self, pool_key):
-        pool = self._available_ports_pools.get(pool_key, {})
-        pool_members = []
-        for port_list in pool.values():
-            pool_members.extend(port_list)
-        return len(pool_members)
+        return self._available_ports_pools.get_size(pool_key)
+
+    def _is_adaptive(self):
+        return (oslo_cfg.CONF.vif_pool.ports_pool_sizing ==
+                POOL_SIZING_ADAPTIVE)
+
+    def _get_pool_demand(self, pool_key):
+        try:
+            return self._pool_demand[pool_key]
+        except KeyError:
+            demand = PoolDemand(
+                oslo_cfg.CONF.vif_pool.ports_pool_demand_window,
+                oslo_cfg.CONF.vif_pool.ports_pool_refill_weight)
+            self._pool_demand[pool_key] = demand
+            return demand
+
+    def _get_pool_target(self, pool_key):
+        """Returns the number of ports the pool should be populated to."""
+        target = oslo_cfg.CONF.vif_pool.ports_pool_min
+        if self._is_adaptive():
+            target = max(target,
+                         self._get_pool_demand(pool_key).get_target())
+            if oslo_cfg.CONF.vif_pool.ports_pool_max:
+                target = min(target, oslo_cfg.CONF.vif_pool.ports_pool_max)
+        return target
+
+    def _get_pool_limit(self, pool_key):
+        """Returns the number of ports the pool can keep, None if unlimited.
+
+        In adaptive mode the pool is limited to its target, so idle pools
+        shrink down to ports_pool_min, even if it is 0.
+        """
+        if self._is_adaptive():
+            return self._get_pool_target(pool_key)
+        return oslo_cfg.CONF.vif_pool.ports_pool_max or None
+
+    def _take_surplus_ports(self):
+        """Takes the ports exceeding the target of each adaptive pool.
+
+        Ports of the least recently populated groups are taken first.
+
+        :return: dict with the lists of taken port IDs by pool_key
+        """
+        surplus = {}
+        if not self._is_adaptive():
+            return surplus
+        pools = self._available_ports_pools
+        for pool_key in pools:
+            excess = (self._get_pool_size(pool_key) -
+                      self._get_pool_target(pool_key))
+            port_ids = []
+            while len(port_ids) < excess:
+                port_id = pools.take_lru(pool_key)
+                if port_id is None:
+                    break
+                port_ids.append(port_id)
+            if port_ids:
+                LOG.debug('Shrinking pool %s by %d ports.', pool_key,
+                          len(port_ids))
+                surplus[pool_key] = port_ids
+        return surplus
+
+    def _get_populate_size(self, pool_key, pool_size, target):
+        if self._is_adaptive():
+            return target - pool_size
+        return max(oslo_cfg.CONF.vif_pool.ports_pool_batch,
+                   target - pool_size)
+
+    def get_pool_sizes(self):
+        """Returns numbers of available ports by (host, network ID)."""
+        sizes = collections.Counter()
+        pools = getattr(self, '_available_ports_pools', None) or {}
+        for pool_key in list(pools):
+            sizes[(pool_key[0], self._get_pool_key_net(pool_key))] += (
+                self._get_pool_size(pool_key))
+        return sizes
 
     def _get_host_addr(self, pod):
         return pod['status']['hostIP']
@@ -206,11 +595,15 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
             return None
 
         pool_key = self._get_pool_key(host_addr, project_id, None, subnets)
+        if self._is_adaptive():
+            self._get_pool_demand(pool_key).record_request()
 
         try:
-            return self._get_port_from_pool(pool_key, pod, subnets,
-                                            tuple(sorted(security_groups)))
+            vif = self._get_port_from_pool(pool_key, pod, subnets,
+                                           tuple(sorted(security_groups)))
         except exceptions.ResourceNotReady:
+            metrics.VIF_POOL_REQUESTS.labels(type(self).__name__,
+                                             'miss').inc()
             LOG.debug("Ports pool does not have available ports: %s", pool_key)
             # NOTE(dulek): We're passing raise_not_ready=False because this
             #              will be run outside of handlers thread, so raising
@@ -219,6 +612,8 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
                            tuple(sorted(security_groups)),
                            raise_not_ready=False)
             raise
+        metrics.VIF_POOL_REQUESTS.labels(type(self).__name__, 'hit').inc()
+        return vif
 
     def _get_port_from_pool(self, pool_key, pod, subnets, security_groups):
         raise NotImplementedError()
@@ -250,20 +645,24 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
         self._last_update[pool_key] = {security_groups: now}
 
         pool_size = self._get_pool_size(pool_key)
-        if pool_size < oslo_cfg.CONF.vif_pool.ports_pool_min:
-            num_ports = max(oslo_cfg.CONF.vif_pool.ports_pool_batch,
-                            oslo_cfg.CONF.vif_pool.ports_pool_min - pool_size)
+        target = self._get_pool_target(pool_key)
+        if pool_size < target:
+            num_ports = self._get_populate_size(pool_key, pool_size, target)
+            start = time.time()
             vifs = self._drv_vif.request_vifs(
                 pod=pod,
                 project_id=pool_key[1],
                 subnets=subnets,
                 security_groups=security_groups,
                 num_ports=num_ports)
+            if self._is_adaptive():
+                self._get_pool_demand(pool_key).record_refill(
+                    time.time() - start)
             for vif in vifs:
                 self._existing_vifs[vif.id] = vif
-                self._available_ports_pools.setdefault(
-                    pool_key, {}).setdefault(
-                        security_groups, []).append(vif.id)
+                self._available_ports_pools.put(pool_key, security_groups,
+                                                vif.id)
+            self._available_ports_pools.touch(pool_key, security_groups)
             if not vifs:
                 self._last_update[pool_key] = {security_groups: last_update}
 
@@ -296,9 +695,10 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
         kubernetes = clients.get_kubernetes_client()
         in_use_ports = []
         networks = {}
-        running_pods = kubernetes.get(constants.K8S_API_BASE + '/pods')
-        for pod in running_pods['items']:
-            vifs = c_utils.get_vifs(pod)
+        # KuryrPorts hold the VIFs of all the pods, so there's no need to get
+        # them for every pod separately.
+        for kp in kubernetes.list_items(constants.K8S_API_CRD_KURYRPORTS):
+            vifs = c_utils.get_kuryrport_vifs(kp)
             for data in vifs.values():
                 in_use_ports.append(data.id)
                 networks[data.network.id] = data.network
@@ -315,16 +715,16 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
 
     def remove_sg_from_pools(self, sg_id, net_id):
         os_net = clients.get_network_client()
-        for pool_key, pool_ports in list(self._available_ports_pools.items()):
+        pools = self._available_ports_pools
+        for pool_key, pool_ports in pools.items():
             if self._get_pool_key_net(pool_key) != net_id:
                 continue
-            for sg_key, ports in list(pool_ports.items()):
+            for sg_key in pool_ports.groups():
                 if sg_id not in sg_key:
                     continue
                 # remove the pool associated to that SG
-                try:
-                    del self._available_ports_pools[pool_key][sg_key]
-                except KeyError:
+                ports = pools.remove_group(pool_key, sg_key)
+                if not ports:
                     LOG.debug("SG already removed from the pool. Ports "
                               "already re-used, no need to change their "
                               "associated SGs.")
@@ -333,13 +733,130 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
                     # remove all SGs from the port to be reused
                     os_net.update_port(port_id, security_groups=None)
                     # add the port to the default pool
-                    self._available_ports_pools[pool_key].setdefault(
-                        tuple([]), []).append(port_id)
+                    pools.put(pool_key, tuple([]), port_id)
                 # NOTE(ltomasbo): as this ports were not created for this
                 # pool, ensuring they are used first, marking them as the
                 # most outdated
                 self._last_update[pool_key] = {tuple([]): 0}
 
+    def _get_ports_security_groups(self, port_ids):
+        """Returns the current security groups of the ports by port ID.
+
+        Only the given ports are queried, in batches, so the cost depends on
+        the number of ports rather than on the size of the deployment.
+        """
+        os_net = clients.get_network_client()
+        sgs = {}
+        for i in range(0, len(port_ids), PORTS_QUERY_SIZE):
+            for port in os_net.ports(id=port_ids[i:i + PORTS_QUERY_SIZE]):
+                sgs[port.id] = tuple(sorted(port.security_group_ids))
+        return sgs
+
+    def _delete_ports(self, port_ids):
+        """Deletes the ports, PORTS_DELETE_CONCURRENCY of them at once.
+
+        Neutron has no bulk port deletion, so this at least avoids waiting
+        for each of the deletions in turn.
+
+        :return: list of IDs of the ports that got deleted
+        """
+        os_net = clients.get_network_client()
+
+        def _delete(port_id):
+            try:
+                os_net.delete_port(port_id)
+            except os_exc.SDKException:
+                LOG.debug("Problem deleting port %s. Skipping.", port_id)
+                return None
+            return port_id
+
+        green_pool = eventlet.GreenPool(PORTS_DELETE_CONCURRENCY)
+        return [port_id for port_id in green_pool.imap(_delete, port_ids)
+                if port_id]
+
+    def _save_checkpoint(self):
+        """Saves the pools content to the checkpoint file."""
+        path = oslo_cfg.CONF.vif_pool.ports_pool_checkpoint_file
+        if not path or not self._recovered_pools:
+            return
+        ports = []
+        for pool_key, ports_pool in self._available_ports_pools.items():
+            for sgs, port_ids in ports_pool.groups().items():
+                for port_id in port_ids:
+                    vif = self._existing_vifs.get(port_id)
+                    if vif is None:
+                        continue
+                    ports.append({'id': port_id,
+                                  'pool_key': list(pool_key),
+                                  'vif': vif.obj_to_primitive()})
+        data = {'driver': self.__class__.__name__, 'ports': ports}
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(jsonutils.dumps(data))
+            os.replace(tmp_path, path)
+        except OSError:
+            LOG.warning("Cannot save the ports pools checkpoint to %s.",
+                        path, exc_info=True)
+
+    def _load_checkpoint(self):
+        """Loads the pools content from the checkpoint file.
+
+        Only the saved ports that still exist in Neutron, are owned by Kuryr
+        and are not used by any pod get loaded, with their current security
+        groups.
+
+        :return: True if the pools got loaded from the checkpoint
+        """
+        path = oslo_cfg.CONF.vif_pool.ports_pool_checkpoint_file
+        if not path:
+            return False
+        try:
+            with open(path) as f:
+                data = jsonutils.loads(f.read())
+            if data['driver'] != self.__class__.__name__:
+                LOG.info("Ports pools checkpoint %s was saved by another "
+                         "driver, ignoring it.", path)
+                return False
+            saved = {port['id']: port for port in data['ports']}
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError):
+            LOG.warning("Cannot load the ports pools checkpoint from %s.",
+                        path, exc_info=True)
+            return False
+
+        os_net = clients.get_network_client()
+        in_use_ports, _ = self._get_in_use_ports_info()
+        in_use_ports = set(in_use_ports)
+        port_ids = [port_id for port_id in saved
+                    if port_id not in in_use_ports]
+        try:
+            for i in range(0, len(port_ids), PORTS_QUERY_SIZE):
+                ports = os_net.ports(
+                    id=port_ids[i:i + PORTS_QUERY_SIZE])
+                for port in ports:
+                    entry = saved.get(port.id)
+                    if (not entry or
+                            port.device_owner not in self._pool_port_owners):
+                        continue
+                    vif = objects.base.VersionedObject.obj_from_primitive(
+                        entry['vif'])
+                    self._existing_vifs[port.id] = vif
+                    self._available_ports_pools.put(
+                        tuple(entry['pool_key']),
+                        tuple(sorted(port.security_group_ids)), port.id)
+        except os_exc.SDKException:
+            LOG.warning("Cannot verify the ports pools checkpoint, "
+                        "recovering the pools from scratch.", exc_info=True)
+            self._available_ports_pools = PoolIndex()
+            self._existing_vifs = collections.defaultdict()
+            return False
+
+        LOG.info("PORTS POOL: loaded %d out of %d ports saved in the "
+                 "checkpoint.", len(self._available_ports_pools), len(saved))
+        return True
+
     def _create_healthcheck_file(self):
         # Note(ltomasbo): Create a health check file when the pre-created
         # ports are loaded into their corresponding pools. This file is used
@@ -362,32 +879,79 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
         except OSError:
             pass
 
-        self._available_ports_pools = collections.defaultdict()
+        self._available_ports_pools = PoolIndex()
         self._existing_vifs = collections.defaultdict()
         self._recyclable_ports = collections.defaultdict()
         self._last_update = collections.defaultdict()
 
-    def _get_trunks_info(self):
-        """Returns information about trunks and their subports.
-
-        This method searches for parent ports and subports among the active
-        neutron ports.
-        To find the parent ports it filters the ones that have trunk_details,
-        i.e., the ones that are the parent port of a trunk.
-        To find the subports to recover, it filters out the ports that are
-        already in used by running kubernetes pods. It also filters out the
-        ports whose device_owner is not related to subports, i.e., the ports
-        that are not attached to trunks, such as active ports allocated to
-        running VMs.
-        At the same time it collects information about ports subnets to
-        minimize the number of interaction with Neutron API.
+    def _scan_ports(self, trunks=False):
+        """Lists the ports needed to clean up and recover the pools.
 
-        It returns three dictionaries with the needed information about the
-        parent ports, subports and subnets
+        Ports owned by Kuryr, including the ones turned into subports, are
+        listed just once and sorted into a `PortsScan`. The subnets of the
+        available ports are looked up concurrently, reusing the networks of
+        the existing KuryrPorts where possible, and so are the trunks parent
+        ports if `trunks` is set.
+        """
+        os_net = clients.get_network_client()
+        tags = config.CONF.neutron_defaults.resource_tags
+        scan = PortsScan()
+        if trunks:
+            parents = eventlet.spawn(self._get_parent_ports)
 
-        :return: 3 dicts with the trunk details (Key: trunk_id; Value: dict
-        containing ip and subports), subport details (Key: port_id; Value:
-        port_object), and subnet details (Key: subnet_id; Value: subnet dict)
+        in_use_ports, in_use_networks = self._get_in_use_ports_info()
+        scan.in_use_ports = set(in_use_ports)
+        ports = os_net.ports(device_owner=[kl_const.DEVICE_OWNER,
+                                           SUBPORT_DEVICE_OWNER])
+        for port in ports:
+            if (port.device_owner == kl_const.DEVICE_OWNER and
+                    port.status == 'DOWN'):
+                scan.leftover_ports.append(port)
+            if tags and set(tags).difference(port.tags or []):
+                continue
+            in_use = port.id in scan.in_use_ports
+            if port.status == 'ACTIVE' and not in_use:
+                scan.subports[port.id] = port
+            if port.device_owner != kl_const.DEVICE_OWNER:
+                continue
+            if config.CONF.kubernetes.port_debug:
+                if port.name == constants.KURYR_PORT_NAME:
+                    scan.available_ports[port.id] = port
+            elif not in_use:
+                scan.available_ports[port.id] = port
+
+        subnet_ids = set()
+        for port in list(scan.available_ports.values()) + list(
+                scan.subports.values()):
+            if not port.fixed_ips:
+                continue
+            subnet_id = port.fixed_ips[0]['subnet_id']
+            if subnet_id in scan.subnets:
+                continue
+            # NOTE(maysams): Avoid calling Neutron by getting the Network and
+            # Subnet info from Network defined on an existing KuryrPort CR.
+            # This assumes only one Subnet exists per Network.
+            network = in_use_networks.get(port.network_id)
+            if network:
+                scan.subnets[subnet_id] = {subnet_id: network}
+            else:
+                subnet_ids.add(subnet_id)
+        if subnet_ids:
+            subnet_ids = list(subnet_ids)
+            green_pool = eventlet.GreenPool(SUBNET_LOOKUP_CONCURRENCY)
+            for subnet_id, network in zip(
+                    subnet_ids, green_pool.imap(utils.get_subnet,
+                                                subnet_ids)):
+                scan.subnets[subnet_id] = {subnet_id: network}
+
+        if trunks:
+            scan.parent_ports = parents.wait()
+        return scan
+
+    def _get_parent_ports(self):
+        """Returns the IPs and subports of the trunks by trunk ID.
+
+        Only trunks whose parent ports are ACTIVE are considered.
         """
         # REVISIT(ltomasbo): there is no need to recover the subports
         # belonging to trunk ports whose parent port is DOWN as that means no
@@ -397,56 +961,55 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
         # kubernetes Worker VM with subports already attached, and the
         # controller is restarted in between.
         os_net = clients.get_network_client()
-        parent_ports = {}
-        subports = {}
-        subnets = {}
-
+        trunks = {trunk.port_id: trunk for trunk in os_net.trunks()}
         attrs = {'status': 'ACTIVE'}
         tags = config.CONF.neutron_defaults.resource_tags
         if tags:
             attrs['tags'] = tags
 
-        all_active_ports = os_net.ports(**attrs)
-        in_use_ports, in_use_networks = self._get_in_use_ports_info()
-
-        for port in all_active_ports:
-            # Parent port
+        parent_ports = {}
+        port_ids = list(trunks)
+        for i in range(0, len(port_ids), PORTS_QUERY_SIZE):
             # NOTE(dulek): We do not filter by worker_nodes_subnets here
             #              meaning that we might include some unrelated trunks,
             #              but the consequence is only memory usage.
-            if port.trunk_details and port.fixed_ips:
-                parent_ports[port.trunk_details['trunk_id']] = {
+            for port in os_net.ports(id=port_ids[i:i + PORTS_QUERY_SIZE],
+                                     **attrs):
+                trunk = trunks.get(port.id)
+                if trunk is None or not port.fixed_ips:
+                    continue
+                parent_ports[trunk.id] = {
                     'ip': port.fixed_ips[0]['ip_address'],
-                    'subports': port.trunk_details['sub_ports']}
-            else:
-                # Filter to only get subports that are not in use
-                if (port.id not in in_use_ports and
-                    port.device_owner in ['trunk:subport',
-                                          kl_const.DEVICE_OWNER]):
-                    subports[port.id] = port
-                    # NOTE(ltomasbo): _get_subnet can be costly as it
-                    # needs to call neutron to get network and subnet
-                    # information. This ensures it is only called once
-                    # per subnet in use
-                    subnet_id = port.fixed_ips[0]['subnet_id']
-                    if not subnets.get(subnet_id):
-                        # NOTE(maysams): Avoid calling Neutron by
-                        # getting the Network and Subnet info from
-                        # Network defined on an existing KuryrPort CR.
-                        # This assumes only one Subnet exists per Network.
-                        if in_use_networks.get(port.network_id):
-                            subnets[subnet_id] = {
-                                subnet_id: in_use_networks.get(
-                                    port.network_id)}
-                        else:
-                            subnets[subnet_id] = {
-                                subnet_id: utils.get_subnet(subnet_id)}
-        return parent_ports, subports, subnets
-
-    def _cleanup_leftover_ports(self):
+                    'subports': trunk.sub_ports}
+        return parent_ports
+
+    def _get_trunks_info(self, scan=None):
+        """Returns information about trunks and their subports.
+
+        It returns three dictionaries with the needed information about the
+        parent ports, subports and subnets, see `PortsScan`.
+
+        :param scan: `PortsScan` to use instead of scanning the ports
+        :return: 3 dicts with the trunk details (Key: trunk_id; Value: dict
+        containing ip and subports), subport details (Key: port_id; Value:
+        port_object), and subnet details (Key: subnet_id; Value: subnet dict)
+        """
+        if scan is None:
+            scan = self._scan_ports(trunks=True)
+        return scan.parent_ports, scan.subports, scan.subnets
+
+    def _cleanup_leftover_ports(self, scan=None):
+        """Deletes the DOWN Kuryr ports that can't be used by the pools.
+
+        :param scan: `PortsScan` to take the ports from instead of listing
+                     them. The deleted ports are discarded from it.
+        """
         os_net = clients.get_network_client()
-        existing_ports = os_net.ports(device_owner=kl_const.DEVICE_OWNER,
-                                      status='DOWN')
+        if scan is None:
+            existing_ports = os_net.ports(device_owner=kl_const.DEVICE_OWNER,
+                                          status='DOWN')
+        else:
+            existing_ports = scan.leftover_ports
 
         tags = config.CONF.neutron_defaults.resource_tags
         if tags:
@@ -465,6 +1028,9 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
                             except os_exc.SDKException:
                                 LOG.debug("Problem deleting leftover port %s. "
                                           "Skipping.", port.id)
+                                continue
+                            if scan is not None:
+                                scan.discard(port.id)
                     else:
                         # delete port if they have no binding but belong to the
                         # deployment networks, regardless of their tagging
@@ -474,10 +1040,14 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
                             LOG.debug("Problem deleting leftover port %s. "
                                       "Skipping.", port.id)
                             continue
+                        if scan is not None:
+                            scan.discard(port.id)
         else:
             for port in existing_ports:
                 if not port.binding_host_id:
                     c_utils.delete_port(port)
+                    if scan is not None:
+                        scan.discard(port.id)
 
     def _cleanup_removed_nodes(self):
         """Remove ports associated to removed nodes."""
@@ -514,6 +1084,7 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
                       " cleanup.")
             return
         os_net = clients.get_network_client()
+        ports_to_delete = []
         tags = config.CONF.neutron_defaults.resource_tags
         if tags:
             subnetpool_id = config.CONF.namespace_subnet.pod_subnet_pool
@@ -551,13 +1122,7 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
                     del self._existing_vifs[subport.id]
                 except KeyError:
                     LOG.debug('Port %s is not in the ports list.', subport.id)
-                try:
-                    os_net.delete_port(subport.id)
-                except os_exc.SDKException:
-                    LOG.debug("Problem deleting leftover port %s. "
-                              "Skipping.", subport.id)
-                else:
-                    previous_ports_to_remove.remove(subport.id)
+                ports_to_delete.append(subport.id)
 
             # normal ports, or subports not yet attached
             existing_ports = os_net.ports(
@@ -582,13 +1147,11 @@ class BaseVIFPool(base.VIFPoolDriver, metaclass=abc.ABCMeta):
                     del self._existing_vifs[port.id]
                 except KeyError:
                     LOG.debug('Port %s is not in the ports list.', port.id)
-                try:
-                    os_net.delete_port(port.id)
-                except os_exc.SDKException:
-                    LOG.debug("Problem deleting leftover port %s. "
-                              "Skipping.", port.id)
-                else:
-                    previous_ports_to_remove.remove(port.id)
+                ports_to_delete.append(port.id)
+
+        for port_id in self._delete_ports(ports_to_delete):
+            if port_id in previous_ports_to_remove:
+                previous_ports_to_remove.remove(port_id)
 
 
 class NeutronVIFPool(BaseVIFPool):
@@ -599,35 +1162,20 @@ class NeutronVIFPool(BaseVIFPool):
 
     def _get_port_from_pool(self, pool_key, pod, subnets, security_groups):
         try:
-            pool_ports = self._available_ports_pools[pool_key]
-        except (KeyError, AttributeError):
+            pools = self._available_ports_pools
+            if pool_key not in pools:
+                raise exceptions.ResourceNotReady(pod)
+        except AttributeError:
             raise exceptions.ResourceNotReady(pod)
-        try:
-            port_id = pool_ports[security_groups].pop()
-        except (KeyError, IndexError):
+        port_id = pools.take(pool_key, security_groups)
+        if port_id is None:
             # Get another port from the pool and update the SG to the
             # appropriate one. It uses a port from the group that was updated
             # longer ago
-            pool_updates = self._last_update.get(pool_key, {})
-            if not pool_updates:
-                # No pools update info. Selecting a random one
-                for sg_group, ports in list(pool_ports.items()):
-                    if len(ports) > 0:
-                        port_id = pool_ports[sg_group].pop()
-                        break
-                else:
-                    raise exceptions.ResourceNotReady(pod)
-            else:
-                min_date = -1
-                for sg_group, date in list(pool_updates.items()):
-                    if pool_ports.get(sg_group):
-                        if min_date == -1 or date < min_date:
-                            min_date = date
-                            min_sg_group = sg_group
-                if min_date == -1:
-                    # pool is empty, no port to reuse
-                    raise exceptions.ResourceNotReady(pod)
-                port_id = pool_ports[min_sg_group].pop()
+            port_id = pools.take_lru(pool_key)
+            if port_id is None:
+                # pool is empty, no port to reuse
+                raise exceptions.ResourceNotReady(pod)
             os_net = clients.get_network_client()
             os_net.update_port(port_id, security_groups=list(security_groups))
         if config.CONF.kubernetes.port_debug:
@@ -636,7 +1184,7 @@ class NeutronVIFPool(BaseVIFPool):
                                device_id=pod['metadata']['uid'])
         # check if the pool needs to be populated
         if (self._get_pool_size(pool_key) <
-                oslo_cfg.CONF.vif_pool.ports_pool_min):
+                self._get_pool_target(pool_key)):
             eventlet.spawn(self._populate_pool, pool_key, pod, subnets,
                            security_groups)
         # Add protection from port_id not in existing_vifs
@@ -657,12 +1205,14 @@ class NeutronVIFPool(BaseVIFPool):
         Then the port_id is included in the dict with the available_ports.
 
         If a maximum number of ports per pool is set, the port will be
-        deleted if the maximum has been already reached.
+        deleted if the maximum has been already reached. With 'adaptive'
+        pools sizing, the ports exceeding the pool target are deleted too.
         """
         while True:
             eventlet.sleep(oslo_cfg.CONF.vif_pool.ports_pool_update_frequency)
             try:
                 self._trigger_return_to_pool()
+                self._save_checkpoint()
             except Exception:
                 LOG.exception(
                     'Error while returning ports to pool. '
@@ -678,20 +1228,14 @@ class NeutronVIFPool(BaseVIFPool):
         os_net = clients.get_network_client()
         sg_current = {}
         if not config.CONF.kubernetes.port_debug:
-            attrs = {'device_owner': kl_const.DEVICE_OWNER}
-            tags = config.CONF.neutron_defaults.resource_tags
-            if tags:
-                attrs['tags'] = tags
-
-            for port in os_net.ports(**attrs):
-                if port.id in self._recyclable_ports:
-                    sg_current[port.id] = tuple(sorted(
-                        port.security_group_ids))
+            sg_current = self._get_ports_security_groups(
+                list(self._recyclable_ports))
 
+        ports_to_delete = []
         for port_id, pool_key in list(self._recyclable_ports.items()):
-            if (not oslo_cfg.CONF.vif_pool.ports_pool_max or
-                self._get_pool_size(pool_key) <
-                    oslo_cfg.CONF.vif_pool.ports_pool_max):
+            pool_limit = self._get_pool_limit(pool_key)
+            if (pool_limit is None or
+                    self._get_pool_size(pool_key) < pool_limit):
                 port_name = (constants.KURYR_PORT_NAME
                              if config.CONF.kubernetes.port_debug
                              else '')
@@ -704,13 +1248,12 @@ class NeutronVIFPool(BaseVIFPool):
                                     "reused, put back on the cleanable "
                                     "pool.", port_id)
                         continue
-                self._available_ports_pools.setdefault(
-                    pool_key, {}).setdefault(
-                        sg_current.get(port_id), []).append(port_id)
+                self._available_ports_pools.put(
+                    pool_key, sg_current.get(port_id), port_id)
             else:
                 try:
                     del self._existing_vifs[port_id]
-                    os_net.delete_port(port_id)
+                    ports_to_delete.append(port_id)
                 except KeyError:
                     LOG.debug('Port %s is not in the ports list.', port_id)
             try:
@@ -718,46 +1261,70 @@ class NeutronVIFPool(BaseVIFPool):
             except KeyError:
                 LOG.debug('Port already recycled: %s', port_id)
 
+        for port_ids in self._take_surplus_ports().values():
+            for port_id in port_ids:
+                try:
+                    del self._existing_vifs[port_id]
+                    ports_to_delete.append(port_id)
+                except KeyError:
+                    LOG.debug('Port %s is not in the ports list.', port_id)
+
+        self._delete_ports(ports_to_delete)
+
     def sync_pools(self):
         super(NeutronVIFPool, self).sync_pools()
+        if self._load_checkpoint():
+            self._recovered_pools = True
+            self._create_healthcheck_file()
+            # NOTE: Ports created or released after the checkpoint got saved
+            # still need to be recovered.
+            eventlet.spawn(self._recover_ports_missing_in_checkpoint)
+            return
         # NOTE(ltomasbo): Ensure previously created ports are recovered into
         # their respective pools
-        self._cleanup_leftover_ports()
-        self._recover_precreated_ports()
+        scan = self._scan_ports()
+        self._cleanup_leftover_ports(scan)
+        self._recover_precreated_ports(scan)
         self._recovered_pools = True
 
-    def _recover_precreated_ports(self):
-        os_net = clients.get_network_client()
-        attrs = {'device_owner': kl_const.DEVICE_OWNER}
-        tags = config.CONF.neutron_defaults.resource_tags
-        if tags:
-            attrs['tags'] = tags
+    @lockutils.synchronized('return_to_pool_baremetal')
+    def _recover_ports_missing_in_checkpoint(self):
+        """Recovers the ports that are not in the pools checkpoint.
 
-        if config.CONF.kubernetes.port_debug:
-            attrs['name'] = constants.KURYR_PORT_NAME
-            available_ports = os_net.ports(**attrs)
-        else:
-            kuryr_ports = os_net.ports(**attrs)
-            in_use_ports, _ = self._get_in_use_ports_info()
-            available_ports = [port for port in kuryr_ports
-                               if port.id not in in_use_ports]
+        Pods are already being handled at this point, so the ports are
+        listed while holding the pools lock and none of them is deleted, as
+        a port looking like a leftover may be in use already. Leftovers get
+        removed by the removed nodes cleanup instead, once seen twice.
+        """
+        try:
+            scan = self._scan_ports()
+            self._recover_precreated_ports(scan, cleanup=False)
+        except Exception:
+            LOG.exception('Error while recovering ports missing in the pools '
+                          'checkpoint.')
+
+    def _recover_precreated_ports(self, scan=None, cleanup=True):
+        if scan is None:
+            scan = self._scan_ports()
 
-        _, available_subports, _ = self._get_trunks_info()
-        for port in available_ports:
+        for port in list(scan.available_ports.values()):
             # NOTE(ltomasbo): ensure subports are not considered for
             # recovering in the case of multi pools
-            if available_subports.get(port.id):
+            if scan.subports.get(port.id):
+                continue
+            if port.id in self._existing_vifs:
+                # Already loaded from the checkpoint or created since.
                 continue
             if not port.binding_vif_type or not port.binding_host_id:
                 # NOTE(ltomasbo): kuryr-controller is running without the
                 # rights to get the needed information to recover the ports.
                 # Thus, removing the port instead
-                os_net = clients.get_network_client()
-                os_net.delete_port(port.id)
+                if cleanup:
+                    os_net = clients.get_network_client()
+                    os_net.delete_port(port.id)
                 continue
             subnet_id = port.fixed_ips[0]['subnet_id']
-            subnet = {
-                subnet_id: utils.get_subnet(subnet_id)}
+            subnet = scan.subnets[subnet_id]
             vif = ovu.neutron_to_osvif_vif(port.binding_vif_type, port, subnet)
             net_obj = subnet[subnet_id]
             pool_key = self._get_pool_key(port.binding_host_id,
@@ -765,9 +1332,8 @@ class NeutronVIFPool(BaseVIFPool):
                                           net_obj.id, None)
 
             self._existing_vifs[port.id] = vif
-            self._available_ports_pools.setdefault(
-                pool_key, {}).setdefault(
-                    tuple(sorted(port.security_group_ids)), []).append(port.id)
+            self._available_ports_pools.put(
+                pool_key, tuple(sorted(port.security_group_ids)), port.id)
 
         LOG.info("PORTS POOL: pools updated with pre-created ports")
         self._create_healthcheck_file()
@@ -777,40 +1343,34 @@ class NeutronVIFPool(BaseVIFPool):
             LOG.debug("Kuryr-controller not yet ready to delete network "
                       "pools.")
             raise exceptions.ResourceNotReady(net_id)
-        os_net = clients.get_network_client()
 
         # NOTE(ltomasbo): Note the pods should already be deleted, but their
         # associated ports may not have been recycled yet, therefore not being
         # on the available_ports_pools dict. The next call forces it to be on
         # that dict before cleaning it up
         self._trigger_return_to_pool()
-        for pool_key, ports in list(self._available_ports_pools.items()):
+        for pool_key in self._available_ports_pools:
             if self._get_pool_key_net(pool_key) != net_id:
                 continue
-            ports_id = []
-            for sg_ports in ports.values():
-                ports_id.extend(sg_ports)
+            ports_id = self._available_ports_pools.clear(pool_key)
             for port_id in ports_id:
                 try:
                     del self._existing_vifs[port_id]
                 except KeyError:
                     LOG.debug('Port %s is not in the ports list.', port_id)
-                # NOTE(gryf): openstack client doesn't return information, if
-                # the port deos not exists
-                os_net.delete_port(port_id)
-
-            self._available_ports_pools[pool_key] = {}
+            # NOTE(gryf): openstack client doesn't return information, if
+            # the port deos not exists
+            self._delete_ports(ports_id)
 
 
 class NestedVIFPool(BaseVIFPool):
     """Manages VIFs for nested Kubernetes Pods.
 
-    In order to handle the pools of ports for nested Pods, an extra dict is
-    used:
-    _known_trunk_ids is a dictionary that keeps the trunk port ids associated
-    to each pool_key to skip calls to neutron to get the trunk information.
+    The trunks of the pools are looked up through the VIF driver, which keeps
+    them indexed by node IP and by subport, to skip calls to neutron to get
+    the trunk information.
     """
-    _known_trunk_ids = collections.defaultdict(str)
+    _pool_port_owners = ('trunk:subport', kl_const.DEVICE_OWNER)
 
     def __init__(self):
         super(NestedVIFPool, self).__init__()
@@ -845,6 +1405,9 @@ class NestedVIFPool(BaseVIFPool):
         try:
             host_addr = self._get_host_addr(pod)
         except KeyError:
+            host_addr = self._drv_vif._get_subport_host_ip(vif.id)
+
+        if host_addr is None:
             name = pod['metadata']['name']
             LOG.warning("Pod %s does not have status.hostIP field set when "
                         "getting deleted. This is unusual. Trying to "
@@ -865,44 +1428,29 @@ class NestedVIFPool(BaseVIFPool):
 
     def _get_port_from_pool(self, pool_key, pod, subnets, security_groups):
         try:
-            pool_ports = self._available_ports_pools[pool_key]
-        except (KeyError, AttributeError):
+            pools = self._available_ports_pools
+            if pool_key not in pools:
+                raise exceptions.ResourceNotReady(pod)
+        except AttributeError:
             raise exceptions.ResourceNotReady(pod)
 
         os_net = clients.get_network_client()
 
-        try:
-            port_id = pool_ports[security_groups].pop()
-        except (KeyError, IndexError):
+        port_id = pools.take(pool_key, security_groups)
+        if port_id is None:
             # Get another port from the pool and update the SG to the
             # appropriate one. It uses a port from the group that was updated
             # longer ago
-            pool_updates = self._last_update.get(pool_key, {})
-            if not pool_updates:
-                # No pools update info. Selecting a random one
-                for sg_group, ports in list(pool_ports.items()):
-                    if len(ports) > 0:
-                        port_id = pool_ports[sg_group].pop()
-                        break
-                else:
-                    raise exceptions.ResourceNotReady(pod)
-            else:
-                min_date = -1
-                for sg_group, date in list(pool_updates.items()):
-                    if pool_ports.get(sg_group):
-                        if min_date == -1 or date < min_date:
-                            min_date = date
-                            min_sg_group = sg_group
-                if min_date == -1:
-                    # pool is empty, no port to reuse
-                    raise exceptions.ResourceNotReady(pod)
-                port_id = pool_ports[min_sg_group].pop()
+            port_id = pools.take_lru(pool_key)
+            if port_id is None:
+                # pool is empty, no port to reuse
+                raise exceptions.ResourceNotReady(pod)
             os_net.update_port(port_id, security_groups=list(security_groups))
         if config.CONF.kubernetes.port_debug:
             os_net.update_port(port_id, name=c_utils.get_port_name(pod))
         # check if the pool needs to be populated
         if (self._get_pool_size(pool_key) <
-                oslo_cfg.CONF.vif_pool.ports_pool_min):
+                self._get_pool_target(pool_key)):
             eventlet.spawn(self._populate_pool, pool_key, pod, subnets,
                            security_groups)
         # Add protection from port_id not in existing_vifs
@@ -923,12 +1471,14 @@ class NestedVIFPool(BaseVIFPool):
         Then the port_id is included in the dict with the available_ports.
 
         If a maximum number of ports per pool is set, the port will be
-        deleted if the maximum has been already reached.
+        deleted if the maximum has been already reached. With 'adaptive'
+        pools sizing, the ports exceeding the pool target are deleted too.
         """
         while True:
             eventlet.sleep(oslo_cfg.CONF.vif_pool.ports_pool_update_frequency)
             try:
                 self._trigger_return_to_pool()
+                self._save_checkpoint()
             except Exception:
                 LOG.exception(
                     'Error while returning ports to pool. '
@@ -944,20 +1494,16 @@ class NestedVIFPool(BaseVIFPool):
         os_net = clients.get_network_client()
         sg_current = {}
         if not config.CONF.kubernetes.port_debug:
-            attrs = {'device_owner': ['trunk:subport', kl_const.DEVICE_OWNER]}
-            tags = config.CONF.neutron_defaults.resource_tags
-            if tags:
-                attrs['tags'] = tags
-            kuryr_subports = os_net.ports(**attrs)
-            for subport in kuryr_subports:
-                if subport.id in self._recyclable_ports:
-                    sg_current[subport.id] = tuple(sorted(
-                        subport.security_group_ids))
+            sg_current = self._get_ports_security_groups(
+                list(self._recyclable_ports))
 
+        # NOTE: Ports exceeding the pools limits are detached in a single
+        # call per trunk and then deleted together.
+        subports_to_remove = collections.defaultdict(list)
         for port_id, pool_key in list(self._recyclable_ports.items()):
-            if (not oslo_cfg.CONF.vif_pool.ports_pool_max or
-                self._get_pool_size(pool_key) <
-                    oslo_cfg.CONF.vif_pool.ports_pool_max):
+            pool_limit = self._get_pool_limit(pool_key)
+            if (pool_limit is None or
+                    self._get_pool_size(pool_key) < pool_limit):
                 port_name = (constants.KURYR_PORT_NAME
                              if config.CONF.kubernetes.port_debug
                              else '')
@@ -969,34 +1515,70 @@ class NestedVIFPool(BaseVIFPool):
                                     "reused, put back on the cleanable "
                                     "pool.", port_id)
                         continue
-                self._available_ports_pools.setdefault(
-                    pool_key, {}).setdefault(
-                        sg_current.get(port_id), []).append(port_id)
+                self._available_ports_pools.put(
+                    pool_key, sg_current.get(port_id), port_id)
             else:
                 trunk_id = self._get_trunk_id(pool_key)
+                subports_to_remove[trunk_id].append(port_id)
+                continue
+            try:
+                del self._recyclable_ports[port_id]
+            except KeyError:
+                LOG.debug('Port already recycled: %s', port_id)
+
+        for pool_key, port_ids in self._take_surplus_ports().items():
+            trunk_id = self._get_trunk_id(pool_key)
+            for port_id in port_ids:
+                # NOTE: Ports failing to be detached get recycled later on.
+                self._recyclable_ports[port_id] = pool_key
+                subports_to_remove[trunk_id].append(port_id)
+
+        ports_to_delete = []
+        for trunk_id, ports_id in subports_to_remove.items():
+            for port_id in self._remove_subports(trunk_id, ports_id):
                 try:
-                    self._drv_vif._remove_subport(trunk_id, port_id)
                     self._drv_vif._release_vlan_id(
-                        self._existing_vifs[port_id].vlan_id)
+                        trunk_id, self._existing_vifs[port_id].vlan_id)
                     del self._existing_vifs[port_id]
-                    os_net.delete_port(port_id)
+                    ports_to_delete.append(port_id)
                 except KeyError:
                     LOG.debug('Port %s is not in the ports list.', port_id)
-                except (os_exc.SDKException, os_exc.HttpException):
-                    LOG.warning('Error removing the subport %s', port_id)
-                    continue
+                try:
+                    del self._recyclable_ports[port_id]
+                except KeyError:
+                    LOG.debug('Port already recycled: %s', port_id)
+        self._delete_ports(ports_to_delete)
+
+    def _remove_subports(self, trunk_id, port_ids):
+        """Detaches the ports from the trunk.
+
+        If detaching all of them at once fails, they are detached one by
+        one, so that a port that cannot be detached won't block the others.
+
+        :return: list of IDs of the ports not attached to the trunk anymore
+        """
+        try:
+            self._drv_vif._remove_subports(trunk_id, port_ids)
+            return port_ids
+        except (os_exc.SDKException, os_exc.HttpException):
+            LOG.warning('Error removing the subports %s from trunk %s, '
+                        'removing them one by one.', port_ids, trunk_id)
+
+        removed = []
+        for port_id in port_ids:
             try:
-                del self._recyclable_ports[port_id]
-            except KeyError:
-                LOG.debug('Port already recycled: %s', port_id)
+                self._drv_vif._remove_subport(trunk_id, port_id)
+            except os_exc.NotFoundException:
+                LOG.debug('Port %s is already gone or not attached to trunk '
+                          '%s.', port_id, trunk_id)
+            except (os_exc.SDKException, os_exc.HttpException):
+                LOG.warning('Error removing the subport %s', port_id)
+                continue
+            removed.append(port_id)
+        return removed
 
     def _get_trunk_id(self, pool_key):
-        trunk_id = self._known_trunk_ids.get(pool_key, None)
-        if not trunk_id:
-            p_port = self._drv_vif._get_parent_port_by_host_ip(pool_key[0])
-            trunk_id = self._drv_vif._get_trunk_id(p_port)
-            self._known_trunk_ids[pool_key] = trunk_id
-        return trunk_id
+        return self._drv_vif._get_trunk_id_by_host_ip(pool_key[0])
 
     def _get_parent_port_ip(self, port_id):
         os_net = clients.get_network_client()
@@ -1005,21 +1587,46 @@ class NestedVIFPool(BaseVIFPool):
 
     def sync_pools(self):
         super(NestedVIFPool, self).sync_pools()
+        if self._load_checkpoint():
+            self._recovered_pools = True
+            self._create_healthcheck_file()
+            # NOTE: Ports created or released after the checkpoint got saved
+            # still need to be recovered.
+            eventlet.spawn(self._recover_ports_missing_in_checkpoint)
+            return
         # NOTE(ltomasbo): Ensure previously created ports are recovered into
         # their respective pools
-        self._recover_precreated_ports()
+        scan = self._scan_ports(trunks=True)
+        # NOTE: Leftovers are deleted before the pools are used, so no port
+        # that is just being created and attached can be taken for one.
+        self._cleanup_leftover_ports(scan)
+        self._recover_precreated_ports(scan)
         self._recovered_pools = True
-        eventlet.spawn(self._cleanup_leftover_ports)
 
-    def _recover_precreated_ports(self):
-        self._precreated_ports(action='recover')
+    @lockutils.synchronized('return_to_pool_nested')
+    def _recover_ports_missing_in_checkpoint(self):
+        """Recovers the ports that are not in the pools checkpoint.
+
+        See NeutronVIFPool._recover_ports_missing_in_checkpoint.
+        """
+        try:
+            scan = self._scan_ports(trunks=True)
+            self._precreated_ports(action='recover', scan=scan,
+                                   cleanup=False)
+        except Exception:
+            LOG.exception('Error while recovering ports missing in the pools '
+                          'checkpoint.')
+
+    def _recover_precreated_ports(self, scan=None):
+        self._precreated_ports(action='recover', scan=scan)
         LOG.info("PORTS POOL: pools updated with pre-created ports")
         self._create_healthcheck_file()
 
     def _remove_precreated_ports(self, trunk_ips=None):
         self._precreated_ports(action='free', trunk_ips=trunk_ips)
 
-    def _precreated_ports(self, action, trunk_ips=None):
+    def _precreated_ports(self, action, trunk_ips=None, scan=None,
+                          cleanup=True):
         """Removes or recovers pre-created subports at given pools
 
         This function handles the pre-created ports based on the given action:
@@ -1028,6 +1635,10 @@ class NestedVIFPool(BaseVIFPool):
         - If action is `recover` it will discover the existing subports in the
         given trunk ports (or in all of them if none are passed) and will add
         them (and the needed information) to the respective pools.
+
+        A `PortsScan` can be passed to avoid listing the ports again. Unless
+        `cleanup` is set, subports no longer attached to the trunks are
+        not deleted.
         """
         os_net = clients.get_network_client()
         # Note(ltomasbo): ML2/OVS changes the device_owner to trunk:subport
@@ -1035,7 +1646,8 @@ class NestedVIFPool(BaseVIFPool):
         # for other ML2 drivers, such as ODL. So we also need to look for
         # compute:kuryr
 
-        parent_ports, available_subports, subnets = self._get_trunks_info()
+        parent_ports, available_subports, subnets = self._get_trunks_info(
+            scan)
 
         if not available_subports:
             return
@@ -1045,8 +1657,10 @@ class NestedVIFPool(BaseVIFPool):
         trunks_subports = [subport_id['port_id']
                            for p_port in parent_ports.values()
                            for subport_id in p_port['subports']]
-        port_ids_to_delete = [p_id for p_id in available_subports
-                              if p_id not in trunks_subports]
+        port_ids_to_delete = []
+        if cleanup:
+            port_ids_to_delete = [p_id for p_id in available_subports
+                                  if p_id not in trunks_subports]
         for port_id in port_ids_to_delete:
             LOG.debug("Deleting port with wrong status: %s", port_id)
             try:
@@ -1059,10 +1673,18 @@ class NestedVIFPool(BaseVIFPool):
             if trunk_ips and host_addr not in trunk_ips:
                 continue
 
+            if action == 'recover':
+                self._drv_vif._seed_trunk(trunk_id, host_addr,
+                                          parent_port.get('subports'))
+
             for subport in parent_port.get('subports'):
                 kuryr_subport = available_subports.get(subport['port_id'])
                 if not kuryr_subport:
                     continue
+                if (action == 'recover' and
+                        kuryr_subport.id in self._existing_vifs):
+                    # Already loaded from the checkpoint or created since.
+                    continue
 
                 subnet_id = kuryr_subport.fixed_ips[0]['subnet_id']
                 subnet = subnets[subnet_id]
@@ -1076,10 +1698,10 @@ class NestedVIFPool(BaseVIFPool):
                         kuryr_subport, subnet, subport['segmentation_id'])
 
                     self._existing_vifs[kuryr_subport.id] = vif
-                    self._available_ports_pools.setdefault(
-                        pool_key, {}).setdefault(tuple(sorted(
-                            kuryr_subport.security_group_ids)),
-                            []).append(kuryr_subport.id)
+                    self._available_ports_pools.put(
+                        pool_key,
+                        tuple(sorted(kuryr_subport.security_group_ids)),
+                        kuryr_subport.id)
 
                 elif action == 'free':
                     try:
@@ -1087,28 +1709,26 @@ class NestedVIFPool(BaseVIFPool):
                                                       kuryr_subport.id)
                         os_net.delete_port(kuryr_subport.id)
                         self._drv_vif._release_vlan_id(
-                            subport['segmentation_id'])
+                            trunk_id, subport['segmentation_id'])
                         del self._existing_vifs[kuryr_subport.id]
-                        self._available_ports_pools[pool_key][
-                            tuple(sorted(kuryr_subport.security_group_ids
-                                         ))].remove(kuryr_subport.id)
+                        if not self._available_ports_pools.remove(
+                                kuryr_subport.id):
+                            LOG.debug('Port %s is not in the available ports '
+                                      'pool.', kuryr_subport.id)
                     except KeyError:
                         LOG.debug('Port %s is not in the ports list.',
                                   kuryr_subport.id)
                     except (os_exc.SDKException, os_exc.HttpException):
                         LOG.warning('Error removing the subport %s',
                                     kuryr_subport.id)
-                    except ValueError:
-                        LOG.debug('Port %s is not in the available ports '
-                                  'pool.', kuryr_subport.id)
 
-    @lockutils.synchronized('return_to_pool_nested')
     def populate_pool(self, trunk_ip, project_id, subnets, security_groups):
         if not self._recovered_pools:
             LOG.debug("Kuryr-controller not yet ready to populate pools.")
             raise exceptions.ResourceNotReady(trunk_ip)
         pool_key = self._get_pool_key(trunk_ip, project_id, None, subnets)
-        pools = self._available_ports_pools.get(pool_key)
+        with lockutils.lock('return_to_pool_nested'):
+            pools = self._available_ports_pools.get(pool_key)
         if not pools:
             # NOTE(ltomasbo): If the amount of nodes is large the repopulation
             # actions may take too long. Using half of the batch to prevent
@@ -1137,10 +1757,13 @@ class NestedVIFPool(BaseVIFPool):
             trunk_ip=trunk_ip)
 
         pool_key = self._get_pool_key(trunk_ip, project_id, None, subnets)
-        for vif in vifs:
-            self._existing_vifs[vif.id] = vif
-            self._available_ports_pools.setdefault(pool_key, {}).setdefault(
-                tuple(sorted(security_groups)), []).append(vif.id)
+        # NOTE: The lock is only taken once the ports exist, so pools of
+        # different nodes can be populated at the same time.
+        with lockutils.lock('return_to_pool_nested'):
+            for vif in vifs:
+                self._existing_vifs[vif.id] = vif
+                self._available_ports_pools.put(
+                    pool_key, tuple(sorted(security_groups)), vif.id)
 
     def free_pool(self, trunk_ips=None):
         """Removes subports from the pool and deletes neutron port resource.
@@ -1156,35 +1779,33 @@ class NestedVIFPool(BaseVIFPool):
             LOG.debug("Kuryr-controller not yet ready to delete network "
                       "pools.")
             raise exceptions.ResourceNotReady(net_id)
-        os_net = clients.get_network_client()
         # NOTE(ltomasbo): Note the pods should already be deleted, but their
         # associated ports may not have been recycled yet, therefore not being
         # on the available_ports_pools dict. The next call forces it to be on
         # that dict before cleaning it up
         self._trigger_return_to_pool()
-        for pool_key, ports in list(self._available_ports_pools.items()):
+        pools = self._available_ports_pools
+        for pool_key, ports in pools.items():
             if self._get_pool_key_net(pool_key) != net_id:
                 continue
             trunk_id = self._get_trunk_id(pool_key)
-            ports_id = [p_id for sg_ports in ports.values()
-                        for p_id in sg_ports]
+            ports_id = list(ports)
             try:
                 self._drv_vif._remove_subports(trunk_id, ports_id)
             except (os_exc.SDKException, os_exc.HttpException):
                 LOG.exception('Error removing subports from trunk: %s',
                               trunk_id)
                 continue
+            pools.clear(pool_key)
 
             for port_id in ports_id:
                 try:
                     self._drv_vif._release_vlan_id(
-                        self._existing_vifs[port_id].vlan_id)
+                        trunk_id, self._existing_vifs[port_id].vlan_id)
                     del self._existing_vifs[port_id]
                 except KeyError:
                     LOG.debug('Port %s is not in the ports list.', port_id)
-                os_net.delete_port(port_id)
-
-            self._available_ports_pools[pool_key] = {}
+            self._delete_ports(ports_id)
 
 
 class MultiVIFPool(base.VIFPoolDriver):
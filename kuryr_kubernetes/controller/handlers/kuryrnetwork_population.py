@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import eventlet
+from oslo_config import cfg
 from oslo_log import log as logging
 
 from kuryr_kubernetes import clients
@@ -22,6 +24,7 @@ from kuryr_kubernetes.handlers import k8s_base
 from kuryr_kubernetes import utils
 
 LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
 
 
 class KuryrNetworkPopulationHandler(k8s_base.ResourceEventHandler):
@@ -62,36 +65,74 @@ class KuryrNetworkPopulationHandler(k8s_base.ResourceEventHandler):
         node_subnets = self._drv_nodes_subnets.get_nodes_subnets(
             raise_on_empty=True)
         nodes = utils.get_nodes_ips(node_subnets)
-        # NOTE(ltomasbo): Patching the kuryrnet_crd here instead of after
-        # populate_pool method to ensure initial repopulation is not happening
-        # twice upon unexpected problems, such as neutron failing to
-        # transition the ports to ACTIVE or being too slow replying.
-        # In such case, even though the repopulation actions got triggered,
-        # the pools will not get the ports loaded (as they are not ACTIVE)
-        # and new population actions may be triggered if the controller was
-        # restarted before performing the populated=true patching.
-        self._patch_kuryrnetwork_crd(kuryrnet_crd, populated=True)
+        # NOTE(ltomasbo): Nodes are recorded as populated before their
+        # population gets triggered, to ensure initial repopulation is not
+        # happening twice upon unexpected problems, such as neutron failing
+        # to transition the ports to ACTIVE or being too slow replying. In
+        # such case, even though the repopulation actions got triggered, the
+        # pools will not get the ports loaded (as they are not ACTIVE) and
+        # new population actions may be triggered if the controller was
+        # restarted before recording it. To avoid patching the CRD for every
+        # node, the nodes are recorded once per batch of
+        # ports_pool_populate_concurrency nodes, before the first of them
+        # gets dispatched. If the controller is restarted, up to a batch of
+        # recorded nodes may thus not get populated, which is fine as their
+        # pools still get filled on demand. Nodes failing to be populated
+        # are moved to the failed ones, so that they are retried.
+        populated = set(kuryrnet_crd['status'].get('populatedNodes', []))
+        pending = [node_ip for node_ip in nodes if node_ip not in populated]
         # TODO(ltomasbo): Skip the master node where pods are not usually
         # allocated.
-        for node_ip in nodes:
+        failed = []
+
+        def _populate(node_ip):
             LOG.debug("Populating subnet pool %s at node %s", subnet_id,
                       node_ip)
             try:
                 self._drv_vif_pool.populate_pool(node_ip, project_id, subnets,
                                                  [])
             except exceptions.ResourceNotReady:
-                # Ensure the repopulation is retriggered if the system was not
-                # yet ready to perform the repopulation actions
-                self._patch_kuryrnetwork_crd(kuryrnet_crd, populated=False)
-                raise
+                LOG.debug("Pools not ready to be populated at node %s",
+                          node_ip)
+            except Exception:
+                LOG.exception("Error populating subnet pool %s at node %s",
+                              subnet_id, node_ip)
+            else:
+                return
+            populated.discard(node_ip)
+            failed.append(node_ip)
+
+        concurrency = CONF.vif_pool.ports_pool_populate_concurrency
+        green_pool = eventlet.GreenPool(concurrency)
+        for i, node_ip in enumerate(pending):
+            if i % concurrency == 0:
+                populated.update(pending[i:i + concurrency])
+                self._patch_kuryrnetwork_crd(kuryrnet_crd, populated, failed)
+            # NOTE(ltomasbo): this blocks until there is a free thread, so
+            # nodes are never dispatched before they got recorded.
+            green_pool.spawn_n(_populate, node_ip)
+        green_pool.waitall()
+
+        self._patch_kuryrnetwork_crd(kuryrnet_crd, populated, failed,
+                                     done=not failed)
+        if failed:
+            # Ensure the population is retriggered for the nodes the system
+            # was not yet ready to populate the pools at.
+            LOG.debug("Population of subnet %s failed at %d out of %d nodes",
+                      subnet_id, len(failed), len(nodes))
+            raise exceptions.ResourceNotReady(kuryrnet_crd)
 
-    def _patch_kuryrnetwork_crd(self, kns_crd, populated=True):
+    def _patch_kuryrnetwork_crd(self, kns_crd, populated_nodes, failed_nodes,
+                                done=False):
         kubernetes = clients.get_kubernetes_client()
         crd_name = kns_crd['metadata']['name']
         LOG.debug('Patching KuryrNetwork CRD %s' % crd_name)
+        status = {'populated': done,
+                  'populatedNodes': sorted(populated_nodes),
+                  'populationFailedNodes': sorted(failed_nodes)}
         try:
             kubernetes.patch_crd('status', utils.get_res_link(kns_crd),
-                                 {'populated': populated})
+                                 status)
         except exceptions.K8sClientException:
             LOG.exception('Error updating kuryrnet CRD %s', crd_name)
             raise
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+
 from openstack import exceptions as os_exc
 from os_vif import objects
 from oslo_config import cfg as oslo_cfg
@@ -23,10 +25,13 @@ from kuryr_kubernetes.controller.drivers import base as drivers
 from kuryr_kubernetes.controller.drivers import utils as driver_utils
 from kuryr_kubernetes import exceptions as k_exc
 from kuryr_kubernetes.handlers import k8s_base
+from kuryr_kubernetes import metrics
 from kuryr_kubernetes import utils
 
 LOG = logging.getLogger(__name__)
 KURYRPORT_URI = constants.K8S_API_CRD_NAMESPACES + '/{ns}/kuryrports/{crd}'
+# Number of KuryrPorts for which the activation of their VIFs is remembered.
+ACTIVATED_PORTS_SIZE = 10000
 
 
 class KuryrPortHandler(k8s_base.ResourceEventHandler):
@@ -38,6 +43,7 @@ class KuryrPortHandler(k8s_base.ResourceEventHandler):
     """
     OBJECT_KIND = constants.K8S_OBJ_KURYRPORT
     OBJECT_WATCH_PATH = constants.K8S_API_CRD_KURYRPORTS
+    OBJECT_WATCH_FIELDS = ['spec', 'status']
 
     def __init__(self):
         super(KuryrPortHandler, self).__init__()
@@ -57,6 +63,7 @@ class KuryrPortHandler(k8s_base.ResourceEventHandler):
             self._drv_svc_sg = (drivers.ServiceSecurityGroupsDriver
                                 .get_instance())
         self.k8s = clients.get_kubernetes_client()
+        self._activated_ports = collections.OrderedDict()
 
     def on_present(self, kuryrport_crd, *args, **kwargs):
         if not kuryrport_crd['status']['vifs']:
@@ -101,6 +108,8 @@ class KuryrPortHandler(k8s_base.ResourceEventHandler):
 
                 try:
                     self._update_kuryrport_crd(kuryrport_crd, vifs)
+                    if all(v['vif'].active for v in vifs.values()):
+                        self._observe_vifs_activated(kuryrport_crd, pod)
                 except k_exc.K8sResourceNotFound as ex:
                     LOG.exception("Failed to update KuryrPort CRD: %s", ex)
                     security_groups = self._drv_sg.get_security_groups(
@@ -269,6 +278,19 @@ class KuryrPortHandler(k8s_base.ResourceEventHandler):
         self.k8s.patch_crd('status', utils.get_res_link(kuryrport_crd),
                            {'vifs': vif_dict})
 
+    def _observe_vifs_activated(self, kuryrport_crd, pod):
+        # NOTE: The KuryrPort gets handled again on retries and outdated
+        # events, so the VIFs activation is only recorded the first time.
+        uid = kuryrport_crd['metadata'].get('uid')
+        if uid in self._activated_ports:
+            return
+        if uid is not None:
+            self._activated_ports[uid] = True
+            while len(self._activated_ports) > ACTIVATED_PORTS_SIZE:
+                self._activated_ports.popitem(last=False)
+        metrics.observe_pod_readiness(metrics.STAGE_VIFS_ACTIVATED,
+                                      pod['metadata'].get('creationTimestamp'))
+
     def _update_services(self, services, crd_pod_selectors, project_id):
         for service in services.get('items'):
             if not driver_utils.service_matches_affected_pods(
@@ -42,8 +42,7 @@ class MachineHandler(k8s_base.ResourceEventHandler):
         k8s = clients.get_kubernetes_client()
         # NOTE(dulek): Listing KuryrNetworkPolicies instead of NetworkPolicies,
         #              as we only care about NPs already handled.
-        knps = k8s.get(constants.K8S_API_CRD_KURYRNETWORKPOLICIES)
-        for knp in knps.get('items', []):
+        for knp in k8s.list_items(constants.K8S_API_CRD_KURYRNETWORKPOLICIES):
             try:
                 k8s.annotate(
                     knp['metadata']['annotations']['networkPolicyLink'],
@@ -16,7 +16,10 @@
 from requests import exceptions as requests_exc
 
 from keystoneauth1 import exceptions as key_exc
+from oslo_config import cfg
+from oslo_log import log as logging
 
+from kuryr_kubernetes import constants
 from kuryr_kubernetes import exceptions
 from kuryr_kubernetes.handlers import asynchronous as h_async
 from kuryr_kubernetes.handlers import dispatch as h_dis
@@ -24,6 +27,40 @@ from kuryr_kubernetes.handlers import k8s_base as h_k8s
 from kuryr_kubernetes.handlers import logging as h_log
 from kuryr_kubernetes.handlers import retry as h_retry
 
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+
+# Classes of events, in the order of priority of handling them.
+EVENTS_PODS = 'pods'
+EVENTS_SERVICES = 'services'
+EVENTS_POLICIES = 'policies'
+EVENT_CLASSES = (EVENTS_PODS, EVENTS_SERVICES, EVENTS_POLICIES)
+
+_EVENT_CLASS_BY_KIND = {
+    constants.K8S_OBJ_POD: EVENTS_PODS,
+    constants.K8S_OBJ_KURYRPORT: EVENTS_PODS,
+    constants.K8S_OBJ_NAMESPACE: EVENTS_PODS,
+    constants.K8S_OBJ_KURYRNETWORK: EVENTS_PODS,
+    constants.K8S_OBJ_POLICY: EVENTS_POLICIES,
+    constants.K8S_OBJ_KURYRNETWORKPOLICY: EVENTS_POLICIES,
+}
+
+
+def event_class(event):
+    """Returns the class of the event, determining its priority."""
+    return _EVENT_CLASS_BY_KIND.get(h_k8s.object_kind(event),
+                                    EVENTS_SERVICES)
+
+
+def _get_event_classes():
+    limits = CONF.kubernetes.event_workers_limits
+    unknown = set(limits) - set(EVENT_CLASSES)
+    if unknown:
+        LOG.warning('Ignoring limits of unknown event classes %s set in '
+                    'event_workers_limits, known classes are %s.',
+                    ', '.join(sorted(unknown)), ', '.join(EVENT_CLASSES))
+    return [(cls, limits.get(cls)) for cls in EVENT_CLASSES]
+
 
 class ControllerPipeline(h_dis.EventPipeline):
     """Serves as an entry point for controller Kubernetes events.
@@ -39,7 +76,9 @@ class ControllerPipeline(h_dis.EventPipeline):
 
       - failing handlers (i.e. ones that raise `Exception`s) are retried
         until either the handler succeeds or a finite amount of time passes,
-        in which case the most recent exception is logged
+        in which case the most recent exception is logged; events waiting to
+        be retried are not occupying any thread and get superseded by newer
+        events for the same object
 
       - in case there are multiple handlers registered for the same resource
         type, all such handlers are considered independent (i.e. if one
@@ -50,6 +89,10 @@ class ControllerPipeline(h_dis.EventPipeline):
 
       - events for the same Kubernetes object are handled sequentially in
         the order of arrival
+
+      - events are handled by a bounded number of threads, pods' events
+        before services' events before network policies' events, and
+        the number of threads handling a class of events can be limited
     """
 
     def __init__(self, thread_group):
@@ -65,5 +108,6 @@ class ControllerPipeline(h_dis.EventPipeline):
                 requests_exc.ConnectionError)))
 
     def _wrap_dispatcher(self, dispatcher):
-        return h_log.LogExceptions(h_async.Async(dispatcher, self._tg,
-                                                 h_k8s.object_uid))
+        return h_log.LogExceptions(h_async.Async(
+            dispatcher, self._tg, h_k8s.object_uid, classify=event_class,
+            classes=_get_event_classes()))
@@ -36,6 +36,7 @@ class PodLabelHandler(k8s_base.ResourceEventHandler):
 
     OBJECT_KIND = constants.K8S_OBJ_POD
     OBJECT_WATCH_PATH = "%s/%s" % (constants.K8S_API_BASE, "pods")
+    OBJECT_WATCH_FIELDS = ['metadata.labels', 'status.podIP']
 
     def __init__(self):
         super(PodLabelHandler, self).__init__()
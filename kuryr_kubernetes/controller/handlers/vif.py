@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
 from oslo_log import log as logging
 
 from kuryr_kubernetes import clients
@@ -20,6 +22,8 @@ from kuryr_kubernetes import constants
 from kuryr_kubernetes.controller.drivers import utils as driver_utils
 from kuryr_kubernetes import exceptions as k_exc
 from kuryr_kubernetes.handlers import k8s_base
+from kuryr_kubernetes import informer
+from kuryr_kubernetes import metrics
 from kuryr_kubernetes import utils
 
 LOG = logging.getLogger(__name__)
@@ -39,6 +43,24 @@ class VIFHandler(k8s_base.ResourceEventHandler):
 
     OBJECT_KIND = constants.K8S_OBJ_POD
     OBJECT_WATCH_PATH = "%s/%s" % (constants.K8S_API_BASE, "pods")
+    # Pod status updates are ignored unless the pod completes.
+    OBJECT_WATCH_FIELDS = ['metadata.finalizers', 'spec.nodeName',
+                           'spec.hostNetwork', 'status.phase']
+
+    def _is_unchanged(self, uid, obj, injected):
+        if not super(VIFHandler, self)._is_unchanged(uid, obj, injected):
+            return False
+        if (driver_utils.is_host_network(obj) or
+                not self._is_pod_scheduled(obj)):
+            return True
+        # NOTE: The pod is handled again if its KuryrPort got deleted, so
+        # that it gets recreated. Without the informer Store it's recreated
+        # on the next reconciliation.
+        store = informer.get_store(constants.K8S_API_CRD_KURYRPORTS)
+        if store is None:
+            return True
+        return store.get(obj['metadata']['name'],
+                         obj['metadata'].get('namespace')) is not None
 
     def on_present(self, pod, *args, **kwargs):
         if (driver_utils.is_host_network(pod) or
@@ -179,6 +201,20 @@ class VIFHandler(k8s_base.ResourceEventHandler):
             }
         }
 
+        # CNI daemon uses it to measure the time it took to set up the pod
+        # networking.
+        created = pod['metadata'].get('creationTimestamp')
+        if created:
+            kuryr_port['metadata']['annotations'] = {
+                constants.K8S_ANNOTATION_POD_CREATION_TIMESTAMP: created}
+
         k8s = clients.get_kubernetes_client()
+        handled = time.time()
         k8s.post(KURYRPORT_URI.format(ns=pod["metadata"]["namespace"],
                                       crd=''), kuryr_port)
+        # NOTE: Both stages are only recorded once the KuryrPort got
+        # created, so that retries don't record the pod more than once.
+        metrics.observe_pod_readiness(metrics.STAGE_POD_HANDLED, created,
+                                      now=handled)
+        metrics.observe_pod_readiness(metrics.STAGE_KURYRPORT_CREATED,
+                                      created)
@@ -25,6 +25,7 @@ from kuryr_kubernetes import clients
 from kuryr_kubernetes import config
 from kuryr_kubernetes.handlers import health as h_health
 from kuryr_kubernetes import health as base_server
+from kuryr_kubernetes import metrics
 
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
@@ -44,11 +45,12 @@ class HealthServer(base_server.BaseHealthServer):
     Allows to verify connectivity with Kubernetes API, Keystone and Neutron.
     If pool ports functionality is enabled it is verified whether
     the precreated ports are loaded into the pools. Also, checks handlers
-    states.
+    states. Prometheus metrics of the controller are served on /metrics.
     """
 
     def __init__(self):
-        super().__init__('controller-health', CONF.health_server.port)
+        super().__init__('controller-health', CONF.health_server.port,
+                         metrics.REGISTRY)
         self._registry = h_health.HealthRegister.get_instance().registry
 
     def _components_ready(self):
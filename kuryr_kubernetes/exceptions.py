@@ -89,6 +89,18 @@ class K8sFieldValueForbidden(K8sUnprocessableEntity):
     pass
 
 
+class K8sResourceVersionExpired(K8sClientException):
+    """Exception indicates that K8s API has compacted the resourceVersion
+
+    This exception is raised when K8s API responds with 410 Gone to a watch
+    request, i.e. the requested resourceVersion is too old to resume the
+    watch from it and the collection needs to be listed again.
+    """
+    def __init__(self, message):
+        super(K8sResourceVersionExpired, self).__init__(
+            "Resource version expired: %r" % message)
+
+
 class InvalidKuryrNetworkAnnotation(Exception):
     pass
 
@@ -129,6 +141,14 @@ class MultiPodDriverPoolConfigurationNotSupported(Exception):
     """
 
 
+class CNIRequestQueueFull(Exception):
+    """Exception indicates the CNI daemon cannot queue more requests
+
+    This exception is raised when the admission queue of the CNI daemon
+    server is full, so the request should be retried later.
+    """
+
+
 class CNIBindingFailure(Exception):
     """Exception indicates a binding/unbinding VIF failure in CNI"""
     def __init__(self, message):
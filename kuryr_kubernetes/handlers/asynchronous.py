@@ -13,21 +13,199 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import functools
+import heapq
 import itertools
 import queue as py_queue
+import threading
 import time
 
-from oslo_concurrency import lockutils
+from oslo_config import cfg
 from oslo_log import log as logging
 
-
+from kuryr_kubernetes import clients
 from kuryr_kubernetes.handlers import base
+from kuryr_kubernetes import metrics
 
 LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+
+
+def _get_resource_version(event):
+    try:
+        return int(event['object']['metadata']['resourceVersion'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class WorkQueue(object):
+    """Queue of work items grouped by key.
+
+    Modeled after the work queue of K8s client-go. Items are grouped by key
+    (e.g. uid of a K8s object) and the `WorkQueue` guarantees that a single
+    key is never handed to more than one consumer at a time. Adding an item
+    replaces whatever is waiting for the key, also cancelling the items
+    scheduled to be retried later with `add_after`, so that only the most
+    recent state of the object is handled.
+
+    Each `add` starts a new generation of the key. Retries are scheduled for
+    a given generation and are dropped once a newer one exists.
+
+    Keys can belong to different classes. Keys of a class are handed out
+    only if no keys of the classes with higher priority are ready and
+    optionally only while less than the class limit of them are being
+    processed.
+    """
+
+    def __init__(self, classes=None):
+        """Initializes a new WorkQueue instance.
+
+        :param classes: list of (name, limit) tuples describing the classes
+                        of keys in the order of their priority. `None` limit
+                        means no limit. By default there's a single unlimited
+                        class named `None`.
+        """
+        if not classes:
+            classes = [(None, None)]
+        self._cond = threading.Condition()
+        self._counter = itertools.count()
+        self._priorities = [name for name, _ in classes]
+        self._limits = dict(classes)
+        # Items waiting to be processed, by key.
+        self._items = {}
+        # Keys with items waiting, per class, in the order they became ready.
+        self._ready = {name: collections.deque() for name in self._priorities}
+        self._queued = set()
+        self._processing = set()
+        self._classes = {}
+        self._running = collections.Counter()
+        self._generations = {}
+        # Heap of (due time, sequence, key, generation, item) to be retried.
+        self._delayed = []
+        self._delayed_keys = collections.Counter()
+
+    def __contains__(self, key):
+        with self._cond:
+            return key in self._generations
+
+    def __len__(self):
+        with self._cond:
+            return len(self._queued)
+
+    def delayed_count(self):
+        with self._cond:
+            return len(self._delayed)
+
+    def processing_count(self):
+        with self._cond:
+            return len(self._processing)
+
+    def add(self, key, item, cls=None):
+        """Adds an item, replacing everything pending for the key.
+
+        :param cls: class of the key, the first one if not set
+        """
+        if cls is None:
+            cls = self._priorities[0]
+        with self._cond:
+            self._classes.setdefault(key, cls)
+            self._generations[key] = next(self._counter)
+            self._items[key] = [item]
+            self._schedule(key)
+
+    def add_after(self, key, item, delay, generation):
+        """Adds an item of the key generation once the delay passes.
 
-DEFAULT_QUEUE_DEPTH = 100
-DEFAULT_GRACE_PERIOD = 5
-STALE_PERIOD = 0.5
+        :return: False if the item got dropped as the key has a newer
+                 generation already.
+        """
+        with self._cond:
+            if self._generations.get(key) != generation:
+                return False
+            entry = (time.time() + delay, next(self._counter), key,
+                     generation, item)
+            heapq.heappush(self._delayed, entry)
+            self._delayed_keys[key] += 1
+            self._cond.notify()
+            return True
+
+    def get(self, timeout=None):
+        """Takes a key that has items ready to be processed.
+
+        The key has to be returned with `done` after processing its items.
+
+        :return: tuple of the key, its generation and list of its items
+        :raises queue.Empty: if nothing got ready within the timeout
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                self._promote(now)
+                key = self._pop_ready()
+                if key is not None:
+                    return key, self._generations[key], self._items.pop(key)
+
+                wait = None
+                if self._delayed:
+                    wait = self._delayed[0][0] - now
+                if deadline is not None:
+                    if deadline <= now:
+                        raise py_queue.Empty()
+                    if wait is None or wait > deadline - now:
+                        wait = deadline - now
+                self._cond.wait(wait)
+
+    def done(self, key):
+        """Marks the key as processed."""
+        with self._cond:
+            self._processing.discard(key)
+            self._running[self._classes[key]] -= 1
+            if key in self._items:
+                self._schedule(key)
+            else:
+                self._forget(key)
+            # The class could have been at its limit.
+            self._cond.notify()
+
+    def _pop_ready(self):
+        for cls in self._priorities:
+            ready = self._ready[cls]
+            limit = self._limits[cls]
+            if ready and (limit is None or self._running[cls] < limit):
+                key = ready.popleft()
+                self._queued.discard(key)
+                self._processing.add(key)
+                self._running[cls] += 1
+                return key
+        return None
+
+    def _forget(self, key):
+        # Key is remembered only as long as there's anything to do with it.
+        if (key in self._processing or key in self._items or
+                self._delayed_keys[key]):
+            return
+        self._generations.pop(key, None)
+        self._classes.pop(key, None)
+        del self._delayed_keys[key]
+
+    def _schedule(self, key):
+        if key in self._processing or key in self._queued:
+            return
+        self._queued.add(key)
+        self._ready[self._classes[key]].append(key)
+        self._cond.notify()
+
+    def _promote(self, now):
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, key, generation, item = heapq.heappop(self._delayed)
+            self._delayed_keys[key] -= 1
+            if self._generations.get(key) == generation:
+                self._items.setdefault(key, []).append(item)
+                self._schedule(key)
+            else:
+                self._forget(key)
 
 
 class Async(base.EventHandler):
@@ -38,80 +216,100 @@ class Async(base.EventHandler):
     *unrelated* events (based on the result of `group_by`(`event`) function)
     and handles *unrelated* events concurrently while *related* events are
     handled serially and in the same order they arrived to `Async`.
+
+    Events are put into a `WorkQueue` consumed by a bounded number of
+    `workers`. *Related* events waiting to be handled are coalesced, i.e.
+    only the most recent one gets to the `handler` as it carries the most
+    recent state of the resource. Events older than the last change Kuryr did
+    to the resource are skipped too, as K8s API is going to send the event
+    resulting from that change anyway.
+
+    Events can be split into classes using the `classify`(`event`)
+    function, `classes` define their priority and concurrency limits (see
+    `WorkQueue`).
+
+    The `handler` is called with a `requeue` keyword argument that can be
+    used to get the event handled again later without occupying a worker in
+    the meantime (see :class:`kuryr_kubernetes.handlers.retry.Retry`).
     """
 
-    def __init__(self, handler, thread_group, group_by,
-                 queue_depth=DEFAULT_QUEUE_DEPTH,
-                 grace_period=DEFAULT_GRACE_PERIOD):
+    def __init__(self, handler, thread_group, group_by, workers=None,
+                 classify=None, classes=None):
         self._handler = handler
         self._thread_group = thread_group
         self._group_by = group_by
-        self._queue_depth = queue_depth
-        self._grace_period = grace_period
-        self._queues = {}
+        self._classify = classify
+        if workers is None:
+            workers = CONF.kubernetes.event_workers
+        self._workers = workers
+        self._queue = WorkQueue(classes)
+        self._started = False
+        metrics.register_work_queue(self._queue)
 
     def __call__(self, event, *args, **kwargs):
         group = self._group_by(event)
-        with lockutils.lock(group):
-            try:
-                queue = self._queues[group]
-                # NOTE(dulek): We don't want to risk injecting an outdated
-                #              state if events for that resource are in queue.
-                if kwargs.get('injected', False):
-                    return
-            except KeyError:
-                queue = py_queue.Queue(self._queue_depth)
-                self._queues[group] = queue
-                thread = self._thread_group.add_thread(self._run, group, queue)
-                thread.link(self._done, group)
-        queue.put((event, args, kwargs))
-
-    def _run(self, group, queue):
-        LOG.debug("Asynchronous handler started processing %s", group)
+        # NOTE(dulek): We don't want to risk injecting an outdated
+        #              state if events for that resource are in queue.
+        if kwargs.get('injected', False) and group in self._queue:
+            return
+        if not self._started:
+            self._start()
+        cls = self._classify(event) if self._classify else None
+        self._queue.add(group, (self._handler, event, args, kwargs), cls)
+
+    def _start(self):
+        self._started = True
+        for _ in range(self._workers):
+            self._thread_group.add_thread(self._run)
+
+    def _requeue(self, group, generation, handler, delay, event, *args,
+                 **kwargs):
+        if self._queue.add_after(group, (handler, event, args, kwargs),
+                                 delay, generation):
+            LOG.debug("Handling of %s by %s postponed for %s seconds",
+                      group, handler, delay)
+        else:
+            LOG.debug("Not retrying handling of %s by %s, newer event "
+                      "arrived in the meantime.", group, handler)
+
+    def _is_outdated(self, event):
+        resource_version = _get_resource_version(event)
+        if resource_version is None:
+            return False
+        try:
+            uid = event['object']['metadata']['uid']
+            written = int(clients.get_kubernetes_client()
+                          .get_written_resource_version(uid))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return False
+        return resource_version < written
+
+    def _run(self):
         for _ in itertools.count():
             # NOTE(ivc): this is a mock-friendly replacement for 'while True'
             # to allow more controlled environment for unit-tests (e.g. to
             # avoid tests getting stuck in infinite loops)
+            group, generation, items = self._queue.get()
             try:
-                event, args, kwargs = queue.get(timeout=self._grace_period)
-            except py_queue.Empty:
-                break
-            # FIXME(ivc): temporary workaround to skip stale events
-            # If K8s updates resource while the handler is processing it,
-            # when the handler finishes its work it can fail to update an
-            # annotation due to the 'resourceVersion' conflict. K8sClient
-            # was updated to allow *new* annotations to be set ignoring
-            # 'resourceVersion', but it leads to another problem as the
-            # Handler will receive old events (i.e. before annotation is set)
-            # and will start processing the event 'from scratch'.
-            # It has negative effect on handlers' performance (VIFHandler
-            # creates ports only to later delete them and LBaaS handler also
-            # produces some excess requests to Neutron, although with lesser
-            # impact).
-            # Possible solutions (can be combined):
-            #  - use K8s ThirdPartyResources to store data/annotations instead
-            #    of native K8s resources (assuming Kuryr-K8s will own those
-            #    resources and no one else would update them)
-            #  - use the resulting 'resourceVersion' received from K8sClient's
-            #    'annotate' to provide feedback to Async to skip all events
-            #    until that version
-            #  - stick to the 'get-or-create' behaviour in handlers and
-            #    also introduce cache for long operations
-            time.sleep(STALE_PERIOD)
-            while not queue.empty():
-                event, args, kwargs = queue.get()
-                if queue.empty():
-                    time.sleep(STALE_PERIOD)
-            self._handler(event, *args, **kwargs)
-
-    def _done(self, thread, group):
-        LOG.debug("Asynchronous handler stopped processing group %s", group)
-        queue = self._queues.pop(group)
-
-        if not queue.empty():
-            LOG.critical("Asynchronous handler terminated abnormally; "
-                         "%(count)s events dropped for %(group)s",
-                         {'count': queue.qsize(), 'group': group})
-
-        if not self._queues:
-            LOG.debug("Asynchronous handler is idle")
+                requeue = functools.partial(self._requeue, group, generation)
+                for handler, event, args, kwargs in items:
+                    self._handle(group, requeue, handler, event, args,
+                                 kwargs)
+            finally:
+                self._queue.done(group)
+
+    def _handle(self, group, requeue, handler, event, args, kwargs):
+        # If K8s updates the resource while the handler is processing it,
+        # the handler will receive the events from before its own update
+        # (e.g. annotation got set) and would start processing the resource
+        # 'from scratch'. Such events are skipped, the event caused by the
+        # update is going to follow them.
+        if self._is_outdated(event):
+            LOG.debug("Skipping event for %s, resourceVersion %s is older "
+                      "than the last one written by Kuryr.", group,
+                      _get_resource_version(event))
+            return
+        try:
+            handler(event, *args, requeue=requeue, **kwargs)
+        except Exception:
+            LOG.exception("Failed to handle event %s", event)
@@ -13,8 +13,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+import time
+
+from oslo_log import log as logging
+
 from kuryr_kubernetes.handlers import dispatch
 from kuryr_kubernetes.handlers import health
+from kuryr_kubernetes import informer
+from kuryr_kubernetes import metrics
+
+LOG = logging.getLogger(__name__)
 
 
 def object_kind(event):
@@ -42,6 +51,12 @@ class ResourceEventHandler(dispatch.EventConsumer, health.HealthHandler):
     The `OBJECT_WATCH_PATH` should point to object's watched path,
     (e.g. for the 'Pod' case the OBJECT_WATCH_PATH should be '/api/v1/pods').
 
+    Implementing classes can also set `OBJECT_WATCH_FIELDS` to the list of
+    dot-separated paths of the object fields (e.g. 'metadata.labels') they
+    depend on. ADDED and MODIFIED events of an object that got successfully
+    handled before are then ignored unless any of those fields changed.
+    Events injected during the reconciliation are never ignored.
+
     Implementing classes are expected to override any or all of the
     `on_added`, `on_present`, `on_modified`, `on_deleted` methods that would
     be called depending on the type of the event (with K8s object as a single
@@ -53,9 +68,12 @@ class ResourceEventHandler(dispatch.EventConsumer, health.HealthHandler):
 
     OBJECT_KIND = None
     OBJECT_WATCH_PATH = None
+    OBJECT_WATCH_FIELDS = None
 
     def __init__(self):
         super(ResourceEventHandler, self).__init__()
+        # Watched fields of the objects as they were last handled, by uid.
+        self._handled_fields = {}
 
     def get_watch_path(self):
         return self.OBJECT_WATCH_PATH
@@ -73,23 +91,95 @@ class ResourceEventHandler(dispatch.EventConsumer, health.HealthHandler):
 
         return deletion_timestamp
 
+    def _get_watched_fields(self, obj):
+        values = []
+        for path in self.OBJECT_WATCH_FIELDS:
+            value = obj
+            for key in path.split('.'):
+                try:
+                    value = value.get(key)
+                except AttributeError:
+                    value = None
+                    break
+            values.append(value)
+        return values
+
+    def _get_uid(self, obj):
+        if self.OBJECT_WATCH_FIELDS is None:
+            return None
+        try:
+            return obj['metadata']['uid']
+        except (KeyError, TypeError):
+            return None
+
+    def _prune_handled_fields(self):
+        """Forgets the objects that are gone from the informer Store.
+
+        Deletions happening while the path isn't watched are never reported
+        with DELETED events. Once there are more handled objects than the
+        Store of the path has, some of them must be gone.
+        """
+        store = informer.get_store(self.get_watch_path())
+        if store is None or len(self._handled_fields) <= len(store):
+            return
+        for uid in list(self._handled_fields):
+            if store.get_by_uid(uid) is None:
+                del self._handled_fields[uid]
+
+    def _is_unchanged(self, uid, obj, injected):
+        if uid is None or injected or uid not in self._handled_fields:
+            return False
+        return self._handled_fields[uid] == self._get_watched_fields(obj)
+
     def __call__(self, event, *args, **kwargs):
+        event_type = event.get('type')
+        start = time.monotonic()
+        # Failed attempts are measured too, only skipped events are not.
+        handled = True
+        try:
+            handled = self._handle(event, *args, **kwargs)
+        finally:
+            if handled:
+                metrics.EVENT_HANDLING_TIME.labels(
+                    type(self).__name__, event_type).observe(
+                        time.monotonic() - start)
+
+    def _handle(self, event, *args, **kwargs):
+        """Calls the methods handling the event.
+
+        :return: False if the event got ignored, True otherwise
+        """
         event_type = event.get('type')
         obj = event.get('object')
-        if 'MODIFIED' == event_type:
-            if self._check_finalize(obj):
-                self.on_finalize(obj, *args, **kwargs)
-                return
-            self.on_modified(obj, *args, **kwargs)
-            self.on_present(obj, *args, **kwargs)
-        elif 'ADDED' == event_type:
+        uid = self._get_uid(obj)
+        if event_type in ('MODIFIED', 'ADDED'):
             if self._check_finalize(obj):
+                self._handled_fields.pop(uid, None)
                 self.on_finalize(obj, *args, **kwargs)
-                return
-            self.on_added(obj, *args, **kwargs)
+                return True
+            if self._is_unchanged(uid, obj, kwargs.get('injected')):
+                LOG.debug("Skipping %s event of %s, none of the fields %s "
+                          "handled by %s has changed.", event_type, uid,
+                          self.OBJECT_WATCH_FIELDS, self)
+                return False
+            if uid is not None:
+                # Handler can modify the object, so remember the fields as
+                # they came with the event.
+                fields = copy.deepcopy(self._get_watched_fields(obj))
+            if 'MODIFIED' == event_type:
+                self.on_modified(obj, *args, **kwargs)
+            else:
+                self.on_added(obj, *args, **kwargs)
             self.on_present(obj, *args, **kwargs)
+            if uid is not None:
+                self._handled_fields[uid] = fields
+                self._prune_handled_fields()
+            return True
         elif 'DELETED' == event_type:
+            self._handled_fields.pop(uid, None)
             self.on_deleted(obj, *args, **kwargs)
+            return True
+        return False
 
     def on_added(self, obj, *args, **kwargs):
         pass
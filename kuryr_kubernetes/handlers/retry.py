@@ -25,6 +25,7 @@ from oslo_utils import excutils
 from kuryr_kubernetes import clients
 from kuryr_kubernetes import exceptions
 from kuryr_kubernetes.handlers import base
+from kuryr_kubernetes import metrics
 from kuryr_kubernetes import utils
 
 LOG = logging.getLogger(__name__)
@@ -41,7 +42,10 @@ class Retry(base.EventHandler):
     exceed the `timeout` depending on responsiveness of the `handler`.
 
     `handler` is retried for the same `event` (expected backoff E(c) =
-    interval * 2 ** c / 2).
+    interval * 2 ** c / 2). If `Retry` is called with a `requeue` callable
+    (see :class:`kuryr_kubernetes.handlers.asynchronous.Async`), it uses it to
+    schedule the next attempt instead of sleeping, so the calling thread is
+    not blocked while waiting.
     """
 
     def __init__(self, handler, exceptions=Exception,
@@ -53,10 +57,12 @@ class Retry(base.EventHandler):
         self._interval = interval
         self._k8s = clients.get_kubernetes_client()
 
-    def __call__(self, event, *args, **kwargs):
-        start_time = time.time()
-        deadline = time.time() + self._timeout
-        for attempt in itertools.count(1):
+    def __call__(self, event, *args, requeue=None, attempt=1,
+                 start_time=None, **kwargs):
+        if start_time is None:
+            start_time = time.time()
+        deadline = start_time + self._timeout
+        for attempt in itertools.count(attempt):
             if event.get('type') in ['MODIFIED', 'ADDED']:
                 obj = event.get('object')
                 if obj:
@@ -86,13 +92,16 @@ class Retry(base.EventHandler):
             except os_exc.ConflictException as ex:
                 if ex.details.startswith('Quota exceeded for resources'):
                     with excutils.save_and_reraise_exception() as ex:
-                        if self._sleep(deadline, attempt, ex.value):
+                        delay = self._retry(requeue, deadline, attempt,
+                                            ex.value)
+                        if delay:
                             ex.reraise = False
                 else:
                     raise
             except self._exceptions:
                 with excutils.save_and_reraise_exception() as ex:
-                    if self._sleep(deadline, attempt, ex.value):
+                    delay = self._retry(requeue, deadline, attempt, ex.value)
+                    if delay:
                         ex.reraise = False
                     else:
                         LOG.debug('Report handler unhealthy %s', self._handler)
@@ -102,18 +111,36 @@ class Retry(base.EventHandler):
                 self._handler.set_liveness(alive=False, exc=ex)
                 raise
 
-    def _sleep(self, deadline, attempt, exception):
+            if requeue:
+                requeue(self, delay, event, *args, attempt=attempt + 1,
+                        start_time=start_time, **kwargs)
+                return
+
+    def _retry(self, requeue, deadline, attempt, exception):
+        if requeue:
+            return self._get_delay(deadline, attempt, exception)
+        return self._sleep(deadline, attempt, exception)
+
+    def _get_delay(self, deadline, attempt, exception):
         LOG.debug("Handler %s failed (attempt %s; %s)",
                   self._handler, attempt, exceptions.format_msg(exception))
-        interval = utils.exponential_sleep(deadline, attempt,
-                                           self._interval)
+        interval = utils.exponential_delay(deadline, attempt, self._interval)
         if not interval:
             LOG.debug("Handler %s failed (attempt %s; %s), "
                       "timeout exceeded (%s seconds)",
                       self._handler, attempt, exceptions.format_msg(exception),
                       self._timeout)
+        else:
+            metrics.EVENT_RETRIES.labels(type(self._handler).__name__,
+                                         type(exception).__name__).inc()
+        return interval
+
+    def _sleep(self, deadline, attempt, exception):
+        interval = self._get_delay(deadline, attempt, exception)
+        if not interval:
             return 0
 
+        time.sleep(interval)
         LOG.debug("Resumed after %s seconds. Retry handler %s", interval,
                   self._handler)
         return interval
@@ -11,29 +11,38 @@
 # limitations under the License.
 
 import abc
+from http import client as httplib
 
 from flask import Flask
 from oslo_config import cfg
 from oslo_log import log as logging
 
 from kuryr_kubernetes import clients
+from kuryr_kubernetes import metrics
 
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
 
 
 class BaseHealthServer(abc.ABC):
-    """Base class of server used to provide readiness and liveness probes."""
+    """Base class of server used to provide readiness and liveness probes.
 
-    def __init__(self, app_name, port):
+    If a Prometheus `registry` is passed, its metrics are served on /metrics.
+    """
+
+    def __init__(self, app_name, port, registry=None):
         self.app_name = app_name
         self.port = port
         self.ctx = None
+        self.registry = registry
         self.application = Flask(app_name)
         self.application.add_url_rule(
             '/ready', methods=['GET'], view_func=self.readiness_status)
         self.application.add_url_rule(
             '/alive', methods=['GET'], view_func=self.liveness_status)
+        if registry is not None:
+            self.application.add_url_rule(
+                '/metrics', methods=['GET'], view_func=self.metrics_status)
 
         def apply_conn_close(response):
             response.headers['Connection'] = 'close'
@@ -49,6 +58,10 @@ class BaseHealthServer(abc.ABC):
     def liveness_status(self):
         raise NotImplementedError()
 
+    def metrics_status(self):
+        return (metrics.generate_latest(self.registry), httplib.OK,
+                {'Content-Type': metrics.CONTENT_TYPE})
+
     def run(self):
         # Disable obtrusive werkzeug logs.
         logging.getLogger('werkzeug').setLevel(logging.WARNING)
@@ -0,0 +1,282 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import copy
+
+from oslo_config import cfg
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+
+INDEX_NAMESPACE = 'namespace'
+INDEX_POD_IP = 'podIP'
+
+# Number of deleted objects remembered by a Store to recognize outdated
+# listings still containing them.
+TOMBSTONES_SIZE = 10000
+
+
+def _index_namespace(obj):
+    namespace = obj['metadata'].get('namespace')
+    return [namespace] if namespace else []
+
+
+def _index_pod_ip(obj):
+    try:
+        pod_ip = obj['status']['podIP']
+    except (KeyError, TypeError):
+        return []
+    return [pod_ip] if pod_ip else []
+
+
+INDEXERS = {
+    INDEX_NAMESPACE: _index_namespace,
+    INDEX_POD_IP: _index_pod_ip,
+}
+
+_stores = {}
+
+
+def _is_newer(obj, resource_version):
+    """Checks if the object is newer than the resourceVersion.
+
+    resourceVersions are meant to be opaque, so if they cannot be compared
+    as numbers, any difference is considered newer.
+    """
+    obj_version = obj['metadata'].get('resourceVersion')
+    try:
+        return int(obj_version) > int(resource_version)
+    except (TypeError, ValueError):
+        return obj_version != resource_version
+
+
+class Store(object):
+    """Indexed in-memory copy of a watched K8s resource collection.
+
+    A `Store` is fed by the `Watcher` with every event it observes for a
+    given path and is seeded and resynchronized with full listings of that
+    path. Handlers and drivers can then use it to answer list queries without
+    contacting the K8s API. Objects are kept by `uid` and additionally indexed
+    by all the functions in `INDEXERS`.
+
+    Objects kept in the `Store` are shared, so callers should never modify
+    them. Use the module-level helpers that return copies instead.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.synced = False
+        self.resource_version = None
+        self._objects = {}
+        self._tombstones = collections.OrderedDict()
+        self._names = {}
+        self._indices = {name: {} for name in INDEXERS}
+
+    def __len__(self):
+        return len(self._objects)
+
+    def replace(self, items, resource_version=None):
+        """Replaces the Store content with a full listing of the path."""
+        self._objects = {}
+        self._names = {}
+        self._indices = {name: {} for name in INDEXERS}
+        for obj in items:
+            self._add(obj)
+        self.resource_version = resource_version
+        self.synced = True
+        LOG.debug('Synchronized %d objects of %s', len(items), self.path)
+
+    def handle_event(self, event):
+        """Applies a single watch event to the Store."""
+        obj = event.get('object')
+        try:
+            uid = obj['metadata']['uid']
+        except (KeyError, TypeError):
+            return
+
+        event_type = event.get('type')
+        if event_type in ('ADDED', 'MODIFIED'):
+            if self._is_deleted(obj):
+                return
+            self._remove(uid)
+            self._add(obj)
+        elif event_type == 'DELETED':
+            self._remove(uid)
+            self._add_tombstone(obj)
+        else:
+            return
+
+        resource_version = obj['metadata'].get('resourceVersion')
+        # NOTE: Events injected from listings can be older than the ones
+        # the watch has already delivered.
+        if (self.resource_version is None or
+                _is_newer(obj, self.resource_version)):
+            self.resource_version = resource_version
+
+    def diff(self, items, resource_version=None):
+        """Returns events turning the Store content into the listed one.
+
+        Objects missing in the Store result in ADDED events, objects with a
+        newer resourceVersion in MODIFIED events and objects that are not
+        listed anymore in DELETED events carrying their last known state.
+
+        As the Store can get updated by the watch while the listing is in
+        progress, objects the Store has a newer version of are ignored, and
+        so are objects missing in the listing created after it was done and
+        listed objects the watch has reported as deleted since.
+
+        :param items: listed objects
+        :param resource_version: resourceVersion of the listing
+        """
+        events = []
+        listed = set()
+        for obj in items:
+            uid = obj['metadata']['uid']
+            listed.add(uid)
+            known = self._objects.get(uid)
+            if known is None:
+                if self._is_deleted(obj):
+                    continue
+                events.append({'type': 'ADDED', 'object': obj})
+            elif _is_newer(obj, known['metadata'].get('resourceVersion')):
+                events.append({'type': 'MODIFIED', 'object': obj})
+        for uid, obj in list(self._objects.items()):
+            if uid in listed:
+                continue
+            if resource_version and _is_newer(obj, resource_version):
+                continue
+            events.append({'type': 'DELETED', 'object': obj})
+        return events
+
+    def _add_tombstone(self, obj):
+        uid = obj['metadata']['uid']
+        self._tombstones[uid] = obj['metadata'].get('resourceVersion')
+        self._tombstones.move_to_end(uid)
+        while len(self._tombstones) > TOMBSTONES_SIZE:
+            self._tombstones.popitem(last=False)
+
+    def _is_deleted(self, obj):
+        """Checks if the object got deleted after this version of it."""
+        uid = obj['metadata']['uid']
+        if uid not in self._tombstones:
+            return False
+        return not _is_newer(obj, self._tombstones[uid])
+
+    def get_by_uid(self, uid):
+        return self._objects.get(uid)
+
+    def get(self, name, namespace=None):
+        uid = self._names.get((namespace, name))
+        return self._objects.get(uid)
+
+    def list(self, namespace=None):
+        if namespace:
+            return self.by_index(INDEX_NAMESPACE, namespace)
+        return list(self._objects.values())
+
+    def by_index(self, index, key):
+        uids = self._indices[index].get(key, ())
+        return [self._objects[uid] for uid in list(uids)]
+
+    def _add(self, obj):
+        metadata = obj['metadata']
+        uid = metadata['uid']
+        self._objects[uid] = obj
+        self._names[(metadata.get('namespace'), metadata['name'])] = uid
+        for name, indexer in INDEXERS.items():
+            for key in indexer(obj):
+                self._indices[name].setdefault(key, set()).add(uid)
+
+    def _remove(self, uid):
+        obj = self._objects.pop(uid, None)
+        if obj is None:
+            return
+        metadata = obj['metadata']
+        self._names.pop((metadata.get('namespace'), metadata['name']), None)
+        for name, indexer in INDEXERS.items():
+            index = self._indices[name]
+            for key in indexer(obj):
+                uids = index.get(key)
+                if uids is None:
+                    continue
+                uids.discard(uid)
+                if not uids:
+                    del index[key]
+
+
+def is_enabled():
+    return CONF.kubernetes.informer_cache
+
+
+def ensure_store(path):
+    """Returns the Store for the path, creating it if necessary."""
+    try:
+        return _stores[path]
+    except KeyError:
+        store = _stores[path] = Store(path)
+        return store
+
+
+def invalidate(path):
+    """Marks the Store as not reflecting the K8s API state anymore.
+
+    Called when the `Watcher` stops receiving events for the path, so that
+    readers fall back to query K8s API until the Store is resynchronized.
+    """
+    store = _stores.get(path)
+    if store is not None:
+        store.synced = False
+
+
+def get_store(path):
+    """Returns a synchronized Store for the path or None."""
+    if not is_enabled():
+        return None
+    store = _stores.get(path)
+    if store is not None and store.synced:
+        return store
+    return None
+
+
+def list_objects(path, namespace=None, predicate=None):
+    """Returns copies of objects of the path from the local Store.
+
+    :param path: watched K8s resource URL path
+    :param namespace: only return objects from that namespace
+    :param predicate: function used to filter the returned objects
+    :return: list of matching objects or None if there is no synchronized
+             Store for the path and the caller needs to query K8s API
+    """
+    store = get_store(path)
+    if store is None:
+        return None
+    objs = store.list(namespace)
+    if predicate:
+        objs = [obj for obj in objs if predicate(obj)]
+    return copy.deepcopy(objs)
+
+
+def list_by_index(path, index, key, predicate=None):
+    """Returns copies of indexed objects of the path from the local Store.
+
+    Works just like `list_objects`, but uses one of the `INDEXERS` to find
+    the objects.
+    """
+    store = get_store(path)
+    if store is None:
+        return None
+    objs = store.by_index(index, key)
+    if predicate:
+        objs = [obj for obj in objs if predicate(obj)]
+    return copy.deepcopy(objs)
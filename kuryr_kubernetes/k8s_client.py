@@ -12,6 +12,7 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import collections
 import contextlib
 import datetime
 import functools
@@ -26,17 +27,21 @@ from oslo_log import log as logging
 from oslo_serialization import jsonutils
 import pytz
 import requests
-from requests import adapters
 
 from kuryr.lib._i18n import _
 from kuryr_kubernetes import config
 from kuryr_kubernetes import constants
 from kuryr_kubernetes import exceptions as exc
+from kuryr_kubernetes import rate_limit
 from kuryr_kubernetes import utils
 
 CONF = config.CONF
 LOG = logging.getLogger(__name__)
 
+# Number of objects for which the resourceVersion of the last write made by
+# Kuryr is remembered.
+WRITTEN_VERSIONS_SIZE = 10000
+
 
 class K8sClient(object):
     # REVISIT(ivc): replace with python-k8sclient if it could be extended
@@ -51,12 +56,15 @@ class K8sClient(object):
         token_file = config.CONF.kubernetes.token_file
         self.token = None
         self.cert = (None, None)
+        self._watch_resource_versions = {}
+        self._written_resource_versions = collections.OrderedDict()
 
         # Setting higher numbers regarding connection pools as we're running
         # with max of 1000 green threads.
         self.session = requests.Session()
         prefix = '%s://' % parse.urlparse(base_url).scheme
-        self.session.mount(prefix, adapters.HTTPAdapter(pool_maxsize=1000))
+        self.session.mount(prefix, rate_limit.get_kubernetes_adapter(
+            pool_maxsize=1000))
         if token_file:
             if os.path.exists(token_file):
                 with open(token_file, 'r') as f:
@@ -98,6 +106,8 @@ class K8sClient(object):
             raise exc.K8sResourceNotFound(response.text)
         if response.status_code == requests.codes.conflict:
             raise exc.K8sConflict(response.text)
+        if response.status_code == requests.codes.gone:
+            raise exc.K8sResourceVersionExpired(response.text)
         if response.status_code == requests.codes.forbidden:
             if 'because it is being terminated' in response.json()['message']:
                 raise exc.K8sNamespaceTerminating(response.text)
@@ -156,6 +166,75 @@ class K8sClient(object):
 
         return result
 
+    def get_pages(self, path, limit=None):
+        """Lists the collection of the path in chunks.
+
+        Uses the `limit` and `continue` parameters of K8s API to get the
+        collection in pages of at most `limit` items, so that big collections
+        are never loaded into the memory as a whole at once.
+
+        :param path: K8s collection URL path, can contain query parameters
+        :param limit: maximum number of items in a single page. Defaults to
+                      `[kubernetes]list_page_size`, 0 disables paging.
+        :return: generator of the K8s list objects, one per page
+        """
+        if limit is None:
+            limit = CONF.kubernetes.list_page_size
+
+        continue_token = None
+        while True:
+            params = {}
+            if limit:
+                params['limit'] = limit
+            if continue_token:
+                params['continue'] = continue_token
+
+            page_path = path
+            if params:
+                separator = '&' if '?' in path else '?'
+                page_path = f'{path}{separator}{parse.urlencode(params)}'
+
+            page = self.get(page_path)
+            yield page
+
+            continue_token = page.get('metadata', {}).get('continue')
+            if not continue_token:
+                return
+
+    def list_items(self, path, limit=None):
+        """Yields items of the collection of the path as pages arrive.
+
+        :raises K8sResourceVersionExpired: when listing took so long that the
+                                           `continue` token has expired
+        """
+        for page in self.get_pages(path, limit):
+            # NOTE: K8s API returns null instead of an empty list of items.
+            yield from page.get('items') or []
+
+    def _remember_write(self, obj):
+        """Saves the resourceVersion of the object Kuryr has just written."""
+        try:
+            uid = obj['metadata']['uid']
+            resource_version = obj['metadata']['resourceVersion']
+        except (KeyError, TypeError):
+            return
+        versions = self._written_resource_versions
+        versions[uid] = resource_version
+        versions.move_to_end(uid)
+        while len(versions) > WRITTEN_VERSIONS_SIZE:
+            versions.popitem(last=False)
+
+    def get_written_resource_version(self, uid):
+        """Returns resourceVersion of the last write Kuryr did to the object.
+
+        Events carrying an older resourceVersion of the object describe state
+        that got already outdated by Kuryr itself.
+
+        :param uid: uid of the K8s object
+        :return: resourceVersion or None if it's unknown
+        """
+        return self._written_resource_versions.get(uid)
+
     def _get_url_and_header(self, path, content_type):
         url = self._base_url + path
         header = {'Content-Type': content_type,
@@ -169,7 +248,9 @@ class K8sClient(object):
         url, header = self._get_url_and_header(path, content_type)
         response = self.session.patch(url, json={field: data}, headers=header)
         self._raise_from_response(response)
-        return response.json().get('status')
+        result = response.json()
+        self._remember_write(result)
+        return result.get('status')
 
     def patch_crd(self, field, path, data, action='replace'):
         content_type = 'application/json-patch+json'
@@ -195,7 +276,9 @@ class K8sClient(object):
         response = self.session.patch(url, data=jsonutils.dumps(data),
                                       headers=header)
         self._raise_from_response(response)
-        return response.json().get('status')
+        result = response.json()
+        self._remember_write(result)
+        return result.get('status')
 
     def patch_node_annotations(self, node, annotation_name, value):
         content_type = 'application/json-patch+json'
@@ -242,7 +325,9 @@ class K8sClient(object):
         response = self.session.patch(url, data=jsonutils.dumps(data),
                                       headers=header)
         if response.ok:
-            return response.json().get('status')
+            result = response.json()
+            self._remember_write(result)
+            return result.get('status')
         raise exc.K8sClientException(response.text)
 
     def post(self, path, body):
@@ -252,7 +337,9 @@ class K8sClient(object):
 
         response = self.session.post(url, json=body, headers=header)
         self._raise_from_response(response)
-        return response.json()
+        result = response.json()
+        self._remember_write(result)
+        return result
 
     def delete(self, path):
         LOG.debug("Delete %(path)s", {'path': path})
@@ -288,6 +375,7 @@ class K8sClient(object):
             response = self.session.patch(url, json=data, headers=headers)
 
             if response.ok:
+                self._remember_write(response.json())
                 return True
 
             try:
@@ -332,6 +420,7 @@ class K8sClient(object):
             response = self.session.patch(url, json=data, headers=headers)
 
             if response.ok:
+                self._remember_write(response.json())
                 return True
 
             try:
@@ -382,7 +471,9 @@ class K8sClient(object):
             data = jsonutils.dumps({"metadata": metadata}, sort_keys=True)
             response = self.session.patch(url, data=data, headers=header)
             if response.ok:
-                return response.json()['metadata'].get('annotations', {})
+                result = response.json()
+                self._remember_write(result)
+                return result['metadata'].get('annotations', {})
             if response.status_code == requests.codes.conflict:
                 resource = self.get(path)
                 new_version = resource['metadata']['resourceVersion']
@@ -408,31 +499,67 @@ class K8sClient(object):
 
             self._raise_from_response(response)
 
-    def watch(self, path):
+    def get_watch_resource_version(self, path):
+        """Returns resourceVersion the watch of the path is currently at.
+
+        It gets updated with every event delivered to the consumer of the
+        `watch` generator and with every bookmark received from K8s API, so
+        it can be used to resume the watch without getting all the objects
+        again.
+        """
+        return self._watch_resource_versions.get(path)
+
+    def watch(self, path, resource_version=None):
+        """Watches K8s resources of the path.
+
+        Yields events observed for the path, reconnecting whenever the
+        connection gets broken. If `resource_version` is specified, watch is
+        resumed from that version, otherwise K8s API starts with synthetic
+        ADDED events for all the existing objects.
+
+        :raises K8sResourceVersionExpired: when the resourceVersion is too old
+                                           to resume the watch and the path
+                                           needs to be listed again
+        """
         url = self._base_url + path
-        resource_version = None
+        self._watch_resource_versions[path] = resource_version
 
         attempt = 0
         while True:
             try:
-                params = {'watch': 'true'}
+                params = {'watch': 'true', 'allowWatchBookmarks': 'true'}
                 if resource_version:
                     params['resourceVersion'] = resource_version
                 with contextlib.closing(
                         self.session.get(
                             url, params=params, stream=True)) as response:
+                    if response.status_code == requests.codes.gone:
+                        self._watch_resource_versions.pop(path, None)
+                        raise exc.K8sResourceVersionExpired(response.text)
                     if not response.ok:
                         raise exc.K8sClientException(response.text)
                     attempt = 0
                     for line in response.iter_lines():
                         line = line.decode('utf-8').strip()
-                        if line:
-                            line_dict = jsonutils.loads(line)
+                        if not line:
+                            continue
+                        line_dict = jsonutils.loads(line)
+                        event_type = line_dict.get('type')
+                        obj = line_dict.get('object', {})
+                        if (event_type == 'ERROR' and
+                                obj.get('code') == requests.codes.gone):
+                            self._watch_resource_versions.pop(path, None)
+                            raise exc.K8sResourceVersionExpired(
+                                obj.get('message'))
+                        if event_type != 'BOOKMARK':
                             yield line_dict
-                            # Saving the resourceVersion in case of a restart.
-                            # At this point it's safely passed to handler.
-                            m = line_dict.get('object', {}).get('metadata', {})
-                            resource_version = m.get('resourceVersion', None)
+                        # Saving the resourceVersion in case of a restart.
+                        # At this point it's safely passed to handler.
+                        m = obj.get('metadata', {})
+                        if m.get('resourceVersion'):
+                            resource_version = m['resourceVersion']
+                            self._watch_resource_versions[path] = (
+                                resource_version)
             except (requests.ReadTimeout, requests.ConnectionError,
                     ssl.SSLError, requests.exceptions.ChunkedEncodingError,
                     urllib3.exceptions.SSLError):
@@ -0,0 +1,306 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import datetime
+import multiprocessing
+import re
+import time
+import weakref
+
+from oslo_log import log as logging
+import prometheus_client
+from prometheus_client import core
+from prometheus_client import utils as prometheus_utils
+
+LOG = logging.getLogger(__name__)
+
+KUBERNETES = 'kubernetes'
+
+# Handlers can take from milliseconds up to minutes when waiting for
+# OpenStack resources.
+HANDLER_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+                   float('inf'))
+READINESS_BUCKETS = (0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 45, 60, 90, 120,
+                     180, 300, float('inf'))
+
+# Stages of the pod networking setup, in order.
+STAGE_POD_HANDLED = 'pod_handled'
+STAGE_KURYRPORT_CREATED = 'kuryrport_created'
+STAGE_VIFS_ACTIVATED = 'vifs_activated'
+STAGE_CNI_ADD_RECEIVED = 'cni_add_received'
+STAGE_CNI_ADD_RETURNED = 'cni_add_returned'
+
+REGISTRY = prometheus_client.CollectorRegistry()
+
+EVENT_HANDLING_TIME = prometheus_client.Histogram(
+    'kuryr_event_handling_duration_seconds',
+    'Time spent handling K8s events, per handler and event type.',
+    ['handler', 'event_type'], buckets=HANDLER_BUCKETS, registry=REGISTRY)
+
+EVENT_RETRIES = prometheus_client.Counter(
+    'kuryr_event_retries',
+    'Number of times handling of an event got retried, per handler and '
+    'the exception causing the retry.',
+    ['handler', 'exception'], registry=REGISTRY)
+
+API_REQUEST_TIME = prometheus_client.Histogram(
+    'kuryr_api_request_duration_seconds',
+    'Time spent on requests to K8s and OpenStack APIs, per operation.',
+    ['api', 'host', 'method', 'resource'], registry=REGISTRY)
+
+API_REQUESTS = prometheus_client.Counter(
+    'kuryr_api_requests',
+    'Number of requests to K8s and OpenStack APIs, per operation and HTTP '
+    'status code.',
+    ['api', 'host', 'method', 'resource', 'code'], registry=REGISTRY)
+
+API_THROTTLE_TIME = prometheus_client.Counter(
+    'kuryr_api_throttle_wait_seconds',
+    'Time requests to K8s and OpenStack APIs waited for the client-side '
+    'rate limiters.',
+    ['api', 'host', 'method'], registry=REGISTRY)
+
+API_THROTTLED = prometheus_client.Counter(
+    'kuryr_api_throttled_responses',
+    'Number of HTTP 429 Too Many Requests responses from K8s and OpenStack '
+    'APIs.',
+    ['api', 'host'], registry=REGISTRY)
+
+VIF_POOL_REQUESTS = prometheus_client.Counter(
+    'kuryr_vif_pool_requests',
+    'Number of VIFs requested from the pools, per result (hit or miss).',
+    ['driver', 'result'], registry=REGISTRY)
+
+POD_NETWORK_READINESS = prometheus_client.Histogram(
+    'kuryr_pod_network_readiness_seconds',
+    'Time from the pod creation until each stage of its network setup.',
+    ['stage'], buckets=READINESS_BUCKETS, registry=REGISTRY)
+
+WATCH_RESTARTS = prometheus_client.Counter(
+    'kuryr_watch_restarts',
+    'Number of times watching a K8s resource had to be restarted, per '
+    'reason.',
+    ['path', 'reason'], registry=REGISTRY)
+
+_UUID = re.compile(r'^[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?'
+                   r'[0-9a-f]{12}$', re.IGNORECASE)
+_VERSION = re.compile(r'^v\d+(\.\d+)?$')
+
+
+def _get_k8s_resource(path):
+    parts = [p for p in path.split('/') if p]
+    if parts[:1] == ['api']:
+        parts = parts[2:]
+    elif parts[:1] == ['apis']:
+        parts = parts[3:]
+    else:
+        return '/'.join(parts[:1])
+    if parts[:1] == ['namespaces'] and len(parts) > 2:
+        parts = parts[2:]
+    # Keep the type and the subresource, e.g. pods/status, drop the names.
+    return '/'.join(parts[0:1] + parts[2:3])
+
+
+def _get_openstack_resource(path):
+    return '/'.join(p for p in path.split('/')
+                    if p and not _VERSION.match(p) and not _UUID.match(p))
+
+
+def get_resource(api, path):
+    """Returns the type of the resource of the API URL path.
+
+    Used to name the operation in the metrics without the names and IDs
+    of particular resources, e.g. `pods` for `/api/v1/namespaces/a/pods/b`
+    or `ports` for `/v2.0/ports/<uuid>`.
+    """
+    if api == KUBERNETES:
+        return _get_k8s_resource(path)
+    return _get_openstack_resource(path)
+
+
+def observe_api_request(api, host, method, path, code, duration):
+    resource = get_resource(api, path)
+    API_REQUEST_TIME.labels(api, host, method, resource).observe(duration)
+    API_REQUESTS.labels(api, host, method, resource, code).inc()
+
+
+def _parse_timestamp(timestamp):
+    created = datetime.datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
+    return created.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def get_pod_age(created, now=None):
+    """Returns seconds since the K8s creationTimestamp or None."""
+    try:
+        created = _parse_timestamp(created)
+    except (TypeError, ValueError):
+        return None
+    if now is None:
+        now = time.time()
+    return max(now - created, 0)
+
+
+def observe_pod_readiness(stage, created, now=None, histogram=None):
+    """Records the pod reaching the stage of the network setup.
+
+    :param stage: one of the STAGE_* constants
+    :param created: creationTimestamp of the pod
+    :param now: time (as returned by time.time()) the stage was reached at
+    :param histogram: histogram to record it in, POD_NETWORK_READINESS by
+                      default
+    """
+    age = get_pod_age(created, now)
+    if age is None:
+        return
+    LOG.debug('Pod network setup reached stage %s %.3f seconds after the '
+              'pod creation.', stage, age)
+    if histogram is None:
+        histogram = POD_NETWORK_READINESS.labels(stage)
+    else:
+        histogram = histogram.labels(stage)
+    histogram.observe(age)
+
+
+class SharedHistogram(object):
+    """Histogram with a single label observable from forked processes.
+
+    prometheus-client metrics live in the memory of a single process, while
+    the CNI daemon handles requests in processes forked from the one
+    exposing the metrics. The counts are kept in shared memory instead, so
+    a `SharedHistogram` needs to be created before forking and all the
+    values of its label need to be known upfront.
+    """
+
+    def __init__(self, name, documentation, label, values,
+                 buckets=READINESS_BUCKETS, registry=None):
+        self._name = name
+        self._documentation = documentation
+        self._label = label
+        self._values = list(values)
+        self._buckets = list(buckets)
+        if self._buckets[-1] != float('inf'):
+            self._buckets.append(float('inf'))
+        # Count of each bucket followed by the sum, for each label value.
+        self._size = len(self._buckets) + 1
+        self._data = multiprocessing.Array('d',
+                                           len(self._values) * self._size)
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, value):
+        return _SharedHistogramChild(self, self._values.index(value))
+
+    def _observe(self, index, amount):
+        offset = index * self._size
+        with self._data.get_lock():
+            for i, bound in enumerate(self._buckets):
+                if amount <= bound:
+                    self._data[offset + i] += 1
+                    break
+            self._data[offset + self._size - 1] += amount
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        family = core.HistogramMetricFamily(self._name, self._documentation,
+                                            labels=[self._label])
+        with self._data.get_lock():
+            data = self._data[:]
+        for index, value in enumerate(self._values):
+            offset = index * self._size
+            buckets = []
+            count = 0
+            for i, bound in enumerate(self._buckets):
+                count += data[offset + i]
+                buckets.append((prometheus_utils.floatToGoString(bound),
+                                count))
+            family.add_metric([value], buckets,
+                              data[offset + self._size - 1])
+        yield family
+
+
+class _SharedHistogramChild(object):
+    def __init__(self, histogram, index):
+        self._histogram = histogram
+        self._index = index
+
+    def observe(self, amount):
+        self._histogram._observe(self._index, amount)
+
+
+class _Collector(object):
+    """Collects metrics of the objects registered with it on scrape."""
+
+    def __init__(self):
+        self._queues = weakref.WeakSet()
+        self._pools = weakref.WeakSet()
+
+    def add_queue(self, queue):
+        self._queues.add(queue)
+
+    def add_pool(self, pool):
+        self._pools.add(pool)
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        depth = core.GaugeMetricFamily(
+            'kuryr_event_queue_depth',
+            'Number of resources with events in the event queue, per state.',
+            labels=['state'])
+        queued = delayed = processing = 0
+        for queue in list(self._queues):
+            queued += len(queue)
+            delayed += queue.delayed_count()
+            processing += queue.processing_count()
+        depth.add_metric(['queued'], queued)
+        depth.add_metric(['delayed'], delayed)
+        depth.add_metric(['processing'], processing)
+        yield depth
+
+        pools = core.GaugeMetricFamily(
+            'kuryr_vif_pool_size',
+            'Number of ports available in the VIF pools, per node and '
+            'network.',
+            labels=['driver', 'host', 'network_id'])
+        for pool in list(self._pools):
+            try:
+                sizes = pool.get_pool_sizes()
+            except Exception:
+                LOG.debug('Cannot get sizes of pools of %s.', pool)
+                continue
+            for (host, net_id), size in sizes.items():
+                pools.add_metric([type(pool).__name__, host, net_id], size)
+        yield pools
+
+
+_collector = _Collector()
+REGISTRY.register(_collector)
+
+
+def register_work_queue(queue):
+    """Exports the depth of the queue."""
+    _collector.add_queue(queue)
+
+
+def register_vif_pool(pool):
+    """Exports the sizes of pools of the VIF pool driver."""
+    _collector.add_pool(pool)
+
+
+def generate_latest(registry=REGISTRY):
+    return prometheus_client.generate_latest(registry)
+
+
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST
@@ -20,6 +20,7 @@ from kuryr_kubernetes.controller.drivers import namespace_subnet
 from kuryr_kubernetes.controller.drivers import vif_pool
 from kuryr_kubernetes.controller.managers import health
 from kuryr_kubernetes.controller.managers import pool
+from kuryr_kubernetes import rate_limit
 from kuryr_kubernetes import utils
 
 _kuryr_k8s_opts = [
@@ -38,6 +39,7 @@ _kuryr_k8s_opts = [
     ('cni_health_server', cni_health.cni_health_server_opts),
     ('namespace_subnet', namespace_subnet.namespace_subnet_driver_opts),
     ('sriov', config.sriov_opts),
+    ('rate_limit', rate_limit.rate_limit_opts),
 ]
 
 
@@ -0,0 +1,268 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import email.utils
+import math
+import threading
+import time
+from urllib import parse
+
+from keystoneauth1 import session as k_session
+from kuryr.lib._i18n import _
+from oslo_config import cfg
+from oslo_log import log as logging
+from requests import adapters
+
+from kuryr_kubernetes import metrics
+
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+
+rate_limit_opts = [
+    cfg.FloatOpt('kubernetes_qps',
+                 help=_('Maximum number of requests per second sent to K8s '
+                        'API for each HTTP verb. 0 means no limit.'),
+                 default=0,
+                 min=0),
+    cfg.IntOpt('kubernetes_burst',
+               help=_('Number of requests that can be sent to K8s API over '
+                      'the kubernetes_qps limit in a short burst. 0 means '
+                      'the same as kubernetes_qps.'),
+               default=0,
+               min=0),
+    cfg.DictOpt('kubernetes_verb_qps',
+                help=_('Overrides kubernetes_qps for particular HTTP verbs, '
+                       'e.g. GET:100,PATCH:20. Starting a watch is counted '
+                       'as WATCH verb.'),
+                default={}),
+    cfg.FloatOpt('openstack_qps',
+                 help=_('Maximum number of requests per second sent to each '
+                        'of OpenStack APIs (e.g. Neutron or Octavia) for '
+                        'each HTTP verb. 0 means no limit.'),
+                 default=0,
+                 min=0),
+    cfg.IntOpt('openstack_burst',
+               help=_('Number of requests that can be sent to OpenStack API '
+                      'over the openstack_qps limit in a short burst. 0 means '
+                      'the same as openstack_qps.'),
+               default=0,
+               min=0),
+    cfg.DictOpt('openstack_verb_qps',
+                help=_('Overrides openstack_qps for particular HTTP verbs, '
+                       'e.g. GET:100,PUT:20.'),
+                default={}),
+    cfg.IntOpt('max_throttled_retries',
+               help=_('Number of times a request rejected with HTTP 429 Too '
+                      'Many Requests is retried after waiting for the time '
+                      'from the Retry-After header.'),
+               default=5,
+               min=0),
+    cfg.IntOpt('max_retry_after',
+               help=_('Maximum time (in seconds) to wait before retrying a '
+                      'request rejected with HTTP 429 Too Many Requests.'),
+               default=60,
+               min=1),
+]
+
+CONF.register_opts(rate_limit_opts, 'rate_limit')
+
+KUBERNETES = metrics.KUBERNETES
+OPENSTACK = 'openstack'
+DEFAULT_RETRY_AFTER = 1
+
+
+class TokenBucket(object):
+    """Token bucket allowing `rate` operations per second on average.
+
+    Up to `burst` operations can be done at once after the bucket got idle.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, math.ceil(rate))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token.
+
+        :return: time (in seconds) the caller needs to wait before using the
+                 token
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+
+class RateLimiter(object):
+    """Limits the rate of requests to an API.
+
+    Keeps a `TokenBucket` per HTTP verb and allows to pause all the requests
+    to the API when it asks to slow down with HTTP 429 responses.
+    """
+
+    def __init__(self, api, host='', qps=0, burst=0, verb_qps=None):
+        self.api = api
+        self.host = host
+        self._qps = qps
+        self._burst = burst
+        self._verb_qps = {verb.upper(): float(rate)
+                          for verb, rate in (verb_qps or {}).items()}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._paused_until = 0
+
+    def _get_bucket(self, verb):
+        with self._lock:
+            try:
+                return self._buckets[verb]
+            except KeyError:
+                rate = self._verb_qps.get(verb, self._qps)
+                bucket = None
+                if rate:
+                    bucket = TokenBucket(rate, self._burst)
+                self._buckets[verb] = bucket
+                return bucket
+
+    def wait(self, verb):
+        """Blocks until a request with the verb can be sent."""
+        bucket = self._get_bucket(verb)
+        delay = bucket.reserve() if bucket else 0
+        delay = max(delay, self._paused_until - time.monotonic())
+        if delay > 0:
+            LOG.debug('Throttling %s request to %s API at %s for %.3f '
+                      'seconds.', verb, self.api, self.host, delay)
+            metrics.API_THROTTLE_TIME.labels(self.api, self.host,
+                                             verb).inc(delay)
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Pauses all the requests to the API for the given time."""
+        with self._lock:
+            self._paused_until = max(self._paused_until,
+                                     time.monotonic() + seconds)
+
+
+def _get_retry_after(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (email.utils.parsedate_to_datetime(value).timestamp() -
+                       time.time())
+        except (TypeError, ValueError):
+            seconds = DEFAULT_RETRY_AFTER
+    return min(max(seconds, 0), CONF.rate_limit.max_retry_after)
+
+
+class RateLimitingMixin(object):
+    """Mixin for requests adapters limiting the rate of the requests.
+
+    Requests are throttled by a `RateLimiter` per API host. Requests rejected
+    with HTTP 429 are retried after the time requested by the API in the
+    Retry-After header and all other requests to the API wait for it too.
+    Number and duration of the requests are recorded in the metrics.
+    """
+
+    def __init__(self, api, qps=0, burst=0, verb_qps=None, **kwargs):
+        self._api = api
+        self._limiter_args = (qps, burst, verb_qps)
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+        super(RateLimitingMixin, self).__init__(**kwargs)
+
+    def _get_limiter(self, url):
+        host = parse.urlparse(url).netloc
+        with self._limiters_lock:
+            try:
+                return self._limiters[host]
+            except KeyError:
+                limiter = RateLimiter(self._api, host, *self._limiter_args)
+                self._limiters[host] = limiter
+                return limiter
+
+    @staticmethod
+    def _get_verb(request):
+        if 'watch=true' in parse.urlparse(request.url).query:
+            return 'WATCH'
+        return request.method
+
+    def _send(self, request, limiter, verb, **kwargs):
+        path = parse.urlparse(request.url).path
+        start = time.monotonic()
+        try:
+            response = super(RateLimitingMixin, self).send(request, **kwargs)
+        except Exception:
+            metrics.observe_api_request(self._api, limiter.host, verb, path,
+                                        'error', time.monotonic() - start)
+            raise
+        metrics.observe_api_request(self._api, limiter.host, verb, path,
+                                    response.status_code,
+                                    time.monotonic() - start)
+        return response
+
+    def send(self, request, **kwargs):
+        limiter = self._get_limiter(request.url)
+        verb = self._get_verb(request)
+        retries = CONF.rate_limit.max_throttled_retries
+        attempt = 0
+        while True:
+            limiter.wait(verb)
+            response = self._send(request, limiter, verb, **kwargs)
+            if response.status_code != 429:
+                return response
+
+            metrics.API_THROTTLED.labels(limiter.api, limiter.host).inc()
+            if attempt >= retries:
+                LOG.warning('%s request to %s API at %s still throttled '
+                            'after %d retries.', verb, limiter.api,
+                            limiter.host, attempt)
+                return response
+            attempt += 1
+            delay = _get_retry_after(response)
+            LOG.warning('%s API at %s throttled %s request, retrying in %s '
+                        'seconds.', limiter.api, limiter.host, verb, delay)
+            limiter.pause(delay)
+            response.close()
+
+
+class RateLimitingHTTPAdapter(RateLimitingMixin, adapters.HTTPAdapter):
+    pass
+
+
+class RateLimitingTCPKeepAliveAdapter(RateLimitingMixin,
+                                      k_session.TCPKeepAliveAdapter):
+    pass
+
+
+def get_kubernetes_adapter(**kwargs):
+    opts = CONF.rate_limit
+    return RateLimitingHTTPAdapter(
+        KUBERNETES, opts.kubernetes_qps, opts.kubernetes_burst,
+        opts.kubernetes_verb_qps, **kwargs)
+
+
+def get_openstack_adapter(**kwargs):
+    opts = CONF.rate_limit
+    return RateLimitingTCPKeepAliveAdapter(
+        OPENSTACK, opts.openstack_qps, opts.openstack_burst,
+        opts.openstack_verb_qps, **kwargs)
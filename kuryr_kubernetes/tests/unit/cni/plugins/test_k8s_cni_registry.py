@@ -12,12 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
 from unittest import mock
 
 from oslo_config import cfg
 
 from kuryr_kubernetes.cni.plugins import k8s_cni_registry
+from kuryr_kubernetes import constants as k_const
 from kuryr_kubernetes import exceptions
+from kuryr_kubernetes import metrics
 from kuryr_kubernetes.tests import base
 from kuryr_kubernetes.tests import fake
 from kuryr_kubernetes.tests.unit import kuryr_fixtures
@@ -35,10 +38,11 @@ class TestK8sCNIRegistryPlugin(base.TestCase):
                                 'namespace': 'default'},
                    'spec': {'podUid': 'bar'}}
         self.vifs = fake._fake_vifs()
-        registry = {'default/foo': {'kp': self.kp, 'vifs': self.vifs,
-                                    'containerid': None,
-                                    'vif_unplugged': False,
-                                    'del_received': False}}
+        registry = k8s_cni_registry.Registry(
+            {'default/foo': {'kp': self.kp, 'vifs': self.vifs,
+                             'containerid': None,
+                             'vif_unplugged': False,
+                             'del_received': False}})
         healthy = mock.Mock()
         self.plugin = k8s_cni_registry.K8sCNIRegistryPlugin(registry, healthy)
         self.params = mock.Mock(args=mock.Mock(K8S_POD_NAME='foo',
@@ -53,7 +57,7 @@ class TestK8sCNIRegistryPlugin(base.TestCase):
 
         self.plugin.add(self.params)
 
-        m_lock.assert_called_with('default/foo', external=True)
+        m_lock.assert_called_with('default/foo')
         m_connect.assert_any_call(mock.ANY, mock.ANY, self.default_iface,
                                   123, report_health=mock.ANY,
                                   is_default_gateway=True,
@@ -65,12 +69,31 @@ class TestK8sCNIRegistryPlugin(base.TestCase):
         self.assertEqual('cont_id',
                          self.plugin.registry['default/foo']['containerid'])
 
+    @mock.patch('time.time', return_value=1608627872.5)
+    @mock.patch('kuryr_kubernetes.cni.metrics.POD_NETWORK_READINESS')
+    @mock.patch('oslo_concurrency.lockutils.lock')
+    @mock.patch('kuryr_kubernetes.cni.binding.base.connect')
+    def test_add_present_readiness(self, m_connect, m_lock, m_readiness,
+                                   m_time):
+        self.kp['metadata']['annotations'] = {
+            k_const.K8S_ANNOTATION_POD_CREATION_TIMESTAMP:
+                '2020-12-22T09:04:29Z'}
+        self.k8s_mock.get.return_value = self.kp
+
+        self.plugin.add(self.params)
+
+        m_readiness.labels.assert_has_calls([
+            mock.call(metrics.STAGE_CNI_ADD_RECEIVED),
+            mock.call().observe(3.5),
+            mock.call(metrics.STAGE_CNI_ADD_RETURNED),
+            mock.call().observe(3.5)])
+
     @mock.patch('oslo_concurrency.lockutils.lock')
     @mock.patch('kuryr_kubernetes.cni.binding.base.disconnect')
     def test_del_present(self, m_disconnect, m_lock):
         self.plugin.delete(self.params)
 
-        m_lock.assert_called_with('default/foo', external=True)
+        m_lock.assert_called_with('default/foo')
         m_disconnect.assert_any_call(mock.ANY, mock.ANY, self.default_iface,
                                      123, report_health=mock.ANY,
                                      is_default_gateway=True,
@@ -89,7 +112,7 @@ class TestK8sCNIRegistryPlugin(base.TestCase):
         self.plugin.registry['default/foo']['del_received'] = True
         self.plugin.delete(self.params)
 
-        m_lock.assert_called_with('default/foo', external=True)
+        m_lock.assert_called_with('default/foo')
         self.assertNotIn('default/foo', self.plugin.registry)
         m_disconnect.assert_any_call(mock.ANY, mock.ANY, self.default_iface,
                                      123, report_health=mock.ANY,
@@ -102,8 +125,9 @@ class TestK8sCNIRegistryPlugin(base.TestCase):
 
     @mock.patch('kuryr_kubernetes.cni.binding.base.disconnect')
     def test_del_wrong_container_id(self, m_disconnect):
-        registry = {'default/foo': {'kp': self.kp, 'vifs': self.vifs,
-                                    'containerid': 'different'}}
+        registry = k8s_cni_registry.Registry(
+            {'default/foo': {'kp': self.kp, 'vifs': self.vifs,
+                             'containerid': 'different'}})
         healthy = mock.Mock()
         self.plugin = k8s_cni_registry.K8sCNIRegistryPlugin(registry, healthy)
         self.plugin.delete(self.params)
@@ -111,30 +135,19 @@ class TestK8sCNIRegistryPlugin(base.TestCase):
         m_disconnect.assert_not_called()
 
     @mock.patch('oslo_concurrency.lockutils.lock')
-    @mock.patch('time.sleep', mock.Mock())
     @mock.patch('kuryr_kubernetes.cni.binding.base.connect')
-    def test_add_present_on_5_try(self, m_connect, m_lock):
-        se = [KeyError] * 5
-        se.append({'kp': self.kp, 'vifs': self.vifs, 'containerid': None,
-                   'vif_unplugged': False, 'del_received': False})
-        se.append({'kp': self.kp, 'vifs': self.vifs, 'containerid': None,
-                   'vif_unplugged': False, 'del_received': False})
-        se.append({'kp': self.kp, 'vifs': self.vifs, 'containerid': None,
-                   'vif_unplugged': False, 'del_received': False})
-        m_getitem = mock.Mock(side_effect=se)
-        m_setitem = mock.Mock()
-        m_registry = mock.Mock(__getitem__=m_getitem, __setitem__=m_setitem,
-                               __contains__=mock.Mock(return_value=False))
-        self.plugin.registry = m_registry
+    def test_add_present_later(self, m_connect, m_lock):
+        entry = self.plugin.registry.pop('default/foo')
+
+        def _on_done():
+            self.plugin.registry['default/foo'] = entry
+            self.plugin.registry.notify('default/foo')
+
+        threading.Timer(0.1, _on_done).start()
         self.plugin.add(self.params)
 
-        m_lock.assert_called_with('default/foo', external=True)
-        m_setitem.assert_called_once_with('default/foo',
-                                          {'kp': self.kp,
-                                           'vifs': self.vifs,
-                                           'containerid': 'cont_id',
-                                           'vif_unplugged': False,
-                                           'del_received': False})
+        m_lock.assert_called_with('default/foo')
+        self.assertEqual('cont_id', entry['containerid'])
         m_connect.assert_any_call(mock.ANY, mock.ANY, self.default_iface,
                                   123, report_health=mock.ANY,
                                   is_default_gateway=True,
@@ -144,7 +157,36 @@ class TestK8sCNIRegistryPlugin(base.TestCase):
                                   is_default_gateway=False,
                                   container_id='cont_id')
 
-    @mock.patch('time.sleep', mock.Mock())
+    @mock.patch('oslo_concurrency.lockutils.lock')
+    @mock.patch('kuryr_kubernetes.cni.binding.base.connect')
+    def test_add_wait_for_active(self, m_connect, m_lock):
+        self.k8s_mock.get.return_value = self.kp
+        for vif in self.vifs.values():
+            vif.active = False
+
+        def _on_done():
+            for vif in self.vifs.values():
+                vif.active = True
+            self.plugin.registry.notify('default/foo')
+
+        threading.Timer(0.1, _on_done).start()
+        vif = self.plugin.add(self.params)
+
+        self.assertIs(self.vifs[k_const.DEFAULT_IFNAME], vif)
+        self.assertTrue(vif.active)
+
+    @mock.patch('oslo_concurrency.lockutils.lock')
+    @mock.patch('kuryr_kubernetes.cni.binding.base.connect')
+    def test_add_inactive_timeout(self, m_connect, m_lock):
+        cfg.CONF.set_override('vif_annotation_timeout', 0, group='cni_daemon')
+        self.addCleanup(cfg.CONF.clear_override, 'vif_annotation_timeout',
+                        group='cni_daemon')
+        self.k8s_mock.get.return_value = self.kp
+        self.vifs[self.additional_iface].active = False
+
+        self.assertRaises(exceptions.ResourceNotReady, self.plugin.add,
+                          self.params)
+
     @mock.patch('oslo_concurrency.lockutils.lock', mock.Mock(
         return_value=mock.Mock(__enter__=mock.Mock(), __exit__=mock.Mock())))
     def test_add_not_present(self):
@@ -152,8 +194,39 @@ class TestK8sCNIRegistryPlugin(base.TestCase):
         self.addCleanup(cfg.CONF.set_override, 'vif_annotation_timeout', 120,
                         group='cni_daemon')
 
-        m_getitem = mock.Mock(side_effect=KeyError)
-        m_registry = mock.Mock(__getitem__=m_getitem, __contains__=False)
-        self.plugin.registry = m_registry
+        self.plugin.registry = k8s_cni_registry.Registry()
         self.assertRaises(exceptions.ResourceNotReady, self.plugin.add,
                           self.params)
+
+
+class TestRegistry(base.TestCase):
+    def setUp(self):
+        super(TestRegistry, self).setUp()
+        self.registry = k8s_cni_registry.Registry()
+
+    def test_wait_for_present(self):
+        self.registry['default/foo'] = mock.sentinel.entry
+        self.assertIs(mock.sentinel.entry, self.registry.wait_for(
+            'default/foo', lambda e: e is not None, 0))
+        self.assertEqual({}, self.registry._waiters)
+
+    def test_wait_for_timeout(self):
+        self.assertIsNone(self.registry.wait_for(
+            'default/foo', lambda e: e is not None, 0.01))
+        self.assertEqual({}, self.registry._waiters)
+
+    def test_wait_for_notified(self):
+        def _on_done():
+            self.registry['default/bar'] = mock.sentinel.other
+            self.registry.notify('default/bar')
+            self.registry['default/foo'] = mock.sentinel.entry
+            self.registry.notify('default/foo')
+
+        predicate = mock.Mock(side_effect=lambda e: e is not None)
+        threading.Timer(0.1, _on_done).start()
+        self.assertIs(mock.sentinel.entry, self.registry.wait_for(
+            'default/foo', predicate, 60))
+        # Notifications about other pods don't wake the request up.
+        predicate.assert_has_calls([mock.call(None),
+                                    mock.call(mock.sentinel.entry)])
+        self.assertEqual(2, predicate.call_count)
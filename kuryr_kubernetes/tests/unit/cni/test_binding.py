@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import collections
+import contextlib
+import errno
 import os
 from unittest import mock
 import uuid
@@ -22,6 +24,7 @@ from os_vif import objects as osv_objects
 from os_vif.objects import fields as osv_fields
 from oslo_config import cfg
 from oslo_utils import uuidutils
+import pyroute2
 
 from kuryr_kubernetes.cni.binding import base
 from kuryr_kubernetes.cni.binding import nested
@@ -36,6 +39,101 @@ from kuryr_kubernetes.tests import fake
 CONF = cfg.CONF
 
 
+def _nlmsg(attrs, **fields):
+    msg = mock.MagicMock()
+    msg.__getitem__.side_effect = fields.__getitem__
+    msg.get_attr.side_effect = attrs.get
+    return msg
+
+
+class TestGetIPRoute(test_base.TestCase):
+    def setUp(self):
+        super(TestGetIPRoute, self).setUp()
+        self.netns = '/proc/netns/1234'
+        patcher = mock.patch.multiple(base, _host_iproute=None,
+                                      _host_iproute_pid=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('pyroute2.IPRoute')
+    def test_host_shared(self, m_iproute):
+        with base.get_iproute() as ipr1:
+            pass
+        with base.get_iproute() as ipr2:
+            pass
+
+        self.assertIs(m_iproute.return_value, ipr1)
+        self.assertIs(ipr1, ipr2)
+        m_iproute.assert_called_once_with()
+        ipr1.close.assert_not_called()
+
+    @mock.patch('os.getpid')
+    @mock.patch('pyroute2.IPRoute')
+    def test_host_forked(self, m_iproute, m_getpid):
+        m_iproute.side_effect = [mock.Mock(), mock.Mock()]
+        m_getpid.return_value = 1
+        with base.get_iproute() as ipr1:
+            pass
+        m_getpid.return_value = 2
+        with base.get_iproute() as ipr2:
+            pass
+
+        self.assertIsNot(ipr1, ipr2)
+        self.assertEqual(2, m_iproute.call_count)
+
+    @mock.patch('kuryr_kubernetes.cni.binding.base._switch_netns')
+    @mock.patch('pyroute2.IPRoute')
+    def test_netns_reused(self, m_iproute, m_switch_netns):
+        with base.get_iproute(self.netns) as ipr1:
+            with base.get_iproute(self.netns) as ipr2:
+                self.assertIs(ipr1, ipr2)
+            ipr1.close.assert_not_called()
+
+        m_iproute.assert_called_once_with()
+        m_switch_netns.assert_called_once_with(self.netns)
+        ipr1.close.assert_called_once_with()
+
+        with base.get_iproute(self.netns):
+            pass
+        self.assertEqual(2, m_iproute.call_count)
+
+    @mock.patch('kuryr_kubernetes.cni.binding.base._switch_netns')
+    @mock.patch('pyroute2.IPRoute')
+    def test_netns_closed_on_error(self, m_iproute, m_switch_netns):
+        def use_iproute():
+            with base.get_iproute(self.netns):
+                raise pyroute2.NetlinkError(errno.EEXIST)
+
+        self.assertRaises(pyroute2.NetlinkError, use_iproute)
+        m_iproute.return_value.close.assert_called_once_with()
+
+    @mock.patch('builtins.open', new_callable=mock.mock_open)
+    @mock.patch('pyroute2.netns.setns')
+    def test_switch_netns(self, m_setns, m_open):
+        def switch():
+            with base._switch_netns(self.netns):
+                m_setns.assert_called_once_with(self.netns, flags=0)
+                raise OSError()
+
+        self.assertRaises(OSError, switch)
+        m_open.assert_called_once_with('/proc/self/ns/net')
+        m_setns.assert_called_with(m_open.return_value)
+        self.assertEqual(2, m_setns.call_count)
+
+    @mock.patch('kuryr_kubernetes.cni.binding.base.get_iproute')
+    def test_configure_l3_missing_iface(self, m_get_iproute):
+        ipr = m_get_iproute.return_value.__enter__.return_value
+        ipr.link_lookup.return_value = []
+
+        ex = self.assertRaises(exceptions.CNIBindingFailure,
+                               base._configure_l3, fake._fake_vif(), 'eth0',
+                               self.netns, True)
+
+        self.assertIn('eth0', str(ex))
+        self.assertIn(self.netns, str(ex))
+        ipr.addr.assert_not_called()
+
+
 class TestDriverMixin(test_base.TestCase):
     def setUp(self):
         super(TestDriverMixin, self).setUp()
@@ -44,72 +142,53 @@ class TestDriverMixin(test_base.TestCase):
         self.ifname = 'c_interface'
         self.netns = '/proc/netns/1234'
 
-        # Mock IPDB context managers
-        self.ipdbs = {}
-        self.m_bridge_iface = mock.Mock(__exit__=mock.Mock(return_value=None))
-        self.m_c_iface = mock.Mock()
-        self.m_h_iface = mock.Mock()
-        self.h_ipdb, self.h_ipdb_exit = self._mock_ipdb_context_manager(None)
-        self.c_ipdb, self.c_ipdb_exit = self._mock_ipdb_context_manager(
-            self.netns)
-        self.m_create = mock.Mock()
-        self.h_ipdb.create = mock.Mock(
-            return_value=mock.Mock(
-                __enter__=mock.Mock(return_value=self.m_create),
-                __exit__=mock.Mock(return_value=None)))
-        self.c_ipdb.create = mock.Mock(
-            return_value=mock.Mock(
-                __enter__=mock.Mock(return_value=self.m_create),
-                __exit__=mock.Mock(return_value=None)))
-
-    def _mock_ipdb_context_manager(self, netns):
-        mock_ipdb = mock.Mock(
-            interfaces={
-                'bridge': mock.Mock(
-                    __enter__=mock.Mock(return_value=self.m_bridge_iface),
-                    __exit__=mock.Mock(return_value=None),
-                    mtu=1,
-                ),
-                'c_interface': mock.Mock(
-                    __enter__=mock.Mock(return_value=self.m_c_iface),
-                    __exit__=mock.Mock(return_value=None),
-                ),
-                'h_interface': mock.Mock(
-                    __enter__=mock.Mock(return_value=self.m_h_iface),
-                    __exit__=mock.Mock(return_value=None),
-                ),
-            }
-        )
-        mock_exit = mock.Mock(return_value=None)
-        mock_ipdb.__exit__ = mock_exit
-        mock_ipdb.__enter__ = mock.Mock(return_value=mock_ipdb)
-        self.ipdbs[netns] = mock_ipdb
+        # Mock IPRoute handles of the netns'
+        self.indexes = {'bridge': 1, 'c_interface': 2, 'h_interface': 3}
+        self.iprs = {}
+        self.h_ipr = self._mock_iproute(None)
+        self.c_ipr = self._mock_iproute(self.netns)
 
-        return mock_ipdb, mock_exit
+    def _mock_iproute(self, netns):
+        def link_lookup(ifname):
+            return [self.indexes[ifname]] if ifname in self.indexes else []
+
+        def link(command, **kwargs):
+            if command == 'get':
+                index = self.indexes[kwargs['ifname']]
+                return [_nlmsg({'IFLA_MTU': 1}, index=index)]
+
+        ipr = mock.Mock()
+        ipr.link_lookup.side_effect = link_lookup
+        ipr.link.side_effect = link
+        self.iprs[netns] = ipr
+        return ipr
+
+    @contextlib.contextmanager
+    def _get_iproute(self, netns=None):
+        yield self.iprs[netns]
 
     @mock.patch('kuryr_kubernetes.cni.binding.base._need_configure_l3')
-    @mock.patch('kuryr_kubernetes.cni.binding.base.get_ipdb')
+    @mock.patch('kuryr_kubernetes.cni.binding.base.get_iproute')
     @mock.patch('os_vif.plug')
-    def _test_connect(self, m_vif_plug, m_get_ipdb, m_need_l3, report=None):
-        def get_ipdb(netns=None):
-            return self.ipdbs[netns]
-
-        m_get_ipdb.side_effect = get_ipdb
+    def _test_connect(self, m_vif_plug, m_get_iproute, m_need_l3,
+                      report=None):
+        m_get_iproute.side_effect = self._get_iproute
         m_need_l3.return_value = True
 
         base.connect(self.vif, self.instance_info, self.ifname, self.netns,
                      report)
         m_vif_plug.assert_called_once_with(self.vif, self.instance_info)
-        self.m_c_iface.add_ip.assert_called_once_with('192.168.0.2/24')
+        self.c_ipr.addr.assert_called_once_with(
+            'add', index=2, address='192.168.0.2', mask=24)
+        self.c_ipr.route.assert_called_once_with(
+            'add', gateway='192.168.0.1', dst='default')
         if report:
             report.assert_called_once()
 
-    @mock.patch('kuryr_kubernetes.cni.binding.base.get_ipdb')
+    @mock.patch('kuryr_kubernetes.cni.binding.base.get_iproute')
     @mock.patch('os_vif.unplug')
-    def _test_disconnect(self, m_vif_unplug, m_get_ipdb, report=None):
-        def get_ipdb(netns=None):
-            return self.ipdbs[netns]
-        m_get_ipdb.side_effect = get_ipdb
+    def _test_disconnect(self, m_vif_unplug, m_get_iproute, report=None):
+        m_get_iproute.side_effect = self._get_iproute
 
         base.disconnect(self.vif, self.instance_info, self.ifname, self.netns,
                         report)
@@ -129,17 +208,14 @@ class TestOpenVSwitchDriver(TestDriverMixin, test_base.TestCase):
     @mock.patch('kuryr_kubernetes.linux_net_utils.create_ovs_vif_port')
     def test_connect(self, mock_create_ovs, m_report):
         self._test_connect(report=m_report)
-        self.assertEqual(3, self.h_ipdb_exit.call_count)
-        self.assertEqual(2, self.c_ipdb_exit.call_count)
-        self.c_ipdb.create.assert_called_once_with(
-            ifname=self.ifname, peer='h_interface', kind='veth')
-        self.assertEqual(1, self.m_create.mtu)
-        self.assertEqual(str(self.vif.address),
-                         self.m_create.address)
-        self.m_create.up.assert_called_once_with()
-        self.assertEqual(123, self.m_h_iface.net_ns_pid)
-        self.assertEqual(1, self.m_h_iface.mtu)
-        self.m_h_iface.up.assert_called_once_with()
+        self.c_ipr.link.assert_has_calls([
+            mock.call('add', ifname=self.ifname, peer='h_interface',
+                      kind='veth'),
+            mock.call('set', index=2, mtu=1, address=str(self.vif.address)),
+            mock.call('set', index=2, state='up'),
+            mock.call('set', index=3, net_ns_pid=123)])
+        self.h_ipr.link.assert_called_with('set', index=3, mtu=1,
+                                           state='up')
 
         mock_create_ovs.assert_called_once_with(
             'bridge', 'h_interface', '89eccd45-43e9-43d8-b4cc-4c13db13f782',
@@ -162,21 +238,16 @@ class TestBridgeDriver(TestDriverMixin, test_base.TestCase):
     def test_connect(self):
         self._test_connect()
 
-        self.m_h_iface.remove.assert_called_once_with()
-
-        self.assertEqual(3, self.h_ipdb_exit.call_count)
-        self.assertEqual(2, self.c_ipdb_exit.call_count)
-        self.c_ipdb.create.assert_called_once_with(
-            ifname=self.ifname, peer='h_interface', kind='veth')
-        self.assertEqual(1, self.m_create.mtu)
-        self.assertEqual(str(self.vif.address),
-                         self.m_create.address)
-        self.m_create.up.assert_called_once_with()
-        self.assertEqual(123, self.m_h_iface.net_ns_pid)
-        self.assertEqual(1, self.m_h_iface.mtu)
-        self.m_h_iface.up.assert_called_once_with()
-
-        self.m_bridge_iface.add_port.assert_called_once_with('h_interface')
+        self.c_ipr.link.assert_has_calls([
+            mock.call('add', ifname=self.ifname, peer='h_interface',
+                      kind='veth'),
+            mock.call('set', index=2, mtu=1, address=str(self.vif.address)),
+            mock.call('set', index=2, state='up'),
+            mock.call('set', index=3, net_ns_pid=123)])
+        self.h_ipr.link.assert_has_calls([
+            mock.call('del', index=3),
+            mock.call('set', index=3, mtu=1, state='up'),
+            mock.call('set', index=3, master=1)])
 
     def test_disconnect(self):
         self._test_disconnect()
@@ -185,14 +256,18 @@ class TestBridgeDriver(TestDriverMixin, test_base.TestCase):
 class TestNestedDriver(TestDriverMixin, test_base.TestCase):
     def setUp(self):
         super(TestNestedDriver, self).setUp()
-        ifaces = {
-            'lo': {'flags': 0x8, 'ipaddr': (('127.0.0.1', 8),)},
-            'first': {'flags': 0, 'ipaddr': (('192.168.0.1', 8),)},
-            'kubelet': {'flags': 0, 'ipaddr': (('192.168.1.1', 8),)},
-            'bridge': {'flags': 0, 'ipaddr': (('192.168.2.1', 8),)},
-        }
-        self.h_ipdb = mock.Mock(interfaces=ifaces)
-        self.h_ipdb_loopback = mock.Mock(interfaces=ifaces)
+        self.h_ipr.get_links.return_value = [
+            _nlmsg({'IFLA_IFNAME': 'lo'}, index=1, flags=0x8),
+            _nlmsg({'IFLA_IFNAME': 'first'}, index=2, flags=0),
+            _nlmsg({'IFLA_IFNAME': 'kubelet'}, index=3, flags=0),
+            _nlmsg({'IFLA_IFNAME': 'bridge'}, index=4, flags=0),
+        ]
+        self.h_ipr.get_addr.return_value = [
+            _nlmsg({'IFA_ADDRESS': '127.0.0.1'}, index=1),
+            _nlmsg({'IFA_ADDRESS': '192.168.0.1'}, index=2),
+            _nlmsg({'IFA_ADDRESS': '192.168.1.1'}, index=3),
+            _nlmsg({'IFA_ADDRESS': '192.168.2.1'}, index=4),
+        ]
         self.sconn = collections.namedtuple(
             'sconn', ['fd', 'family', 'type', 'laddr', 'raddr', 'status',
                       'pid'])
@@ -203,7 +278,7 @@ class TestNestedDriver(TestDriverMixin, test_base.TestCase):
         driver = nested.NestedDriver()
         self.addCleanup(CONF.clear_override, 'link_iface', group='binding')
         CONF.set_override('link_iface', 'bridge', group='binding')
-        iface = driver._detect_iface_name(self.h_ipdb)
+        iface = driver._detect_iface_name(self.h_ipr)
         self.assertEqual('bridge', iface)
 
     @mock.patch.multiple(nested.NestedDriver, __abstractmethods__=set())
@@ -218,7 +293,7 @@ class TestNestedDriver(TestDriverMixin, test_base.TestCase):
             self.sconn(-1, 2, 2, laddr=self.addr(ip='192.168.1.1', port=10250),
                        raddr=(), status='LISTEN', pid=None),
         ]
-        iface = driver._detect_iface_name(self.h_ipdb)
+        iface = driver._detect_iface_name(self.h_ipr)
         self.assertEqual('kubelet', iface)
 
     @mock.patch.multiple(nested.NestedDriver, __abstractmethods__=set())
@@ -227,7 +302,7 @@ class TestNestedDriver(TestDriverMixin, test_base.TestCase):
         driver = nested.NestedDriver()
         m_net_connections.return_value = []
 
-        iface = driver._detect_iface_name(self.h_ipdb)
+        iface = driver._detect_iface_name(self.h_ipr)
         self.assertEqual('first', iface)
 
     @mock.patch.multiple(nested.NestedDriver, __abstractmethods__=set())
@@ -236,11 +311,11 @@ class TestNestedDriver(TestDriverMixin, test_base.TestCase):
         driver = nested.NestedDriver()
         m_net_connections.return_value = []
 
-        self.h_ipdb.interfaces = {
-            'lo': {'flags': 0x8, 'ipaddr': (('127.0.0.1', 8),)},
-        }
+        self.h_ipr.get_links.return_value = [
+            _nlmsg({'IFLA_IFNAME': 'lo'}, index=1, flags=0x8),
+        ]
         self.assertRaises(exceptions.CNIBindingFailure,
-                          driver._detect_iface_name, self.h_ipdb)
+                          driver._detect_iface_name, self.h_ipr)
 
 
 class TestNestedVlanDriver(TestDriverMixin, test_base.TestCase):
@@ -254,20 +329,71 @@ class TestNestedVlanDriver(TestDriverMixin, test_base.TestCase):
     def test_connect(self):
         self._test_connect()
 
-        self.assertEqual(2, self.h_ipdb_exit.call_count)
-        self.assertEqual(3, self.c_ipdb_exit.call_count)
-
-        self.assertEqual(self.ifname, self.m_h_iface.ifname)
-        self.assertEqual(1, self.m_h_iface.mtu)
-        self.assertEqual(str(self.vif.address), self.m_h_iface.address)
-        self.m_h_iface.up.assert_called_once_with()
+        self.h_ipr.link.assert_has_calls([
+            mock.call('del', index=3),
+            mock.call('get', ifname='bridge'),
+            mock.call('add', ifname='h_interface', link=1, kind='vlan',
+                      vlan_id=7),
+            mock.call('set', index=3, net_ns_fd=self.netns)])
+        self.c_ipr.link.assert_has_calls([
+            mock.call('set', index=3, ifname=self.ifname, mtu=1,
+                      address=str(self.vif.address)),
+            mock.call('set', index=3, state='up')])
 
     def test_connect_mtu_mismatch(self):
         self.vif.network.mtu = 2
         self.assertRaises(exceptions.CNIBindingFailure, self._test_connect)
 
+    @mock.patch('kuryr_kubernetes.cni.binding.nested.VlanDriver.'
+                '_cleanup_conflicting_vlan')
+    def test_connect_vlan_conflict(self, m_cleanup):
+        links = []
+
+        def link(command, **kwargs):
+            if command == 'get':
+                return [_nlmsg({'IFLA_MTU': 1}, index=1)]
+            if command == 'add':
+                links.append(kwargs)
+                if len(links) == 1:
+                    raise pyroute2.NetlinkError(errno.EEXIST)
+
+        self.h_ipr.link.side_effect = link
+        self._test_connect()
+
+        m_cleanup.assert_called_once_with(self.netns, 7)
+        self.assertEqual(2, len(links))
+
     def test_disconnect(self):
         self._test_disconnect()
+        self.c_ipr.link.assert_has_calls([mock.call('del', index=3),
+                                          mock.call('del', index=2)])
+
+    @mock.patch('os.stat')
+    @mock.patch('os.listdir')
+    @mock.patch('kuryr_kubernetes.cni.binding.base.get_iproute')
+    def test_cleanup_conflicting_vlan(self, m_get_iproute, m_listdir,
+                                      m_stat):
+        def vlan(index, vlan_id, link):
+            info_data = _nlmsg({'IFLA_VLAN_ID': vlan_id})
+            link_info = _nlmsg({'IFLA_INFO_KIND': 'vlan',
+                                'IFLA_INFO_DATA': info_data})
+            return _nlmsg({'IFLA_IFNAME': 'eth0', 'IFLA_LINK': link,
+                           'IFLA_LINKINFO': link_info}, index=index)
+
+        netns = '/var/run/netns/a'
+        other_ipr = self._mock_iproute('/var/run/netns/b')
+        self.c_ipr.get_links.return_value = [
+            _nlmsg({'IFLA_IFNAME': 'lo'}, index=1), vlan(2, 8, 1)]
+        other_ipr.get_links.return_value = [vlan(5, 7, 4), vlan(6, 7, 1)]
+        self.iprs[netns] = self.c_ipr
+        m_get_iproute.side_effect = self._get_iproute
+        m_listdir.return_value = ['a', 'b']
+        m_stat.side_effect = lambda path: mock.Mock(st_dev=1, st_ino=path)
+
+        nested.VlanDriver()._cleanup_conflicting_vlan(netns, 7)
+
+        self.c_ipr.link.assert_not_called()
+        other_ipr.link.assert_called_once_with('del', index=6)
 
 
 class TestNestedMacvlanDriver(TestDriverMixin, test_base.TestCase):
@@ -280,13 +406,14 @@ class TestNestedMacvlanDriver(TestDriverMixin, test_base.TestCase):
     def test_connect(self):
         self._test_connect()
 
-        self.assertEqual(2, self.h_ipdb_exit.call_count)
-        self.assertEqual(3, self.c_ipdb_exit.call_count)
-
-        self.assertEqual(self.ifname, self.m_h_iface.ifname)
-        self.assertEqual(1, self.m_h_iface.mtu)
-        self.assertEqual(str(self.vif.address), self.m_h_iface.address)
-        self.m_h_iface.up.assert_called_once_with()
+        self.h_ipr.link.assert_has_calls([
+            mock.call('add', ifname='h_interface', link=1, kind='macvlan',
+                      macvlan_mode='bridge'),
+            mock.call('set', index=3, net_ns_fd=self.netns)])
+        self.c_ipr.link.assert_has_calls([
+            mock.call('set', index=3, ifname=self.ifname, mtu=1,
+                      address=str(self.vif.address)),
+            mock.call('set', index=3, state='up')])
 
     def test_connect_mtu_mismatch(self):
         self.vif.network.mtu = 2
@@ -512,6 +639,10 @@ class TestVHostUserDriver(TestDriverMixin, test_base.TestCase):
         self.vif.address = '64:0f:2b:5f:0c:1c'
         self.port_name = vhostuser._get_vhostuser_port_name(self.vif)
         self.cont_id = uuidutils.generate_uuid()
+        m_get_iproute = mock.patch.object(base, 'get_iproute',
+                                          self._get_iproute)
+        m_get_iproute.start()
+        self.addCleanup(m_get_iproute.stop)
 
     @mock.patch('kuryr_kubernetes.cni.binding.base._need_configure_l3')
     @mock.patch('kuryr_kubernetes.cni.plugins.k8s_cni_registry.'
@@ -0,0 +1,186 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from io import StringIO
+import json
+import socket
+import subprocess
+import sys
+from unittest import mock
+
+from os_vif import objects as osv_objects
+from oslo_serialization import jsonutils
+
+from kuryr_kubernetes.cni import api
+from kuryr_kubernetes.cni import client
+from kuryr_kubernetes import constants as k_const
+from kuryr_kubernetes.tests import base as test_base
+from kuryr_kubernetes.tests import fake
+
+
+class TestCNIClient(test_base.TestCase):
+    def setUp(self):
+        super(TestCNIClient, self).setUp()
+        self.env = {
+            'CNI_COMMAND': 'ADD',
+            'CNI_CONTAINERID': 'a4181c680a39',
+            'CNI_ARGS': 'foo=bar',
+            'CNI_IFNAME': 'eth0',
+            'PATH': '/usr/bin',
+        }
+        self.conf = {'daemon_socket': '/run/kuryr/cni.sock'}
+
+    def _set_response(self, m_get_conn, status, body=b''):
+        m_resp = mock.Mock(status=status, reason='Reason')
+        m_resp.read.return_value = body
+        m_get_conn.return_value.getresponse.return_value = m_resp
+        return m_get_conn.return_value
+
+    def _expected_vif_data(self, vif):
+        # kuryr-cni serializes the IPAddress objects on output.
+        return jsonutils.loads(jsonutils.dumps(
+            api.CNIDaemonizedRunner()._vif_data(vif, self.env)))
+
+    def _run(self, command):
+        self.env['CNI_COMMAND'] = command
+        fout = StringIO()
+        code = client._run(self.env, self.conf, fout)
+        return code, json.loads(fout.getvalue() or 'null')
+
+    def test_get_connection_socket(self):
+        conn = client._get_connection(self.conf)
+
+        self.assertIsInstance(conn, client.UnixDomainHttpConnection)
+        self.assertEqual('/run/kuryr/cni.sock', conn._unix_socket_path)
+
+    def test_get_connection_address(self):
+        conn = client._get_connection({'daemon_address': '10.0.0.1:5037'})
+
+        self.assertNotIsInstance(conn, client.UnixDomainHttpConnection)
+        self.assertEqual(('10.0.0.1', 5037), (conn.host, conn.port))
+
+    def test_get_connection_default(self):
+        conn = client._get_connection({})
+
+        self.assertEqual(('127.0.0.1', 5036), (conn.host, conn.port))
+
+    def test_vif_data(self):
+        vif = fake._fake_vif()
+        vif.network.subnets.objects[0].routes.objects.append(
+            osv_objects.route.Route(cidr='10.0.0.0/8', gateway='192.168.0.3'))
+        primitive = json.loads(json.dumps(vif.obj_to_primitive()))
+
+        self.assertEqual(self._expected_vif_data(vif),
+                         client._vif_data(primitive, self.env))
+
+    @mock.patch.object(client, '_get_connection')
+    def test_run_add(self, m_get_conn):
+        vif = fake._fake_vif()
+        m_conn = self._set_response(
+            m_get_conn, 202, json.dumps(vif.obj_to_primitive()).encode())
+
+        code, result = self._run('ADD')
+
+        self.assertEqual(0, code)
+        self.assertEqual(client.CNI_VERSION, result.pop('cniVersion'))
+        self.assertEqual(self._expected_vif_data(vif), result)
+        m_conn.request.assert_called_once_with(
+            'POST', '/addNetwork', body=mock.ANY, headers=mock.ANY)
+        params = json.loads(m_conn.request.call_args[1]['body'])
+        self.assertNotIn('PATH', params)
+        self.assertEqual(self.conf, params['config_kuryr'])
+        m_conn.close.assert_called_once_with()
+
+    @mock.patch.object(client, '_get_connection')
+    def test_run_del(self, m_get_conn):
+        m_conn = self._set_response(m_get_conn, 204)
+
+        code, result = self._run('DEL')
+
+        self.assertEqual(0, code)
+        self.assertIsNone(result)
+        m_conn.request.assert_called_once_with(
+            'POST', '/delNetwork', body=mock.ANY, headers=mock.ANY)
+
+    @mock.patch.object(client, '_get_connection')
+    def test_run_version(self, m_get_conn):
+        code, result = self._run('VERSION')
+
+        self.assertEqual(0, code)
+        self.assertEqual(client.SUPPORTED_VERSIONS,
+                         result['supportedVersions'])
+        self.assertEqual(api.CNIRunner.SUPPORTED_VERSIONS,
+                         client.SUPPORTED_VERSIONS)
+        m_get_conn.assert_not_called()
+
+    @mock.patch.object(client, '_get_connection')
+    def test_run_check(self, m_get_conn):
+        code, result = self._run('CHECK')
+
+        self.assertEqual(0, code)
+        self.assertIsNone(result)
+        m_get_conn.assert_not_called()
+
+    def test_run_invalid(self):
+        code, result = self._run('INVALID')
+
+        self.assertEqual(1, code)
+        self.assertEqual(k_const.CNI_EXCEPTION_CODE, result['code'])
+
+    @mock.patch.object(client, '_get_connection')
+    def test_run_daemon_error(self, m_get_conn):
+        error = {'code': k_const.CNI_TIMEOUT_CODE, 'msg': 'Try again later.'}
+        self._set_response(m_get_conn, 503, json.dumps(error).encode())
+
+        code, result = self._run('ADD')
+
+        self.assertEqual(1, code)
+        self.assertEqual(client.CNI_VERSION, result.pop('cniVersion'))
+        self.assertEqual(error, result)
+
+    @mock.patch.object(client, '_get_connection')
+    def test_run_invalid_status(self, m_get_conn):
+        self._set_response(m_get_conn, 500, b'Internal Server Error')
+
+        code, result = self._run('DEL')
+
+        self.assertEqual(1, code)
+        self.assertEqual(k_const.CNI_EXCEPTION_CODE, result['code'])
+        self.assertEqual('500 Reason', result['details'])
+
+    @mock.patch.object(client, '_get_connection')
+    def test_run_timeout(self, m_get_conn):
+        m_get_conn.return_value.getresponse.side_effect = socket.timeout
+
+        code, result = self._run('ADD')
+
+        self.assertEqual(1, code)
+        self.assertEqual(k_const.CNI_TIMEOUT_CODE, result['code'])
+        m_get_conn.return_value.close.assert_called_once_with()
+
+    @mock.patch.object(client, '_get_connection')
+    def test_run_connection_error(self, m_get_conn):
+        m_get_conn.return_value.request.side_effect = ConnectionRefusedError
+
+        code, result = self._run('ADD')
+
+        self.assertEqual(1, code)
+        self.assertEqual(k_const.CNI_EXCEPTION_CODE, result['code'])
+
+    def test_imports(self):
+        code = ('import sys; import kuryr_kubernetes.cni.client; '
+                'print(" ".join(sorted(sys.modules)))')
+        modules = subprocess.check_output([sys.executable, '-c', code],
+                                          universal_newlines=True).split()
+
+        for module in ('oslo_config', 'oslo_log', 'os_vif', 'requests'):
+            self.assertNotIn(module, modules)
@@ -58,11 +58,11 @@ class TestCNIHealthServer(base.TestCase):
         resp = self.test_client.get('/ready')
         self.assertEqual(500, resp.status_code)
 
-    @mock.patch('pyroute2.IPDB.release')
-    def test_liveness_status(self, m_ipdb):
+    @mock.patch('pyroute2.IPRoute.get_links')
+    def test_liveness_status(self, m_get_links):
         self.srv._components_healthy.value = True
         resp = self.test_client.get('/alive')
-        m_ipdb.assert_called()
+        m_get_links.assert_called()
         self.assertEqual(200, resp.status_code)
 
     def test_liveness_status_components_error(self):
@@ -70,9 +70,9 @@ class TestCNIHealthServer(base.TestCase):
         resp = self.test_client.get('/alive')
         self.assertEqual(500, resp.status_code)
 
-    @mock.patch('pyroute2.IPDB.release')
-    def test_liveness_status_ipdb_error(self, m_ipdb):
-        m_ipdb.side_effect = Exception
+    @mock.patch('pyroute2.IPRoute.get_links')
+    def test_liveness_status_netlink_error(self, m_get_links):
+        m_get_links.side_effect = Exception
         resp = self.test_client.get('/alive')
         self.assertEqual(500, resp.status_code)
 
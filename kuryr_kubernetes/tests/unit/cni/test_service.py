@@ -12,10 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import threading
+import time
 from unittest import mock
 
+import fixtures
 from oslo_serialization import jsonutils
 
+from kuryr_kubernetes.cni import client
 from kuryr_kubernetes.cni.daemon import service
 from kuryr_kubernetes.cni.plugins import k8s_cni_registry
 from kuryr_kubernetes import exceptions
@@ -29,7 +34,8 @@ class TestDaemonServer(base.TestCase):
         super(TestDaemonServer, self).setUp()
         healthy = mock.Mock()
         self.k8s_mock = self.useFixture(kuryr_fixtures.MockK8sClient())
-        self.plugin = k8s_cni_registry.K8sCNIRegistryPlugin({}, healthy)
+        self.plugin = k8s_cni_registry.K8sCNIRegistryPlugin(
+            k8s_cni_registry.Registry(), healthy)
         self.health_registry = mock.Mock()
         self.srv = service.DaemonServer(self.plugin, self.health_registry)
 
@@ -53,6 +59,45 @@ class TestDaemonServer(base.TestCase):
             fake._fake_vif_string(vif.obj_to_primitive()).encode(), resp.data)
         self.assertEqual(202, resp.status_code)
 
+    @mock.patch('kuryr_kubernetes.cni.metrics.CNI_REQUEST_TIME')
+    @mock.patch('kuryr_kubernetes.cni.plugins.k8s_cni_registry.'
+                'K8sCNIRegistryPlugin.add')
+    def test_add_request_time(self, m_add, m_request_time):
+        m_add.side_effect = Exception
+
+        self.test_client.post('/addNetwork', data=self.params_str,
+                              content_type='application/json')
+
+        m_request_time.labels.assert_called_once_with('ADD')
+        m_request_time.labels().observe.assert_called_once()
+
+    @mock.patch('kuryr_kubernetes.cni.metrics.CNI_QUEUE_TIME')
+    @mock.patch('kuryr_kubernetes.cni.plugins.k8s_cni_registry.'
+                'K8sCNIRegistryPlugin.add')
+    def test_add_queue_time(self, m_add, m_queue_time):
+        m_add.return_value = fake._fake_vif()
+
+        self.test_client.post('/addNetwork', data=self.params_str,
+                              content_type='application/json')
+
+        m_queue_time.labels.assert_called_once_with('ADD')
+        m_queue_time.labels().observe.assert_called_once()
+
+    @mock.patch('kuryr_kubernetes.cni.plugins.k8s_cni_registry.'
+                'K8sCNIRegistryPlugin.add')
+    def test_add_queue_full(self, m_add):
+        self.srv._queue = mock.Mock()
+        self.srv._queue.admit.side_effect = exceptions.CNIRequestQueueFull
+
+        resp = self.test_client.post('/addNetwork', data=self.params_str,
+                                     content_type='application/json')
+
+        self.srv._queue.admit.assert_called_once_with(True)
+        m_add.assert_not_called()
+        self.assertEqual(503, resp.status_code)
+        self.assertEqual(service.ErrTryAgainLater,
+                         jsonutils.loads(resp.data)['code'])
+
     @mock.patch('kuryr_kubernetes.cni.plugins.k8s_cni_registry.'
                 'K8sCNIRegistryPlugin.add')
     def test_add_timeout(self, m_add):
@@ -104,18 +149,88 @@ class TestDaemonServer(base.TestCase):
         m_delete.assert_called_once_with(mock.ANY)
         self.assertEqual(500, resp.status_code)
 
+    @mock.patch('kuryr_kubernetes.cni.plugins.k8s_cni_registry.'
+                'K8sCNIRegistryPlugin.delete')
+    def test_socket_server(self, m_delete):
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            'cni.sock')
+        # Stale socket left by a previous run.
+        open(path, 'w').close()
+        self.srv._start_socket_server(path)
+        self.addCleanup(self.srv.stop)
 
-class TestCNIDaemonWatcherService(base.TestCase):
+        conf = {'daemon_socket': path}
+        data = client._make_request(conf, 'delNetwork',
+                                    jsonutils.loads(self.params_str), 204)
+
+        self.assertEqual(b'', data)
+        m_delete.assert_called_once_with(mock.ANY)
+
+
+class TestAdmissionQueue(base.TestCase):
     def setUp(self):
-        super(TestCNIDaemonWatcherService, self).setUp()
-        self.registry = {}
+        super(TestAdmissionQueue, self).setUp()
+        self.queue = service.AdmissionQueue(1, 1)
+
+    def _admit(self, name, admitted, release, bounded=True):
+        with self.queue.admit(bounded):
+            admitted.append(name)
+            release.wait()
+
+    def _start(self, name, admitted, release, bounded=True):
+        thread = threading.Thread(target=self._admit,
+                                  args=(name, admitted, release, bounded))
+        thread.start()
+        self.addCleanup(thread.join)
+        return thread
+
+    def _wait_for_waiting(self, count):
+        for _ in range(100):
+            if len(self.queue._waiting) == count:
+                return
+            time.sleep(0.01)
+        self.fail('Requests not queued')
+
+    def test_admit_in_order(self):
+        admitted = []
+        releases = [threading.Event() for _ in range(3)]
+        threads = [self._start(0, admitted, releases[0])]
+        self._wait_for_waiting(0)
+        threads.append(self._start(1, admitted, releases[1]))
+        self._wait_for_waiting(1)
+        threads.append(self._start(2, admitted, releases[2], bounded=False))
+        self._wait_for_waiting(2)
+        self.assertEqual([0], admitted)
+
+        for i, release in enumerate(releases):
+            release.set()
+            threads[i].join()
+        self.assertEqual([0, 1, 2], admitted)
+
+    def test_admit_queue_full(self):
+        admitted = []
+        release = threading.Event()
+        self._start(0, admitted, release)
+        self._wait_for_waiting(0)
+        self._start(1, admitted, release)
+        self.addCleanup(release.set)
+        self._wait_for_waiting(1)
+
+        self.assertRaises(exceptions.CNIRequestQueueFull,
+                          self.queue.admit(bounded=True).__enter__)
+        self.assertEqual(1, self.queue._bounded_waiting)
+
+
+class TestCNIDaemonWatcher(base.TestCase):
+    def setUp(self):
+        super(TestCNIDaemonWatcher, self).setUp()
+        self.registry = k8s_cni_registry.Registry()
         self.pod = {'metadata': {'namespace': 'testing',
                                  'name': 'default'},
                     'vif_unplugged': False,
                     'del_receieved': False}
-        self.healthy = mock.Mock()
-        self.watcher = service.CNIDaemonWatcherService(
-            0, self.registry, self.healthy)
+        self.healthy = mock.MagicMock()
+        self.watcher = service.CNIDaemonWatcher(self.registry, self.healthy)
 
     @mock.patch('oslo_concurrency.lockutils.lock')
     def test_on_deleted(self, m_lock):
@@ -134,3 +249,34 @@ class TestCNIDaemonWatcherService(base.TestCase):
         self.watcher.on_deleted(pod)
         self.assertIn(pod_name, self.registry)
         self.assertIs(True, pod['del_received'])
+
+    @mock.patch('oslo_concurrency.lockutils.lock')
+    def test_on_done(self, m_lock):
+        kp = {'metadata': {'namespace': 'testing', 'name': 'default',
+                           'uid': 'uid'}}
+        vifs = {'eth0': mock.Mock(active=False)}
+        self.watcher.on_done(kp, vifs)
+        self.assertIs(vifs, self.registry['testing/default']['vifs'])
+
+        entry = self.registry['testing/default']
+        entry['containerid'] = 'cont_id'
+        active_vifs = {'eth0': mock.Mock(active=True)}
+        self.watcher.on_done(kp, active_vifs)
+        self.assertIs(entry, self.registry['testing/default'])
+        self.assertIs(active_vifs, entry['vifs'])
+        self.assertEqual('cont_id', entry['containerid'])
+        m_lock.assert_called_with('testing/default')
+
+    @mock.patch('threading.Thread', mock.Mock())
+    @mock.patch('kuryr_kubernetes.watcher.Watcher')
+    def test_run_watcher_stopped(self, m_watcher):
+        self.watcher.run()
+        m_watcher.return_value.start.assert_called_once()
+        self.assertIs(False, self.healthy.value)
+
+    @mock.patch('threading.Thread', mock.Mock())
+    @mock.patch('kuryr_kubernetes.watcher.Watcher')
+    def test_run_terminated(self, m_watcher):
+        m_watcher.return_value.start.side_effect = self.watcher.terminate
+        self.watcher.run()
+        self.assertNotEqual(False, self.healthy.value)
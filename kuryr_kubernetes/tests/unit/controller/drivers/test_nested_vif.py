@@ -39,7 +39,23 @@ class TestNestedPodVIFDriver(test_base.TestCase):
         m_driver._get_parent_port_by_host_ip.return_value = parent_port
 
         cls._get_parent_port(m_driver, pod)
-        m_driver._get_parent_port_by_host_ip.assert_called_once()
+        m_driver._get_host_ip.assert_called_once_with(pod)
+        m_driver._get_parent_port_by_host_ip.assert_called_once_with(
+            m_driver._get_host_ip.return_value)
+
+    def test_get_host_ip(self):
+        cls = nested_vif.NestedPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        pod = {'status': {'hostIP': '10.0.0.1'}}
+
+        self.assertEqual('10.0.0.1', cls._get_host_ip(m_driver, pod))
+
+    def test_get_host_ip_missing(self):
+        cls = nested_vif.NestedPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        pod = {'status': {'conditions': [{'type': 'PodScheduled'}]}}
+
+        self.assertRaises(KeyError, cls._get_host_ip, m_driver, pod)
 
     def test_get_parent_port_by_host_ip(self):
         cls = nested_vif.NestedPodVIFDriver
@@ -10,6 +10,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import fixtures
 import munch
 from unittest import mock
 
@@ -40,7 +41,6 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         subnets = mock.sentinel.subnets
         security_groups = mock.sentinel.security_groups
 
-        parent_port = mock.sentinel.parent_port
         trunk_id = mock.sentinel.trunk_id
         port_id = mock.sentinel.port_id
         port = munch.Munch({'id': port_id})
@@ -54,18 +54,15 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         vif = mock.Mock()
 
         m_to_vif.return_value = vif
-        m_driver._get_parent_port.return_value = parent_port
-        m_driver._get_trunk_id.return_value = trunk_id
+        m_driver._get_pod_trunk_id.return_value = trunk_id
         m_driver._get_port_request.return_value = port_request
         m_driver._add_subport.return_value = vlan_id
-        os_net.ports.return_value = (p for p in [parent_port])
         os_net.create_port.return_value = port
 
         self.assertEqual(vif, cls.request_vif(m_driver, pod, project_id,
                                               subnets, security_groups))
 
-        m_driver._get_parent_port.assert_called_once_with(pod)
-        m_driver._get_trunk_id.assert_called_once_with(parent_port)
+        m_driver._get_pod_trunk_id.assert_called_once_with(pod)
         m_driver._get_port_request.assert_called_once_with(
             pod, project_id, subnets, security_groups)
         os_net.create_port.assert_called_once_with(**port_request)
@@ -86,7 +83,6 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         security_groups = mock.sentinel.security_groups
         num_ports = 2
 
-        parent_port = mock.sentinel.parent_port
         trunk_id = mock.sentinel.trunk_id
         port_request = mock.sentinel.port_request
         subports_info = [{'segmentation_id': 1,
@@ -100,18 +96,18 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
 
         bulk_rq = {'ports': [port_request for _ in range(len(subports_info))]}
 
-        m_driver._get_parent_port.return_value = parent_port
-        m_driver._get_trunk_id.return_value = trunk_id
+        m_driver._get_pod_trunk_id.return_value = trunk_id
         m_driver._create_subports_info.return_value = (port_request,
                                                        subports_info)
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
         os_net.create_ports.return_value = (p for p in [port, port])
         m_to_vif.return_value = vif
 
         self.assertEqual([vif, vif], cls.request_vifs(
             m_driver, pod, project_id, subnets, security_groups, num_ports))
 
-        m_driver._get_parent_port.assert_called_once_with(pod)
-        m_driver._get_trunk_id.assert_called_once_with(parent_port)
+        m_driver._get_pod_trunk_id.assert_called_once_with(pod)
         m_driver._create_subports_info.assert_called_once_with(
             pod, project_id, subnets, security_groups, trunk_id, num_ports,
             unbound=True)
@@ -119,6 +115,9 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         os_net.add_trunk_subports.assert_called_once_with(trunk_id,
                                                           subports_info)
         os_net.delete_port.assert_not_called()
+        m_driver._vlan_ids.confirm.assert_called_once_with(trunk_id, [1, 2])
+        m_driver._trunks.add_subports.assert_called_once_with(
+            trunk_id, [port.id, port.id])
 
         calls = [mock.call(port, subnets, info['segmentation_id'])
                  for info in subports_info]
@@ -136,13 +135,11 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         security_groups = mock.sentinel.security_groups
         num_ports = 2
 
-        parent_port = mock.sentinel.parent_port
         trunk_id = mock.sentinel.trunk_id
         port_request = mock.sentinel.port_request
         subports_info = []
 
-        m_driver._get_parent_port.return_value = parent_port
-        m_driver._get_trunk_id.return_value = trunk_id
+        m_driver._get_pod_trunk_id.return_value = trunk_id
         m_driver._create_subports_info.return_value = (port_request,
                                                        subports_info)
 
@@ -150,8 +147,7 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
                                               subnets, security_groups,
                                               num_ports))
 
-        m_driver._get_parent_port.assert_called_once_with(pod)
-        m_driver._get_trunk_id.assert_called_once_with(parent_port)
+        m_driver._get_pod_trunk_id.assert_called_once_with(pod)
         m_driver._create_subports_info.assert_called_once_with(
             pod, project_id, subnets, security_groups,
             trunk_id, num_ports, unbound=True)
@@ -168,7 +164,6 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         security_groups = mock.sentinel.security_groups
         num_ports = 2
 
-        parent_port = mock.sentinel.parent_port
         trunk_id = mock.sentinel.trunk_id
         port_request = mock.sentinel.port_request
         subports_info = [{'segmentation_id': 1,
@@ -180,8 +175,7 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
 
         bulk_rq = {'ports': [port_request for _ in range(len(subports_info))]}
 
-        m_driver._get_parent_port.return_value = parent_port
-        m_driver._get_trunk_id.return_value = trunk_id
+        m_driver._get_pod_trunk_id.return_value = trunk_id
         m_driver._create_subports_info.return_value = (port_request,
                                                        subports_info)
         os_net.create_ports.side_effect = os_exc.SDKException
@@ -190,8 +184,7 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
             os_exc.SDKException, cls.request_vifs,
             m_driver, pod, project_id, subnets, security_groups, num_ports)
 
-        m_driver._get_parent_port.assert_called_once_with(pod)
-        m_driver._get_trunk_id.assert_called_once_with(parent_port)
+        m_driver._get_pod_trunk_id.assert_called_once_with(pod)
         m_driver._create_subports_info.assert_called_once_with(
             pod, project_id, subnets, security_groups,
             trunk_id, num_ports, unbound=True)
@@ -209,7 +202,6 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         security_groups = mock.sentinel.security_groups
         num_ports = 2
 
-        parent_port = mock.sentinel.parent_port
         trunk_id = mock.sentinel.trunk_id
         port_request = mock.sentinel.port_request
         subports_info = [{'segmentation_id': 1,
@@ -222,18 +214,18 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
 
         bulk_rq = {'ports': [port_request for _ in range(len(subports_info))]}
 
-        m_driver._get_parent_port.return_value = parent_port
-        m_driver._get_trunk_id.return_value = trunk_id
+        m_driver._get_pod_trunk_id.return_value = trunk_id
         m_driver._create_subports_info.return_value = (port_request,
                                                        subports_info)
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
         os_net.create_ports.return_value = (p for p in [port, port])
         os_net.add_trunk_subports.side_effect = os_exc.ConflictException
 
         self.assertEqual([], cls.request_vifs(m_driver, pod, project_id,
                          subnets, security_groups, num_ports))
 
-        m_driver._get_parent_port.assert_called_once_with(pod)
-        m_driver._get_trunk_id.assert_called_once_with(parent_port)
+        m_driver._get_pod_trunk_id.assert_called_once_with(pod)
         m_driver._create_subports_info.assert_called_once_with(
             pod, project_id, subnets, security_groups,
             trunk_id, num_ports, unbound=True)
@@ -241,6 +233,9 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         os_net.add_trunk_subports.assert_called_once_with(trunk_id,
                                                           subports_info)
         os_net.delete_port.assert_called_with(port['id'])
+        m_driver._vlan_ids.release.assert_called_once_with(trunk_id, [1, 2])
+        m_driver._vlan_ids.invalidate.assert_called_once_with(trunk_id)
+        m_driver._vlan_ids.confirm.assert_not_called()
 
     def test_request_vifs_trunk_subports_exception(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
@@ -254,7 +249,6 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         security_groups = mock.sentinel.security_groups
         num_ports = 2
 
-        parent_port = mock.sentinel.parent_port
         trunk_id = mock.sentinel.trunk_id
         port_request = mock.sentinel.port_request
         subports_info = [{'segmentation_id': 1,
@@ -267,18 +261,18 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
 
         bulk_rq = {'ports': [port_request for _ in range(len(subports_info))]}
 
-        m_driver._get_parent_port.return_value = parent_port
-        m_driver._get_trunk_id.return_value = trunk_id
+        m_driver._get_pod_trunk_id.return_value = trunk_id
         m_driver._create_subports_info.return_value = (port_request,
                                                        subports_info)
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
         os_net.create_ports.return_value = (p for p in [port, port])
         os_net.add_trunk_subports.side_effect = os_exc.SDKException
 
         self.assertEqual([], cls.request_vifs(m_driver, pod, project_id,
                          subnets, security_groups, num_ports))
 
-        m_driver._get_parent_port.assert_called_once_with(pod)
-        m_driver._get_trunk_id.assert_called_once_with(parent_port)
+        m_driver._get_pod_trunk_id.assert_called_once_with(pod)
         m_driver._create_subports_info.assert_called_once_with(
             pod, project_id, subnets, security_groups,
             trunk_id, num_ports, unbound=True)
@@ -286,35 +280,34 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         os_net.add_trunk_subports.assert_called_once_with(trunk_id,
                                                           subports_info)
         os_net.delete_port.assert_called_with(port['id'])
+        m_driver._vlan_ids.release.assert_called_once_with(trunk_id, [1, 2])
+        m_driver._vlan_ids.invalidate.assert_not_called()
 
     def test_release_vif(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
         m_driver = mock.Mock(spec=cls)
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
-        parent_port = mock.sentinel.parent_port
         trunk_id = mock.sentinel.trunk_id
 
-        m_driver._get_parent_port.return_value = parent_port
-        m_driver._get_trunk_id.return_value = trunk_id
+        m_driver._get_pod_trunk_id.return_value = trunk_id
         pod = mock.sentinel.pod
         vif = mock.Mock()
 
         cls.release_vif(m_driver, pod, vif)
 
-        m_driver._get_parent_port.assert_called_once_with(pod)
-        m_driver._get_trunk_id.assert_called_once_with(parent_port)
+        m_driver._get_pod_trunk_id.assert_called_once_with(pod)
         m_driver._remove_subport.assert_called_once_with(trunk_id, vif.id)
+        m_driver._release_vlan_id.assert_called_once_with(trunk_id,
+                                                          vif.vlan_id)
         os_net.delete_port.assert_called_once_with(vif.id)
 
     def test_release_vif_not_found(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
         m_driver = mock.Mock(spec=cls)
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
-        parent_port = mock.sentinel.parent_port
         trunk_id = mock.sentinel.trunk_id
 
-        m_driver._get_parent_port.return_value = parent_port
-        m_driver._get_trunk_id.return_value = trunk_id
+        m_driver._get_pod_trunk_id.return_value = trunk_id
         pod = mock.sentinel.pod
         vlan_id = mock.sentinel.vlan_id
         vif = mock.Mock()
@@ -323,8 +316,7 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
 
         cls.release_vif(m_driver, pod, vif)
 
-        m_driver._get_parent_port.assert_called_once_with(pod)
-        m_driver._get_trunk_id.assert_called_once_with(parent_port)
+        m_driver._get_pod_trunk_id.assert_called_once_with(pod)
         m_driver._remove_subport.assert_called_once_with(trunk_id, vif.id)
         os_net.delete_port.assert_called_once_with(vif.id)
 
@@ -402,8 +394,7 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
                                     m_get_network_id, m_get_port_name,
                                     unbound=True)
 
-    @mock.patch('kuryr.lib.segmentation_type_drivers.allocate_segmentation_id')
-    def test__create_subports_info(self, m_allocate_seg_id):
+    def test__create_subports_info(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
         m_driver = mock.Mock(spec=cls)
 
@@ -413,16 +404,14 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         security_groups = mock.sentinel.security_groups
         trunk_id = mock.sentinel.trunk_id
         num_ports = 2
-        in_use_vlan = set([1])
         port = mock.sentinel.port
         subports_info = [{'segmentation_id': i + 2,
                           'port_id': '',
                           'segmentation_type': 'vlan'}
                          for i in range(num_ports)]
 
-        m_driver._get_in_use_vlan_ids_set.return_value = in_use_vlan
         m_driver._get_port_request.return_value = port
-        m_allocate_seg_id.side_effect = [2, 3]
+        m_driver._get_vlan_id.side_effect = [2, 3]
 
         port_res, subports_res = cls._create_subports_info(
             m_driver, pod, project_id, subnets, security_groups, trunk_id,
@@ -431,13 +420,11 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         self.assertEqual(port_res, port)
         self.assertEqual(subports_res, subports_info)
 
-        m_driver._get_in_use_vlan_ids_set.assert_called_once_with(trunk_id)
         m_driver._get_port_request.assert_called_once_with(
             pod, project_id, subnets, security_groups, False)
-        self.assertEqual(m_allocate_seg_id.call_count, 2)
+        m_driver._get_vlan_id.assert_has_calls([mock.call(trunk_id)] * 2)
 
-    @mock.patch('kuryr.lib.segmentation_type_drivers.allocate_segmentation_id')
-    def test__create_subports_info_not_enough_vlans(self, m_allocate_seg_id):
+    def test__create_subports_info_not_enough_vlans(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
         m_driver = mock.Mock(spec=cls)
 
@@ -447,15 +434,13 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         security_groups = mock.sentinel.security_groups
         trunk_id = mock.sentinel.trunk_id
         num_ports = 2
-        in_use_vlan = set([1])
         port = mock.sentinel.port
         subports_info = [{'segmentation_id': 2,
                           'port_id': '',
                           'segmentation_type': 'vlan'}]
 
-        m_driver._get_in_use_vlan_ids_set.return_value = in_use_vlan
         m_driver._get_port_request.return_value = port
-        m_allocate_seg_id.side_effect = [
+        m_driver._get_vlan_id.side_effect = [
             2, kl_exc.SegmentationIdAllocationFailure
         ]
 
@@ -466,13 +451,11 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         self.assertEqual(port_res, port)
         self.assertEqual(subports_res, subports_info)
 
-        m_driver._get_in_use_vlan_ids_set.assert_called_once_with(trunk_id)
         m_driver._get_port_request.assert_called_once_with(
             pod, project_id, subnets, security_groups, False)
-        self.assertEqual(m_allocate_seg_id.call_count, 2)
+        m_driver._get_vlan_id.assert_has_calls([mock.call(trunk_id)] * 2)
 
-    @mock.patch('kuryr.lib.segmentation_type_drivers.allocate_segmentation_id')
-    def test__create_subports_info_no_vlans(self, m_allocate_seg_id):
+    def test__create_subports_info_no_vlans(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
         m_driver = mock.Mock(spec=cls)
 
@@ -482,12 +465,11 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         security_groups = mock.sentinel.security_groups
         trunk_id = mock.sentinel.trunk_id
         num_ports = 2
-        in_use_vlan = set([1])
         port = mock.sentinel.port
 
-        m_driver._get_in_use_vlan_ids_set.return_value = in_use_vlan
         m_driver._get_port_request.return_value = port
-        m_allocate_seg_id.side_effect = kl_exc.SegmentationIdAllocationFailure
+        m_driver._get_vlan_id.side_effect = (
+            kl_exc.SegmentationIdAllocationFailure)
 
         port_res, subports_res = cls._create_subports_info(
             m_driver, pod, project_id, subnets, security_groups, trunk_id,
@@ -496,10 +478,9 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         self.assertEqual(port_res, port)
         self.assertEqual(subports_res, [])
 
-        m_driver._get_in_use_vlan_ids_set.assert_called_once_with(trunk_id)
         m_driver._get_port_request.assert_called_once_with(
             pod, project_id, subnets, security_groups, False)
-        self.assertEqual(m_allocate_seg_id.call_count, 1)
+        m_driver._get_vlan_id.assert_called_once_with(trunk_id)
 
     def test_get_trunk_id(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
@@ -525,6 +506,8 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         subport = mock.sentinel.subport
         vlan_id = mock.sentinel.vlan_id
         m_driver._get_vlan_id.return_value = vlan_id
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
         subport_dict = [{'segmentation_id': vlan_id,
                          'port_id': subport,
                          'segmentation_type': 'vlan'}]
@@ -534,6 +517,30 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         m_driver._get_vlan_id.assert_called_once_with(trunk_id)
         os_net.add_trunk_subports.assert_called_once_with(trunk_id,
                                                           subport_dict)
+        m_driver._vlan_ids.confirm.assert_called_once_with(trunk_id,
+                                                           [vlan_id])
+        m_driver._trunks.add_subports.assert_called_once_with(trunk_id,
+                                                              [subport])
+
+    def test_add_subport_requested_vlan_id(self):
+        cls = nested_vlan_vif.NestedVlanPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        trunk_id = mock.sentinel.trunk_id
+        subport = mock.sentinel.subport
+        vlan_id = mock.sentinel.vlan_id
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
+        subport_dict = [{'segmentation_id': vlan_id,
+                         'port_id': subport,
+                         'segmentation_type': 'vlan'}]
+
+        self.assertEqual(vlan_id, cls._add_subport(
+            m_driver, trunk_id, subport, requested_vlan_id=vlan_id))
+        m_driver._get_vlan_id.assert_not_called()
+        m_driver._vlan_ids.reserve.assert_called_once_with(trunk_id, vlan_id)
+        os_net.add_trunk_subports.assert_called_once_with(trunk_id,
+                                                          subport_dict)
 
     def test_add_subport_get_vlanid_failure(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
@@ -554,8 +561,10 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
         trunk_id = mock.sentinel.trunk_id
         subport = mock.sentinel.subport
-        vlan_id = mock.sentinel.vlan_id
+        vlan_id = 100
         m_driver._get_vlan_id.return_value = vlan_id
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
         subport_dict = [{'segmentation_id': vlan_id,
                          'port_id': subport,
                          'segmentation_type': 'vlan'}]
@@ -566,6 +575,60 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
 
         os_net.add_trunk_subports.assert_called_once_with(trunk_id,
                                                           subport_dict)
+        m_driver._cancel_vlan_id.assert_called_once_with(trunk_id, vlan_id,
+                                                         None)
+        m_driver._vlan_ids.invalidate.assert_called_once_with(trunk_id)
+
+    def test_add_subport_with_vlan_id_conflict_retry(self):
+        cls = nested_vlan_vif.NestedVlanPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        trunk_id = mock.sentinel.trunk_id
+        subport = mock.sentinel.subport
+        m_driver._get_vlan_id.side_effect = [1, 2]
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
+        os_net.add_trunk_subports.side_effect = [os_exc.ConflictException,
+                                                 None]
+        self.useFixture(fixtures.MockPatchObject(
+            nested_vlan_vif, 'DEFAULT_MAX_RETRY_COUNT', 3))
+
+        self.assertEqual(2, cls._add_subport(m_driver, trunk_id, subport))
+
+        m_driver._cancel_vlan_id.assert_called_once_with(trunk_id, 1, None)
+        m_driver._vlan_ids.invalidate.assert_called_once_with(trunk_id)
+        m_driver._vlan_ids.confirm.assert_called_once_with(trunk_id, [2])
+
+    def test_add_subport_trunk_not_found(self):
+        cls = nested_vlan_vif.NestedVlanPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        trunk_id = mock.sentinel.trunk_id
+        subport = mock.sentinel.subport
+        m_driver._get_vlan_id.return_value = 100
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
+        os_net.add_trunk_subports.side_effect = os_exc.NotFoundException
+
+        self.assertRaises(os_exc.NotFoundException, cls._add_subport,
+                          m_driver, trunk_id, subport)
+
+        m_driver._cancel_vlan_id.assert_called_once_with(trunk_id, 100, None)
+        m_driver._forget_trunk.assert_called_once_with(trunk_id)
+        m_driver._trunks.add_subports.assert_not_called()
+
+    def test__cancel_vlan_id(self):
+        cls = nested_vlan_vif.NestedVlanPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
+        trunk_id = mock.sentinel.trunk_id
+
+        cls._cancel_vlan_id(m_driver, trunk_id, 10)
+        m_driver._vlan_ids.release.assert_called_once_with(trunk_id, [10])
+
+        cls._cancel_vlan_id(m_driver, trunk_id, 20, requested=True)
+        m_driver._vlan_ids.confirm.assert_called_once_with(trunk_id, [20])
 
     def test__remove_subports(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
@@ -574,7 +637,10 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         trunk_id = mock.sentinel.trunk_id
         subport_id = mock.sentinel.subport_id
         subportid_dict = [{'port_id': subport_id}]
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
         cls._remove_subports(m_driver, trunk_id, [subport_id])
+        m_driver._trunks.remove_subports.assert_called_once_with(
+            [subport_id])
 
         os_net.delete_trunk_subports.assert_called_once_with(trunk_id,
                                                              subportid_dict)
@@ -586,43 +652,111 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         trunk_id = mock.sentinel.trunk_id
         subport_id = mock.sentinel.subport_id
         subportid_dict = [{'port_id': subport_id}]
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
         cls._remove_subports(m_driver, trunk_id, [subport_id, subport_id])
 
         os_net.delete_trunk_subports.assert_called_once_with(trunk_id,
                                                              subportid_dict)
 
-    @mock.patch('kuryr.lib.segmentation_type_drivers.allocate_segmentation_id')
-    def test_get_vlan_id(self, mock_alloc_seg_id):
+    def test_get_vlan_id(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
         m_driver = mock.Mock(spec=cls)
-        vlanid_set = mock.sentinel.vlanid_set
+        m_driver._vlan_ids = nested_vlan_vif.VlanIdAllocator()
         trunk_id = mock.sentinel.trunk_id
-        m_driver._get_in_use_vlan_ids_set.return_value = vlanid_set
-        cls._get_vlan_id(m_driver, trunk_id)
+        m_driver._get_in_use_vlan_ids_set.return_value = {1, 2}
 
-        mock_alloc_seg_id.assert_called_once_with(vlanid_set)
+        self.assertEqual(3, cls._get_vlan_id(m_driver, trunk_id))
+        self.assertEqual(4, cls._get_vlan_id(m_driver, trunk_id))
 
-    @mock.patch('kuryr.lib.segmentation_type_drivers.allocate_segmentation_id')
-    def test_get_vlan_id_exhausted(self, mock_alloc_seg_id):
+        m_driver._get_in_use_vlan_ids_set.assert_called_once_with(trunk_id)
+
+    def test_get_vlan_id_exhausted(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
         m_driver = mock.Mock(spec=cls)
-        vlanid_set = mock.sentinel.vlanid_set
+        m_driver._vlan_ids = nested_vlan_vif.VlanIdAllocator()
         trunk_id = mock.sentinel.trunk_id
-        m_driver._get_in_use_vlan_ids_set.return_value = vlanid_set
-        mock_alloc_seg_id.side_effect = kl_exc.SegmentationIdAllocationFailure
+        m_driver._get_in_use_vlan_ids_set.return_value = set(
+            range(kl_const.MIN_VLAN_TAG, kl_const.MAX_VLAN_TAG + 1))
         self.assertRaises(kl_exc.SegmentationIdAllocationFailure,
                           cls._get_vlan_id, m_driver, trunk_id)
 
-        mock_alloc_seg_id.assert_called_once_with(vlanid_set)
+    def test_release_vlan_id(self):
+        cls = nested_vlan_vif.NestedVlanPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
+        trunk_id = mock.sentinel.trunk_id
+        cls._release_vlan_id(m_driver, trunk_id, 100)
+
+        m_driver._vlan_ids.release.assert_called_once_with(trunk_id, [100])
+
+    def test_seed_trunk(self):
+        cls = nested_vlan_vif.NestedVlanPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        m_driver._vlan_ids = nested_vlan_vif.VlanIdAllocator()
+        m_driver._trunks = nested_vlan_vif.TrunksIndex()
+        trunk_id = mock.sentinel.trunk_id
+        subports = [{'port_id': 'port_id',
+                     'segmentation_type': 'vlan',
+                     'segmentation_id': 1}]
+        cls._seed_trunk(m_driver, trunk_id, 'host_ip', subports)
+
+        self.assertEqual(2, cls._get_vlan_id(m_driver, trunk_id))
+        self.assertEqual(trunk_id,
+                         cls._get_trunk_id_by_host_ip(m_driver, 'host_ip'))
+        self.assertEqual('host_ip',
+                         cls._get_subport_host_ip(m_driver, 'port_id'))
+        m_driver._get_in_use_vlan_ids_set.assert_not_called()
+        m_driver._get_parent_port_by_host_ip.assert_not_called()
+
+    def test_get_trunk_id_by_host_ip(self):
+        cls = nested_vlan_vif.NestedVlanPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        m_driver._trunks = nested_vlan_vif.TrunksIndex()
+        parent_port = mock.sentinel.parent_port
+        trunk_id = mock.sentinel.trunk_id
+        m_driver._get_parent_port_by_host_ip.return_value = parent_port
+        m_driver._get_trunk_id.return_value = trunk_id
+
+        for _ in range(2):
+            self.assertEqual(trunk_id, cls._get_trunk_id_by_host_ip(
+                m_driver, 'host_ip'))
 
-    @mock.patch('kuryr.lib.segmentation_type_drivers.release_segmentation_id')
-    def test_release_vlan_id(self, mock_rel_seg_id):
+        m_driver._get_parent_port_by_host_ip.assert_called_once_with(
+            'host_ip')
+        m_driver._get_trunk_id.assert_called_once_with(parent_port)
+
+    def test_get_pod_trunk_id(self):
+        cls = nested_vlan_vif.NestedVlanPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        pod = mock.sentinel.pod
+        trunk_id = mock.sentinel.trunk_id
+        m_driver._get_host_ip.return_value = 'host_ip'
+        m_driver._get_trunk_id_by_host_ip.return_value = trunk_id
+
+        self.assertEqual(trunk_id, cls._get_pod_trunk_id(m_driver, pod))
+
+        m_driver._get_host_ip.assert_called_once_with(pod)
+        m_driver._get_trunk_id_by_host_ip.assert_called_once_with('host_ip')
+
+    def test_get_subport_host_ip_unknown(self):
+        cls = nested_vlan_vif.NestedVlanPodVIFDriver
+        m_driver = mock.Mock(spec=cls)
+        m_driver._trunks = nested_vlan_vif.TrunksIndex()
+
+        self.assertIsNone(cls._get_subport_host_ip(m_driver, 'port_id'))
+
+    def test_forget_trunk(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
         m_driver = mock.Mock(spec=cls)
-        vlanid = mock.sentinel.vlanid
-        cls._release_vlan_id(m_driver, vlanid)
+        m_driver._vlan_ids = mock.Mock(spec=nested_vlan_vif.VlanIdAllocator)
+        m_driver._trunks = mock.Mock(spec=nested_vlan_vif.TrunksIndex)
+        trunk_id = mock.sentinel.trunk_id
 
-        mock_rel_seg_id.assert_called_once_with(vlanid)
+        cls._forget_trunk(m_driver, trunk_id)
+
+        m_driver._trunks.remove_trunk.assert_called_once_with(trunk_id)
+        m_driver._vlan_ids.invalidate.assert_called_once_with(trunk_id)
 
     def test_get_in_use_vlan_ids_set(self):
         cls = nested_vlan_vif.NestedVlanPodVIFDriver
@@ -638,3 +772,120 @@ class TestNestedVlanPodVIFDriver(test_base.TestCase):
         os_net.get_trunk.return_value = trunk_obj
         self.assertEqual(vlan_ids,
                          cls._get_in_use_vlan_ids_set(m_driver, trunk_id))
+
+
+class TestVlanIdAllocator(test_base.TestCase):
+
+    def setUp(self):
+        super(TestVlanIdAllocator, self).setUp()
+        self.allocator = nested_vlan_vif.VlanIdAllocator()
+
+    def test_allocate(self):
+        self.allocator.sync('trunk', [1, 3])
+
+        self.assertEqual([2, 4, 5],
+                         [self.allocator.allocate('trunk') for _ in range(3)])
+        self.assertEqual(1, self.allocator.allocate('other'))
+
+    def test_allocate_next_fit(self):
+        self.allocator.sync('trunk', [])
+        vlan_id = self.allocator.allocate('trunk')
+        self.allocator.release('trunk', [vlan_id])
+
+        self.assertNotEqual(vlan_id, self.allocator.allocate('trunk'))
+
+    def test_allocate_wraps_around(self):
+        self.allocator.sync('trunk', range(2, kl_const.MAX_VLAN_TAG))
+        self.assertEqual(1, self.allocator.allocate('trunk'))
+        self.allocator.release('trunk', [1])
+
+        self.assertEqual(kl_const.MAX_VLAN_TAG,
+                         self.allocator.allocate('trunk'))
+        self.assertEqual(1, self.allocator.allocate('trunk'))
+        self.assertRaises(kl_exc.SegmentationIdAllocationFailure,
+                          self.allocator.allocate, 'trunk')
+
+    def test_sync_keeps_pending(self):
+        self.allocator.sync('trunk', [])
+        pending = self.allocator.allocate('trunk')
+        confirmed = self.allocator.allocate('trunk')
+        self.allocator.confirm('trunk', [confirmed])
+
+        self.allocator.sync('trunk', range(3, kl_const.MAX_VLAN_TAG + 1))
+
+        self.assertEqual((1, 2), (pending, confirmed))
+        self.assertEqual(confirmed, self.allocator.allocate('trunk'))
+        self.assertRaises(kl_exc.SegmentationIdAllocationFailure,
+                          self.allocator.allocate, 'trunk')
+
+    def test_seed(self):
+        self.assertTrue(self.allocator.seed('trunk', [1]))
+        self.assertFalse(self.allocator.seed('trunk', [2]))
+
+        self.assertEqual(2, self.allocator.allocate('trunk'))
+
+    @mock.patch('time.monotonic')
+    def test_is_stale(self, m_monotonic):
+        self.addCleanup(oslo_cfg.CONF.clear_override,
+                        'vlan_ids_reconcile_period', group='pod_vif_nested')
+        oslo_cfg.CONF.set_override('vlan_ids_reconcile_period', 60,
+                                   group='pod_vif_nested')
+        m_monotonic.return_value = 100
+        self.assertTrue(self.allocator.is_stale('trunk'))
+
+        self.allocator.sync('trunk', [])
+        self.assertFalse(self.allocator.is_stale('trunk'))
+
+        m_monotonic.return_value = 161
+        self.assertTrue(self.allocator.is_stale('trunk'))
+
+        oslo_cfg.CONF.set_override('vlan_ids_reconcile_period', 0,
+                                   group='pod_vif_nested')
+        self.assertFalse(self.allocator.is_stale('trunk'))
+
+        self.allocator.invalidate('trunk')
+        self.assertTrue(self.allocator.is_stale('trunk'))
+
+
+class TestTrunksIndex(test_base.TestCase):
+
+    def setUp(self):
+        super(TestTrunksIndex, self).setUp()
+        self.index = nested_vlan_vif.TrunksIndex()
+        self.index.add_trunk('trunk1', '10.0.0.1')
+        self.index.add_subports('trunk1', ['port1', 'port2'])
+
+    def test_lookups(self):
+        self.assertEqual('trunk1', self.index.get_trunk_id('10.0.0.1'))
+        self.assertEqual('10.0.0.1', self.index.get_host_ip('trunk1'))
+        self.assertEqual('trunk1', self.index.get_subport_trunk_id('port1'))
+        self.assertIsNone(self.index.get_trunk_id('10.0.0.2'))
+        self.assertIsNone(self.index.get_subport_trunk_id('port3'))
+
+    def test_remove_subports(self):
+        self.index.remove_subports(['port1', 'port3'])
+
+        self.assertIsNone(self.index.get_subport_trunk_id('port1'))
+        self.assertEqual('trunk1', self.index.get_subport_trunk_id('port2'))
+
+    def test_add_subports_moved(self):
+        self.index.add_trunk('trunk2', '10.0.0.2')
+        self.index.add_subports('trunk2', ['port1'])
+        self.index.remove_trunk('trunk1')
+
+        self.assertEqual('trunk2', self.index.get_subport_trunk_id('port1'))
+        self.assertIsNone(self.index.get_subport_trunk_id('port2'))
+
+    def test_remove_trunk(self):
+        self.index.remove_trunk('trunk1')
+
+        self.assertIsNone(self.index.get_trunk_id('10.0.0.1'))
+        self.assertIsNone(self.index.get_host_ip('trunk1'))
+        self.assertIsNone(self.index.get_subport_trunk_id('port1'))
+
+    def test_add_trunk_replaced_node(self):
+        self.index.add_trunk('trunk2', '10.0.0.1')
+
+        self.assertEqual('trunk2', self.index.get_trunk_id('10.0.0.1'))
+        self.assertIsNone(self.index.get_host_ip('trunk1'))
+        self.assertIsNone(self.index.get_subport_trunk_id('port1'))
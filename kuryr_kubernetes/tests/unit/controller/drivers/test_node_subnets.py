@@ -184,7 +184,7 @@ class TestOpenShiftNodesSubnetsDriver(test_base.TestCase):
     def test_delete_node(self,  m_get_k8s, m_get_subnet_id):
         m_k8s = mock.Mock()
         m_get_k8s.return_value = m_k8s
-        m_k8s.get.return_value = {'items': []}
+        m_k8s.list_items.return_value = []
 
         driver = node_subnets.OpenShiftNodesSubnets()
         driver.subnets.add('foobar')
@@ -199,7 +199,7 @@ class TestOpenShiftNodesSubnetsDriver(test_base.TestCase):
     def test_delete_node_still_exists(self,  m_get_k8s, m_get_subnet_id):
         m_k8s = mock.Mock()
         m_get_k8s.return_value = m_k8s
-        m_k8s.get.return_value = {'items': [self.machine]}
+        m_k8s.list_items.return_value = [self.machine]
 
         driver = node_subnets.OpenShiftNodesSubnets()
         driver.subnets.add('foobar')
@@ -18,6 +18,7 @@ from oslo_config import cfg
 from kuryr_kubernetes import constants
 from kuryr_kubernetes.controller.drivers import utils
 from kuryr_kubernetes import exceptions
+from kuryr_kubernetes import informer
 from kuryr_kubernetes.tests import base as test_base
 from kuryr_kubernetes.tests.unit import kuryr_fixtures as k_fix
 
@@ -115,3 +116,58 @@ class TestUtils(test_base.TestCase):
                         group='kubernetes')
 
         self.assertTrue(utils.is_network_policy_enabled())
+
+    def _get_pod(self, name, namespace, labels):
+        return {'metadata': {'name': name, 'namespace': namespace,
+                             'uid': f'{namespace}-{name}', 'labels': labels}}
+
+    def test_get_pods_cached(self):
+        kubernetes = self.useFixture(k_fix.MockK8sClient()).client
+        self.useFixture(k_fix.MockInformerStores())
+        pod1 = self._get_pod('pod1', 'ns1', {'app': 'demo', 'tier': 'a'})
+        pod2 = self._get_pod('pod2', 'ns1', {'app': 'other'})
+        pod3 = self._get_pod('pod3', 'ns2', {'app': 'demo'})
+        informer.ensure_store(utils.POD_PATH).replace([pod1, pod2, pod3])
+
+        selector = {'matchLabels': {'app': 'demo',
+                                    'pod-template-hash': '1234'}}
+        pods = utils.get_pods(selector)
+        self.assertCountEqual([pod1, pod3], pods['items'])
+
+        pods = utils.get_pods(selector, namespace='ns1')
+        self.assertEqual([pod1], pods['items'])
+
+        pods = utils.get_pods({'selector': {'app': 'other'}})
+        self.assertEqual([pod2], pods['items'])
+
+        selector = {'matchExpressions': [{'key': 'tier', 'operator': 'In',
+                                          'values': ['a', 'b']}]}
+        pods = utils.get_pods(selector)
+        self.assertEqual([pod1], pods['items'])
+
+        kubernetes.get.assert_not_called()
+
+    def test_get_pods_not_synced(self):
+        kubernetes = self.useFixture(k_fix.MockK8sClient()).client
+        self.useFixture(k_fix.MockInformerStores())
+        informer.ensure_store(utils.POD_PATH)
+        kubernetes.get.return_value = {'items': []}
+
+        pods = utils.get_pods({'matchLabels': {'app': 'demo'}}, 'ns1')
+
+        self.assertEqual({'items': []}, pods)
+        kubernetes.get.assert_called_once_with(
+            '/api/v1/namespaces/ns1/pods?labelSelector=app=demo')
+
+    def test_get_services_cached(self):
+        kubernetes = self.useFixture(k_fix.MockK8sClient()).client
+        self.useFixture(k_fix.MockInformerStores())
+        svc1 = {'metadata': {'name': 'svc1', 'namespace': 'ns1',
+                             'uid': 'svc1-uid'}}
+        svc2 = {'metadata': {'name': 'svc2', 'namespace': 'ns2',
+                             'uid': 'svc2-uid'}}
+        informer.ensure_store(utils.SERVICE_PATH).replace([svc1, svc2])
+
+        self.assertCountEqual([svc1, svc2], utils.get_services()['items'])
+        self.assertEqual([svc2], utils.get_services('ns2')['items'])
+        kubernetes.get.assert_not_called()
@@ -12,7 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import collections
+import functools
+import math
+import os
+import shutil
+import tempfile
 from unittest import mock
 import uuid
 
@@ -35,6 +39,13 @@ from kuryr_kubernetes.tests import fake
 from kuryr_kubernetes.tests.unit import kuryr_fixtures as k_fix
 
 
+def _use_pool_sizing(m_driver, cls):
+    for method in ('_is_adaptive', '_get_pool_target', '_get_pool_limit',
+                   '_get_populate_size', '_take_surplus_ports'):
+        getattr(m_driver, method).side_effect = functools.partial(
+            getattr(cls, method), m_driver)
+
+
 def get_pod_obj():
     return {
         'status': {
@@ -97,6 +108,124 @@ class BaseVIFPool(test_base.TestCase):
         self.assertEqual(vif, cls.request_vif(m_driver, pod, project_id,
                                               subnets, security_groups))
 
+    def test_get_pool_sizes(self):
+        cls = vif_pool.BaseVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            ('node1', 'project1', 'net1'): {('sg1',): ['p1', 'p2']},
+            ('node1', 'project2', 'net1'): {('sg1',): ['p3']},
+            ('node2', 'project1', 'net1'): {('sg2',): []},
+        })
+        m_driver._get_pool_size.side_effect = functools.partial(
+            cls._get_pool_size, m_driver)
+        m_driver._get_pool_key_net.side_effect = functools.partial(
+            cls._get_pool_key_net, m_driver)
+
+        self.assertEqual({('node1', 'net1'): 3, ('node2', 'net1'): 0},
+                         cls.get_pool_sizes(m_driver))
+
+    def _set_adaptive(self, pool_min=1, pool_max=0):
+        for name, value in (('ports_pool_sizing', 'adaptive'),
+                            ('ports_pool_min', pool_min),
+                            ('ports_pool_max', pool_max),
+                            ('ports_pool_update_frequency', 10)):
+            oslo_cfg.CONF.set_override(name, value, group='vif_pool')
+            self.addCleanup(oslo_cfg.CONF.clear_override, name,
+                            group='vif_pool')
+
+    def _get_adaptive_driver(self, rate):
+        cls = vif_pool.BaseVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
+        demand = mock.Mock(spec=vif_pool.PoolDemand)
+        demand.get_target.side_effect = lambda: int(rate * 12)
+        m_driver._get_pool_demand.return_value = demand
+        return m_driver
+
+    def test_get_pool_target_static(self):
+        cls = vif_pool.BaseVIFPool
+        m_driver = self._get_adaptive_driver(10)
+        oslo_cfg.CONF.set_override('ports_pool_min', 3, group='vif_pool')
+        self.addCleanup(oslo_cfg.CONF.clear_override, 'ports_pool_min',
+                        group='vif_pool')
+
+        self.assertEqual(3, cls._get_pool_target(m_driver, 'key'))
+        m_driver._get_pool_demand.assert_not_called()
+
+    def test_get_pool_target_adaptive(self):
+        cls = vif_pool.BaseVIFPool
+        self._set_adaptive(pool_min=2)
+
+        m_driver = self._get_adaptive_driver(1)
+        self.assertEqual(12, cls._get_pool_target(m_driver, 'key'))
+        self.assertEqual(12, cls._get_pool_limit(m_driver, 'key'))
+
+        m_driver = self._get_adaptive_driver(0)
+        self.assertEqual(2, cls._get_pool_target(m_driver, 'key'))
+
+    def test_get_pool_target_adaptive_capped(self):
+        cls = vif_pool.BaseVIFPool
+        self._set_adaptive(pool_max=8)
+        m_driver = self._get_adaptive_driver(1)
+
+        self.assertEqual(8, cls._get_pool_target(m_driver, 'key'))
+        self.assertEqual(8, cls._get_pool_limit(m_driver, 'key'))
+
+    def test_get_pool_limit(self):
+        cls = vif_pool.BaseVIFPool
+        m_driver = self._get_adaptive_driver(0)
+        oslo_cfg.CONF.set_override('ports_pool_max', 0, group='vif_pool')
+        self.addCleanup(oslo_cfg.CONF.clear_override, 'ports_pool_max',
+                        group='vif_pool')
+
+        self.assertIsNone(cls._get_pool_limit(m_driver, 'key'))
+
+        self._set_adaptive(pool_min=0)
+        # Idle pool in adaptive mode shouldn't keep any port.
+        self.assertEqual(0, cls._get_pool_limit(m_driver, 'key'))
+
+    @mock.patch('time.time', return_value=50)
+    def test__populate_pool_adaptive(self, m_time):
+        cls = vif_pool.BaseVIFPool
+        self._set_adaptive()
+        m_driver = self._get_adaptive_driver(1)
+        vif_driver = mock.MagicMock(spec=neutron_vif.NeutronPodVIFDriver)
+        m_driver._drv_vif = vif_driver
+
+        pool_key = (mock.sentinel.host_addr, str(uuid.uuid4()))
+        security_groups = ('test-sg',)
+        m_driver._existing_vifs = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
+        m_driver._last_update = {pool_key: {security_groups: 1}}
+        m_driver._recovered_pools = True
+        m_driver._get_pool_size.return_value = 5
+        vif_driver.request_vifs.return_value = []
+
+        cls._populate_pool(m_driver, pool_key, mock.sentinel.pod,
+                           mock.sentinel.subnets, security_groups)
+
+        vif_driver.request_vifs.assert_called_once_with(
+            pod=mock.sentinel.pod, project_id=pool_key[1],
+            subnets=mock.sentinel.subnets, security_groups=security_groups,
+            num_ports=7)
+        demand = m_driver._get_pool_demand.return_value
+        demand.record_refill.assert_called_once_with(0)
+
+    def test_request_vif_adaptive(self):
+        cls = vif_pool.BaseVIFPool
+        self._set_adaptive()
+        m_driver = self._get_adaptive_driver(1)
+        m_driver._recovered_pools = True
+        m_driver._get_pool_key.return_value = mock.sentinel.pool_key
+        m_driver._get_port_from_pool.return_value = mock.sentinel.vif
+
+        self.assertEqual(mock.sentinel.vif, cls.request_vif(
+            m_driver, get_pod_obj(), 'project', {}, []))
+        m_driver._get_pool_demand.assert_called_once_with(
+            mock.sentinel.pool_key)
+        demand = m_driver._get_pool_demand.return_value
+        demand.record_request.assert_called_once_with()
+
     @mock.patch('eventlet.spawn')
     def test_request_vif_empty_pool(self, m_eventlet):
         cls = vif_pool.BaseVIFPool
@@ -146,6 +275,7 @@ class BaseVIFPool(test_base.TestCase):
     def test__populate_pool(self, m_vif_driver, m_time):
         cls = vif_pool.BaseVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
 
         cls_vif_driver = m_vif_driver
         vif_driver = mock.MagicMock(spec=cls_vif_driver)
@@ -160,7 +290,7 @@ class BaseVIFPool(test_base.TestCase):
         vifs = [vif]
 
         m_driver._existing_vifs = {}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._last_update = {pool_key: {tuple(security_groups): 1}}
         m_driver._recovered_pools = True
 
@@ -248,6 +378,7 @@ class BaseVIFPool(test_base.TestCase):
     def test__populate_pool_large_pool(self, m_vif_driver, m_time):
         cls = vif_pool.BaseVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
 
         cls_vif_driver = m_vif_driver
         vif_driver = mock.MagicMock(spec=cls_vif_driver)
@@ -299,32 +430,33 @@ class BaseVIFPool(test_base.TestCase):
 
         m_driver._return_ports_to_pool.assert_not_called()
 
-    @mock.patch('kuryr_kubernetes.controller.drivers.utils.get_vifs')
-    def test__get_in_use_ports(self, get_vifs):
+    def test__get_in_use_ports(self):
         cls = vif_pool.BaseVIFPool
         m_driver = mock.MagicMock(spec=cls)
 
         kubernetes = self.useFixture(k_fix.MockK8sClient()).client
-        pod = get_pod_obj()
         port_id = str(uuid.uuid4())
         port_network = osv_network.Network(id=str(uuid.uuid4()))
         pod_vif = osv_vif.VIFBase(id=port_id, network=port_network)
-        get_vifs.return_value = {'eth0': pod_vif}
-        items = [pod]
-        kubernetes.get.return_value = {'items': items}
-        network = {}
+        kp = {'status': {'vifs': {'eth0': {
+            'default': True, 'vif': pod_vif.obj_to_primitive()}}}}
+        kubernetes.list_items.return_value = iter([kp])
 
-        resp = cls._get_in_use_ports_info(m_driver)
-        network[port_network.id] = port_network
-        self.assertEqual(resp, ([port_id], network))
+        in_use_ports, networks = cls._get_in_use_ports_info(m_driver)
+
+        self.assertEqual([port_id], in_use_ports)
+        self.assertEqual([port_network.id], list(networks))
+        self.assertEqual(port_network.id, networks[port_network.id].id)
+        kubernetes.list_items.assert_called_once_with(
+            constants.K8S_API_CRD_KURYRPORTS)
+        kubernetes.get.assert_not_called()
 
     def test__get_in_use_ports_empty(self):
         cls = vif_pool.BaseVIFPool
         m_driver = mock.MagicMock(spec=cls)
 
         kubernetes = self.useFixture(k_fix.MockK8sClient()).client
-        items = []
-        kubernetes.get.return_value = {'items': items}
+        kubernetes.list_items.return_value = iter([])
 
         resp = cls._get_in_use_ports_info(m_driver)
 
@@ -453,6 +585,272 @@ class BaseVIFPool(test_base.TestCase):
         os_net.networks.assert_not_called()
         os_net.delete_port.assert_called_once_with(port.id)
 
+    def test_cleanup_leftover_ports_scan(self):
+        cls = vif_pool.BaseVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+
+        port = fake.get_port_obj(port_id=str(uuid.uuid4()))
+        port.binding_host_id = None
+        scan = vif_pool.PortsScan()
+        scan.leftover_ports = [port]
+        scan.available_ports = {port.id: port}
+
+        cls._cleanup_leftover_ports(m_driver, scan)
+        os_net.ports.assert_not_called()
+        os_net.delete_port.assert_called_once_with(port.id)
+        self.assertEqual({}, scan.available_ports)
+
+    @mock.patch('kuryr_kubernetes.utils.get_subnet')
+    def test_scan_ports(self, m_get_subnet):
+        cls = vif_pool.BaseVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        oslo_cfg.CONF.set_override('resource_tags', ['cluster'],
+                                   group='neutron_defaults')
+        self.addCleanup(oslo_cfg.CONF.clear_override, 'resource_tags',
+                        group='neutron_defaults')
+        oslo_cfg.CONF.set_override('port_debug', False, group='kubernetes')
+        self.addCleanup(oslo_cfg.CONF.clear_override, 'port_debug',
+                        group='kubernetes')
+
+        def _port(status='DOWN', tags=('cluster',), **kwargs):
+            port = fake.get_port_obj(port_id=str(uuid.uuid4()), **kwargs)
+            port.status = status
+            port.tags = list(tags)
+            return port
+
+        available = _port()
+        untagged = _port(tags=())
+        in_use = _port(status='ACTIVE')
+        subport = _port(status='ACTIVE', device_owner='trunk:subport')
+        in_use_net = _port(status='ACTIVE')
+        in_use_net.network_id = 'in-use-net'
+        in_use_net.fixed_ips = [{'subnet_id': 'in-use-subnet',
+                                 'ip_address': '10.0.1.5'}]
+        os_net.ports.return_value = [available, untagged, in_use, subport,
+                                     in_use_net]
+        network = mock.sentinel.network
+        m_driver._get_in_use_ports_info.return_value = (
+            [in_use.id], {'in-use-net': network})
+        m_get_subnet.side_effect = lambda subnet_id: subnet_id
+
+        scan = cls._scan_ports(m_driver)
+
+        os_net.ports.assert_called_once_with(
+            device_owner=['compute:kuryr', 'trunk:subport'])
+        m_driver._get_parent_ports.assert_not_called()
+        self.assertEqual({in_use.id}, scan.in_use_ports)
+        self.assertEqual([available, untagged], scan.leftover_ports)
+        self.assertEqual({available.id, in_use_net.id},
+                         set(scan.available_ports))
+        self.assertEqual({subport.id, in_use_net.id}, set(scan.subports))
+        subnet_ids = {p.id: p.fixed_ips[0]['subnet_id']
+                      for p in (available, subport, in_use_net)}
+        self.assertEqual(network,
+                         scan.subnets[subnet_ids[in_use_net.id]][
+                             subnet_ids[in_use_net.id]])
+        self.assertEqual(subnet_ids[available.id],
+                         scan.subnets[subnet_ids[available.id]][
+                             subnet_ids[available.id]])
+        m_get_subnet.assert_called_once_with(subnet_ids[available.id])
+
+    def test_scan_ports_port_debug(self):
+        cls = vif_pool.BaseVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        oslo_cfg.CONF.set_override('port_debug', True, group='kubernetes')
+        self.addCleanup(oslo_cfg.CONF.clear_override, 'port_debug',
+                        group='kubernetes')
+
+        available = fake.get_port_obj(port_id=str(uuid.uuid4()))
+        available.name = constants.KURYR_PORT_NAME
+        available.fixed_ips = []
+        used = fake.get_port_obj(port_id=str(uuid.uuid4()))
+        used.name = 'default/pod'
+        os_net.ports.return_value = [available, used]
+        m_driver._get_in_use_ports_info.return_value = [], {}
+        m_driver._get_parent_ports.return_value = mock.sentinel.parents
+
+        scan = cls._scan_ports(m_driver, trunks=True)
+
+        self.assertEqual([available.id], list(scan.available_ports))
+        self.assertEqual(mock.sentinel.parents, scan.parent_ports)
+
+    def test__get_ports_security_groups(self):
+        cls = vif_pool.BaseVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+
+        port_ids = [str(uuid.uuid4())
+                    for _ in range(vif_pool.PORTS_QUERY_SIZE + 1)]
+        ports = []
+        for port_id in port_ids:
+            port = fake.get_port_obj(port_id=port_id)
+            port.security_group_ids = ['sg2', 'sg1']
+            ports.append(port)
+        os_net.ports.side_effect = [ports[:-1], ports[-1:]]
+
+        sgs = cls._get_ports_security_groups(m_driver, port_ids)
+
+        self.assertEqual({port_id: ('sg1', 'sg2') for port_id in port_ids},
+                         sgs)
+        os_net.ports.assert_has_calls([
+            mock.call(id=port_ids[:vif_pool.PORTS_QUERY_SIZE]),
+            mock.call(id=port_ids[vif_pool.PORTS_QUERY_SIZE:])])
+
+    def test__get_ports_security_groups_empty(self):
+        cls = vif_pool.BaseVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+
+        self.assertEqual({}, cls._get_ports_security_groups(m_driver, []))
+        os_net.ports.assert_not_called()
+
+    def test__delete_ports(self):
+        cls = vif_pool.BaseVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        port_ids = [str(uuid.uuid4()) for _ in range(3)]
+
+        def delete_port(port_id):
+            if port_id == port_ids[1]:
+                raise os_exc.SDKException()
+        os_net.delete_port.side_effect = delete_port
+
+        self.assertEqual([port_ids[0], port_ids[2]],
+                         cls._delete_ports(m_driver, port_ids))
+        os_net.delete_port.assert_has_calls(
+            [mock.call(port_id) for port_id in port_ids], any_order=True)
+
+    def test__trigger_removed_nodes_ports_cleanup(self):
+        cls = vif_pool.BaseVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        oslo_cfg.CONF.set_override('resource_tags', [],
+                                   group='neutron_defaults')
+        self.addCleanup(oslo_cfg.CONF.clear_override, 'resource_tags',
+                        group='neutron_defaults')
+
+        seen = fake.get_port_obj(port_id=str(uuid.uuid4()))
+        seen.binding_host_id = None
+        new = fake.get_port_obj(port_id=str(uuid.uuid4()))
+        new.binding_host_id = None
+        bound = fake.get_port_obj(port_id=str(uuid.uuid4()))
+        os_net.ports.return_value = [seen, new, bound]
+        m_driver._recovered_pools = True
+        m_driver._existing_vifs = {seen.id: mock.sentinel.vif}
+        previous_ports_to_remove = [seen.id, bound.id]
+
+        cls._trigger_removed_nodes_ports_cleanup(m_driver,
+                                                 previous_ports_to_remove)
+
+        os_net.delete_port.assert_called_once_with(seen.id)
+        self.assertEqual({}, m_driver._existing_vifs)
+        self.assertEqual([bound.id, new.id], previous_ports_to_remove)
+
+
+class TestPoolIndex(test_base.TestCase):
+
+    def setUp(self):
+        super(TestPoolIndex, self).setUp()
+        self.pools = vif_pool.PoolIndex({
+            'key1': {('sg1',): ['p1', 'p2'], ('sg2',): ['p3']},
+            'key2': {('sg1',): ['p4']},
+        })
+
+    def test_sizes(self):
+        self.assertEqual(4, len(self.pools))
+        self.assertEqual(3, self.pools.get_size('key1'))
+        self.assertEqual(1, self.pools.get_size('key2'))
+        self.assertEqual(0, self.pools.get_size('key3'))
+        self.assertEqual(2, self.pools.get('key1').get_group_size(('sg1',)))
+        self.assertEqual({'p1', 'p2', 'p3'}, set(self.pools.get('key1')))
+
+    def test_take(self):
+        self.assertEqual('p2', self.pools.take('key1', ('sg1',)))
+        self.assertEqual('p1', self.pools.take('key1', ('sg1',)))
+        self.assertIsNone(self.pools.take('key1', ('sg1',)))
+        self.assertIsNone(self.pools.take('key3', ('sg1',)))
+        self.assertEqual(1, self.pools.get_size('key1'))
+        self.assertEqual({('sg2',): ['p3']}, self.pools.get('key1').groups())
+        self.assertIsNone(self.pools.get_pool_key('p1'))
+
+    def test_take_lru(self):
+        self.pools.touch('key1', ('sg2',))
+        self.assertEqual('p2', self.pools.take_lru('key1'))
+        self.pools.touch('key1', ('sg1',))
+        self.assertEqual('p3', self.pools.take_lru('key1'))
+        self.assertEqual('p1', self.pools.take_lru('key1'))
+        self.assertIsNone(self.pools.take_lru('key1'))
+        self.assertIn('key1', self.pools)
+
+    def test_take_lru_unpopulated_first(self):
+        self.pools.put('key1', ('sg3',), 'p5')
+        self.assertEqual('p5', self.pools.take_lru('key1'))
+
+    def test_put_moves_port(self):
+        self.pools.put('key2', ('sg2',), 'p1')
+        self.assertEqual(4, len(self.pools))
+        self.assertEqual(2, self.pools.get_size('key1'))
+        self.assertEqual('key2', self.pools.get_pool_key('p1'))
+
+    def test_remove(self):
+        self.assertTrue(self.pools.remove('p3'))
+        self.assertFalse(self.pools.remove('p3'))
+        self.assertEqual({('sg1',): ['p1', 'p2']},
+                         self.pools.get('key1').groups())
+
+    def test_remove_group(self):
+        self.assertEqual({'p1', 'p2'},
+                         set(self.pools.remove_group('key1', ('sg1',))))
+        self.assertEqual([], self.pools.remove_group('key1', ('sg1',)))
+        self.assertEqual(1, self.pools.get_size('key1'))
+
+    def test_clear(self):
+        self.assertEqual({'p1', 'p2', 'p3'}, set(self.pools.clear('key1')))
+        self.assertEqual(0, self.pools.get_size('key1'))
+        self.assertEqual(1, len(self.pools))
+        self.assertEqual([], self.pools.clear('key3'))
+
+
+class TestPoolDemand(test_base.TestCase):
+
+    def setUp(self):
+        super(TestPoolDemand, self).setUp()
+        oslo_cfg.CONF.set_override('ports_pool_update_frequency', 20,
+                                   group='vif_pool')
+        self.addCleanup(oslo_cfg.CONF.clear_override,
+                        'ports_pool_update_frequency', group='vif_pool')
+        self.demand = vif_pool.PoolDemand(10, 0.5)
+
+    def test_no_requests(self):
+        self.assertEqual(0, self.demand.get_rate(100))
+        self.assertEqual(0, self.demand.get_target(100))
+
+    def test_rate(self):
+        for now in range(100, 110):
+            self.demand.record_request(now)
+
+        rate = self.demand.get_rate(110)
+        self.assertGreater(rate, 0.5)
+        self.assertLess(rate, 1)
+        self.assertAlmostEqual(rate / math.e, self.demand.get_rate(120))
+        self.assertEqual(math.ceil(rate * 20), self.demand.get_target(110))
+
+    def test_refill_time(self):
+        self.demand.record_request(100)
+        self.demand.record_refill(4)
+        self.assertEqual(4, self.demand.refill_time)
+        self.demand.record_refill(8)
+        self.assertEqual(6, self.demand.refill_time)
+
+        self.assertEqual(math.ceil(self.demand.get_rate(100) * 26),
+                         self.demand.get_target(100))
+
 
 @ddt.ddt
 class NeutronVIFPool(test_base.TestCase):
@@ -462,6 +860,7 @@ class NeutronVIFPool(test_base.TestCase):
     def test__get_port_from_pool(self, m_eventlet, m_get_port_name):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -473,8 +872,8 @@ class NeutronVIFPool(test_base.TestCase):
 
         pod = get_pod_obj()
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([port_id])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): [port_id]}})
         m_driver._existing_vifs = {port_id: port}
         m_get_port_name.return_value = get_pod_name(pod)
 
@@ -503,6 +902,7 @@ class NeutronVIFPool(test_base.TestCase):
                                                m_get_port_name):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -514,8 +914,8 @@ class NeutronVIFPool(test_base.TestCase):
 
         pod = get_pod_obj()
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([port_id])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): [port_id]}})
         m_driver._existing_vifs = {port_id: port}
         m_get_port_name.return_value = get_pod_name(pod)
 
@@ -546,8 +946,8 @@ class NeutronVIFPool(test_base.TestCase):
         subnets = mock.sentinel.subnets
         security_groups = 'test-sg'
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): []}})
         m_driver._last_update = {pool_key: {tuple(security_groups): 1}}
 
         self.assertRaises(exceptions.ResourceNotReady, cls._get_port_from_pool,
@@ -560,6 +960,7 @@ class NeutronVIFPool(test_base.TestCase):
     def test__get_port_from_pool_empty_pool_reuse(self, m_eventlet):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -577,9 +978,9 @@ class NeutronVIFPool(test_base.TestCase):
         pool_length = 5
         m_driver._get_pool_size.return_value = pool_length
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([]),
-                       tuple(security_groups_2): collections.deque([port_id])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): [],
+                       tuple(security_groups_2): [port_id]}})
         m_driver._last_update = {pool_key: {tuple(security_groups): 1,
                                             tuple(security_groups_2): 0}}
         m_driver._existing_vifs = {port_id: port}
@@ -596,6 +997,7 @@ class NeutronVIFPool(test_base.TestCase):
                                                                  m_eventlet):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -613,9 +1015,9 @@ class NeutronVIFPool(test_base.TestCase):
         pool_length = 5
         m_driver._get_pool_size.return_value = pool_length
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([]),
-                       tuple(security_groups_2): collections.deque([port_id])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): [],
+                       tuple(security_groups_2): [port_id]}})
         m_driver._last_update = {}
         m_driver._existing_vifs = {port_id: port}
 
@@ -646,9 +1048,9 @@ class NeutronVIFPool(test_base.TestCase):
         pool_length = 5
         m_driver._get_pool_size.return_value = pool_length
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([]),
-                       tuple(security_groups_2): collections.deque([])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): [],
+                       tuple(security_groups_2): []}})
         m_driver._last_update = {}
         m_driver._existing_vifs = {port_id: port}
 
@@ -662,6 +1064,9 @@ class NeutronVIFPool(test_base.TestCase):
     def test__trigger_return_to_pool(self, max_pool):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -670,7 +1075,7 @@ class NeutronVIFPool(test_base.TestCase):
         pool_length = 5
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._recovered_pools = True
         oslo_cfg.CONF.set_override('ports_pool_max',
                                    max_pool,
@@ -693,6 +1098,9 @@ class NeutronVIFPool(test_base.TestCase):
     def test__trigger_return_to_pool_no_update(self, max_pool):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -701,7 +1109,7 @@ class NeutronVIFPool(test_base.TestCase):
         pool_length = 5
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         oslo_cfg.CONF.set_override('ports_pool_max',
                                    max_pool,
                                    group='vif_pool')
@@ -717,12 +1125,18 @@ class NeutronVIFPool(test_base.TestCase):
 
         cls._trigger_return_to_pool(m_driver)
 
+        os_net.ports.assert_called_once_with(id=[port_id])
         os_net.update_port.assert_not_called()
         os_net.delete_port.assert_not_called()
 
     def test__trigger_return_to_pool_delete_port(self):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -732,7 +1146,7 @@ class NeutronVIFPool(test_base.TestCase):
         vif = mock.sentinel.vif
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {port_id: vif}
         m_driver._recovered_pools = True
         oslo_cfg.CONF.set_override('ports_pool_max',
@@ -748,9 +1162,116 @@ class NeutronVIFPool(test_base.TestCase):
         os_net.update_port.assert_not_called()
         os_net.delete_port.assert_called_once_with(port_id)
 
+    def test__trigger_return_to_pool_adaptive_idle(self):
+        cls = vif_pool.NeutronVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
+        demand = mock.Mock(spec=vif_pool.PoolDemand)
+        demand.get_target.return_value = 0
+        m_driver._get_pool_demand.return_value = demand
+        oslo_cfg.CONF.set_override('ports_pool_sizing', 'adaptive',
+                                   group='vif_pool')
+        oslo_cfg.CONF.set_override('ports_pool_min', 0, group='vif_pool')
+        for name in ('ports_pool_sizing', 'ports_pool_min'):
+            self.addCleanup(oslo_cfg.CONF.clear_override, name,
+                            group='vif_pool')
+
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+
+        pool_key = ('node_ip', 'project_id')
+        port_id = str(uuid.uuid4())
+
+        m_driver._recyclable_ports = {port_id: pool_key}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
+        m_driver._existing_vifs = {port_id: mock.sentinel.vif}
+        m_driver._recovered_pools = True
+        os_net.ports.return_value = [
+            munch.Munch({'id': port_id,
+                         'security_group_ids': ['security_group']})]
+        m_driver._get_pool_size.return_value = 0
+
+        cls._trigger_return_to_pool(m_driver)
+
+        os_net.update_port.assert_not_called()
+        os_net.delete_port.assert_called_once_with(port_id)
+
+    def test__trigger_return_to_pool_adaptive_shrink(self):
+        cls = vif_pool.NeutronVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_pool_size.side_effect = functools.partial(
+            cls._get_pool_size, m_driver)
+        demand = mock.Mock(spec=vif_pool.PoolDemand)
+        # Demand of the pool has decayed after a burst.
+        demand.get_target.return_value = 0
+        m_driver._get_pool_demand.return_value = demand
+        oslo_cfg.CONF.set_override('ports_pool_sizing', 'adaptive',
+                                   group='vif_pool')
+        oslo_cfg.CONF.set_override('ports_pool_min', 2, group='vif_pool')
+        for name in ('ports_pool_sizing', 'ports_pool_min'):
+            self.addCleanup(oslo_cfg.CONF.clear_override, name,
+                            group='vif_pool')
+
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+
+        pool_key = ('node_ip', 'project_id')
+        port_ids = [str(uuid.uuid4()) for _ in range(5)]
+        m_driver._recyclable_ports = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
+        for i, port_id in enumerate(port_ids):
+            m_driver._available_ports_pools.put(pool_key, ('sg%d' % i,),
+                                                port_id)
+        m_driver._existing_vifs = {port_id: mock.sentinel.vif
+                                   for port_id in port_ids}
+        m_driver._recovered_pools = True
+
+        cls._trigger_return_to_pool(m_driver)
+
+        self.assertEqual(2, m_driver._available_ports_pools.get_size(
+            pool_key))
+        # The least recently populated ports are deleted.
+        self.assertEqual(3, os_net.delete_port.call_count)
+        os_net.delete_port.assert_has_calls(
+            [mock.call(port_id) for port_id in port_ids[2:]], any_order=True)
+        self.assertEqual(set(port_ids[:2]), set(m_driver._existing_vifs))
+
+    def test__trigger_return_to_pool_static_no_shrink(self):
+        cls = vif_pool.NeutronVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_pool_size.side_effect = functools.partial(
+            cls._get_pool_size, m_driver)
+        oslo_cfg.CONF.set_override('ports_pool_min', 2, group='vif_pool')
+        self.addCleanup(oslo_cfg.CONF.clear_override, 'ports_pool_min',
+                        group='vif_pool')
+        self.useFixture(k_fix.MockNetworkClient())
+
+        pool_key = ('node_ip', 'project_id')
+        m_driver._recyclable_ports = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
+        for i in range(5):
+            m_driver._available_ports_pools.put(pool_key, ('sg',),
+                                                str(uuid.uuid4()))
+        m_driver._recovered_pools = True
+
+        cls._trigger_return_to_pool(m_driver)
+
+        self.assertEqual(5, m_driver._available_ports_pools.get_size(
+            pool_key))
+        m_driver._delete_ports.assert_called_once_with([])
+
     def test__trigger_return_to_pool_update_exception(self):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -759,7 +1280,7 @@ class NeutronVIFPool(test_base.TestCase):
         pool_length = 5
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._recovered_pools = True
         oslo_cfg.CONF.set_override('ports_pool_max',
                                    0,
@@ -785,6 +1306,11 @@ class NeutronVIFPool(test_base.TestCase):
     def test__trigger_return_to_pool_delete_exception(self):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -794,7 +1320,7 @@ class NeutronVIFPool(test_base.TestCase):
         vif = mock.sentinel.vif
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {port_id: vif}
         m_driver._recovered_pools = True
         oslo_cfg.CONF.set_override('ports_pool_max',
@@ -813,6 +1339,11 @@ class NeutronVIFPool(test_base.TestCase):
     def test__trigger_return_to_pool_delete_key_error(self):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -821,7 +1352,7 @@ class NeutronVIFPool(test_base.TestCase):
         pool_length = 10
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {}
         m_driver._recovered_pools = True
         oslo_cfg.CONF.set_override('ports_pool_max',
@@ -842,6 +1373,8 @@ class NeutronVIFPool(test_base.TestCase):
     def test__recover_precreated_ports(self, m_get_subnet, m_to_osvif):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._scan_ports.side_effect = functools.partial(
+            cls._scan_ports, m_driver)
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
         cls_vif_driver = neutron_vif.NeutronPodVIFDriver
@@ -849,7 +1382,7 @@ class NeutronVIFPool(test_base.TestCase):
         m_driver._drv_vif = vif_driver
 
         m_driver._existing_vifs = {}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
 
         port_id = str(uuid.uuid4())
         port = fake.get_port_obj(port_id=port_id)
@@ -877,7 +1410,6 @@ class NeutronVIFPool(test_base.TestCase):
 
         pool_key = (port.binding_host_id, port.project_id, net_id)
         m_driver._get_pool_key.return_value = pool_key
-        m_driver._get_trunks_info.return_value = ({}, {}, {})
 
         cls._recover_precreated_ports(m_driver)
 
@@ -886,19 +1418,39 @@ class NeutronVIFPool(test_base.TestCase):
         m_to_osvif.assert_called_once_with(vif_plugin, port, subnet)
 
         self.assertEqual(m_driver._existing_vifs[port_id], vif)
-        self.assertEqual(m_driver._available_ports_pools[pool_key],
+        pool = m_driver._available_ports_pools.get(pool_key)
+        self.assertEqual(pool.groups(),
                          {tuple(port.security_group_ids): [port_id]})
 
+    def test__recover_precreated_ports_no_cleanup(self):
+        cls = vif_pool.NeutronVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        m_driver._existing_vifs = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
+
+        port = fake.get_port_obj(port_id=str(uuid.uuid4()))
+        port.binding_host_id = None
+        scan = vif_pool.PortsScan()
+        scan.available_ports[port.id] = port
+
+        cls._recover_precreated_ports(m_driver, scan, cleanup=False)
+
+        # The port may be just being created, so it's left alone.
+        os_net.delete_port.assert_not_called()
+        self.assertEqual(0, len(m_driver._available_ports_pools))
+
     @mock.patch('kuryr_kubernetes.os_vif_util.neutron_to_osvif_vif')
     @mock.patch('kuryr_kubernetes.utils.get_subnet')
     def test__recover_precreated_ports_empty(self, m_get_subnet, m_to_osvif):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._scan_ports.side_effect = functools.partial(
+            cls._scan_ports, m_driver)
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
         filtered_ports = []
         os_net.ports.return_value = filtered_ports
-        m_driver._get_trunks_info.return_value = ({}, {}, {})
         m_driver._get_in_use_ports_info.return_value = [], {}
 
         oslo_cfg.CONF.set_override('port_debug',
@@ -914,14 +1466,16 @@ class NeutronVIFPool(test_base.TestCase):
     def test_delete_network_pools(self):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
         net_id = mock.sentinel.net_id
         pool_key = ('node_ip', 'project_id')
         port_id = str(uuid.uuid4())
-        m_driver._available_ports_pools = {pool_key: {
-            tuple(['security_group']): [port_id]}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({pool_key: {
+            tuple(['security_group']): [port_id]}})
         m_driver._existing_vifs = {port_id: mock.sentinel.vif}
         m_driver._recovered_pools = True
 
@@ -951,14 +1505,16 @@ class NeutronVIFPool(test_base.TestCase):
     def test_delete_network_pools_missing_port_id(self):
         cls = vif_pool.NeutronVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
         net_id = mock.sentinel.net_id
         pool_key = ('node_ip', 'project_id')
         port_id = str(uuid.uuid4())
-        m_driver._available_ports_pools = {pool_key: {
-            tuple(['security_group']): [port_id]}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({pool_key: {
+            tuple(['security_group']): [port_id]}})
         m_driver._existing_vifs = {}
         m_driver._recovered_pools = True
 
@@ -971,6 +1527,163 @@ class NeutronVIFPool(test_base.TestCase):
         os_net.delete_port.assert_called_once_with(port_id)
 
 
+class PoolsCheckpoint(test_base.TestCase):
+
+    def setUp(self):
+        super(PoolsCheckpoint, self).setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.path = os.path.join(tmp_dir, 'pools.json')
+        oslo_cfg.CONF.set_override('ports_pool_checkpoint_file', self.path,
+                                   group='vif_pool')
+        self.addCleanup(oslo_cfg.CONF.clear_override,
+                        'ports_pool_checkpoint_file', group='vif_pool')
+        self.os_net = self.useFixture(k_fix.MockNetworkClient()).client
+
+        self.cls = vif_pool.NeutronVIFPool
+        self.m_driver = self._get_driver()
+        self.pool_key = ('node1', 'project1', 'net1')
+        self.port_ids = [str(uuid.uuid4()) for _ in range(3)]
+        self.m_driver._available_ports_pools = vif_pool.PoolIndex(
+            {self.pool_key: {('sg1',): self.port_ids}})
+        self.m_driver._existing_vifs = {
+            port_id: osv_vif.VIFOpenVSwitch(id=port_id)
+            for port_id in self.port_ids}
+
+    def _get_driver(self, cls=None):
+        cls = cls or self.cls
+        m_driver = mock.MagicMock(spec=cls)
+        m_driver._recovered_pools = True
+        m_driver._pool_port_owners = cls._pool_port_owners
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
+        m_driver._existing_vifs = {}
+        m_driver._get_in_use_ports_info.return_value = [], {}
+        return m_driver
+
+    def _get_port(self, port_id, sgs=('sg2',)):
+        port = fake.get_port_obj(port_id=port_id)
+        port.device_owner = 'compute:kuryr'
+        port.security_group_ids = list(sgs)
+        return port
+
+    def test_save_and_load(self):
+        self.cls._save_checkpoint(self.m_driver)
+
+        m_driver = self._get_driver()
+        m_driver._get_in_use_ports_info.return_value = [self.port_ids[0]], {}
+        self.os_net.ports.return_value = [self._get_port(self.port_ids[1])]
+
+        self.assertTrue(self.cls._load_checkpoint(m_driver))
+
+        self.os_net.ports.assert_called_once_with(id=self.port_ids[1:])
+        pools = m_driver._available_ports_pools
+        self.assertEqual({('sg2',): [self.port_ids[1]]},
+                         pools.get(self.pool_key).groups())
+        self.assertEqual(self.port_ids[1],
+                         m_driver._existing_vifs[self.port_ids[1]].id)
+        self.assertEqual([self.port_ids[1]], list(m_driver._existing_vifs))
+
+    def test_save_not_recovered(self):
+        self.m_driver._recovered_pools = False
+        self.cls._save_checkpoint(self.m_driver)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_load_no_checkpoint(self):
+        self.assertFalse(self.cls._load_checkpoint(self.m_driver))
+        self.os_net.ports.assert_not_called()
+
+    def test_load_other_driver(self):
+        self.cls._save_checkpoint(self.m_driver)
+        cls = vif_pool.NestedVIFPool
+        self.assertFalse(cls._load_checkpoint(self._get_driver(cls)))
+
+    def test_load_invalid(self):
+        with open(self.path, 'w') as f:
+            f.write('{"driver": "NeutronVIFPool"')
+        self.assertFalse(self.cls._load_checkpoint(self.m_driver))
+
+    def test_load_not_kuryr_port(self):
+        self.cls._save_checkpoint(self.m_driver)
+        m_driver = self._get_driver()
+        port = self._get_port(self.port_ids[0])
+        port.device_owner = 'compute:nova'
+        self.os_net.ports.return_value = [port]
+
+        self.assertTrue(self.cls._load_checkpoint(m_driver))
+        self.assertEqual(0, len(m_driver._available_ports_pools))
+
+    def test_load_neutron_error(self):
+        self.cls._save_checkpoint(self.m_driver)
+        m_driver = self._get_driver()
+        self.os_net.ports.side_effect = os_exc.SDKException
+
+        self.assertFalse(self.cls._load_checkpoint(m_driver))
+        self.assertEqual(0, len(m_driver._available_ports_pools))
+
+    @mock.patch('eventlet.spawn')
+    @mock.patch('os.remove')
+    def test_sync_pools_from_checkpoint(self, m_remove, m_spawn):
+        m_driver = self._get_driver()
+        m_driver._load_checkpoint.return_value = True
+
+        self.cls.sync_pools(m_driver)
+
+        self.assertTrue(m_driver._recovered_pools)
+        m_driver._create_healthcheck_file.assert_called_once()
+        m_driver._recover_precreated_ports.assert_not_called()
+        m_spawn.assert_called_once_with(
+            m_driver._recover_ports_missing_in_checkpoint)
+
+    @mock.patch('eventlet.spawn')
+    @mock.patch('os.remove')
+    def test_sync_pools_no_checkpoint(self, m_remove, m_spawn):
+        m_driver = self._get_driver()
+        m_driver._load_checkpoint.return_value = False
+
+        self.cls.sync_pools(m_driver)
+
+        self.assertTrue(m_driver._recovered_pools)
+        m_driver._cleanup_leftover_ports.assert_called_once()
+        m_driver._recover_precreated_ports.assert_called_once()
+        m_spawn.assert_not_called()
+
+    @mock.patch('eventlet.spawn')
+    @mock.patch('os.remove')
+    def test_sync_pools_no_checkpoint_nested(self, m_remove, m_spawn):
+        cls = vif_pool.NestedVIFPool
+        m_driver = self._get_driver(cls)
+        m_driver._load_checkpoint.return_value = False
+
+        cls.sync_pools(m_driver)
+
+        self.assertTrue(m_driver._recovered_pools)
+        scan = m_driver._scan_ports.return_value
+        # Leftovers are cleaned up before the pools can be used.
+        m_driver._cleanup_leftover_ports.assert_called_once_with(scan)
+        m_driver._recover_precreated_ports.assert_called_once_with(scan)
+        m_spawn.assert_not_called()
+
+    def test_recover_ports_missing_in_checkpoint(self):
+        m_driver = self._get_driver()
+
+        self.cls._recover_ports_missing_in_checkpoint(m_driver)
+
+        m_driver._recover_precreated_ports.assert_called_once_with(
+            m_driver._scan_ports.return_value, cleanup=False)
+        m_driver._cleanup_leftover_ports.assert_not_called()
+
+    def test_recover_ports_missing_in_checkpoint_nested(self):
+        cls = vif_pool.NestedVIFPool
+        m_driver = self._get_driver(cls)
+
+        cls._recover_ports_missing_in_checkpoint(m_driver)
+
+        m_driver._precreated_ports.assert_called_once_with(
+            action='recover', scan=m_driver._scan_ports.return_value,
+            cleanup=False)
+        m_driver._cleanup_leftover_ports.assert_not_called()
+
+
 @ddt.ddt
 class NestedVIFPool(test_base.TestCase):
 
@@ -1014,6 +1727,7 @@ class NestedVIFPool(test_base.TestCase):
     def test__get_port_from_pool(self, m_eventlet, m_get_port_name):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -1025,8 +1739,8 @@ class NestedVIFPool(test_base.TestCase):
 
         pod = get_pod_obj()
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([port_id])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): [port_id]}})
         m_driver._existing_vifs = {port_id: port}
         m_get_port_name.return_value = get_pod_name(pod)
 
@@ -1052,6 +1766,7 @@ class NestedVIFPool(test_base.TestCase):
                                                m_get_port_name):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -1063,8 +1778,8 @@ class NestedVIFPool(test_base.TestCase):
 
         pod = get_pod_obj()
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([port_id])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): [port_id]}})
         m_driver._existing_vifs = {port_id: port}
         m_get_port_name.return_value = get_pod_name(pod)
 
@@ -1095,8 +1810,8 @@ class NestedVIFPool(test_base.TestCase):
         subnets = mock.sentinel.subnets
         security_groups = 'test-sg'
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): []}})
         m_driver._last_update = {pool_key: {tuple(security_groups): 1}}
 
         self.assertRaises(exceptions.ResourceNotReady, cls._get_port_from_pool,
@@ -1109,6 +1824,7 @@ class NestedVIFPool(test_base.TestCase):
     def test__get_port_from_pool_empty_pool_reuse(self, m_eventlet):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -1126,9 +1842,9 @@ class NestedVIFPool(test_base.TestCase):
         pool_length = 5
         m_driver._get_pool_size.return_value = pool_length
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([]),
-                       tuple(security_groups_2): collections.deque([port_id])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): [],
+                       tuple(security_groups_2): [port_id]}})
         m_driver._last_update = {pool_key: {tuple(security_groups): 1,
                                             tuple(security_groups_2): 0}}
         m_driver._existing_vifs = {port_id: port}
@@ -1145,6 +1861,7 @@ class NestedVIFPool(test_base.TestCase):
                                                                  m_eventlet):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -1162,9 +1879,9 @@ class NestedVIFPool(test_base.TestCase):
         pool_length = 5
         m_driver._get_pool_size.return_value = pool_length
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([]),
-                       tuple(security_groups_2): collections.deque([port_id])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): [],
+                       tuple(security_groups_2): [port_id]}})
         m_driver._last_update = {}
         m_driver._existing_vifs = {port_id: port}
 
@@ -1195,9 +1912,9 @@ class NestedVIFPool(test_base.TestCase):
         pool_length = 5
         m_driver._get_pool_size.return_value = pool_length
 
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(security_groups): collections.deque([]),
-                       tuple(security_groups_2): collections.deque([])}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(security_groups): [],
+                       tuple(security_groups_2): []}})
         m_driver._last_update = {}
         m_driver._existing_vifs = {port_id: port}
 
@@ -1211,6 +1928,9 @@ class NestedVIFPool(test_base.TestCase):
     def test__trigger_return_to_pool(self, max_pool):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -1219,7 +1939,7 @@ class NestedVIFPool(test_base.TestCase):
         pool_length = 5
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         oslo_cfg.CONF.set_override('ports_pool_max',
                                    max_pool,
                                    group='vif_pool')
@@ -1243,6 +1963,9 @@ class NestedVIFPool(test_base.TestCase):
     def test__trigger_return_to_pool_no_update(self, max_pool):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -1251,7 +1974,7 @@ class NestedVIFPool(test_base.TestCase):
         pool_length = 5
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         oslo_cfg.CONF.set_override('ports_pool_max',
                                    max_pool,
                                    group='vif_pool')
@@ -1272,6 +1995,13 @@ class NestedVIFPool(test_base.TestCase):
     def test__trigger_return_to_pool_delete_port(self):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        m_driver._remove_subports.side_effect = functools.partial(
+            cls._remove_subports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -1287,7 +2017,7 @@ class NestedVIFPool(test_base.TestCase):
         trunk_id = str(uuid.uuid4())
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {port_id: vif}
         oslo_cfg.CONF.set_override('ports_pool_max',
                                    10,
@@ -1297,7 +2027,6 @@ class NestedVIFPool(test_base.TestCase):
         os_net.ports.return_value = [port]
         m_driver._get_pool_size.return_value = pool_length
         m_driver._get_trunk_id.return_value = trunk_id
-        m_driver._known_trunk_ids = {}
         m_driver._recovered_pools = True
 
         cls._trigger_return_to_pool(m_driver)
@@ -1305,12 +2034,173 @@ class NestedVIFPool(test_base.TestCase):
         os_net.update_port.assert_not_called()
         os_net.delete_port.assert_called_once_with(port_id)
         m_driver._get_trunk_id.assert_called_once()
-        m_driver._drv_vif._remove_subport.assert_called_once_with(trunk_id,
-                                                                  port_id)
+        m_driver._drv_vif._remove_subports.assert_called_once_with(
+            trunk_id, [port_id])
+
+    def test__trigger_return_to_pool_delete_ports_per_trunk(self):
+        cls = vif_pool.NestedVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        m_driver._remove_subports.side_effect = functools.partial(
+            cls._remove_subports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
+        vif_driver = mock.MagicMock(spec=cls_vif_driver)
+        m_driver._drv_vif = vif_driver
+
+        pool_key1 = ('node_ip1', 'project_id')
+        pool_key2 = ('node_ip2', 'project_id')
+        trunk_ids = {pool_key1: 'trunk1', pool_key2: 'trunk2'}
+        port_ids = [str(uuid.uuid4()) for _ in range(3)]
+        vifs = {}
+        for vlan_id, port_id in enumerate(port_ids):
+            vifs[port_id] = mock.Mock(vlan_id=vlan_id)
+
+        m_driver._recyclable_ports = {port_ids[0]: pool_key1,
+                                      port_ids[1]: pool_key1,
+                                      port_ids[2]: pool_key2}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
+        m_driver._existing_vifs = dict(vifs)
+        oslo_cfg.CONF.set_override('ports_pool_max', 5, group='vif_pool')
+        oslo_cfg.CONF.set_override('port_debug', False, group='kubernetes')
+        os_net.ports.return_value = []
+        m_driver._get_pool_size.return_value = 10
+        m_driver._get_trunk_id.side_effect = trunk_ids.get
+        m_driver._recovered_pools = True
+        vif_driver._remove_subports.side_effect = [None,
+                                                   os_exc.SDKException]
+        vif_driver._remove_subport.side_effect = os_exc.SDKException
+
+        cls._trigger_return_to_pool(m_driver)
+
+        vif_driver._remove_subports.assert_has_calls([
+            mock.call('trunk1', port_ids[:2]),
+            mock.call('trunk2', port_ids[2:])])
+        vif_driver._release_vlan_id.assert_has_calls([
+            mock.call('trunk1', 0), mock.call('trunk1', 1)])
+        self.assertEqual(2, os_net.delete_port.call_count)
+        os_net.delete_port.assert_has_calls(
+            [mock.call(port_ids[0]), mock.call(port_ids[1])], any_order=True)
+        # Ports failing to be detached are retried in the next iteration.
+        self.assertEqual({port_ids[2]: pool_key2},
+                         m_driver._recyclable_ports)
+        self.assertEqual({port_ids[2]: vifs[port_ids[2]]},
+                         m_driver._existing_vifs)
+
+    def test__trigger_return_to_pool_remove_subports_fallback(self):
+        cls = vif_pool.NestedVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        m_driver._remove_subports.side_effect = functools.partial(
+            cls._remove_subports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
+        vif_driver = mock.MagicMock(spec=cls_vif_driver)
+        m_driver._drv_vif = vif_driver
+
+        pool_key = ('node_ip', 'project_id')
+        port_ids = [str(uuid.uuid4()) for _ in range(3)]
+        vifs = {}
+        for vlan_id, port_id in enumerate(port_ids):
+            vifs[port_id] = mock.Mock(vlan_id=vlan_id)
+
+        m_driver._recyclable_ports = {port_id: pool_key
+                                      for port_id in port_ids}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
+        m_driver._existing_vifs = dict(vifs)
+        oslo_cfg.CONF.set_override('ports_pool_max', 5, group='vif_pool')
+        oslo_cfg.CONF.set_override('port_debug', False, group='kubernetes')
+        os_net.ports.return_value = []
+        m_driver._get_pool_size.return_value = 10
+        m_driver._get_trunk_id.return_value = 'trunk'
+        m_driver._recovered_pools = True
+        # One of the ports got detached in the meantime, so the whole batch
+        # fails.
+        vif_driver._remove_subports.side_effect = os_exc.NotFoundException
+        vif_driver._remove_subport.side_effect = [
+            None, os_exc.NotFoundException, os_exc.SDKException]
+
+        cls._trigger_return_to_pool(m_driver)
+
+        vif_driver._remove_subports.assert_called_once_with('trunk',
+                                                            port_ids)
+        vif_driver._remove_subport.assert_has_calls([
+            mock.call('trunk', port_id) for port_id in port_ids])
+        os_net.delete_port.assert_has_calls(
+            [mock.call(port_ids[0]), mock.call(port_ids[1])], any_order=True)
+        self.assertEqual(2, os_net.delete_port.call_count)
+        # Only the port failing to be detached is retried.
+        self.assertEqual({port_ids[2]: pool_key},
+                         m_driver._recyclable_ports)
+        self.assertEqual({port_ids[2]: vifs[port_ids[2]]},
+                         m_driver._existing_vifs)
+
+    def test__trigger_return_to_pool_adaptive_shrink(self):
+        cls = vif_pool.NestedVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        m_driver._remove_subports.side_effect = functools.partial(
+            cls._remove_subports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_pool_size.side_effect = functools.partial(
+            cls._get_pool_size, m_driver)
+        demand = mock.Mock(spec=vif_pool.PoolDemand)
+        demand.get_target.return_value = 0
+        m_driver._get_pool_demand.return_value = demand
+        oslo_cfg.CONF.set_override('ports_pool_sizing', 'adaptive',
+                                   group='vif_pool')
+        oslo_cfg.CONF.set_override('ports_pool_min', 1, group='vif_pool')
+        for name in ('ports_pool_sizing', 'ports_pool_min'):
+            self.addCleanup(oslo_cfg.CONF.clear_override, name,
+                            group='vif_pool')
+        os_net = self.useFixture(k_fix.MockNetworkClient()).client
+        cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
+        vif_driver = mock.MagicMock(spec=cls_vif_driver)
+        m_driver._drv_vif = vif_driver
+
+        pool_key = ('node_ip', 'project_id')
+        port_ids = [str(uuid.uuid4()) for _ in range(3)]
+        vifs = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
+        for vlan_id, port_id in enumerate(port_ids):
+            vifs[port_id] = mock.Mock(vlan_id=vlan_id)
+            m_driver._available_ports_pools.put(pool_key, ('sg',), port_id)
+        m_driver._recyclable_ports = {}
+        m_driver._existing_vifs = dict(vifs)
+        m_driver._get_trunk_id.return_value = 'trunk'
+        m_driver._recovered_pools = True
+        # The second port fails to be detached.
+        vif_driver._remove_subports.side_effect = os_exc.SDKException
+        vif_driver._remove_subport.side_effect = [None, os_exc.SDKException]
+
+        cls._trigger_return_to_pool(m_driver)
+
+        self.assertEqual(1, m_driver._available_ports_pools.get_size(
+            pool_key))
+        removed = [args[1] for args, kwargs in
+                   vif_driver._remove_subport.call_args_list]
+        self.assertEqual(2, len(removed))
+        vif_driver._release_vlan_id.assert_called_once_with(
+            'trunk', vifs[removed[0]].vlan_id)
+        os_net.delete_port.assert_called_once_with(removed[0])
+        # The port failing to be detached is recycled later on.
+        self.assertEqual({removed[1]: pool_key}, m_driver._recyclable_ports)
 
     def test__trigger_return_to_pool_update_exception(self):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
@@ -1319,7 +2209,7 @@ class NestedVIFPool(test_base.TestCase):
         pool_length = 5
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         oslo_cfg.CONF.set_override('ports_pool_max',
                                    0,
                                    group='vif_pool')
@@ -1342,6 +2232,13 @@ class NestedVIFPool(test_base.TestCase):
     def test__trigger_return_to_pool_delete_exception(self):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        m_driver._remove_subports.side_effect = functools.partial(
+            cls._remove_subports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
         cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
         vif_driver = mock.MagicMock(spec=cls_vif_driver)
@@ -1355,7 +2252,7 @@ class NestedVIFPool(test_base.TestCase):
         trunk_id = str(uuid.uuid4())
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {port_id: vif}
         oslo_cfg.CONF.set_override('ports_pool_max',
                                    5,
@@ -1365,20 +2262,26 @@ class NestedVIFPool(test_base.TestCase):
         os_net.ports.return_value = [port]
         m_driver._get_pool_size.return_value = pool_length
         m_driver._get_trunk_id.return_value = trunk_id
-        m_driver._known_trunk_ids = {}
         m_driver._recovered_pools = True
 
         cls._trigger_return_to_pool(m_driver)
 
         os_net.update_port.assert_not_called()
         m_driver._get_trunk_id.assert_called_once()
-        m_driver._drv_vif._remove_subport.assert_called_once_with(trunk_id,
-                                                                  port_id)
+        m_driver._drv_vif._remove_subports.assert_called_once_with(
+            trunk_id, [port_id])
         os_net.delete_port.assert_called_once_with(port_id)
 
     def test__trigger_return_to_pool_delete_key_error(self):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
+        m_driver._remove_subports.side_effect = functools.partial(
+            cls._remove_subports, m_driver)
+        _use_pool_sizing(m_driver, cls)
+        m_driver._get_ports_security_groups.side_effect = (
+            functools.partial(cls._get_ports_security_groups, m_driver))
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
         cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
         vif_driver = mock.MagicMock(spec=cls_vif_driver)
@@ -1390,7 +2293,7 @@ class NestedVIFPool(test_base.TestCase):
         trunk_id = str(uuid.uuid4())
 
         m_driver._recyclable_ports = {port_id: pool_key}
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {}
         oslo_cfg.CONF.set_override('ports_pool_max',
                                    5,
@@ -1399,7 +2302,6 @@ class NestedVIFPool(test_base.TestCase):
         port.security_group_ids = ['security_group_modified']
         os_net.ports.return_value = [port]
         m_driver._get_pool_size.return_value = pool_length
-        m_driver._known_trunk_ids = {}
         m_driver._get_trunk_id.return_value = trunk_id
         m_driver._recovered_pools = True
 
@@ -1407,8 +2309,8 @@ class NestedVIFPool(test_base.TestCase):
 
         os_net.update_port.assert_not_called()
         m_driver._get_trunk_id.assert_called_once()
-        m_driver._drv_vif._remove_subport.assert_called_once_with(trunk_id,
-                                                                  port_id)
+        m_driver._drv_vif._remove_subports.assert_called_once_with(
+            trunk_id, [port_id])
         os_net.delete_port.assert_not_called()
 
     def test__get_parent_port_ip(self):
@@ -1426,34 +2328,105 @@ class NestedVIFPool(test_base.TestCase):
         self.assertEqual(ip_address, cls._get_parent_port_ip(m_driver,
                                                              port_id))
 
+    def test__get_trunk_id(self):
+        cls = vif_pool.NestedVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
+        vif_driver = mock.MagicMock(spec=cls_vif_driver)
+        m_driver._drv_vif = vif_driver
+        trunk_id = mock.sentinel.trunk_id
+        vif_driver._get_trunk_id_by_host_ip.return_value = trunk_id
+
+        self.assertEqual(trunk_id, cls._get_trunk_id(
+            m_driver, ('node_ip', 'project_id', 'net_id')))
+        vif_driver._get_trunk_id_by_host_ip.assert_called_once_with('node_ip')
+
+    @mock.patch('kuryr_kubernetes.controller.drivers.vif_pool.BaseVIFPool.'
+                'release_vif')
+    def test_release_vif_no_host_ip(self, m_release_vif):
+        cls = vif_pool.NestedVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
+        vif_driver = mock.MagicMock(spec=cls_vif_driver)
+        m_driver._drv_vif = vif_driver
+        m_driver._recovered_pools = True
+        m_driver._get_host_addr.side_effect = KeyError
+        vif_driver._get_subport_host_ip.return_value = 'node_ip'
+        pod = get_pod_obj()
+        vif = mock.Mock()
+
+        cls.release_vif(m_driver, pod, vif, mock.sentinel.project_id,
+                        mock.sentinel.sgs)
+
+        vif_driver._get_subport_host_ip.assert_called_once_with(vif.id)
+        m_driver._get_parent_port_id.assert_not_called()
+        m_release_vif.assert_called_once_with(
+            pod, vif, mock.sentinel.project_id, mock.sentinel.sgs,
+            host_addr='node_ip')
+
+    @mock.patch('kuryr_kubernetes.controller.drivers.vif_pool.BaseVIFPool.'
+                'release_vif')
+    def test_release_vif_no_host_ip_unknown_subport(self, m_release_vif):
+        cls = vif_pool.NestedVIFPool
+        m_driver = mock.MagicMock(spec=cls)
+        cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
+        vif_driver = mock.MagicMock(spec=cls_vif_driver)
+        m_driver._drv_vif = vif_driver
+        m_driver._recovered_pools = True
+        m_driver._get_host_addr.side_effect = KeyError
+        vif_driver._get_subport_host_ip.return_value = None
+        m_driver._get_parent_port_id.return_value = mock.sentinel.parent_id
+        m_driver._get_parent_port_ip.return_value = 'node_ip'
+        pod = get_pod_obj()
+        vif = mock.Mock()
+
+        cls.release_vif(m_driver, pod, vif, mock.sentinel.project_id,
+                        mock.sentinel.sgs)
+
+        m_driver._get_parent_port_id.assert_called_once_with(vif)
+        m_driver._get_parent_port_ip.assert_called_once_with(
+            mock.sentinel.parent_id)
+        m_release_vif.assert_called_once_with(
+            pod, vif, mock.sentinel.project_id, mock.sentinel.sgs,
+            host_addr='node_ip')
+
+    def _use_ports_scan(self, m_driver, cls):
+        m_driver._scan_ports.side_effect = functools.partial(
+            cls._scan_ports, m_driver)
+        m_driver._get_parent_ports.side_effect = functools.partial(
+            cls._get_parent_ports, m_driver)
+
     @mock.patch('kuryr_kubernetes.utils.get_subnet')
     def test__get_trunk_info(self, m_get_subnet):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        self._use_ports_scan(m_driver, cls)
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
         port_id = str(uuid.uuid4())
         trunk_port = fake.get_port_obj(port_id=port_id)
+        trunk_port.status = 'ACTIVE'
         trunk_id = str(uuid.uuid4())
-        trunk_details = {
-            'trunk_id': trunk_id,
-            'sub_ports': [{
-                'port_id': '85104e7d-8597-4bf7-94e7-a447ef0b50f1',
-                'segmentation_type': 'vlan',
-                'segmentation_id': 4056}]}
-        trunk_port.trunk_details = trunk_details
+        sub_ports = [{'port_id': '85104e7d-8597-4bf7-94e7-a447ef0b50f1',
+                      'segmentation_type': 'vlan',
+                      'segmentation_id': 4056}]
+        trunk = munch.Munch({'id': trunk_id, 'port_id': port_id,
+                             'sub_ports': sub_ports})
 
         subport_id = str(uuid.uuid4())
         subport = fake.get_port_obj(port_id=subport_id,
                                     device_owner='trunk:subport')
-        os_net.ports.return_value = [trunk_port, subport]
+        subport.status = 'ACTIVE'
+        os_net.trunks.return_value = [trunk]
+        os_net.ports.side_effect = lambda **kw: (
+            [trunk_port] if 'id' in kw else [subport])
         m_driver._get_in_use_ports_info.return_value = [], {}
         subnet = mock.sentinel.subnet
         m_get_subnet.return_value = subnet
 
         exp_p_ports = {trunk_id: {
             'ip': trunk_port.fixed_ips[0]['ip_address'],
-            'subports': trunk_details['sub_ports']}}
+            'subports': sub_ports}}
         exp_subnets = {subport.fixed_ips[0]['subnet_id']:
                        {subport.fixed_ips[0]['subnet_id']: subnet}}
 
@@ -1463,13 +2436,19 @@ class NestedVIFPool(test_base.TestCase):
         self.assertDictEqual(r_subports[subport_id].to_dict(),
                              subport.to_dict())
         self.assertEqual(r_subnets, exp_subnets)
+        os_net.ports.assert_any_call(id=[port_id], status='ACTIVE')
+        os_net.ports.assert_any_call(
+            device_owner=['compute:kuryr', 'trunk:subport'])
+        self.assertEqual(2, os_net.ports.call_count)
 
     def test__get_trunk_info_empty(self):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        self._use_ports_scan(m_driver, cls)
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
         os_net.ports.return_value = []
+        os_net.trunks.return_value = []
         m_driver._get_in_use_ports_info.return_value = [], {}
 
         r_p_ports, r_subports, r_subnets = cls._get_trunks_info(m_driver)
@@ -1478,14 +2457,17 @@ class NestedVIFPool(test_base.TestCase):
         self.assertEqual(r_subports, {})
         self.assertEqual(r_subnets, {})
 
-    def test__get_trunk_info_no_trunk_details(self):
+    def test__get_trunk_info_down_subport(self):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        self._use_ports_scan(m_driver, cls)
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
         port_id = str(uuid.uuid4())
-        port = fake.get_port_obj(port_id=port_id, device_owner='compute:nova')
+        port = fake.get_port_obj(port_id=port_id,
+                                 device_owner='trunk:subport')
         os_net.ports.return_value = [port]
+        os_net.trunks.return_value = []
         m_driver._get_in_use_ports_info.return_value = [], {}
 
         r_p_ports, r_subports, r_subnets = cls._get_trunks_info(m_driver)
@@ -1499,10 +2481,13 @@ class NestedVIFPool(test_base.TestCase):
     def test__precreated_ports_recover(self, m_to_osvif):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
+        vif_driver = mock.MagicMock(spec=cls_vif_driver)
+        m_driver._drv_vif = vif_driver
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {}
 
         oslo_cfg.CONF.set_override('port_debug',
@@ -1536,18 +2521,27 @@ class NestedVIFPool(test_base.TestCase):
 
         m_driver._get_trunks_info.assert_called_once()
         self.assertEqual(m_driver._existing_vifs[port_id], vif)
-        self.assertEqual(m_driver._available_ports_pools[pool_key],
+        pool = m_driver._available_ports_pools.get(pool_key)
+        self.assertEqual(pool.groups(),
                          {tuple(port.security_group_ids): [port_id]})
+        vif_driver._seed_trunk.assert_called_once_with(
+            trunk_obj['id'], p_ports[trunk_obj['id']]['ip'],
+            trunk_obj['sub_ports'])
         os_net.delete_port.assert_not_called()
 
+    @ddt.data(True, False)
     @mock.patch('kuryr_kubernetes.os_vif_util.'
                 'neutron_to_osvif_vif_nested_vlan')
-    def test__precreated_ports_recover_plus_port_cleanup(self, m_to_osvif):
+    def test__precreated_ports_recover_plus_port_cleanup(self, cleanup,
+                                                         m_to_osvif):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
+        vif_driver = mock.MagicMock(spec=cls_vif_driver)
+        m_driver._drv_vif = vif_driver
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {}
 
         oslo_cfg.CONF.set_override('port_debug',
@@ -1581,13 +2575,17 @@ class NestedVIFPool(test_base.TestCase):
         pool_key = (port.binding_host_id, port.project_id, net_id)
         m_driver._get_pool_key.return_value = pool_key
 
-        cls._precreated_ports(m_driver, 'recover')
+        cls._precreated_ports(m_driver, 'recover', cleanup=cleanup)
 
         m_driver._get_trunks_info.assert_called_once()
         self.assertEqual(m_driver._existing_vifs[port_id], vif)
-        self.assertEqual(m_driver._available_ports_pools[pool_key],
+        pool = m_driver._available_ports_pools.get(pool_key)
+        self.assertEqual(pool.groups(),
                          {tuple(port.security_group_ids): [port_id]})
-        os_net.delete_port.assert_called_with(port_to_delete_id)
+        if cleanup:
+            os_net.delete_port.assert_called_with(port_to_delete_id)
+        else:
+            os_net.delete_port.assert_not_called()
 
     def test__precreated_ports_free(self):
         cls = vif_pool.NestedVIFPool
@@ -1622,8 +2620,8 @@ class NestedVIFPool(test_base.TestCase):
 
         pool_key = (port.binding_host_id, port.project_id, net_id)
         m_driver._get_pool_key.return_value = pool_key
-        m_driver._available_ports_pools = {
-            pool_key: {tuple(port.security_group_ids): [port_id]}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({
+            pool_key: {tuple(port.security_group_ids): [port_id]}})
         m_driver._existing_vifs = {port_id: mock.sentinel.vif}
 
         cls._precreated_ports(m_driver, 'free')
@@ -1634,18 +2632,21 @@ class NestedVIFPool(test_base.TestCase):
         m_driver._drv_vif._release_vlan_id.assert_called_once()
 
         self.assertEqual(m_driver._existing_vifs, {})
-        self.assertEqual(m_driver._available_ports_pools[pool_key][tuple(
-            port.security_group_ids)], [])
+        self.assertEqual(0, m_driver._available_ports_pools.get_size(
+            pool_key))
 
     @mock.patch('kuryr_kubernetes.os_vif_util.'
                 'neutron_to_osvif_vif_nested_vlan')
     def test__precreated_ports_recover_several_trunks(self, m_to_osvif):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
+        vif_driver = mock.MagicMock(spec=cls_vif_driver)
+        m_driver._drv_vif = vif_driver
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {}
 
         oslo_cfg.CONF.set_override('port_debug',
@@ -1697,10 +2698,13 @@ class NestedVIFPool(test_base.TestCase):
     def test__precreated_ports_recover_several_subports(self, m_to_osvif):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
+        vif_driver = mock.MagicMock(spec=cls_vif_driver)
+        m_driver._drv_vif = vif_driver
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {}
 
         oslo_cfg.CONF.set_override('port_debug',
@@ -1744,7 +2748,8 @@ class NestedVIFPool(test_base.TestCase):
         m_driver._get_trunks_info.assert_called_once()
         self.assertEqual(m_driver._existing_vifs, {port_id1: vif,
                                                    port_id2: vif})
-        self.assertEqual(m_driver._available_ports_pools[pool_key],
+        pool = m_driver._available_ports_pools.get(pool_key)
+        self.assertEqual(pool.groups(),
                          {tuple(port1.security_group_ids): [port_id1,
                                                             port_id2]})
         os_net.delete_port.assert_not_called()
@@ -1759,7 +2764,7 @@ class NestedVIFPool(test_base.TestCase):
         oslo_cfg.CONF.set_override('port_debug',
                                    True,
                                    group='kubernetes')
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {}
 
         port_id = mock.sentinel.port_id
@@ -1776,7 +2781,7 @@ class NestedVIFPool(test_base.TestCase):
 
         m_driver._get_trunks_info.assert_called_once()
         self.assertEqual(m_driver._existing_vifs, {})
-        self.assertEqual(m_driver._available_ports_pools, {})
+        self.assertEqual(0, len(m_driver._available_ports_pools))
         os_net.delete_port.assert_not_called()
 
     @ddt.data(('recover'), ('free'))
@@ -1786,7 +2791,7 @@ class NestedVIFPool(test_base.TestCase):
 
         os_net = self.useFixture(k_fix.MockNetworkClient()).client
 
-        m_driver._available_ports_pools = {}
+        m_driver._available_ports_pools = vif_pool.PoolIndex()
         m_driver._existing_vifs = {}
         oslo_cfg.CONF.set_override('port_debug',
                                    True,
@@ -1806,12 +2811,14 @@ class NestedVIFPool(test_base.TestCase):
         cls._precreated_ports(m_driver, m_action)
         m_driver._get_trunks_info.assert_called_once()
         self.assertEqual(m_driver._existing_vifs, {})
-        self.assertEqual(m_driver._available_ports_pools, {})
+        self.assertEqual(0, len(m_driver._available_ports_pools))
         os_net.delete_port.assert_not_called()
 
     def test_delete_network_pools(self):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
         cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
         vif_driver = mock.MagicMock(spec=cls_vif_driver)
         m_driver._drv_vif = vif_driver
@@ -1825,8 +2832,8 @@ class NestedVIFPool(test_base.TestCase):
         vif = mock.MagicMock()
         vlan_id = mock.sentinel.vlan_id
         vif.vlan_id = vlan_id
-        m_driver._available_ports_pools = {pool_key: {
-            tuple(['security_group']): [port_id]}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({pool_key: {
+            tuple(['security_group']): [port_id]}})
         m_driver._existing_vifs = {port_id: vif}
         m_driver._recovered_pools = True
 
@@ -1840,7 +2847,8 @@ class NestedVIFPool(test_base.TestCase):
         m_driver._get_trunk_id.assert_called_once_with(pool_key)
         m_driver._drv_vif._remove_subports.assert_called_once_with(trunk_id,
                                                                    [port_id])
-        m_driver._drv_vif._release_vlan_id.assert_called_once_with(vlan_id)
+        m_driver._drv_vif._release_vlan_id.assert_called_once_with(trunk_id,
+                                                                   vlan_id)
         os_net.delete_port.assert_called_once_with(port_id)
 
     def test_delete_network_pools_not_ready(self):
@@ -1879,8 +2887,8 @@ class NestedVIFPool(test_base.TestCase):
         vif = mock.MagicMock()
         vlan_id = mock.sentinel.vlan_id
         vif.vlan_id = vlan_id
-        m_driver._available_ports_pools = {pool_key: {
-            tuple(['security_group']): [port_id]}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({pool_key: {
+            tuple(['security_group']): [port_id]}})
         m_driver._existing_vifs = {port_id: vif}
         m_driver._recovered_pools = True
 
@@ -1901,6 +2909,8 @@ class NestedVIFPool(test_base.TestCase):
     def test_delete_network_pools_missing_port(self):
         cls = vif_pool.NestedVIFPool
         m_driver = mock.MagicMock(spec=cls)
+        m_driver._delete_ports.side_effect = functools.partial(
+            cls._delete_ports, m_driver)
         cls_vif_driver = nested_vlan_vif.NestedVlanPodVIFDriver
         vif_driver = mock.MagicMock(spec=cls_vif_driver)
         m_driver._drv_vif = vif_driver
@@ -1914,8 +2924,8 @@ class NestedVIFPool(test_base.TestCase):
         vif = mock.MagicMock()
         vlan_id = mock.sentinel.vlan_id
         vif.vlan_id = vlan_id
-        m_driver._available_ports_pools = {pool_key: {
-            tuple(['security_group']): [port_id]}}
+        m_driver._available_ports_pools = vif_pool.PoolIndex({pool_key: {
+            tuple(['security_group']): [port_id]}})
         m_driver._existing_vifs = {}
         m_driver._recovered_pools = True
 
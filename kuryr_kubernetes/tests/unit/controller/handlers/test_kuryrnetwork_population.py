@@ -14,12 +14,17 @@
 
 from unittest import mock
 
+import eventlet
+from openstack import exceptions as os_exc
+from oslo_config import cfg
+
 from kuryr_kubernetes.controller.drivers import base as drivers
 from kuryr_kubernetes.controller.drivers import namespace_subnet as subnet_drv
 from kuryr_kubernetes.controller.drivers import node_subnets
 from kuryr_kubernetes.controller.drivers import utils as driver_utils
 from kuryr_kubernetes.controller.drivers import vif_pool
 from kuryr_kubernetes.controller.handlers import kuryrnetwork_population
+from kuryr_kubernetes import exceptions
 from kuryr_kubernetes.tests import base as test_base
 from kuryr_kubernetes import utils
 
@@ -95,7 +100,105 @@ class TestKuryrNetworkPopulationHandler(test_base.TestCase):
         self._populate_pool.assert_called_once_with(
             'node-ip', self._kuryrnet_crd['spec']['projectId'], self._subnets,
             [])
-        self._patch_kuryrnetwork_crd.assert_called_once()
+        self.assertEqual(2, self._patch_kuryrnetwork_crd.call_count)
+        self._patch_kuryrnetwork_crd.assert_called_with(
+            self._kuryrnet_crd, {'node-ip'}, [], done=True)
+
+    @mock.patch.object(utils, 'get_nodes_ips')
+    def test_on_present_skip_populated_nodes(self, m_get_nodes_ips):
+        m_get_nodes_ips.return_value = ['node-ip1', 'node-ip2']
+        self._kuryrnet_crd['status']['populatedNodes'] = ['node-ip1']
+
+        kuryrnetwork_population.KuryrNetworkPopulationHandler.on_present(
+            self._handler, self._kuryrnet_crd)
+
+        self._populate_pool.assert_called_once_with(
+            'node-ip2', self._kuryrnet_crd['spec']['projectId'],
+            self._subnets, [])
+        self.assertEqual(2, self._patch_kuryrnetwork_crd.call_count)
+        self._patch_kuryrnetwork_crd.assert_called_with(
+            self._kuryrnet_crd, {'node-ip1', 'node-ip2'}, [], done=True)
+
+    @mock.patch.object(utils, 'get_nodes_ips')
+    def test_on_present_node_failure(self, m_get_nodes_ips):
+        m_get_nodes_ips.return_value = ['node-ip1', 'node-ip2', 'node-ip3']
+
+        def _populate_pool(node_ip, *args):
+            if node_ip == 'node-ip1':
+                raise exceptions.ResourceNotReady(node_ip)
+            if node_ip == 'node-ip2':
+                raise os_exc.SDKException()
+        self._populate_pool.side_effect = _populate_pool
+
+        self.assertRaises(
+            exceptions.ResourceNotReady,
+            kuryrnetwork_population.KuryrNetworkPopulationHandler.on_present,
+            self._handler, self._kuryrnet_crd)
+
+        self.assertEqual(3, self._populate_pool.call_count)
+        self.assertEqual(2, self._patch_kuryrnetwork_crd.call_count)
+        self._patch_kuryrnetwork_crd.assert_called_with(
+            self._kuryrnet_crd, {'node-ip3'}, ['node-ip1', 'node-ip2'],
+            done=False)
+
+    @mock.patch.object(utils, 'get_nodes_ips')
+    def test_on_present_progress(self, m_get_nodes_ips):
+        cfg.CONF.set_override('ports_pool_populate_concurrency', 2,
+                              group='vif_pool')
+        self.addCleanup(cfg.CONF.clear_override,
+                        'ports_pool_populate_concurrency', group='vif_pool')
+        nodes = ['node-ip%d' % i for i in range(5)]
+        m_get_nodes_ips.return_value = nodes
+
+        kuryrnetwork_population.KuryrNetworkPopulationHandler.on_present(
+            self._handler, self._kuryrnet_crd)
+
+        self.assertEqual(5, self._populate_pool.call_count)
+        self.assertEqual(4, self._patch_kuryrnetwork_crd.call_count)
+        self._patch_kuryrnetwork_crd.assert_called_with(
+            self._kuryrnet_crd, set(nodes), [], done=True)
+
+    @mock.patch.object(utils, 'get_nodes_ips')
+    def test_on_present_restart(self, m_get_nodes_ips):
+        cfg.CONF.set_override('ports_pool_populate_concurrency', 2,
+                              group='vif_pool')
+        self.addCleanup(cfg.CONF.clear_override,
+                        'ports_pool_populate_concurrency', group='vif_pool')
+        nodes = ['node-ip%d' % i for i in range(5)]
+        m_get_nodes_ips.return_value = nodes
+        recorded = []
+
+        def _patch_kuryrnetwork_crd(kns_crd, populated, failed, done=False):
+            recorded.append(sorted(populated))
+        self._patch_kuryrnetwork_crd.side_effect = _patch_kuryrnetwork_crd
+
+        def _populate_pool(node_ip, *args):
+            # Every node is recorded before its population is triggered.
+            self.assertIn(node_ip, recorded[-1])
+            if node_ip == 'node-ip0':
+                # Simulate the controller getting restarted.
+                raise SystemExit()
+        self._populate_pool.side_effect = _populate_pool
+
+        self.assertRaises(
+            SystemExit,
+            kuryrnetwork_population.KuryrNetworkPopulationHandler.on_present,
+            self._handler, self._kuryrnet_crd)
+
+        # Let the already dispatched threads finish before starting again.
+        eventlet.sleep(0)
+        self._populate_pool.reset_mock()
+        self._populate_pool.side_effect = None
+        self._kuryrnet_crd['status']['populatedNodes'] = recorded[-1]
+
+        kuryrnetwork_population.KuryrNetworkPopulationHandler.on_present(
+            self._handler, self._kuryrnet_crd)
+
+        # The nodes recorded before the restart are not populated again.
+        self._populate_pool.assert_called_once_with(
+            'node-ip4', self._kuryrnet_crd['spec']['projectId'],
+            self._subnets, [])
+        self.assertEqual(nodes, recorded[-1])
 
     def test_on_added_no_subnet(self):
         kns = self._kuryrnet_crd.copy()
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
 from unittest import mock
 
 from openstack import exceptions as os_exc
@@ -23,6 +24,7 @@ from kuryr_kubernetes import constants
 from kuryr_kubernetes.controller.drivers import multi_vif
 from kuryr_kubernetes.controller.handlers import kuryrport
 from kuryr_kubernetes import exceptions as k_exc
+from kuryr_kubernetes import metrics
 from kuryr_kubernetes.tests import base as test_base
 from kuryr_kubernetes.tests.unit import kuryr_fixtures as k_fix
 from kuryr_kubernetes import utils
@@ -152,6 +154,41 @@ class TestKuryrPortHandler(test_base.TestCase):
                                                  retry_info=mock.ANY)])
         update_crd.assert_called_once_with(self._kp, self._vifs)
 
+    @mock.patch('kuryr_kubernetes.metrics.observe_pod_readiness')
+    @mock.patch('kuryr_kubernetes.controller.drivers.default_project.'
+                'DefaultPodProjectDriver.get_project')
+    @mock.patch('kuryr_kubernetes.controller.handlers.kuryrport.'
+                'KuryrPortHandler._update_kuryrport_crd')
+    @mock.patch('kuryr_kubernetes.controller.drivers.vif_pool.MultiVIFPool.'
+                'activate_vif')
+    @mock.patch('kuryr_kubernetes.clients.get_kubernetes_client')
+    @mock.patch('kuryr_kubernetes.controller.drivers.base.MultiVIFDriver.'
+                'get_enabled_drivers')
+    def test_on_present_readiness_observed_once(self, ged, get_k8s_client,
+                                                activate_vif, update_crd,
+                                                get_project, m_observe):
+        ged.return_value = [mock.MagicMock]
+        kp = kuryrport.KuryrPortHandler()
+        self._kp['metadata']['uid'] = self._kp_uid
+        self._kp['status']['vifs'] = self._vifs_primitive
+        self._pod['metadata']['creationTimestamp'] = '2020-12-22T09:04:29Z'
+        get_project.return_value = self._project_id
+
+        def _activate_vif(vif, **kwargs):
+            vif.active = True
+        activate_vif.side_effect = _activate_vif
+
+        with mock.patch.object(kp, 'k8s') as k8s:
+            k8s.get.return_value = self._pod
+
+            # The KuryrPort is handled again, e.g. on an outdated event.
+            kp.on_present(copy.deepcopy(self._kp))
+            kp.on_present(copy.deepcopy(self._kp))
+
+        self.assertEqual(2, update_crd.call_count)
+        m_observe.assert_called_once_with(metrics.STAGE_VIFS_ACTIVATED,
+                                          '2020-12-22T09:04:29Z')
+
     @mock.patch('kuryr_kubernetes.clients.get_kubernetes_client')
     @mock.patch('kuryr_kubernetes.controller.drivers.base.MultiVIFDriver.'
                 'get_enabled_drivers')
@@ -62,20 +62,18 @@ class TestKuryrMachineHandler(test_base.TestCase):
     def test_bump_nps(self, get_client):
         m_k8s = mock.Mock()
         get_client.return_value = m_k8s
-        m_k8s.get.return_value = {
-            'items': [
-                {'metadata': {'annotations': {
-                    'networkPolicyLink': mock.sentinel.link1}}},
-                {'metadata': {'annotations': {
-                    'networkPolicyLink': mock.sentinel.link2}}},
-                {'metadata': {'annotations': {
-                    'networkPolicyLink': mock.sentinel.link3}}},
-            ]
-        }
+        m_k8s.list_items.return_value = [
+            {'metadata': {'annotations': {
+                'networkPolicyLink': mock.sentinel.link1}}},
+            {'metadata': {'annotations': {
+                'networkPolicyLink': mock.sentinel.link2}}},
+            {'metadata': {'annotations': {
+                'networkPolicyLink': mock.sentinel.link3}}},
+        ]
         m_k8s.annotate.side_effect = (
             None, exceptions.K8sResourceNotFound('NP'), None)
         self.handler._bump_nps()
-        m_k8s.get.assert_called_once_with(
+        m_k8s.list_items.assert_called_once_with(
             constants.K8S_API_CRD_KURYRNETWORKPOLICIES)
         m_k8s.annotate.assert_has_calls([
             mock.call(mock.sentinel.link1, mock.ANY),
@@ -13,8 +13,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
 from unittest import mock
 
+import fixtures
+from oslo_config import cfg
+
+from kuryr_kubernetes import config
 from kuryr_kubernetes.controller.handlers import pipeline as h_pipeline
 from kuryr_kubernetes.handlers import dispatch as h_dis
 from kuryr_kubernetes.handlers import k8s_base as h_k8s
@@ -56,5 +61,51 @@ class TestControllerPipeline(test_base.TestCase):
 
         self.assertEqual(logging_handler, ret)
         m_logging_type.assert_called_with(async_handler)
-        m_async_type.assert_called_with(dispatcher, thread_group,
-                                        h_k8s.object_uid)
+        m_async_type.assert_called_with(
+            dispatcher, thread_group, h_k8s.object_uid,
+            classify=h_pipeline.event_class,
+            classes=[('pods', None), ('services', 100), ('policies', 50)])
+
+    def test_event_class(self):
+        for kind, cls in (('Pod', 'pods'), ('KuryrPort', 'pods'),
+                          ('Service', 'services'),
+                          ('Endpoints', 'services'),
+                          ('Node', 'services'),
+                          ('NetworkPolicy', 'policies'),
+                          ('KuryrNetworkPolicy', 'policies')):
+            self.assertEqual(
+                cls, h_pipeline.event_class({'object': {'kind': kind}}))
+
+    def _load_limits(self, value):
+        conf = cfg.ConfigOpts()
+        conf.register_opts(config.k8s_opts, group='kubernetes')
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            'kuryr.conf')
+        with open(path, 'w') as f:
+            f.write('[kubernetes]\nevent_workers_limits = %s\n' % value)
+        conf(['--config-file', path])
+        return conf.kubernetes.event_workers_limits
+
+    def test_event_workers_limits(self):
+        self.assertEqual({'services': 10, 'policies': 5},
+                         self._load_limits('services:10,policies:5'))
+
+    def test_event_workers_limits_zero(self):
+        self.assertRaises(cfg.ConfigFileValueError, self._load_limits,
+                          'services:0')
+
+    def test_event_workers_limits_not_numeric(self):
+        self.assertRaises(cfg.ConfigFileValueError, self._load_limits,
+                          'services:many')
+
+    @mock.patch.object(h_pipeline, 'LOG')
+    def test_get_event_classes_unknown(self, m_log):
+        cfg.CONF.set_override('event_workers_limits',
+                              {'service': 10, 'policies': 5},
+                              group='kubernetes')
+        self.addCleanup(cfg.CONF.clear_override, 'event_workers_limits',
+                        group='kubernetes')
+
+        self.assertEqual([('pods', None), ('services', None),
+                          ('policies', 5)], h_pipeline._get_event_classes())
+        m_log.warning.assert_called_once()
@@ -21,6 +21,8 @@ from kuryr_kubernetes import constants as k_const
 from kuryr_kubernetes.controller.drivers import base as drivers
 from kuryr_kubernetes.controller.handlers import vif as h_vif
 from kuryr_kubernetes import exceptions as k_exc
+from kuryr_kubernetes import informer
+from kuryr_kubernetes import metrics
 from kuryr_kubernetes.objects import vif
 from kuryr_kubernetes.tests import base as test_base
 from kuryr_kubernetes.tests import fake
@@ -191,6 +193,41 @@ class TestVIFHandler(test_base.TestCase):
         m_get_kuryrport.assert_called_once_with(self._pod)
         self._handler._add_kuryrport_crd.assert_called_once_with(self._pod)
 
+    @mock.patch('kuryr_kubernetes.metrics.observe_pod_readiness')
+    @mock.patch('kuryr_kubernetes.clients.get_kubernetes_client')
+    def test__add_kuryrport_crd_readiness(self, m_get_k8s_client, m_observe):
+        k8s = mock.MagicMock()
+        m_get_k8s_client.return_value = k8s
+        k8s.post.side_effect = [k_exc.K8sClientException(), None]
+
+        self.assertRaises(k_exc.K8sClientException,
+                          h_vif.VIFHandler._add_kuryrport_crd, self._handler,
+                          self._pod)
+        m_observe.assert_not_called()
+
+        h_vif.VIFHandler._add_kuryrport_crd(self._handler, self._pod)
+
+        self.assertEqual(2, m_observe.call_count)
+        m_observe.assert_has_calls([
+            mock.call(metrics.STAGE_POD_HANDLED, '2020-12-22T09:04:29Z',
+                      now=mock.ANY),
+            mock.call(metrics.STAGE_KURYRPORT_CREATED,
+                      '2020-12-22T09:04:29Z')])
+
+    @mock.patch('kuryr_kubernetes.clients.get_kubernetes_client')
+    def test__add_kuryrport_crd(self, m_get_k8s_client):
+        k8s = mock.MagicMock()
+        m_get_k8s_client.return_value = k8s
+
+        h_vif.VIFHandler._add_kuryrport_crd(self._handler, self._pod)
+
+        kp = k8s.post.call_args[0][1]
+        self.assertEqual(
+            {k_const.K8S_ANNOTATION_POD_CREATION_TIMESTAMP:
+             '2020-12-22T09:04:29Z'}, kp['metadata']['annotations'])
+        self.assertEqual({'podUid': self._pod['metadata']['uid'],
+                          'podNodeName': 'hostname'}, kp['spec'])
+
     @mock.patch('kuryr_kubernetes.clients.get_kubernetes_client')
     @mock.patch('kuryr_kubernetes.controller.drivers.utils.is_host_network')
     @mock.patch('kuryr_kubernetes.controller.drivers.utils.get_kuryrport')
@@ -291,3 +328,25 @@ class TestVIFHandler(test_base.TestCase):
                 crd=self._pod["metadata"]["name"]))
         (k8s.remove_finalizer
          .assert_called_once_with(self._pod, k_const.POD_FINALIZER))
+
+    @mock.patch.object(informer, 'get_store')
+    @mock.patch.object(h_vif.VIFHandler, 'on_present')
+    def test_unchanged_without_kuryrport(self, m_present, m_get_store):
+        store = informer.Store(k_const.K8S_API_CRD_KURYRPORTS)
+        store.replace([])
+        m_get_store.side_effect = {
+            k_const.K8S_API_CRD_KURYRPORTS: store}.get
+        handler = h_vif.VIFHandler()
+        event = {'type': 'MODIFIED', 'object': self._pod}
+
+        handler(event)
+        # KuryrPort is missing, so it has to be recreated.
+        handler(event)
+        self.assertEqual(2, m_present.call_count)
+
+        kp = {'metadata': {'uid': 'kp-uid',
+                           'name': self._pod['metadata']['name'],
+                           'namespace': self._pod['metadata']['namespace']}}
+        store.replace([kp])
+        handler(event)
+        self.assertEqual(2, m_present.call_count)
@@ -18,6 +18,128 @@ from unittest import mock
 
 from kuryr_kubernetes.handlers import asynchronous as h_async
 from kuryr_kubernetes.tests import base as test_base
+from kuryr_kubernetes.tests.unit import kuryr_fixtures as k_fix
+
+
+def get_event(uid, resource_version):
+    return {'type': 'MODIFIED',
+            'object': {'metadata': {'uid': uid,
+                                    'resourceVersion': resource_version}}}
+
+
+@mock.patch('time.time')
+class TestWorkQueue(test_base.TestCase):
+
+    def test_add_get(self, m_time):
+        m_time.return_value = 0
+        work_queue = h_async.WorkQueue()
+
+        work_queue.add('a', 'a1')
+        work_queue.add('b', 'b1')
+        work_queue.add('a', 'a2')
+
+        self.assertEqual(2, len(work_queue))
+        key, _, items = work_queue.get(timeout=0)
+        self.assertEqual(('a', ['a2']), (key, items))
+        key, _, items = work_queue.get(timeout=0)
+        self.assertEqual(('b', ['b1']), (key, items))
+        self.assertRaises(queue.Empty, work_queue.get, timeout=0)
+
+    def test_add_while_processing(self, m_time):
+        m_time.return_value = 0
+        work_queue = h_async.WorkQueue()
+        work_queue.add('a', 'a1')
+        work_queue.get(timeout=0)
+
+        work_queue.add('a', 'a2')
+
+        # The key is being processed, so it cannot be taken by anyone else.
+        self.assertRaises(queue.Empty, work_queue.get, timeout=0)
+        work_queue.done('a')
+        key, _, items = work_queue.get(timeout=0)
+        self.assertEqual(('a', ['a2']), (key, items))
+
+    def test_done_forgets_key(self, m_time):
+        m_time.return_value = 0
+        work_queue = h_async.WorkQueue()
+        work_queue.add('a', 'a1')
+        work_queue.get(timeout=0)
+
+        self.assertIn('a', work_queue)
+        work_queue.done('a')
+        self.assertNotIn('a', work_queue)
+
+    def test_add_after(self, m_time):
+        m_time.return_value = 0
+        work_queue = h_async.WorkQueue()
+        work_queue.add('a', 'a1')
+        _, generation, _ = work_queue.get(timeout=0)
+
+        self.assertTrue(work_queue.add_after('a', 'retry', 10, generation))
+        work_queue.done('a')
+
+        self.assertIn('a', work_queue)
+        self.assertEqual(1, work_queue.delayed_count())
+        self.assertRaises(queue.Empty, work_queue.get, timeout=0)
+        m_time.return_value = 10
+        key, _, items = work_queue.get(timeout=0)
+        self.assertEqual(('a', ['retry']), (key, items))
+        work_queue.done('a')
+        self.assertNotIn('a', work_queue)
+
+    def test_add_cancels_delayed(self, m_time):
+        m_time.return_value = 0
+        work_queue = h_async.WorkQueue()
+        work_queue.add('a', 'a1')
+        _, generation, _ = work_queue.get(timeout=0)
+        work_queue.add_after('a', 'retry', 10, generation)
+        work_queue.done('a')
+
+        work_queue.add('a', 'a2')
+
+        key, _, items = work_queue.get(timeout=0)
+        self.assertEqual(('a', ['a2']), (key, items))
+        work_queue.done('a')
+        m_time.return_value = 10
+        self.assertRaises(queue.Empty, work_queue.get, timeout=0)
+        self.assertNotIn('a', work_queue)
+
+    def test_add_after_outdated(self, m_time):
+        m_time.return_value = 0
+        work_queue = h_async.WorkQueue()
+        work_queue.add('a', 'a1')
+        _, generation, _ = work_queue.get(timeout=0)
+        work_queue.add('a', 'a2')
+
+        self.assertFalse(work_queue.add_after('a', 'retry', 10, generation))
+        self.assertEqual(0, work_queue.delayed_count())
+
+    def test_classes_priority(self, m_time):
+        m_time.return_value = 0
+        work_queue = h_async.WorkQueue([('high', None), ('low', None)])
+
+        work_queue.add('l', 'l1', 'low')
+        work_queue.add('h', 'h1', 'high')
+        work_queue.add('h2', 'h2')
+
+        self.assertEqual('h', work_queue.get(timeout=0)[0])
+        self.assertEqual('h2', work_queue.get(timeout=0)[0])
+        self.assertEqual('l', work_queue.get(timeout=0)[0])
+
+    def test_classes_limit(self, m_time):
+        m_time.return_value = 0
+        work_queue = h_async.WorkQueue([('high', None), ('low', 1)])
+        work_queue.add('l1', 'l1', 'low')
+        work_queue.add('l2', 'l2', 'low')
+        self.assertEqual('l1', work_queue.get(timeout=0)[0])
+
+        # Class limit is reached, so 'l2' has to wait.
+        self.assertRaises(queue.Empty, work_queue.get, timeout=0)
+        work_queue.add('h', 'h1', 'high')
+        self.assertEqual('h', work_queue.get(timeout=0)[0])
+
+        work_queue.done('l1')
+        self.assertEqual('l2', work_queue.get(timeout=0)[0])
 
 
 class TestAsyncHandler(test_base.TestCase):
@@ -25,128 +147,148 @@ class TestAsyncHandler(test_base.TestCase):
     def test_call(self):
         event = mock.sentinel.event
         group = mock.sentinel.group
-        m_queue = mock.Mock()
         m_handler = mock.Mock()
+        m_tg = mock.Mock()
         m_group_by = mock.Mock(return_value=group)
-        async_handler = h_async.Async(m_handler, mock.Mock(), m_group_by)
-        async_handler._queues[group] = m_queue
+        async_handler = h_async.Async(m_handler, m_tg, m_group_by, workers=2)
 
+        async_handler(event)
         async_handler(event)
 
         m_handler.assert_not_called()
-        self.assertEqual({group: m_queue}, async_handler._queues)
-        m_queue.put.assert_called_once_with((event, (), {}))
+        self.assertEqual(2, m_tg.add_thread.call_count)
+        m_tg.add_thread.assert_called_with(async_handler._run)
+        self.assertEqual((group, mock.ANY, [(m_handler, event, (), {})]),
+                         async_handler._queue.get(timeout=0))
+
+    def test_call_classify(self):
+        m_handler = mock.Mock()
+        m_group_by = mock.Mock(side_effect=lambda event: event)
+        m_classify = mock.Mock(side_effect=lambda event: event[0])
+        async_handler = h_async.Async(
+            m_handler, mock.Mock(), m_group_by, classify=m_classify,
+            classes=[('h', None), ('l', None)])
 
-    @mock.patch('queue.Queue')
-    def test_call_new(self, m_queue_type):
+        async_handler('l1')
+        async_handler('h1')
+
+        self.assertEqual('h1', async_handler._queue.get(timeout=0)[0])
+        self.assertEqual('l1', async_handler._queue.get(timeout=0)[0])
+
+    def test_call_injected(self):
         event = mock.sentinel.event
         group = mock.sentinel.group
-        queue_depth = mock.sentinel.queue_depth
-        m_queue = mock.Mock()
-        m_queue_type.return_value = m_queue
         m_handler = mock.Mock()
-        m_th = mock.Mock()
-        m_tg = mock.Mock()
-        m_tg.add_thread.return_value = m_th
         m_group_by = mock.Mock(return_value=group)
-        async_handler = h_async.Async(m_handler, m_tg, m_group_by,
-                                      queue_depth=queue_depth)
+        async_handler = h_async.Async(m_handler, mock.Mock(), m_group_by)
+        async_handler._queue.add(group, mock.sentinel.item)
 
-        async_handler(event)
+        async_handler(event, injected=True)
 
         m_handler.assert_not_called()
-        m_queue_type.assert_called_once_with(queue_depth)
-        self.assertEqual({group: m_queue}, async_handler._queues)
-        m_tg.add_thread.assert_called_once_with(async_handler._run, group,
-                                                m_queue)
-        m_th.link.assert_called_once_with(async_handler._done, group)
-        m_queue.put.assert_called_once_with((event, (), {}))
+        self.assertEqual((group, mock.ANY, [mock.sentinel.item]),
+                         async_handler._queue.get(timeout=0))
 
-    def test_call_injected(self):
+    def test_call_injected_new(self):
         event = mock.sentinel.event
         group = mock.sentinel.group
-        m_queue = mock.Mock()
         m_handler = mock.Mock()
         m_group_by = mock.Mock(return_value=group)
         async_handler = h_async.Async(m_handler, mock.Mock(), m_group_by)
-        async_handler._queues[group] = m_queue
 
         async_handler(event, injected=True)
 
-        m_handler.assert_not_called()
-        self.assertEqual({group: m_queue}, async_handler._queues)
-        m_queue.put.assert_not_called()
+        self.assertEqual(
+            (group, mock.ANY, [(m_handler, event, (), {'injected': True})]),
+            async_handler._queue.get(timeout=0))
 
     @mock.patch('itertools.count')
     def test_run(self, m_count):
         event = mock.sentinel.event
         group = mock.sentinel.group
-        m_queue = mock.Mock()
-        m_queue.empty.return_value = True
-        m_queue.get.return_value = (event, (), {})
         m_handler = mock.Mock()
+        m_retry = mock.Mock()
         m_count.return_value = [1]
-        async_handler = h_async.Async(m_handler, mock.Mock(), mock.Mock(),
-                                      queue_depth=1)
+        async_handler = h_async.Async(m_handler, mock.Mock(), mock.Mock())
+        async_handler._queue = mock.Mock()
+        async_handler._queue.get.return_value = (
+            group, 1, [(m_handler, event, (), {}),
+                       (m_retry, event, (), {'attempt': 2})])
 
-        with mock.patch('time.sleep'):
-            async_handler._run(group, m_queue)
+        async_handler._run()
 
-        m_handler.assert_called_once_with(event)
+        m_handler.assert_called_once_with(event, requeue=mock.ANY)
+        m_retry.assert_called_once_with(event, requeue=mock.ANY, attempt=2)
+        async_handler._queue.done.assert_called_once_with(group)
 
     @mock.patch('itertools.count')
-    def test_run_empty(self, m_count):
-        events = [(x, (), {}) for x in (mock.sentinel.event1,
-                                        mock.sentinel.event2)]
+    def test_run_exception(self, m_count):
+        events = [mock.sentinel.event1, mock.sentinel.event2]
         group = mock.sentinel.group
-        m_queue = mock.Mock()
-        m_queue.empty.return_value = True
-        m_queue.get.side_effect = events + [queue.Empty()]
         m_handler = mock.Mock()
-        m_count.return_value = list(range(5))
+        m_handler.side_effect = [Exception(), None]
+        m_count.return_value = [1]
         async_handler = h_async.Async(m_handler, mock.Mock(), mock.Mock())
+        async_handler._queue = mock.Mock()
+        async_handler._queue.get.return_value = (
+            group, 1, [(m_handler, event, (), {}) for event in events])
 
-        with mock.patch('time.sleep'):
-            async_handler._run(group, m_queue)
+        async_handler._run()
 
-        m_handler.assert_has_calls([mock.call(event[0]) for event in events])
-        self.assertEqual(len(events), m_handler.call_count)
+        self.assertEqual(2, m_handler.call_count)
+        async_handler._queue.done.assert_called_once_with(group)
 
     @mock.patch('itertools.count')
-    def test_run_stale(self, m_count):
-        events = [(x, (), {}) for x in (mock.sentinel.event1,
-                                        mock.sentinel.event2)]
-        group = mock.sentinel.group
-        m_queue = mock.Mock()
-        m_queue.empty.side_effect = [False, True, True]
-        m_queue.get.side_effect = events + [queue.Empty()]
+    def test_run_outdated(self, m_count):
+        k8s = self.useFixture(k_fix.MockK8sClient()).client
+        k8s.get_written_resource_version.return_value = '5'
+        events = [get_event('uid', rv) for rv in ('4', '5', '6')]
         m_handler = mock.Mock()
-        m_count.return_value = list(range(5))
+        m_count.return_value = [1]
         async_handler = h_async.Async(m_handler, mock.Mock(), mock.Mock())
+        async_handler._queue = mock.Mock()
+        async_handler._queue.get.return_value = (
+            'uid', 1, [(m_handler, event, (), {}) for event in events])
 
-        with mock.patch('time.sleep'):
-            async_handler._run(group, m_queue)
+        async_handler._run()
 
-        m_handler.assert_called_once_with(mock.sentinel.event2)
+        m_handler.assert_has_calls([mock.call(events[1], requeue=mock.ANY),
+                                    mock.call(events[2], requeue=mock.ANY)])
+        self.assertEqual(2, m_handler.call_count)
+        k8s.get_written_resource_version.assert_called_with('uid')
 
-    def test_done(self):
-        group = mock.sentinel.group
-        m_queue = mock.Mock()
-        async_handler = h_async.Async(mock.Mock(), mock.Mock(), mock.Mock())
-        async_handler._queues[group] = m_queue
+    @mock.patch('itertools.count')
+    def test_run_no_written_version(self, m_count):
+        k8s = self.useFixture(k_fix.MockK8sClient()).client
+        k8s.get_written_resource_version.return_value = None
+        event = get_event('uid', '4')
+        m_handler = mock.Mock()
+        m_count.return_value = [1]
+        async_handler = h_async.Async(m_handler, mock.Mock(), mock.Mock())
+        async_handler._queue = mock.Mock()
+        async_handler._queue.get.return_value = (
+            'uid', 1, [(m_handler, event, (), {})])
 
-        async_handler._done(mock.Mock(), group)
+        async_handler._run()
 
-        self.assertFalse(async_handler._queues)
+        m_handler.assert_called_once_with(event, requeue=mock.ANY)
 
-    @mock.patch('kuryr_kubernetes.handlers.asynchronous.LOG.critical')
-    def test_done_terminated(self, m_critical):
+    @mock.patch('itertools.count')
+    def test_run_requeue(self, m_count):
+        event = mock.sentinel.event
         group = mock.sentinel.group
-        m_queue = mock.Mock()
-        m_queue.empty.return_value = False
-        async_handler = h_async.Async(mock.Mock(), mock.Mock(), mock.Mock())
-        async_handler._queues[group] = m_queue
+        m_retry = mock.Mock()
+
+        def handler(event, requeue):
+            requeue(m_retry, 10, event, attempt=2)
+
+        m_count.return_value = [1]
+        async_handler = h_async.Async(handler, mock.Mock(), mock.Mock())
+        async_handler._queue = mock.Mock()
+        async_handler._queue.get.return_value = (
+            group, 3, [(handler, event, (), {})])
 
-        async_handler._done(mock.Mock(), group)
+        async_handler._run()
 
-        m_critical.assert_called_once()
+        async_handler._queue.add_after.assert_called_once_with(
+            group, (m_retry, event, (), {'attempt': 2}), 10, 3)
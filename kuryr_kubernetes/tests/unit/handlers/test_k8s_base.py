@@ -16,6 +16,8 @@
 from unittest import mock
 
 from kuryr_kubernetes.handlers import k8s_base as h_k8s
+from kuryr_kubernetes import informer
+from kuryr_kubernetes import metrics
 from kuryr_kubernetes.tests import base as test_base
 
 
@@ -62,3 +64,119 @@ class TestResourceEventHandler(test_base.TestCase):
         handler(event)
 
         self.assertTrue(True)
+
+    @mock.patch.object(h_k8s.ResourceEventHandler, 'on_present')
+    def test_handling_time_observed(self, m_present):
+        m_present.side_effect = ValueError
+        event = {'type': 'ADDED', 'object': {}}
+        handler = h_k8s.ResourceEventHandler()
+        labels = {'handler': 'ResourceEventHandler', 'event_type': 'ADDED'}
+        count = metrics.REGISTRY.get_sample_value(
+            'kuryr_event_handling_duration_seconds_count', labels) or 0
+
+        self.assertRaises(ValueError, handler, event)
+
+        self.assertEqual(count + 1, metrics.REGISTRY.get_sample_value(
+            'kuryr_event_handling_duration_seconds_count', labels))
+
+
+class _WatchingHandler(h_k8s.ResourceEventHandler):
+    OBJECT_WATCH_FIELDS = ['metadata.labels', 'status.podIP']
+
+
+def get_pod(labels=None, pod_ip=None, phase='Running', uid='uid'):
+    return {'metadata': {'uid': uid, 'name': uid, 'labels': labels or {}},
+            'status': {'podIP': pod_ip, 'phase': phase}}
+
+
+@mock.patch.object(_WatchingHandler, 'on_present')
+class TestResourceEventHandlerWatchFields(test_base.TestCase):
+
+    def test_unchanged_not_observed(self, m_present):
+        handler = _WatchingHandler()
+        labels = {'handler': '_WatchingHandler', 'event_type': 'MODIFIED'}
+
+        handler({'type': 'ADDED', 'object': get_pod({'a': 'b'})})
+        count = metrics.REGISTRY.get_sample_value(
+            'kuryr_event_handling_duration_seconds_count', labels) or 0
+        handler({'type': 'MODIFIED', 'object': get_pod({'a': 'b'})})
+
+        self.assertEqual(count, metrics.REGISTRY.get_sample_value(
+            'kuryr_event_handling_duration_seconds_count', labels) or 0)
+
+    def test_unchanged(self, m_present):
+        handler = _WatchingHandler()
+
+        handler({'type': 'ADDED', 'object': get_pod({'a': 'b'})})
+        handler({'type': 'MODIFIED',
+                 'object': get_pod({'a': 'b'}, phase='Succeeded')})
+
+        m_present.assert_called_once_with(get_pod({'a': 'b'}))
+
+    def test_changed(self, m_present):
+        handler = _WatchingHandler()
+        pods = [get_pod({'a': 'b'}), get_pod({'a': 'b'}, '10.0.0.1'),
+                get_pod({'a': 'c'}, '10.0.0.1')]
+
+        for pod in pods:
+            handler({'type': 'MODIFIED', 'object': pod})
+
+        m_present.assert_has_calls([mock.call(pod) for pod in pods])
+
+    def test_injected(self, m_present):
+        handler = _WatchingHandler()
+        pod = get_pod({'a': 'b'})
+
+        handler({'type': 'MODIFIED', 'object': pod})
+        handler({'type': 'MODIFIED', 'object': pod}, injected=True)
+
+        self.assertEqual(2, m_present.call_count)
+
+    def test_failed(self, m_present):
+        handler = _WatchingHandler()
+        pod = get_pod({'a': 'b'})
+        m_present.side_effect = [ValueError(), None]
+
+        self.assertRaises(ValueError, handler,
+                          {'type': 'MODIFIED', 'object': pod})
+        handler({'type': 'MODIFIED', 'object': pod})
+
+        self.assertEqual(2, m_present.call_count)
+
+    def test_modified_by_handler(self, m_present):
+        handler = _WatchingHandler()
+
+        def on_present(pod):
+            pod['metadata']['labels']['x'] = 'y'
+        m_present.side_effect = on_present
+
+        handler({'type': 'MODIFIED', 'object': get_pod({'a': 'b'})})
+        handler({'type': 'MODIFIED', 'object': get_pod({'a': 'b'})})
+
+        m_present.assert_called_once()
+
+    def test_deleted(self, m_present):
+        handler = _WatchingHandler()
+        pod = get_pod({'a': 'b'})
+
+        handler({'type': 'ADDED', 'object': pod})
+        handler({'type': 'DELETED', 'object': pod})
+        handler({'type': 'ADDED', 'object': pod})
+
+        self.assertEqual(2, m_present.call_count)
+
+    @mock.patch.object(informer, 'get_store')
+    def test_pruned(self, m_get_store, m_present):
+        handler = _WatchingHandler()
+        store = informer.Store('/api/v1/pods')
+        m_get_store.return_value = store
+        pods = [get_pod(uid='uid%d' % i) for i in range(3)]
+        store.replace(pods[:2])
+
+        for pod in pods[:2]:
+            handler({'type': 'ADDED', 'object': pod})
+        # DELETED events of the pods got missed.
+        store.replace(pods[2:])
+        handler({'type': 'ADDED', 'object': pods[2]})
+
+        self.assertEqual(['uid2'], list(handler._handled_fields))
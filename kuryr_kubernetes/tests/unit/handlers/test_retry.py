@@ -161,3 +161,46 @@ class TestRetryHandler(test_base.TestCase):
         m_sleep.assert_has_calls([
             mock.call(deadline, i + 1, failures[i])
             for i in range(len(failures))])
+
+    @mock.patch.object(h_retry.Retry, '_sleep')
+    @mock.patch.object(h_retry.Retry, '_get_delay')
+    def test_call_requeue(self, m_get_delay, m_sleep):
+        timeout = 10
+        deadline = self.now + timeout
+        failure = _EX1()
+        event = {'type': 'DELETED'}
+        m_handler = mock.Mock()
+        m_handler.side_effect = [failure]
+        m_requeue = mock.Mock()
+        m_get_delay.return_value = 2
+        retry = h_retry.Retry(m_handler, timeout=timeout, exceptions=_EX1)
+
+        retry(event, requeue=m_requeue)
+
+        m_handler.assert_called_once_with(event, retry_info=mock.ANY)
+        m_get_delay.assert_called_once_with(deadline, 1, failure)
+        m_sleep.assert_not_called()
+        m_requeue.assert_called_once_with(retry, 2, event, attempt=2,
+                                          start_time=self.now)
+
+    @mock.patch.object(h_retry.Retry, '_get_delay')
+    def test_call_requeued_raises(self, m_get_delay):
+        timeout = 10
+        start_time = self.now - 5
+        failure = _EX1()
+        event = {'type': 'DELETED'}
+        m_handler = mock.Mock()
+        m_handler.side_effect = [failure]
+        m_requeue = mock.Mock()
+        m_get_delay.return_value = 0
+        retry = h_retry.Retry(m_handler, timeout=timeout, exceptions=_EX1)
+
+        self.assertRaises(_EX1, retry, event, requeue=m_requeue, attempt=3,
+                          start_time=start_time)
+
+        m_handler.assert_called_once_with(
+            event, retry_info={'elapsed': self.now - start_time})
+        m_get_delay.assert_called_once_with(start_time + timeout, 3, failure)
+        m_requeue.assert_not_called()
+        m_handler.set_liveness.assert_called_once_with(alive=False,
+                                                       exc=failure)
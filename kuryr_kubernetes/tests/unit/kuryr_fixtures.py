@@ -17,6 +17,7 @@ from unittest import mock
 
 import fixtures
 
+from kuryr_kubernetes import informer
 from kuryr_kubernetes import k8s_client
 
 
@@ -50,3 +51,10 @@ class MockComputeClient(fixtures.Fixture):
         self.useFixture(fixtures.MockPatch(
             'kuryr_kubernetes.clients.get_compute_client',
             lambda: self.client))
+
+
+class MockInformerStores(fixtures.Fixture):
+    def _setUp(self):
+        self.stores = {}
+        self.useFixture(fixtures.MockPatchObject(informer, '_stores',
+                                                 self.stores))
@@ -0,0 +1,202 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import fixtures
+from oslo_config import cfg
+
+from kuryr_kubernetes import informer
+from kuryr_kubernetes.tests import base as test_base
+from kuryr_kubernetes.tests.unit import kuryr_fixtures
+
+CONF = cfg.CONF
+
+
+def get_pod(name, uid, namespace='default', pod_ip=None, rv='1'):
+    pod = {'kind': 'Pod',
+           'metadata': {'name': name, 'namespace': namespace, 'uid': uid,
+                        'resourceVersion': rv},
+           'status': {}}
+    if pod_ip:
+        pod['status']['podIP'] = pod_ip
+    return pod
+
+
+class TestStore(test_base.TestCase):
+    def setUp(self):
+        super(TestStore, self).setUp()
+        self.store = informer.Store('/api/v1/pods')
+
+    def test_replace(self):
+        pods = [get_pod('a', 'uid-a'), get_pod('b', 'uid-b', 'other')]
+
+        self.store.replace(pods, '10')
+
+        self.assertTrue(self.store.synced)
+        self.assertEqual('10', self.store.resource_version)
+        self.assertEqual(2, len(self.store))
+        self.assertEqual([pods[1]], self.store.list('other'))
+        self.assertEqual(pods[0], self.store.get('a', 'default'))
+
+    def test_replace_drops_old(self):
+        self.store.replace([get_pod('a', 'uid-a', pod_ip='10.0.0.1')])
+        self.store.replace([get_pod('b', 'uid-b')])
+
+        self.assertIsNone(self.store.get('a', 'default'))
+        self.assertEqual([], self.store.by_index(informer.INDEX_POD_IP,
+                                                 '10.0.0.1'))
+
+    def test_handle_event_modified(self):
+        self.store.replace([get_pod('a', 'uid-a', pod_ip='10.0.0.1')])
+        pod = get_pod('a', 'uid-a', pod_ip='10.0.0.2', rv='2')
+
+        self.store.handle_event({'type': 'MODIFIED', 'object': pod})
+
+        self.assertEqual('2', self.store.resource_version)
+        self.assertEqual([], self.store.by_index(informer.INDEX_POD_IP,
+                                                 '10.0.0.1'))
+        self.assertEqual([pod], self.store.by_index(informer.INDEX_POD_IP,
+                                                    '10.0.0.2'))
+
+    def test_handle_event_deleted(self):
+        pod = get_pod('a', 'uid-a', pod_ip='10.0.0.1')
+        self.store.replace([pod])
+
+        self.store.handle_event({'type': 'DELETED', 'object': pod})
+
+        self.assertEqual(0, len(self.store))
+        self.assertEqual([], self.store.list('default'))
+        self.assertEqual({}, self.store._indices[informer.INDEX_POD_IP])
+
+    def test_diff(self):
+        kept = get_pod('a', 'uid-a')
+        changed = get_pod('b', 'uid-b')
+        gone = get_pod('c', 'uid-c')
+        self.store.replace([kept, changed, gone])
+        changed_new = get_pod('b', 'uid-b', rv='2')
+        new = get_pod('d', 'uid-d')
+
+        events = self.store.diff([kept, changed_new, new])
+
+        self.assertEqual([{'type': 'MODIFIED', 'object': changed_new},
+                          {'type': 'ADDED', 'object': new},
+                          {'type': 'DELETED', 'object': gone}], events)
+
+    def test_diff_concurrent_watch(self):
+        # Store got updated by the watch after the listing was done.
+        newer = get_pod('a', 'uid-a', rv='12')
+        created = get_pod('b', 'uid-b', rv='11')
+        self.store.replace([newer, created])
+
+        events = self.store.diff([get_pod('a', 'uid-a', rv='5')], '10')
+
+        self.assertEqual([], events)
+
+    def test_handle_event_older(self):
+        self.store.replace([get_pod('a', 'uid-a', rv='5')], '5')
+
+        self.store.handle_event({'type': 'ADDED',
+                                 'object': get_pod('b', 'uid-b', rv='3')})
+
+        self.assertEqual('5', self.store.resource_version)
+        self.assertIsNotNone(self.store.get('b', 'default'))
+
+    def test_handle_event_deleted_not_readded(self):
+        pod = get_pod('a', 'uid-a', rv='5')
+        self.store.replace([pod], '5')
+        self.store.handle_event({'type': 'DELETED',
+                                 'object': get_pod('a', 'uid-a', rv='6')})
+
+        self.store.handle_event({'type': 'ADDED', 'object': pod})
+
+        self.assertIsNone(self.store.get('a', 'default'))
+        self.assertEqual('6', self.store.resource_version)
+
+    def test_diff_listing_older_than_delete(self):
+        pod = get_pod('a', 'uid-a', rv='5')
+        self.store.replace([pod], '5')
+        # Listing was done before the watch reported the deletion.
+        self.store.handle_event({'type': 'DELETED',
+                                 'object': get_pod('a', 'uid-a', rv='7')})
+
+        events = self.store.diff([pod], '6')
+
+        self.assertEqual([], events)
+
+    def test_tombstones_limited(self):
+        self.useFixture(fixtures.MockPatchObject(informer, 'TOMBSTONES_SIZE',
+                                                 2))
+        for i in range(3):
+            self.store.handle_event({'type': 'DELETED',
+                                     'object': get_pod(str(i), f'uid-{i}')})
+
+        self.assertEqual(['uid-1', 'uid-2'], list(self.store._tombstones))
+
+    def test_handle_event_malformed(self):
+        self.store.handle_event({'type': 'ERROR', 'object': {'code': 410}})
+        self.store.handle_event({'e': 1})
+
+        self.assertEqual(0, len(self.store))
+
+
+class TestInformer(test_base.TestCase):
+    def setUp(self):
+        super(TestInformer, self).setUp()
+        self.useFixture(kuryr_fixtures.MockInformerStores())
+        self.path = '/api/v1/pods'
+
+    def test_get_store_empty(self):
+        informer.ensure_store(self.path).replace([])
+
+        self.assertIsNotNone(informer.get_store(self.path))
+        informer.invalidate(self.path)
+        self.assertIsNone(informer.get_store(self.path))
+
+    def test_get_store_not_synced(self):
+        informer.ensure_store(self.path)
+
+        self.assertIsNone(informer.get_store(self.path))
+        self.assertIsNone(informer.list_objects(self.path))
+
+    def test_get_store_disabled(self):
+        CONF.set_override('informer_cache', False, group='kubernetes')
+        self.addCleanup(CONF.clear_override, 'informer_cache',
+                        group='kubernetes')
+        informer.ensure_store(self.path).replace([])
+
+        self.assertIsNone(informer.get_store(self.path))
+
+    def test_invalidate(self):
+        informer.ensure_store(self.path).replace([])
+
+        informer.invalidate(self.path)
+
+        self.assertIsNone(informer.get_store(self.path))
+
+    def test_list_objects_returns_copies(self):
+        pod = get_pod('a', 'uid-a')
+        informer.ensure_store(self.path).replace([pod])
+
+        pods = informer.list_objects(self.path, namespace='default')
+        pods[0]['metadata']['name'] = 'b'
+
+        self.assertEqual('a', pod['metadata']['name'])
+
+    def test_list_by_index(self):
+        pod1 = get_pod('a', 'uid-a', pod_ip='10.0.0.1')
+        pod2 = get_pod('b', 'uid-b', pod_ip='10.0.0.2')
+        informer.ensure_store(self.path).replace([pod1, pod2])
+
+        self.assertEqual([pod2], informer.list_by_index(
+            self.path, informer.INDEX_POD_IP, '10.0.0.2'))
+        self.assertEqual([], informer.list_by_index(
+            self.path, informer.INDEX_POD_IP, '10.0.0.2',
+            predicate=lambda pod: False))
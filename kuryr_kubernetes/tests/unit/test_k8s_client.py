@@ -122,6 +122,55 @@ class TestK8sClient(test_base.TestCase):
         self.assertEqual(ret, self.client.get(path))
         m_get.assert_called_once_with(self.base_url + path, headers=None)
 
+    @mock.patch('kuryr_kubernetes.k8s_client.K8sClient.get')
+    def test_get_pages(self, m_get):
+        path = '/test?labelSelector=foo'
+        pages = [
+            {'items': [{'id': 1}], 'metadata': {'continue': 'abc'}},
+            {'items': [{'id': 2}], 'metadata': {'continue': ''}},
+        ]
+        m_get.side_effect = pages
+
+        self.assertEqual(pages, list(self.client.get_pages(path, limit=1)))
+        m_get.assert_has_calls([
+            mock.call(path + '&limit=1'),
+            mock.call(path + '&limit=1&continue=abc')])
+
+    @mock.patch('kuryr_kubernetes.k8s_client.K8sClient.get')
+    def test_get_pages_no_limit(self, m_get):
+        path = '/test'
+        m_get.return_value = {'items': [], 'metadata': {}}
+
+        self.assertEqual(1, len(list(self.client.get_pages(path, limit=0))))
+        m_get.assert_called_once_with(path)
+
+    @mock.patch('kuryr_kubernetes.k8s_client.K8sClient.get')
+    def test_list_items(self, m_get):
+        path = '/test'
+        m_get.side_effect = [
+            {'items': [{'id': 1}, {'id': 2}], 'metadata': {'continue': 'a'}},
+            {'items': [{'id': 3}], 'metadata': {}},
+        ]
+
+        items = self.client.list_items(path, limit=2)
+
+        self.assertEqual({'id': 1}, next(items))
+        # Next page is only fetched when the items of the first one are
+        # consumed.
+        m_get.assert_called_once_with(path + '?limit=2')
+        self.assertEqual([{'id': 2}, {'id': 3}], list(items))
+        self.assertEqual(2, m_get.call_count)
+
+    @mock.patch('kuryr_kubernetes.k8s_client.K8sClient.get')
+    def test_list_items_null(self, m_get):
+        path = '/test'
+        m_get.side_effect = [
+            {'items': None, 'metadata': {'continue': 'a'}},
+            {'items': [{'id': 1}], 'metadata': {}},
+        ]
+
+        self.assertEqual([{'id': 1}], list(self.client.list_items(path)))
+
     @mock.patch('requests.sessions.Session.get')
     def test_get_list(self, m_get):
         path = '/test'
@@ -198,6 +247,33 @@ class TestK8sClient(test_base.TestCase):
         m_patch.assert_called_once_with(self.base_url + path,
                                         data=data, headers=mock.ANY)
 
+    @mock.patch('requests.sessions.Session.patch')
+    def test_annotate_remembers_write(self, m_patch):
+        path = '/test'
+        annotations = {'a1': 'v1'}
+        ret = {'metadata': {'annotations': annotations, 'uid': 'uid',
+                            'resourceVersion': '124'}}
+
+        m_resp = mock.MagicMock()
+        m_resp.ok = True
+        m_resp.json.return_value = ret
+        m_patch.return_value = m_resp
+
+        self.assertIsNone(self.client.get_written_resource_version('uid'))
+        self.client.annotate(path, annotations)
+        self.assertEqual('124',
+                         self.client.get_written_resource_version('uid'))
+
+    @mock.patch.object(k8s_client, 'WRITTEN_VERSIONS_SIZE', 2)
+    def test_remember_write_bounded(self):
+        for i in range(3):
+            self.client._remember_write(
+                {'metadata': {'uid': f'uid{i}', 'resourceVersion': str(i)}})
+
+        self.assertIsNone(self.client.get_written_resource_version('uid0'))
+        self.assertEqual('1', self.client.get_written_resource_version('uid1'))
+        self.assertEqual('2', self.client.get_written_resource_version('uid2'))
+
     @mock.patch('itertools.count')
     @mock.patch('requests.sessions.Session.patch')
     def test_annotate_exception(self, m_patch, m_count):
@@ -375,7 +451,8 @@ class TestK8sClient(test_base.TestCase):
         self.assertEqual(cycles, m_get.call_count)
         self.assertEqual(cycles, m_resp.close.call_count)
         m_get.assert_called_with(self.base_url + path, stream=True,
-                                 params={'watch': 'true'})
+                                 params={'watch': 'true',
+                                         'allowWatchBookmarks': 'true'})
 
     @mock.patch('requests.sessions.Session.get')
     def test_watch_restart(self, m_get):
@@ -396,10 +473,68 @@ class TestK8sClient(test_base.TestCase):
         self.assertEqual(3, m_get.call_count)
         self.assertEqual(3, m_resp.close.call_count)
         m_get.assert_any_call(
-            self.base_url + path, stream=True, params={"watch": "true"})
+            self.base_url + path, stream=True,
+            params={"watch": "true", "allowWatchBookmarks": "true"})
+        m_get.assert_any_call(
+            self.base_url + path, stream=True,
+            params={"watch": "true", "allowWatchBookmarks": "true",
+                    "resourceVersion": 2})
+
+    @mock.patch('requests.sessions.Session.get')
+    def test_watch_bookmark(self, m_get):
+        path = '/test'
+        data = [{'type': 'ADDED',
+                 'object': {'metadata': {'name': 'obj', 'uid': 'uid',
+                                         'resourceVersion': '1'}}},
+                {'type': 'BOOKMARK',
+                 'object': {'metadata': {'resourceVersion': '5'}}}]
+        lines = [jsonutils.dump_as_bytes(i) for i in data]
+
+        m_resp = mock.MagicMock()
+        m_resp.ok = True
+        m_resp.iter_lines.side_effect = [lines, requests.ReadTimeout,
+                                         lines[:1]]
+        m_get.return_value = m_resp
+
+        self.assertEqual([data[0], data[0]],
+                         list(itertools.islice(
+                             self.client.watch(path, resource_version='1'),
+                             2)))
+        # Second event is not consumed yet, so bookmark is the last position.
+        self.assertEqual('5', self.client.get_watch_resource_version(path))
         m_get.assert_any_call(
-            self.base_url + path, stream=True, params={"watch": "true",
-                                                       "resourceVersion": 2})
+            self.base_url + path, stream=True,
+            params={"watch": "true", "allowWatchBookmarks": "true",
+                    "resourceVersion": '5'})
+
+    @mock.patch('requests.sessions.Session.get')
+    def test_watch_expired_event(self, m_get):
+        path = '/test'
+        data = [{'type': 'ERROR',
+                 'object': {'kind': 'Status', 'code': 410,
+                            'message': 'too old resource version'}}]
+        lines = [jsonutils.dump_as_bytes(i) for i in data]
+
+        m_resp = mock.MagicMock()
+        m_resp.ok = True
+        m_resp.iter_lines.return_value = lines
+        m_get.return_value = m_resp
+
+        self.assertRaises(exc.K8sResourceVersionExpired, next,
+                          self.client.watch(path, resource_version='1'))
+        self.assertIsNone(self.client.get_watch_resource_version(path))
+
+    @mock.patch('requests.sessions.Session.get')
+    def test_watch_expired_response(self, m_get):
+        path = '/test'
+
+        m_resp = mock.MagicMock()
+        m_resp.ok = False
+        m_resp.status_code = 410
+        m_get.return_value = m_resp
+
+        self.assertRaises(exc.K8sResourceVersionExpired, next,
+                          self.client.watch(path, resource_version='1'))
 
     @mock.patch('requests.sessions.Session.get')
     def test_watch_exception(self, m_get):
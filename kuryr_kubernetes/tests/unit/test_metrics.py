@@ -0,0 +1,114 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from unittest import mock
+
+import prometheus_client
+
+from kuryr_kubernetes.handlers import asynchronous
+from kuryr_kubernetes import metrics
+from kuryr_kubernetes.tests import base as test_base
+
+
+class TestMetrics(test_base.TestCase):
+
+    def test_get_resource_k8s(self):
+        for path, resource in (
+                ('/api/v1/pods', 'pods'),
+                ('/api/v1/namespaces/ns/pods/pod1', 'pods'),
+                ('/api/v1/namespaces/ns/pods/pod1/status', 'pods/status'),
+                ('/api/v1/namespaces/ns1', 'namespaces'),
+                ('/apis/openstack.org/v1/namespaces/ns/kuryrports/kp1',
+                 'kuryrports'),
+                ('/healthz', 'healthz')):
+            self.assertEqual(resource,
+                             metrics.get_resource(metrics.KUBERNETES, path))
+
+    def test_get_resource_openstack(self):
+        for path, resource in (
+                ('/v2.0/ports', 'ports'),
+                ('/v2.0/ports/d9a2e0a4-0fe0-4bcf-9f1b-3b0bcd6d1c3b', 'ports'),
+                ('/v2.0/trunks/d9a2e0a4-0fe0-4bcf-9f1b-3b0bcd6d1c3b/'
+                 'add_subports', 'trunks/add_subports'),
+                ('/load-balancer/v2/lbaas/loadbalancers/'
+                 'd9a2e0a4-0fe0-4bcf-9f1b-3b0bcd6d1c3b',
+                 'load-balancer/lbaas/loadbalancers')):
+            self.assertEqual(resource, metrics.get_resource('openstack', path))
+
+    def test_get_pod_age(self):
+        self.assertEqual(3.5, metrics.get_pod_age('2020-12-22T09:04:29Z',
+                                                  1608627872.5))
+        self.assertEqual(0, metrics.get_pod_age('2020-12-22T09:04:29Z',
+                                                1608627800))
+        self.assertIsNone(metrics.get_pod_age(None))
+        self.assertIsNone(metrics.get_pod_age('yesterday'))
+
+    def test_observe_pod_readiness(self):
+        histogram = mock.Mock()
+
+        metrics.observe_pod_readiness(metrics.STAGE_VIFS_ACTIVATED,
+                                      '2020-12-22T09:04:29Z', 1608627872.5,
+                                      histogram=histogram)
+        metrics.observe_pod_readiness(metrics.STAGE_VIFS_ACTIVATED, None,
+                                      histogram=histogram)
+
+        histogram.labels.assert_called_once_with(metrics.STAGE_VIFS_ACTIVATED)
+        histogram.labels().observe.assert_called_once_with(3.5)
+
+    def test_shared_histogram(self):
+        registry = prometheus_client.CollectorRegistry()
+        histogram = metrics.SharedHistogram('test_hist', 'Test.', 'stage',
+                                            ('a', 'b'), buckets=(1, 5),
+                                            registry=registry)
+
+        histogram.labels('a').observe(0.5)
+        histogram.labels('a').observe(3)
+        histogram.labels('a').observe(10)
+        histogram.labels('b').observe(2)
+
+        def sample(name, stage, **labels):
+            labels['stage'] = stage
+            return registry.get_sample_value(name, labels)
+
+        self.assertEqual(1, sample('test_hist_bucket', 'a', le='1.0'))
+        self.assertEqual(2, sample('test_hist_bucket', 'a', le='5.0'))
+        self.assertEqual(3, sample('test_hist_bucket', 'a', le='+Inf'))
+        self.assertEqual(3, sample('test_hist_count', 'a'))
+        self.assertEqual(13.5, sample('test_hist_sum', 'a'))
+        self.assertEqual(0, sample('test_hist_bucket', 'b', le='1.0'))
+        self.assertEqual(1, sample('test_hist_count', 'b'))
+
+    def test_collect_queue_depth(self):
+        queue = asynchronous.WorkQueue()
+        collector = metrics._Collector()
+        collector.add_queue(queue)
+        queue.add('a', 1)
+        queue.add('b', 2)
+        queue.get()
+
+        depth = next(collector.collect())
+
+        self.assertEqual({'queued': 1, 'delayed': 0, 'processing': 1},
+                         {s.labels['state']: s.value for s in depth.samples})
+
+    def test_collect_pool_sizes(self):
+        pool = mock.Mock()
+        pool.get_pool_sizes.return_value = {('node1', 'net1'): 3}
+        collector = metrics._Collector()
+        collector.add_pool(pool)
+
+        sizes = list(collector.collect())[1]
+
+        self.assertEqual(1, len(sizes.samples))
+        self.assertEqual({'driver': 'Mock', 'host': 'node1',
+                          'network_id': 'net1'}, sizes.samples[0].labels)
+        self.assertEqual(3, sizes.samples[0].value)
@@ -0,0 +1,191 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from unittest import mock
+
+from oslo_config import cfg
+from requests import adapters
+
+from kuryr_kubernetes import metrics
+from kuryr_kubernetes import rate_limit
+from kuryr_kubernetes.tests import base as test_base
+
+CONF = cfg.CONF
+
+
+class TestTokenBucket(test_base.TestCase):
+
+    @mock.patch('time.monotonic')
+    def test_reserve_burst(self, m_monotonic):
+        m_monotonic.return_value = 100
+        bucket = rate_limit.TokenBucket(2, 3)
+
+        self.assertEqual([0, 0, 0, 0.5, 1.0],
+                         [bucket.reserve() for _ in range(5)])
+
+    @mock.patch('time.monotonic')
+    def test_reserve_refill(self, m_monotonic):
+        m_monotonic.return_value = 100
+        bucket = rate_limit.TokenBucket(2)
+        self.assertEqual(2, bucket.burst)
+        bucket.reserve()
+        bucket.reserve()
+
+        m_monotonic.return_value = 100.5
+        self.assertEqual(0, bucket.reserve())
+        self.assertEqual(0.5, bucket.reserve())
+
+        m_monotonic.return_value = 1000
+        self.assertEqual(0, bucket.reserve())
+        self.assertEqual(0, bucket.reserve())
+        self.assertEqual(0.5, bucket.reserve())
+
+
+class TestRateLimiter(test_base.TestCase):
+
+    @mock.patch('time.sleep')
+    def test_wait_unlimited(self, m_sleep):
+        limiter = rate_limit.RateLimiter('test')
+        for _ in range(10):
+            limiter.wait('GET')
+        m_sleep.assert_not_called()
+
+    @mock.patch('time.monotonic', return_value=100)
+    @mock.patch('time.sleep')
+    def test_wait_per_verb(self, m_sleep, m_monotonic):
+        limiter = rate_limit.RateLimiter('test_verb', 'host', qps=1,
+                                         verb_qps={'get': 10})
+        for _ in range(10):
+            limiter.wait('GET')
+        m_sleep.assert_not_called()
+
+        limiter.wait('PATCH')
+        m_sleep.assert_not_called()
+        limiter.wait('PATCH')
+        m_sleep.assert_called_once_with(1.0)
+        self.assertEqual(1.0, metrics.REGISTRY.get_sample_value(
+            'kuryr_api_throttle_wait_seconds_total',
+            {'api': 'test_verb', 'host': 'host', 'method': 'PATCH'}))
+
+    @mock.patch('time.monotonic', return_value=100)
+    @mock.patch('time.sleep')
+    def test_pause(self, m_sleep, m_monotonic):
+        limiter = rate_limit.RateLimiter('test')
+        limiter.pause(5)
+        limiter.pause(2)
+        limiter.wait('GET')
+        m_sleep.assert_called_once_with(5)
+
+
+class TestRateLimitingAdapter(test_base.TestCase):
+
+    def setUp(self):
+        super(TestRateLimitingAdapter, self).setUp()
+        self.adapter = rate_limit.RateLimitingHTTPAdapter('test_adapter')
+
+    def _response(self, status_code, retry_after=None):
+        response = mock.Mock(status_code=status_code, headers={})
+        if retry_after is not None:
+            response.headers['Retry-After'] = retry_after
+        return response
+
+    def _request(self, url='https://k8s:6443/api/v1/pods', method='GET'):
+        return mock.Mock(url=url, method=method)
+
+    @mock.patch.object(rate_limit.RateLimiter, 'wait')
+    @mock.patch.object(adapters.HTTPAdapter, 'send')
+    def test_send(self, m_send, m_wait):
+        response = self._response(200)
+        m_send.return_value = response
+        request = self._request(
+            url='https://neutron:9696/v2.0/ports/'
+                '3d2c7ea4-4b5b-4dcb-b0b8-3e3b7e0fe6b2', method='PUT')
+
+        self.assertEqual(response, self.adapter.send(request, timeout=5))
+        m_send.assert_called_once_with(request, timeout=5)
+        m_wait.assert_called_once_with('PUT')
+        self.assertEqual(1, metrics.REGISTRY.get_sample_value(
+            'kuryr_api_requests_total',
+            {'api': 'test_adapter', 'host': 'neutron:9696', 'method': 'PUT',
+             'resource': 'ports', 'code': '200'}))
+
+    @mock.patch.object(rate_limit.RateLimiter, 'wait')
+    @mock.patch.object(adapters.HTTPAdapter, 'send')
+    def test_send_watch(self, m_send, m_wait):
+        m_send.return_value = self._response(200)
+
+        self.adapter.send(self._request(
+            url='https://k8s:6443/api/v1/pods?watch=true'))
+        m_wait.assert_called_once_with('WATCH')
+
+    @mock.patch.object(rate_limit.RateLimiter, 'pause')
+    @mock.patch.object(rate_limit.RateLimiter, 'wait')
+    @mock.patch.object(adapters.HTTPAdapter, 'send')
+    def test_send_throttled(self, m_send, m_wait, m_pause):
+        throttled = self._response(429, '3')
+        response = self._response(200)
+        m_send.side_effect = [throttled, response]
+
+        self.assertEqual(response, self.adapter.send(self._request()))
+        self.assertEqual(2, m_send.call_count)
+        self.assertEqual(2, m_wait.call_count)
+        m_pause.assert_called_once_with(3.0)
+        throttled.close.assert_called_once()
+        self.assertEqual(1, metrics.REGISTRY.get_sample_value(
+            'kuryr_api_throttled_responses_total',
+            {'api': 'test_adapter', 'host': 'k8s:6443'}))
+
+    @mock.patch.object(rate_limit.RateLimiter, 'pause')
+    @mock.patch.object(rate_limit.RateLimiter, 'wait')
+    @mock.patch.object(adapters.HTTPAdapter, 'send')
+    def test_send_throttled_give_up(self, m_send, m_wait, m_pause):
+        CONF.set_override('max_throttled_retries', 2, group='rate_limit')
+        self.addCleanup(CONF.clear_override, 'max_throttled_retries',
+                        group='rate_limit')
+        throttled = self._response(429)
+        m_send.return_value = throttled
+
+        self.assertEqual(throttled, self.adapter.send(self._request()))
+        self.assertEqual(3, m_send.call_count)
+        m_pause.assert_has_calls([mock.call(rate_limit.DEFAULT_RETRY_AFTER)]
+                                 * 2)
+
+    def test_limiter_per_host(self):
+        neutron = self.adapter._get_limiter('https://neutron:9696/v2.0/ports')
+        octavia = self.adapter._get_limiter('https://octavia:9876/v2/lbs')
+
+        self.assertIsNot(neutron, octavia)
+        self.assertIs(neutron, self.adapter._get_limiter(
+            'https://neutron:9696/v2.0/networks'))
+
+
+class TestGetRetryAfter(test_base.TestCase):
+
+    def test_seconds(self):
+        response = mock.Mock(headers={'Retry-After': '7'})
+        self.assertEqual(7, rate_limit._get_retry_after(response))
+
+    def test_capped(self):
+        response = mock.Mock(headers={'Retry-After': '3600'})
+        self.assertEqual(CONF.rate_limit.max_retry_after,
+                         rate_limit._get_retry_after(response))
+
+    @mock.patch('time.time', return_value=784111767)
+    def test_http_date(self, m_time):
+        response = mock.Mock(
+            headers={'Retry-After': 'Sun, 06 Nov 1994 08:49:47 GMT'})
+        self.assertEqual(20, rate_limit._get_retry_after(response))
+
+    def test_invalid(self):
+        response = mock.Mock(headers={'Retry-After': 'soon'})
+        self.assertEqual(rate_limit.DEFAULT_RETRY_AFTER,
+                         rate_limit._get_retry_after(response))
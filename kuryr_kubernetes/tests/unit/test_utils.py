@@ -20,6 +20,7 @@ from oslo_config import cfg
 
 from kuryr_kubernetes import constants as k_const
 from kuryr_kubernetes import exceptions as k_exc
+from kuryr_kubernetes import informer
 from kuryr_kubernetes.objects import vif
 from kuryr_kubernetes.tests import base as test_base
 from kuryr_kubernetes.tests.unit import kuryr_fixtures as k_fix
@@ -488,3 +489,20 @@ class TestUtils(test_base.TestCase):
         sub = utils.get_subnet_id(**filters)
         m_net.subnets.assert_called_with(**filters)
         self.assertIsNone(sub)
+
+    def test_get_pod_by_ip_cached(self):
+        kubernetes = self.useFixture(k_fix.MockK8sClient()).client
+        self.useFixture(k_fix.MockInformerStores())
+        running = {'metadata': {'name': 'a', 'namespace': 'ns1',
+                                'uid': 'a-uid'},
+                   'status': {'phase': 'Running', 'podIP': '10.0.0.1'}}
+        finished = {'metadata': {'name': 'b', 'namespace': 'ns1',
+                                 'uid': 'b-uid'},
+                    'status': {'phase': 'Succeeded', 'podIP': '10.0.0.2'}}
+        informer.ensure_store('/api/v1/pods').replace([running, finished])
+
+        self.assertEqual(running, utils.get_pod_by_ip('10.0.0.1'))
+        self.assertEqual(running, utils.get_pod_by_ip('10.0.0.1', 'ns1'))
+        self.assertEqual({}, utils.get_pod_by_ip('10.0.0.1', 'ns2'))
+        self.assertEqual({}, utils.get_pod_by_ip('10.0.0.2'))
+        kubernetes.get.assert_not_called()
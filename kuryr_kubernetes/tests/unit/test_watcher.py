@@ -16,6 +16,10 @@
 from eventlet import greenlet
 from unittest import mock
 
+from oslo_config import cfg as oslo_cfg
+
+from kuryr_kubernetes import exceptions as k_exc
+from kuryr_kubernetes import informer
 from kuryr_kubernetes.tests import base as test_base
 from kuryr_kubernetes.tests.unit import kuryr_fixtures
 from kuryr_kubernetes import watcher
@@ -27,6 +31,7 @@ class TestWatcher(test_base.TestCase):
         super(TestWatcher, self).setUp()
         mock_client = self.useFixture(kuryr_fixtures.MockK8sClient())
         self.client = mock_client.client
+        self.client.get_pages.return_value = [{'items': [], 'metadata': {}}]
 
     @mock.patch.object(watcher.Watcher, '_start_watch')
     def test_add(self, m_start_watch):
@@ -205,7 +210,7 @@ class TestWatcher(test_base.TestCase):
         m_th.kill.assert_not_called()
 
     def _test_watch_mock_events(self, watcher_obj, events):
-        def client_watch(client_path):
+        def client_watch(client_path, resource_version=None):
             for e in events:
                 self.assertTrue(watcher_obj._idle[client_path])
                 yield e
@@ -345,3 +350,251 @@ class TestWatcher(test_base.TestCase):
         tg.add_thread = mock.Mock()  # Reset mock.
         w.start()
         tg.add_thread.assert_called_once_with(mock.ANY, '/test')
+
+    @mock.patch('sys.exit')
+    def test_watch_updates_store(self, m_sys_exit):
+        self.useFixture(kuryr_fixtures.MockInformerStores())
+        path = '/test'
+        old = {'metadata': {'name': 'old', 'uid': 'old-uid'}}
+        new = {'metadata': {'name': 'new', 'uid': 'new-uid'}}
+        events = [{'type': 'ADDED', 'object': new},
+                  {'type': 'DELETED', 'object': old}]
+        self.client.get_pages.return_value = [
+            {'items': [old], 'metadata': {'resourceVersion': '1'}}]
+
+        handled = []
+
+        def handler(event):
+            store = informer.get_store(path)
+            if event['object'] is new:
+                self.assertIsNotNone(store.get('new'))
+            if event['type'] == 'DELETED':
+                self.assertIsNone(store.get('old'))
+            handled.append(event)
+
+        watcher_obj = self._test_watch_create_watcher(path, handler)
+        self._test_watch_mock_events(watcher_obj, events)
+
+        watcher_obj._watch(path)
+
+        self.client.get_pages.assert_called_once_with(path)
+        # Listed objects are dispatched once and the watch starts from the
+        # listing, so K8s API won't send them again.
+        self.assertEqual([{'type': 'ADDED', 'object': old}] + events,
+                         handled)
+        self.client.watch.assert_called_once_with(path, resource_version='1')
+        # Watch is gone, so the Store cannot be trusted anymore.
+        self.assertIsNone(informer.get_store(path))
+
+    @mock.patch('time.sleep')
+    def test_reconcile_updates_store(self, m_sleep):
+        self.useFixture(kuryr_fixtures.MockInformerStores())
+        path = '/test'
+        obj = {'metadata': {'name': 'foo', 'uid': 'foo-uid'}}
+        obj2 = {'metadata': {'name': 'bar', 'uid': 'bar-uid'}}
+        self.client.get_pages.return_value = [
+            {'items': [obj], 'metadata': {'resourceVersion': '1',
+                                          'continue': 'token'}},
+            {'items': [obj2], 'metadata': {'resourceVersion': '2'}}]
+        m_handler = mock.Mock()
+        watcher_obj = watcher.Watcher(m_handler)
+        watcher_obj._running = True
+        watcher_obj._resources.add(path)
+
+        watcher_obj._reconcile(path)
+
+        store = informer.get_store(path)
+        self.assertEqual(obj, store.get('foo'))
+        self.assertEqual(obj2, store.get('bar'))
+        self.assertEqual('2', store.resource_version)
+        m_handler.assert_has_calls([
+            mock.call({'type': 'MODIFIED', 'object': obj}, injected=True),
+            mock.call({'type': 'MODIFIED', 'object': obj2}, injected=True)])
+
+    def _get_obj(self, name, resource_version):
+        return {'metadata': {'name': name, 'uid': f'{name}-uid',
+                             'resourceVersion': resource_version}}
+
+    @mock.patch('time.sleep')
+    def test_reconcile_diff(self, m_sleep):
+        self.useFixture(kuryr_fixtures.MockInformerStores())
+        oslo_cfg.CONF.set_override('watch_reconcile_period', 40,
+                                   group='kubernetes')
+        self.addCleanup(oslo_cfg.CONF.clear_override,
+                        'watch_reconcile_period', group='kubernetes')
+        path = '/test'
+        kept = self._get_obj('kept', '1')
+        changed = self._get_obj('changed', '1')
+        gone = self._get_obj('gone', '1')
+        newer = self._get_obj('newer', '12')
+        informer.ensure_store(path).replace([kept, changed, gone, newer],
+                                            '10')
+        changed_new = self._get_obj('changed', '5')
+        new = self._get_obj('new', '6')
+        self.client.get_pages.return_value = [
+            {'items': [kept, changed_new, new, self._get_obj('newer', '3')],
+             'metadata': {'resourceVersion': '11'}}]
+        m_handler = mock.Mock()
+        watcher_obj = watcher.Watcher(m_handler)
+        watcher_obj._running = True
+        watcher_obj._resources.add(path)
+
+        watcher_obj._reconcile(path)
+
+        m_handler.assert_has_calls([
+            mock.call({'type': 'MODIFIED', 'object': changed_new},
+                      injected=True),
+            mock.call({'type': 'ADDED', 'object': new}, injected=True),
+            mock.call({'type': 'DELETED', 'object': gone}, injected=True)])
+        self.assertEqual(3, m_handler.call_count)
+        m_sleep.assert_has_calls([mock.call(10)] * 3)
+        store = informer.get_store(path)
+        self.assertEqual(changed_new, store.get('changed'))
+        self.assertEqual(new, store.get('new'))
+        self.assertIsNone(store.get('gone'))
+        self.assertEqual(newer, store.get('newer'))
+
+    @mock.patch('time.sleep')
+    def test_reconcile_superseded(self, m_sleep):
+        self.useFixture(kuryr_fixtures.MockInformerStores())
+        path = '/test'
+        store = informer.ensure_store(path)
+        store.replace([], '1')
+        first = self._get_obj('first', '2')
+        second = self._get_obj('second', '3')
+        self.client.get_pages.return_value = [
+            {'items': [first, second], 'metadata': {'resourceVersion': '3'}}]
+        second_new = self._get_obj('second', '4')
+
+        def handler(event, injected):
+            # Watch delivers an update while reconciliation is in progress.
+            store.handle_event({'type': 'MODIFIED', 'object': second_new})
+        m_handler = mock.Mock(side_effect=handler)
+        watcher_obj = watcher.Watcher(m_handler)
+        watcher_obj._running = True
+        watcher_obj._resources.add(path)
+
+        watcher_obj._reconcile(path)
+
+        m_handler.assert_called_once_with({'type': 'ADDED', 'object': first},
+                                          injected=True)
+
+    @mock.patch('time.sleep')
+    def test_reconcile_list_older_than_delete(self, m_sleep):
+        self.useFixture(kuryr_fixtures.MockInformerStores())
+        path = '/test'
+        store = informer.ensure_store(path)
+        deleted = self._get_obj('deleted', '2')
+        store.replace([deleted], '2')
+
+        def get_pages(path):
+            # Watch reports the deletion after the listing was done.
+            store.handle_event({'type': 'DELETED',
+                                'object': self._get_obj('deleted', '4')})
+            return [{'items': [deleted],
+                     'metadata': {'resourceVersion': '3'}}]
+        self.client.get_pages.side_effect = get_pages
+        m_handler = mock.Mock()
+        watcher_obj = watcher.Watcher(m_handler)
+        watcher_obj._running = True
+        watcher_obj._resources.add(path)
+
+        watcher_obj._reconcile(path)
+
+        m_handler.assert_not_called()
+        self.assertIsNone(store.get('deleted'))
+        self.assertEqual('4', store.resource_version)
+
+    def test_reconcile_stopped(self):
+        path = '/test'
+        self.client.get_pages.return_value = [
+            {'items': [self._get_obj('foo', '1')], 'metadata': {}}]
+        m_handler = mock.Mock()
+        watcher_obj = watcher.Watcher(m_handler)
+
+        watcher_obj._reconcile(path)
+
+        m_handler.assert_not_called()
+
+    @mock.patch('sys.exit')
+    def test_watch_list_stopped(self, m_sys_exit):
+        self.useFixture(kuryr_fixtures.MockInformerStores())
+        path = '/test'
+        self.client.get_pages.return_value = [
+            {'items': [self._get_obj('foo', '1'), self._get_obj('bar', '1')],
+             'metadata': {'resourceVersion': '1'}}]
+
+        def handler(event):
+            watcher_obj._running = False
+
+        m_handler = mock.Mock(side_effect=handler)
+        watcher_obj = self._test_watch_create_watcher(path, m_handler)
+
+        watcher_obj._watch(path)
+
+        m_handler.assert_called_once()
+        self.client.watch.assert_not_called()
+
+    @mock.patch('sys.exit')
+    def test_watch_resume(self, m_sys_exit):
+        path = '/test'
+        events = [{'e': i} for i in range(3)]
+        side_effects = [exceptions.ChunkedEncodingError("Connection Broken")]
+        side_effects.extend(None for _ in events)
+
+        m_handler = mock.Mock()
+        m_handler.side_effect = side_effects
+        watcher_obj = self._test_watch_create_watcher(path, m_handler, 10)
+        self._test_watch_mock_events(watcher_obj, events)
+        self.client.get_watch_resource_version.return_value = '5'
+
+        watcher_obj._watch(path)
+
+        self.client.watch.assert_has_calls([
+            mock.call(path, resource_version=None),
+            mock.call(path, resource_version='5')])
+        # Resumed watch doesn't need the path to be listed again.
+        self.client.get_pages.assert_called_once_with(path)
+
+    @mock.patch('sys.exit')
+    def test_watch_expired(self, m_sys_exit):
+        self.useFixture(kuryr_fixtures.MockInformerStores())
+        path = '/test'
+        kept = {'metadata': {'name': 'kept', 'uid': 'kept-uid',
+                             'resourceVersion': '1'}}
+        changed = {'metadata': {'name': 'changed', 'uid': 'changed-uid',
+                                'resourceVersion': '1'}}
+        gone = {'metadata': {'name': 'gone', 'uid': 'gone-uid',
+                             'resourceVersion': '1'}}
+        new = {'metadata': {'name': 'new', 'uid': 'new-uid',
+                            'resourceVersion': '3'}}
+        changed_new = {'metadata': {'name': 'changed', 'uid': 'changed-uid',
+                                    'resourceVersion': '2'}}
+        self.client.get_pages.side_effect = [
+            [{'items': [kept, changed, gone],
+              'metadata': {'resourceVersion': '1'}}],
+            [{'items': [kept, changed_new, new],
+              'metadata': {'resourceVersion': '10'}}]]
+
+        def client_watch(client_path, resource_version=None):
+            if resource_version == '1':
+                raise k_exc.K8sResourceVersionExpired('expired')
+            return iter([])
+        self.client.watch.side_effect = client_watch
+
+        m_handler = mock.Mock()
+        watcher_obj = self._test_watch_create_watcher(path, m_handler)
+
+        watcher_obj._watch(path)
+
+        m_handler.assert_has_calls([
+            mock.call({'type': 'ADDED', 'object': kept}),
+            mock.call({'type': 'ADDED', 'object': changed}),
+            mock.call({'type': 'ADDED', 'object': gone}),
+            mock.call({'type': 'MODIFIED', 'object': changed_new}),
+            mock.call({'type': 'ADDED', 'object': new}),
+            mock.call({'type': 'DELETED', 'object': gone})])
+        self.assertEqual(6, m_handler.call_count)
+        self.client.watch.assert_has_calls([
+            mock.call(path, resource_version='1'),
+            mock.call(path, resource_version='10')])
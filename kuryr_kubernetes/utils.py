@@ -29,6 +29,7 @@ from oslo_serialization import jsonutils
 from kuryr_kubernetes import clients
 from kuryr_kubernetes import constants
 from kuryr_kubernetes import exceptions
+from kuryr_kubernetes import informer
 from kuryr_kubernetes.objects import lbaas as obj_lbaas
 from kuryr_kubernetes.objects import vif
 from kuryr_kubernetes import os_vif_util
@@ -211,23 +212,37 @@ def exponential_sleep(deadline, attempt, interval=DEFAULT_INTERVAL,
     :param jitter: max value of jitter added to the sleep time
     :return: the actual time that we've slept
     """
+    to_sleep = exponential_delay(deadline, attempt, interval,
+                                 max_backoff=max_backoff, jitter=jitter)
+    if to_sleep:
+        time.sleep(to_sleep)
+    return to_sleep
+
+
+def exponential_delay(deadline, attempt, interval=DEFAULT_INTERVAL,
+                      max_backoff=MAX_BACKOFF, jitter=DEFAULT_JITTER):
+    """Return exponential delay before the next attempt.
+
+    Works like `exponential_sleep`, but leaves the waiting to the caller.
+
+    :return: the time to wait or 0 if the deadline has passed
+    """
     now = time.time()
     seconds_left = deadline - now
 
     if seconds_left <= 0:
         return 0
 
-    to_sleep = exponential_backoff(attempt, interval, max_backoff=max_backoff,
-                                   jitter=jitter)
+    delay = exponential_backoff(attempt, interval, max_backoff=max_backoff,
+                                jitter=jitter)
 
-    if to_sleep > seconds_left:
-        to_sleep = seconds_left
+    if delay > seconds_left:
+        delay = seconds_left
 
-    if to_sleep < interval:
-        to_sleep = interval
+    if delay < interval:
+        delay = interval
 
-    time.sleep(to_sleep)
-    return to_sleep
+    return delay
 
 
 def exponential_backoff(attempt, interval=DEFAULT_INTERVAL,
@@ -582,7 +597,21 @@ def is_kubernetes_default_resource(obj):
             obj['metadata']['namespace'] == 'default')
 
 
+def _is_running_in_namespace(pod, namespace):
+    if namespace and pod['metadata'].get('namespace') != namespace:
+        return False
+    return (pod.get('status', {}).get('phase') ==
+            constants.K8S_POD_STATUS_RUNNING)
+
+
 def get_pod_by_ip(pod_ip, namespace=None):
+    pods = informer.list_by_index(
+        f'{constants.K8S_API_BASE}/pods', informer.INDEX_POD_IP, pod_ip,
+        predicate=lambda pod: _is_running_in_namespace(pod, namespace))
+    if pods is not None:
+        # Only one Pod should have the IP
+        return pods[0] if pods else {}
+
     k8s = clients.get_kubernetes_client()
     pod = {}
     try:
@@ -22,6 +22,8 @@ from oslo_log import log as logging
 from kuryr_kubernetes import clients
 from kuryr_kubernetes import exceptions
 from kuryr_kubernetes.handlers import health
+from kuryr_kubernetes import informer
+from kuryr_kubernetes import metrics
 from kuryr_kubernetes import utils
 
 LOG = logging.getLogger(__name__)
@@ -134,27 +136,138 @@ class Watcher(health.HealthHandler):
         for path in list(self._watching):
             self._stop_watch(path)
 
+    def _list(self, path):
+        """Lists the path page by page.
+
+        :return: tuple of the list of objects and the resourceVersion of the
+                 listing
+        """
+        items = []
+        resource_version = None
+        for page in self._client.get_pages(path):
+            # NOTE(gryf): For some resources (like pods) we could observe that
+            # 'items' is set to None. I'm not sure if that's a K8s issue, since
+            # accroding to the documentation is should be list.
+            items.extend(page.get('items') or [])
+            resource_version = page.get('metadata', {}).get('resourceVersion')
+        return items, resource_version
+
+    def _sync_store(self, path):
+        """Seeds the informer Store of the path with its full listing.
+
+        Listed objects are dispatched as ADDED events, as K8s API won't send
+        them again when the watch starts from the resourceVersion of the
+        listing.
+
+        :return: resourceVersion to start watching the path from or None if
+                 the path wasn't listed and the watch has to start from
+                 scratch
+        """
+        if not informer.is_enabled():
+            return None
+        try:
+            items, resource_version = self._list(path)
+        except exceptions.K8sClientException:
+            LOG.warning("Error listing '%s', local cache of it won't be "
+                        "used until next successful listing.", path)
+            informer.invalidate(path)
+            return None
+        self._update_store(path, items, resource_version)
+
+        for obj in items:
+            if not (self._running and path in self._resources):
+                break
+            self._idle[path] = False
+            self._handler({'type': 'ADDED', 'object': obj})
+            self._idle[path] = True
+        return resource_version
+
+    def _update_store(self, path, items, resource_version):
+        if not informer.is_enabled():
+            return
+        informer.ensure_store(path).replace(items, resource_version)
+
+    def _store_event(self, path, event):
+        # Store is updated before the event gets to the handlers, so
+        # they will always see the state at least as recent as the event.
+        if informer.is_enabled():
+            informer.ensure_store(path).handle_event(event)
+
+    def _relist(self, path):
+        """Lists the path and dispatches the changes missed by the watch.
+
+        Used when K8s API cannot resume the watch from the last known
+        resourceVersion. If the local Store of the path is in sync, only the
+        differences are dispatched, otherwise all listed objects are.
+
+        :return: resourceVersion to resume watching the path from
+        """
+        items, resource_version = self._list(path)
+        store = informer.get_store(path)
+        if store is not None:
+            events = store.diff(items, resource_version)
+        else:
+            events = [{'type': 'MODIFIED', 'object': obj} for obj in items]
+        self._update_store(path, items, resource_version)
+
+        LOG.info("Relisted '%s', dispatching %d missed events.", path,
+                 len(events))
+        for event in events:
+            self._idle[path] = False
+            self._handler(event)
+            self._idle[path] = True
+        return resource_version
+
     def _reconcile(self, path):
+        """Dispatches the changes of the path missed by the watch.
+
+        Listed objects are compared with the local Store by uid and
+        resourceVersion, so only the missing, changed and vanished objects
+        are dispatched. Their events are spread over the reconcile period to
+        avoid bursts of work. If there's no synchronized Store, all the
+        listed objects are dispatched.
+        """
         LOG.debug(f'Getting {path} for reconciliation.')
         try:
-            response = self._client.get(path)
-            resources = response['items']
+            resources, resource_version = self._list(path)
         except exceptions.K8sClientException:
             LOG.exception(f'Error getting path when reconciling.')
             return
 
-        # NOTE(gryf): For some resources (like pods) we could observe that
-        # 'items' is set to None. I'm not sure if that's a K8s issue, since
-        # accroding to the documentation is should be list.
-        if not resources:
+        store = informer.get_store(path)
+        if store is not None:
+            events = store.diff(resources, resource_version)
+            for event in events:
+                store.handle_event(event)
+            LOG.debug('Reconciling %d out of %d objects of %s.', len(events),
+                      len(resources), path)
+        else:
+            self._update_store(path, resources, resource_version)
+            events = [{'type': 'MODIFIED', 'object': resource}
+                      for resource in resources]
+
+        if not events:
             return
 
-        for resource in resources:
-            event = {
-                'type': 'MODIFIED',
-                'object': resource,
-            }
+        interval = CONF.kubernetes.watch_reconcile_period / (len(events) + 1)
+        for event in events:
+            if not (self._running and path in self._resources):
+                return
+            if store is not None and self._is_superseded(store, event):
+                # The watch has delivered a newer state in the meantime.
+                continue
             self._handler(event, injected=True)
+            time.sleep(interval)
+
+    @staticmethod
+    def _is_superseded(store, event):
+        obj = event['object']
+        known = store.get_by_uid(obj['metadata']['uid'])
+        if event['type'] == 'DELETED':
+            return known is not None
+        return (known is None or
+                known['metadata'].get('resourceVersion') !=
+                obj['metadata'].get('resourceVersion'))
 
     def _start_watch(self, path):
         tg = self._thread_group
@@ -184,6 +297,7 @@ class Watcher(health.HealthHandler):
                     self._timers.pop(path, None)
                 self._watching.pop(path, None)
                 self._idle.pop(path, None)
+                informer.invalidate(path)
 
     def _graceful_watch_exit(self, path):
         try:
@@ -191,6 +305,7 @@ class Watcher(health.HealthHandler):
             if CONF.kubernetes.watch_reconcile_period:
                 self._timers.pop(path, None)
             self._idle.pop(path, None)
+            informer.invalidate(path)
             LOG.info("Stopped watching '%s'", path)
         except KeyError:
             LOG.error("Failed to exit watch gracefully")
@@ -203,6 +318,7 @@ class Watcher(health.HealthHandler):
     def _watch(self, path):
         attempts = 0
         deadline = 0
+        resource_version = None
         while self._running and path in self._resources:
             try:
                 retry = False
@@ -215,22 +331,55 @@ class Watcher(health.HealthHandler):
                     self._alive = False
                     return
 
-                LOG.info("Started watching '%s'", path)
-                for event in self._client.watch(path):
+                if resource_version is None:
+                    # Watching from scratch, so (re)build the local cache,
+                    # events could have been missed while we were not
+                    # watching.
+                    resource_version = self._sync_store(path)
+                    if not (self._running and path in self._resources):
+                        return
+                    LOG.info("Started watching '%s'", path)
+                else:
+                    LOG.info("Resumed watching '%s' from resourceVersion %s",
+                             path, resource_version)
+                for event in self._client.watch(
+                        path, resource_version=resource_version):
                     # NOTE(esevan): Watcher retries watching for
                     # `self._timeout` duration with exponential backoff
                     # algorithm to tolerate against temporal exception such as
                     # temporal disconnection to the k8s api server.
                     attempts = 0
                     self._idle[path] = False
+                    self._store_event(path, event)
                     self._handler(event)
                     self._idle[path] = True
                     if not (self._running and path in self._resources):
                         return
+            except exceptions.K8sResourceVersionExpired:
+                LOG.info("Watch of '%s' cannot be resumed from "
+                         "resourceVersion %s, relisting it.", path,
+                         self._client.get_watch_resource_version(path))
+                retry = True
+                self._idle[path] = True
+                metrics.WATCH_RESTARTS.labels(path, 'expired').inc()
+                try:
+                    resource_version = self._relist(path)
+                except Exception:
+                    LOG.exception("Caught exception while relisting.")
+                    informer.invalidate(path)
+                    resource_version = None
+                    attempts += 1
             except Exception:
                 LOG.exception("Caught exception while watching.")
                 LOG.warning("Restarting(%s) watching '%s'.",
                             attempts, path)
+                metrics.WATCH_RESTARTS.labels(path, 'error').inc()
+                # Resume from the last event that got handled, so K8s API
+                # won't resend all the objects.
+                resource_version = self._client.get_watch_resource_version(
+                    path)
+                if resource_version is None:
+                    informer.invalidate(path)
                 attempts += 1
                 retry = True
                 self._idle[path] = True